@@ -0,0 +1 @@
+"""Benchmarks for the Pill Assistant integration."""
@@ -0,0 +1,244 @@
+"""Fixtures and reporting for the Pill Assistant benchmarks."""
+
+from __future__ import annotations
+
+from collections.abc import Awaitable, Callable
+import json
+import os
+import shutil
+import statistics
+import time
+from typing import Any, TypeVar
+from unittest.mock import patch
+from zoneinfo import ZoneInfo
+
+import pytest
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import storage
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.pill_assistant.const import (
+    CONF_HUB,
+    CONF_HUB_MEDICATIONS,
+    DOMAIN,
+)
+from custom_components.pill_assistant.store import PillAssistantStore
+
+from .generate import (
+    DEFAULT_DOSES_PER_DAY,
+    DEFAULT_MEDICATIONS,
+    DEFAULT_YEARS,
+    generate_dataset,
+)
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# The time zone the Home Assistant test fixture configures
+TEST_TIME_ZONE = ZoneInfo("US/Pacific")
+
+# Captured before the hass fixture replaces them with in-memory storage
+_REAL_STORAGE = {
+    "_async_load": storage.Store._async_load,
+    "_async_write_data": storage.Store._async_write_data,
+    "async_remove": storage.Store.async_remove,
+}
+
+_T = TypeVar("_T")
+
+RESULTS_KEY = pytest.StashKey[dict[str, dict[str, float]]]()
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    """Add options for the dataset scale and the baseline."""
+    group = parser.getgroup("pill_assistant benchmarks")
+    group.addoption("--bench-medications", type=int, default=DEFAULT_MEDICATIONS)
+    group.addoption("--bench-years", type=int, default=DEFAULT_YEARS)
+    group.addoption("--bench-doses-per-day", type=int, default=DEFAULT_DOSES_PER_DAY)
+    group.addoption("--bench-rounds", type=int, default=5)
+    group.addoption(
+        "--bench-tolerance",
+        type=float,
+        default=1.5,
+        help="Report a regression when a median exceeds the baseline by this factor",
+    )
+    group.addoption(
+        "--update-baseline",
+        action="store_true",
+        help="Write the measured medians to benchmarks/baseline.json",
+    )
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    """Prepare the results table."""
+    config.stash[RESULTS_KEY] = {}
+
+
+def _scale(config: pytest.Config) -> dict[str, int]:
+    """Return the dataset scale selected on the command line."""
+    return {
+        "medications": config.getoption("--bench-medications"),
+        "years": config.getoption("--bench-years"),
+        "doses_per_day": config.getoption("--bench-doses-per-day"),
+    }
+
+
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(enable_custom_integrations):
+    """Enable custom integrations for benchmarking."""
+    yield
+
+
+@pytest.fixture(autouse=True)
+def reset_storage_singleton():
+    """Reset the storage singleton between benchmarks."""
+    PillAssistantStore.reset_instance()
+    yield
+    PillAssistantStore.reset_instance()
+
+
+@pytest.fixture(scope="session")
+def dataset(
+    request: pytest.FixtureRequest, tmp_path_factory: pytest.TempPathFactory
+) -> dict[str, Any]:
+    """Generate the synthetic dataset once per session."""
+    config_dir = tmp_path_factory.mktemp("pill_assistant_dataset")
+    manifest = generate_dataset(
+        str(config_dir), **_scale(request.config), time_zone=TEST_TIME_ZONE
+    )
+    return {**manifest, "config_dir": str(config_dir)}
+
+
+@pytest.fixture
+def hub_entry(hass: HomeAssistant, dataset: dict[str, Any], tmp_path):
+    """Point hass at a copy of the dataset and add a hub entry for it.
+
+    The storage files are read and written for real, so load and save costs
+    are part of every measurement. Each benchmark gets its own copy, so what
+    one writes (taken doses, archived history) is not in the next one's data.
+    """
+    config_dir = tmp_path / "config"
+    shutil.copytree(dataset["config_dir"], config_dir)
+    hass.config.config_dir = str(config_dir)
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        unique_id=f"{DOMAIN}_hub",
+        data={CONF_HUB: True, CONF_HUB_MEDICATIONS: dataset["medications"]},
+    )
+    entry.add_to_hass(hass)
+    with patch.multiple(storage.Store, **_REAL_STORAGE):
+        yield entry
+
+
+@pytest.fixture
+async def loaded_hub(hass: HomeAssistant, hub_entry: MockConfigEntry):
+    """Set up the hub with its full history loaded."""
+    await hass.config_entries.async_setup(hub_entry.entry_id)
+    await hass.async_block_till_done()
+    await hass.data[DOMAIN]["store"].async_load_history()
+    yield hub_entry
+    await hass.config_entries.async_unload(hub_entry.entry_id)
+    await hass.async_block_till_done()
+
+
+class BenchmarkTimer:
+    """Time an async callable over several rounds and record the median."""
+
+    def __init__(self, config: pytest.Config) -> None:
+        """Initialize the timer."""
+        self._results = config.stash[RESULTS_KEY]
+        self._rounds = config.getoption("--bench-rounds")
+
+    async def __call__(
+        self,
+        name: str,
+        func: Callable[[], Awaitable[_T]],
+        *,
+        rounds: int | None = None,
+        setup: Callable[[], Awaitable[None]] | None = None,
+    ) -> _T:
+        """Run ``func`` and record its timings under ``name``.
+
+        ``setup`` runs before every round and is not timed. Returns the
+        result of the last round.
+        """
+        timings = []
+        result: Any = None
+        for _ in range(rounds or self._rounds):
+            if setup is not None:
+                await setup()
+            start = time.perf_counter()
+            result = await func()
+            timings.append(time.perf_counter() - start)
+        self._results[name] = {
+            "median": statistics.median(timings),
+            "min": min(timings),
+            "max": max(timings),
+            "rounds": len(timings),
+        }
+        return result
+
+
+@pytest.fixture
+def bench(request: pytest.FixtureRequest) -> BenchmarkTimer:
+    """Return the benchmark timer."""
+    return BenchmarkTimer(request.config)
+
+
+def _load_baseline() -> dict[str, Any]:
+    """Return the stored baseline, if any."""
+    try:
+        with open(BASELINE_PATH, encoding="utf-8") as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return {}
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config) -> None:
+    """Print the timings next to the baseline and flag regressions."""
+    results = config.stash.get(RESULTS_KEY, {})
+    if not results:
+        return
+
+    scale = _scale(config)
+    baseline = _load_baseline()
+    compare = baseline.get("scale") == scale
+    reference = baseline.get("results", {}) if compare else {}
+    tolerance = config.getoption("--bench-tolerance")
+
+    terminalreporter.section("pill_assistant benchmarks")
+    terminalreporter.write_line(
+        "scale: {medications} medications x {years} years x "
+        "{doses_per_day} doses/day".format(**scale)
+    )
+    if baseline and not compare:
+        terminalreporter.write_line("baseline was recorded at a different scale")
+    regressions = []
+    for name, timing in sorted(results.items()):
+        line = f"{name:<45} {timing['median'] * 1000:10.1f} ms"
+        if name in reference:
+            ratio = timing["median"] / reference[name]
+            line += f"  ({ratio:.2f}x baseline)"
+            if ratio > tolerance:
+                line += "  REGRESSION"
+                regressions.append(name)
+        terminalreporter.write_line(line)
+
+    if config.getoption("--update-baseline"):
+        with open(BASELINE_PATH, "w", encoding="utf-8") as handle:
+            json.dump(
+                {
+                    "scale": scale,
+                    "results": {
+                        name: round(timing["median"], 6)
+                        for name, timing in sorted(results.items())
+                    },
+                },
+                handle,
+                indent=2,
+            )
+            handle.write("\n")
+        terminalreporter.write_line(f"baseline written to {BASELINE_PATH}")
+    elif regressions:
+        terminalreporter.write_line(
+            f"{len(regressions)} benchmark(s) slower than {tolerance}x baseline"
+        )
@@ -0,0 +1,315 @@
+"""Generate a synthetic multi-year Pill Assistant dataset for benchmarks.
+
+The dataset is written the way a long-running installation would have it on
+disk: the storage index, with a state file and a history file per medication,
+under ``.storage`` and the global and per-medication CSV logs. A
+``dataset.json`` manifest next to them holds the hub medication table, so the
+benchmarks can set up the same medications in a single hub entry.
+
+Run it directly to build a dataset for manual profiling:
+
+    python -m benchmarks.generate /tmp/pa_bench --medications 50 --years 5
+"""
+
+from __future__ import annotations
+
+import argparse
+from collections.abc import Iterator
+import csv
+from datetime import date, datetime, time, timedelta, tzinfo
+import json
+import os
+import random
+from typing import Any
+from zoneinfo import ZoneInfo
+
+from custom_components.pill_assistant.const import (
+    CONF_DOSAGE,
+    CONF_DOSAGE_UNIT,
+    CONF_MEDICATION_NAME,
+    CONF_REFILL_AMOUNT,
+    CONF_REFILL_REMINDER_DAYS,
+    CONF_SCHEDULE_DAYS,
+    CONF_SCHEDULE_TIMES,
+    CONF_SCHEDULE_TYPE,
+    RECENT_HISTORY_DAYS,
+    STORAGE_KEY,
+    STORAGE_VERSION,
+)
+from custom_components.pill_assistant.log_utils import (
+    GLOBAL_LOG_COLUMNS,
+    GLOBAL_LOG_FILENAME,
+    LOGS_DIR_NAME,
+    LOGS_PARENT_DIR_NAME,
+    PER_MED_LOG_SUFFIX,
+    _sanitize_filename,
+)
+from custom_components.pill_assistant.store import (
+    history_storage_key,
+    medication_storage_key,
+)
+
+MANIFEST_FILENAME = "dataset.json"
+
+DEFAULT_MEDICATIONS = 50
+DEFAULT_YEARS = 5
+DEFAULT_DOSES_PER_DAY = 4
+DEFAULT_SEED = 1234
+
+ALL_DAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+DOSE_HOURS = (7, 11, 15, 19, 23, 3)
+
+# Share of scheduled doses that are skipped or snoozed before being taken
+SKIP_RATE = 0.04
+SNOOZE_RATE = 0.06
+
+
+def medication_id(index: int) -> str:
+    """Return the medication ID of the medication at ``index``."""
+    return f"bench_med_{index:03d}"
+
+
+def medication_config(index: int, doses_per_day: int) -> dict[str, Any]:
+    """Return the configuration of a fixed-time benchmark medication."""
+    minute = (index * 5) % 60
+    return {
+        CONF_MEDICATION_NAME: f"Bench Med {index:03d}",
+        CONF_DOSAGE: "1",
+        CONF_DOSAGE_UNIT: "each",
+        CONF_SCHEDULE_TYPE: "fixed_time",
+        CONF_SCHEDULE_TIMES: [
+            f"{hour:02d}:{minute:02d}" for hour in DOSE_HOURS[:doses_per_day]
+        ],
+        CONF_SCHEDULE_DAYS: ALL_DAYS,
+        CONF_REFILL_AMOUNT: 30 * doses_per_day,
+        CONF_REFILL_REMINDER_DAYS: 7,
+    }
+
+
+def _iter_events(
+    rng: random.Random,
+    config: dict[str, Any],
+    first_day: date,
+    last_moment: datetime,
+) -> Iterator[tuple[datetime, str, float, dict[str, Any]]]:
+    """Yield ``(timestamp, action, remaining, extra)`` for one medication."""
+    refill_amount = config[CONF_REFILL_AMOUNT]
+    remaining = float(refill_amount)
+    tz = last_moment.tzinfo
+    day = first_day
+    while day <= last_moment.date():
+        for time_str in config[CONF_SCHEDULE_TIMES]:
+            hour, minute = map(int, time_str.split(":"))
+            scheduled = datetime.combine(day, time(hour, minute), tz)
+            roll = rng.random()
+            if roll < SKIP_RATE:
+                moment = scheduled + timedelta(minutes=rng.randint(0, 90))
+                if moment > last_moment:
+                    return
+                yield moment, "skipped", remaining, {}
+                continue
+            if roll < SKIP_RATE + SNOOZE_RATE:
+                snoozed = scheduled + timedelta(minutes=rng.randint(0, 10))
+                if snoozed > last_moment:
+                    return
+                until = snoozed + timedelta(minutes=15)
+                yield snoozed, "snoozed", remaining, {"snooze_until": until}
+                scheduled = until
+            moment = scheduled + timedelta(minutes=round(rng.gauss(0, 20)))
+            if moment > last_moment:
+                return
+            remaining = max(0.0, remaining - 1)
+            yield moment, "taken", remaining, {}
+            if remaining <= config[CONF_REFILL_REMINDER_DAYS]:
+                remaining += refill_amount
+                yield moment + timedelta(hours=1), "refilled", remaining, {}
+        day += timedelta(days=1)
+
+
+def generate_dataset(
+    config_dir: str,
+    *,
+    medications: int = DEFAULT_MEDICATIONS,
+    years: int = DEFAULT_YEARS,
+    doses_per_day: int = DEFAULT_DOSES_PER_DAY,
+    seed: int = DEFAULT_SEED,
+    time_zone: tzinfo | None = None,
+    now: datetime | None = None,
+) -> dict[str, Any]:
+    """Write a dataset into ``config_dir`` and return its manifest.
+
+    History ends at ``now``, so date-range queries relative to the current
+    time always hit a full window.
+    """
+    if not 1 <= doses_per_day <= len(DOSE_HOURS):
+        raise ValueError(f"doses_per_day must be between 1 and {len(DOSE_HOURS)}")
+    time_zone = time_zone or ZoneInfo("UTC")
+    now = (now or datetime.now(time_zone)).astimezone(time_zone)
+    first_day = now.date() - timedelta(days=365 * years)
+    recent_cutoff = now - timedelta(days=RECENT_HISTORY_DAYS)
+    rng = random.Random(seed)
+
+    logs_dir = os.path.join(config_dir, LOGS_PARENT_DIR_NAME, LOGS_DIR_NAME)
+    storage_dir = os.path.join(config_dir, ".storage")
+    os.makedirs(logs_dir, exist_ok=True)
+    os.makedirs(storage_dir, exist_ok=True)
+
+    table: dict[str, dict[str, Any]] = {}
+    records: dict[str, dict[str, Any]] = {}
+    history: list[dict[str, Any]] = []
+    rows: list[dict[str, Any]] = []
+    for index in range(medications):
+        med_id = medication_id(index)
+        config = table[med_id] = medication_config(index, doses_per_day)
+        name = config[CONF_MEDICATION_NAME]
+        med_rows: list[dict[str, Any]] = []
+        record = {
+            **config,
+            "remaining_amount": config[CONF_REFILL_AMOUNT],
+            "last_taken": None,
+            "missed_doses": [],
+        }
+        for moment, action, remaining, extra in _iter_events(
+            rng, config, first_day, now
+        ):
+            timestamp = moment.isoformat()
+            snooze_until = extra.get("snooze_until")
+            entry = {
+                "medication_id": med_id,
+                "medication_name": name,
+                "timestamp": timestamp,
+                "action": action,
+            }
+            if action == "taken":
+                entry[CONF_DOSAGE] = config[CONF_DOSAGE]
+                entry[CONF_DOSAGE_UNIT] = config[CONF_DOSAGE_UNIT]
+                record["last_taken"] = timestamp
+            elif snooze_until is not None:
+                entry["snooze_until"] = snooze_until.isoformat()
+            record["remaining_amount"] = remaining
+            history.append(entry)
+            med_rows.append(
+                {
+                    "timestamp": timestamp,
+                    "action": action,
+                    "medication_id": med_id,
+                    "medication_name": name,
+                    "dosage": config[CONF_DOSAGE],
+                    "dosage_unit": config[CONF_DOSAGE_UNIT],
+                    "remaining_amount": remaining,
+                    "refill_amount": config[CONF_REFILL_AMOUNT],
+                    "snooze_until": snooze_until.isoformat() if snooze_until else "",
+                    "details_json": json.dumps(
+                        {"timestamp": timestamp}, ensure_ascii=False, sort_keys=True
+                    ),
+                }
+            )
+        records[med_id] = record
+        _write_csv(
+            os.path.join(logs_dir, f"{_sanitize_filename(name)}{PER_MED_LOG_SUFFIX}"),
+            med_rows,
+        )
+        rows.extend(med_rows)
+
+    # Events are appended as they happen, so the stored order is chronological
+    history.sort(key=lambda entry: entry["timestamp"])
+    rows.sort(key=lambda row: row["timestamp"])
+    _write_csv(os.path.join(logs_dir, GLOBAL_LOG_FILENAME), rows)
+
+    histories: dict[str, list[dict[str, Any]]] = {}
+    for entry in history:
+        histories.setdefault(entry["medication_id"], []).append(entry)
+    for med_id, record in records.items():
+        med_history = histories.get(med_id, [])
+        _write_store(
+            storage_dir,
+            medication_storage_key(med_id),
+            {
+                "medication": record,
+                "recent_history": [
+                    entry
+                    for entry in med_history
+                    if datetime.fromisoformat(entry["timestamp"]) >= recent_cutoff
+                ],
+            },
+        )
+        if med_history:
+            _write_store(
+                storage_dir, history_storage_key(med_id), {"history": med_history}
+            )
+    _write_store(
+        storage_dir,
+        STORAGE_KEY,
+        {
+            "last_sensor_trigger": {},
+            "medication_ids": sorted(records),
+            "history_ids": sorted(histories),
+            "recent_history": [],
+        },
+    )
+
+    manifest = {
+        "scale": {
+            "medications": medications,
+            "years": years,
+            "doses_per_day": doses_per_day,
+            "seed": seed,
+        },
+        "generated_at": now.isoformat(),
+        "history_entries": len(history),
+        "medications": table,
+    }
+    with open(
+        os.path.join(config_dir, MANIFEST_FILENAME), "w", encoding="utf-8"
+    ) as handle:
+        json.dump(manifest, handle, indent=2)
+    return manifest
+
+
+def _write_csv(path: str, rows: list[dict[str, Any]]) -> None:
+    """Write a CSV log with the integration's columns."""
+    with open(path, "w", newline="", encoding="utf-8") as handle:
+        writer = csv.DictWriter(handle, fieldnames=list(GLOBAL_LOG_COLUMNS))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def _write_store(storage_dir: str, key: str, data: dict[str, Any]) -> None:
+    """Write a storage document as Home Assistant's Store does."""
+    document = {
+        "version": STORAGE_VERSION,
+        "minor_version": 1,
+        "key": key,
+        "data": data,
+    }
+    with open(os.path.join(storage_dir, key), "w", encoding="utf-8") as handle:
+        json.dump(document, handle)
+
+
+def main() -> None:
+    """Generate a dataset from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("config_dir", help="Home Assistant config directory to fill")
+    parser.add_argument("--medications", type=int, default=DEFAULT_MEDICATIONS)
+    parser.add_argument("--years", type=int, default=DEFAULT_YEARS)
+    parser.add_argument("--doses-per-day", type=int, default=DEFAULT_DOSES_PER_DAY)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--time-zone", default="UTC")
+    args = parser.parse_args()
+
+    manifest = generate_dataset(
+        args.config_dir,
+        medications=args.medications,
+        years=args.years,
+        doses_per_day=args.doses_per_day,
+        seed=args.seed,
+        time_zone=ZoneInfo(args.time_zone),
+    )
+    print(
+        f"Wrote {manifest['history_entries']} history entries for "
+        f"{args.medications} medications to {args.config_dir}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Benchmark the hot paths of Pill Assistant on a multi-year dataset."""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import timedelta
+from itertools import cycle
+
+import pytest
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.entity_platform import async_get_platforms
+from homeassistant.util import dt as dt_util
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.pill_assistant.const import (
+    ATTR_END_DATE,
+    ATTR_MEDICATION_ID,
+    ATTR_START_DATE,
+    DOMAIN,
+    SERVICE_GET_MEDICATION_HISTORY,
+    SERVICE_GET_STATISTICS,
+    SERVICE_TAKE_MEDICATION,
+)
+from custom_components.pill_assistant.sensor import PillAssistantSensor
+from custom_components.pill_assistant.store import PillAssistantStore
+
+from .conftest import BenchmarkTimer
+from .generate import medication_id
+
+
+async def test_startup(
+    hass: HomeAssistant,
+    hub_entry: MockConfigEntry,
+    dataset: dict,
+    bench: BenchmarkTimer,
+):
+    """Time setting up every medication from the files on disk."""
+
+    async def unload() -> None:
+        if hub_entry.state is ConfigEntryState.LOADED:
+            await hass.config_entries.async_unload(hub_entry.entry_id)
+            await hass.async_block_till_done()
+        PillAssistantStore.reset_instance()
+
+    async def setup() -> None:
+        await hass.config_entries.async_setup(hub_entry.entry_id)
+        await hass.async_block_till_done()
+
+    await bench("startup", setup, setup=unload)
+    assert hass.states.get("sensor.pa_bench_med_000") is not None
+
+    store = hass.data[DOMAIN]["store"]
+
+    async def reset_history() -> None:
+        await store.async_load_history()
+        store._history_loaded = False
+        store._data["history"].clear()
+        store._snapshot = {**store._snapshot, "history": ()}
+
+    await bench("startup_history_load", store.async_load_history, setup=reset_history)
+    assert store.history_loaded
+    assert len(store.snapshot["history"]) == dataset["history_entries"]
+
+    await hass.config_entries.async_unload(hub_entry.entry_id)
+    await hass.async_block_till_done()
+
+
+async def test_take_medication(
+    hass: HomeAssistant,
+    loaded_hub: MockConfigEntry,
+    dataset: dict,
+    bench: BenchmarkTimer,
+):
+    """Time a take from the service call until every listener has run."""
+    med_ids = cycle(dataset["medications"])
+
+    async def take() -> None:
+        await hass.services.async_call(
+            DOMAIN,
+            SERVICE_TAKE_MEDICATION,
+            {ATTR_MEDICATION_ID: next(med_ids)},
+            blocking=True,
+        )
+        await hass.async_block_till_done()
+
+    await bench("take_medication", take)
+
+
+@pytest.mark.parametrize("days", [7, 30, 365])
+async def test_get_statistics(
+    hass: HomeAssistant, loaded_hub: MockConfigEntry, bench: BenchmarkTimer, days: int
+):
+    """Time statistics over a trailing window of ``days``."""
+    now = dt_util.now()
+
+    async def get_statistics() -> dict:
+        return await hass.services.async_call(
+            DOMAIN,
+            SERVICE_GET_STATISTICS,
+            {
+                ATTR_START_DATE: (now - timedelta(days=days)).isoformat(),
+                ATTR_END_DATE: now.isoformat(),
+            },
+            blocking=True,
+            return_response=True,
+        )
+
+    stats = await bench(f"get_statistics_{days}d", get_statistics)
+    assert stats["total_entries"] > 0
+
+
+@pytest.mark.parametrize(
+    ("page", "days", "one_medication"),
+    [
+        ("medication_30d", 30, True),
+        ("all_7d", 7, False),
+        ("all_365d", 365, False),
+    ],
+)
+async def test_get_medication_history(
+    hass: HomeAssistant,
+    loaded_hub: MockConfigEntry,
+    bench: BenchmarkTimer,
+    page: str,
+    days: int,
+    one_medication: bool,
+):
+    """Time one page of the history table."""
+    now = dt_util.now()
+    service_data = {
+        ATTR_START_DATE: (now - timedelta(days=days)).isoformat(),
+        ATTR_END_DATE: now.isoformat(),
+    }
+    if one_medication:
+        service_data[ATTR_MEDICATION_ID] = medication_id(0)
+
+    async def get_history() -> dict:
+        return await hass.services.async_call(
+            DOMAIN,
+            SERVICE_GET_MEDICATION_HISTORY,
+            service_data,
+            blocking=True,
+            return_response=True,
+        )
+
+    history = await bench(f"get_medication_history_{page}", get_history)
+    assert history["total_entries"] > 0
+
+
+async def test_sensor_refresh(
+    hass: HomeAssistant, loaded_hub: MockConfigEntry, bench: BenchmarkTimer
+):
+    """Time refreshing every medication sensor at once."""
+    sensors = [
+        entity
+        for platform in async_get_platforms(hass, DOMAIN)
+        for entity in platform.entities.values()
+        if isinstance(entity, PillAssistantSensor)
+    ]
+    assert sensors
+
+    async def refresh() -> None:
+        await asyncio.gather(*(sensor._async_update() for sensor in sensors))
+        await hass.async_block_till_done()
+
+    await bench("sensor_refresh_all", refresh)
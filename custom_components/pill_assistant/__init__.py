@@ -4,19 +4,27 @@ from __future__ import annotations
 
 import logging
 import os
-from datetime import timedelta
+from datetime import datetime, timedelta
+from functools import partial
 
 import voluptuous as vol
 
-from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import Platform
+from homeassistant.config_entries import SOURCE_IMPORT, ConfigEntry
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP, Platform
 from homeassistant.core import HomeAssistant, ServiceCall
 from homeassistant.helpers import config_validation as cv
-from homeassistant.helpers.dispatcher import async_dispatcher_send
 from homeassistant.helpers.typing import ConfigType
 import homeassistant.util.dt as dt_util
 
-from .store import PillAssistantStore
+from .actions import (
+    SNOOZE_ACTION_DURATIONS,
+    ActionDedupCache,
+    ActionRouter,
+    build_notification_actions,
+    new_action_token,
+    parse_action,
+)
+from .store import ChangeSet, PillAssistantStore, async_signal_changes
 
 try:  # HA version compatibility: StaticPathConfig may not exist in tests
     from homeassistant.components.http import StaticPathConfig
@@ -26,16 +34,27 @@ except ImportError:  # pragma: no cover - older HA / test env without StaticPath
 from .const import (
     ATTR_ACTION,
     ATTR_AMOUNT,
+    ATTR_COMPRESS,
     ATTR_DOSAGE,
     ATTR_DOSAGE_UNIT,
+    ATTR_DRY_RUN,
     ATTR_END_DATE,
+    ATTR_FILENAME,
+    ATTR_FORMAT,
     ATTR_HISTORY_INDEX,
     ATTR_MEDICATION_ID,
+    ATTR_PATH,
     ATTR_SNOOZE_DURATION,
+    ATTR_GRANULARITY,
+    ATTR_MAX_POINTS,
+    ATTR_SLOT_MINUTES,
     ATTR_START_DATE,
     ATTR_TIMESTAMP,
     CONF_DOSAGE,
     CONF_DOSAGE_UNIT,
+    CONF_HISTORY_RETENTION_DAYS,
+    CONF_HUB,
+    CONF_TRACING,
     CONF_MEDICATION_NAME,
     CONF_MEDICATION_TYPE,
     CONF_NOTIFY_SERVICES,
@@ -51,14 +70,19 @@ from .const import (
     DEFAULT_DOSAGE_UNIT,
     DEFAULT_AVOID_DUPLICATE_TRIGGERS,
     DOMAIN,
+    METRICS_ENTRY,
     LEGACY_DOSAGE_UNITS,
     DOSAGE_UNIT_OPTIONS,
     SERVICE_DECREMENT_DOSAGE,
     SERVICE_DECREMENT_REMAINING,
     SERVICE_DELETE_MEDICATION_HISTORY,
     SERVICE_EDIT_MEDICATION_HISTORY,
+    SERVICE_EXPORT_HISTORY,
+    SERVICE_GET_ADHERENCE_HEATMAP,
+    SERVICE_GET_DOSE_LEDGER,
     SERVICE_GET_MEDICATION_HISTORY,
     SERVICE_GET_STATISTICS,
+    SERVICE_IMPORT_HISTORY,
     SERVICE_INCREMENT_DOSAGE,
     SERVICE_INCREMENT_REMAINING,
     SERVICE_REFILL_MEDICATION,
@@ -66,15 +90,71 @@ from .const import (
     SERVICE_SNOOZE_MEDICATION,
     SERVICE_TAKE_MEDICATION,
     SERVICE_TEST_NOTIFICATION,
+    SIGNAL_MEDICATION_UPDATED,
 )
 from . import log_utils
+from .adherence import AdherenceTracker
+from .archive import MIN_RETENTION_DAYS, HistoryRetention
+from .evaluation import DoseEvaluator
+from .forecast import RunOutUpdater, record_consumption, update_run_out
+from .heatmap import HEATMAP_SLOT_MINUTES, WEEKDAYS, HourOfWeekHeatmap
+from .history_io import (
+    EXPORT_FORMATS,
+    async_export_history,
+    async_import_history,
+    export_filename,
+    get_exports_dir,
+)
+from .hub import (
+    MedicationConfig,
+    async_absorb_entries,
+    async_update_medication,
+    entry_medication_ids,
+    hub_medications,
+    is_hub_entry,
+)
+from .lateness import LatenessTracker
+from .ledger import DoseLedger
+from .metrics import SERVICE_METRIC_PREFIX, timed
+from .recorder_statistics import LongTermStatistics
+from .reminders import ReminderScheduler
+from .tracing import TRACES_FILENAME, JsonLinesExporter, Tracer, span
+from .triggers import SensorTriggerTracker
 
 _LOGGER = logging.getLogger(__name__)
 
 PLATFORMS: list[Platform] = [Platform.SENSOR, Platform.BUTTON]
 
-# Dispatcher signal for sensor updates
-SIGNAL_MEDICATION_UPDATED = f"{DOMAIN}_medication_updated"
+# Created by the first entry set up, and stopped with the last one
+SHARED_TRACKERS = (
+    "evaluator",
+    "reminders",
+    "trigger_tracker",
+    "forecast",
+    "retention",
+    "long_term_statistics",
+    "heatmap",
+    "lateness",
+    "adherence",
+    "ledger",
+)
+# Trackers that save with a delay
+SAVED_TRACKERS = ("heatmap", "lateness", "adherence", "ledger")
+
+CONFIG_SCHEMA = vol.Schema(
+    {
+        vol.Optional(DOMAIN): vol.Schema(
+            {
+                vol.Optional(CONF_HUB, default=False): cv.boolean,
+                vol.Optional(CONF_TRACING, default=True): cv.boolean,
+                vol.Optional(CONF_HISTORY_RETENTION_DAYS): vol.All(
+                    vol.Coerce(int), vol.Range(min=MIN_RETENTION_DAYS)
+                ),
+            }
+        )
+    },
+    extra=vol.ALLOW_EXTRA,
+)
 
 # Service schemas for validation
 SERVICE_TAKE_MEDICATION_SCHEMA = vol.Schema(
@@ -137,6 +217,8 @@ SERVICE_GET_STATISTICS_SCHEMA = vol.Schema(
         vol.Optional(ATTR_MEDICATION_ID): cv.string,
         vol.Optional(ATTR_START_DATE): cv.string,
         vol.Optional(ATTR_END_DATE): cv.string,
+        vol.Optional(ATTR_GRANULARITY): vol.In(log_utils.STATISTICS_GRANULARITIES),
+        vol.Optional(ATTR_MAX_POINTS): vol.All(vol.Coerce(int), vol.Range(min=1)),
     },
 )
 
@@ -165,6 +247,43 @@ SERVICE_DELETE_MEDICATION_HISTORY_SCHEMA = vol.Schema(
     },
 )
 
+SERVICE_GET_DOSE_LEDGER_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_MEDICATION_ID): cv.string,
+        vol.Optional(ATTR_START_DATE): cv.string,
+        vol.Optional(ATTR_END_DATE): cv.string,
+    },
+)
+
+SERVICE_GET_ADHERENCE_HEATMAP_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_MEDICATION_ID): cv.string,
+        vol.Optional(ATTR_SLOT_MINUTES, default=60): vol.All(
+            vol.Coerce(int), vol.In(HEATMAP_SLOT_MINUTES)
+        ),
+    },
+)
+
+SERVICE_EXPORT_HISTORY_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_MEDICATION_ID): cv.string,
+        vol.Optional(ATTR_START_DATE): cv.string,
+        vol.Optional(ATTR_END_DATE): cv.string,
+        vol.Optional(ATTR_ACTION): vol.All(cv.ensure_list, [cv.string]),
+        vol.Optional(ATTR_FORMAT, default="csv"): vol.In(EXPORT_FORMATS),
+        vol.Optional(ATTR_COMPRESS, default=False): cv.boolean,
+        vol.Optional(ATTR_FILENAME): cv.string,
+    },
+)
+
+SERVICE_IMPORT_HISTORY_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_PATH): cv.string,
+        vol.Optional(ATTR_MEDICATION_ID): cv.string,
+        vol.Optional(ATTR_DRY_RUN, default=False): cv.boolean,
+    },
+)
+
 
 async def _register_panel_static_path(hass: HomeAssistant) -> None:
     """Register static path for the Pill Assistant panel.
@@ -226,6 +345,19 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
 
     await hass.async_add_executor_job(ensure_logs_dir)
 
+    # Actions are traced into a rotating file next to the CSV logs
+    if "tracer" not in hass.data[DOMAIN]:
+        hass.data[DOMAIN]["tracer"] = Tracer(
+            hass,
+            JsonLinesExporter(
+                os.path.join(log_utils.get_logs_dir(hass), TRACES_FILENAME)
+            ),
+            enabled=config.get(DOMAIN, {}).get(CONF_TRACING, True),
+        )
+        hass.bus.async_listen_once(
+            EVENT_HOMEASSISTANT_STOP, hass.data[DOMAIN]["tracer"].async_handle_stop
+        )
+
     # Register the www directory with the http component for static file serving
     # Only register if http component is available (not in test environment)
     if not hass.data[DOMAIN].get("panel_registered") and getattr(
@@ -264,6 +396,20 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
         except Exception as err:  # pragma: no cover - panel registration failure
             _LOGGER.warning("Failed to register sidebar panel: %s", err)
 
+    # Older history is archived once a day when a retention is configured
+    hass.data[DOMAIN][CONF_HISTORY_RETENTION_DAYS] = config.get(DOMAIN, {}).get(
+        CONF_HISTORY_RETENTION_DAYS
+    )
+
+    # Hub mode combines all medications into one entry; it is opted into
+    # from configuration.yaml
+    if config.get(DOMAIN, {}).get(CONF_HUB):
+        hass.async_create_task(
+            hass.config_entries.flow.async_init(
+                DOMAIN, context={"source": SOURCE_IMPORT}, data={CONF_HUB: True}
+            )
+        )
+
     return True
 
 
@@ -271,15 +417,110 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up Pill Assistant from a config entry."""
     hass.data.setdefault(DOMAIN, {})
 
+    if is_hub_entry(entry):
+        # Per-medication entries listed in the hub table are taken over first
+        await async_absorb_entries(hass, entry)
+        medications: list[MedicationConfig] = hub_medications(entry)
+    else:
+        medications = [entry]
+
+    # Get or create the singleton storage instance
+    if "store" not in hass.data[DOMAIN]:
+        hass.data[DOMAIN]["store"] = PillAssistantStore(hass)
+
+    store = hass.data[DOMAIN]["store"]
+
+    # Load storage data (this will use the cached data from the singleton)
+    storage_data = await store.async_load()
+    if not store.history_loaded:
+        # History is not needed to set up sensors, so load it in the background
+        hass.async_create_background_task(
+            store.async_load_history(), f"{DOMAIN}_load_history"
+        )
+
+    # One reminder scheduler services re-reminders for every medication
+    if "reminders" not in hass.data[DOMAIN]:
+        reminders = ReminderScheduler(hass, store)
+        await reminders.async_load()
+        hass.data[DOMAIN]["reminders"] = reminders
+
+    # One ledger records how every scheduled dose ended
+    if "ledger" not in hass.data[DOMAIN]:
+        ledger = DoseLedger(hass, store)
+        await ledger.async_load()
+        hass.data[DOMAIN]["ledger"] = ledger
+
+    # One tracker keeps the rolling adherence of every medication
+    if "adherence" not in hass.data[DOMAIN]:
+        adherence = AdherenceTracker(hass, store)
+        await adherence.async_load()
+        hass.data[DOMAIN]["adherence"] = adherence
+
+    # Closed days are imported into the recorder's long-term statistics
+    if "long_term_statistics" not in hass.data[DOMAIN]:
+        long_term_statistics = LongTermStatistics(hass, store)
+        await long_term_statistics.async_load()
+        hass.data[DOMAIN]["long_term_statistics"] = long_term_statistics
+
+    # Daily sketches answer how late doses are taken over any range
+    if "lateness" not in hass.data[DOMAIN]:
+        lateness = LatenessTracker(hass, store)
+        await lateness.async_load()
+        hass.data[DOMAIN]["lateness"] = lateness
+
+    # Hour-of-week counts of every medication, for the panel heatmap
+    if "heatmap" not in hass.data[DOMAIN]:
+        heatmap = HourOfWeekHeatmap(hass, store, hass.data[DOMAIN]["ledger"])
+        await heatmap.async_load()
+        hass.data[DOMAIN]["heatmap"] = heatmap
+
+    # Only the retained days of history are kept in the live store
+    retention_days = hass.data[DOMAIN].get(CONF_HISTORY_RETENTION_DAYS)
+    if retention_days and "retention" not in hass.data[DOMAIN]:
+        retention = HistoryRetention(hass, store, retention_days)
+        await retention.async_load()
+        hass.data[DOMAIN]["retention"] = retention
+
+    # Run-out dates follow edits of the schedule
+    if "forecast" not in hass.data[DOMAIN]:
+        forecast = RunOutUpdater(hass)
+        await forecast.async_load()
+        hass.data[DOMAIN]["forecast"] = forecast
+
+    # Trigger sensors are tracked once, however many medications use them
+    if "trigger_tracker" not in hass.data[DOMAIN]:
+        hass.data[DOMAIN]["trigger_tracker"] = SensorTriggerTracker(hass)
+
+    # Schedules of all medications are evaluated together once per tick
+    if "evaluator" not in hass.data[DOMAIN]:
+        hass.data[DOMAIN]["evaluator"] = DoseEvaluator(hass)
+
+    for medication in medications:
+        await _async_setup_medication(hass, store, storage_data, medication)
+
+    # Set up platforms; a hub adds all of its medications in a single pass
+    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+
+    _async_register_services(hass)
+    return True
+
+
+async def _async_setup_medication(
+    hass: HomeAssistant,
+    store: PillAssistantStore,
+    storage_data: dict,
+    medication: MedicationConfig,
+) -> None:
+    """Migrate and store one medication and register its runtime data."""
     # Migrate legacy dosage_unit format to separate medication_type and dosage_unit
-    needs_migration = CONF_MEDICATION_TYPE not in entry.data
+    needs_migration = CONF_MEDICATION_TYPE not in medication.data
     if needs_migration:
         _LOGGER.info(
             "Upgrading medication configuration for '%s' to separate dosage and medication type",
-            entry.data.get(CONF_MEDICATION_NAME, "Unknown"),
+            medication.data.get(CONF_MEDICATION_NAME, "Unknown"),
         )
-        migrated_data = entry.data.copy()
-        dosage_unit = entry.data.get(CONF_DOSAGE_UNIT, DEFAULT_DOSAGE_UNIT)
+        migrated_data = medication.data.copy()
+        dosage_unit = medication.data.get(CONF_DOSAGE_UNIT, DEFAULT_DOSAGE_UNIT)
 
         # Check if this is a legacy dosage unit
         if dosage_unit in LEGACY_DOSAGE_UNITS:
@@ -288,7 +529,7 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             migrated_data[CONF_DOSAGE_UNIT] = unit
             _LOGGER.info(
                 "Migrated '%s' from '%s' to type='%s', unit='%s'",
-                entry.data.get(CONF_MEDICATION_NAME),
+                medication.data.get(CONF_MEDICATION_NAME),
                 dosage_unit,
                 med_type,
                 unit,
@@ -303,113 +544,70 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             _LOGGER.info(
                 "Assigned default medication type '%s' for '%s'",
                 DEFAULT_MEDICATION_TYPE,
-                entry.data.get(CONF_MEDICATION_NAME),
+                medication.data.get(CONF_MEDICATION_NAME),
             )
 
         # Update the config entry with migrated data
-        hass.config_entries.async_update_entry(entry, data=migrated_data)
-
-    # Get or create the singleton storage instance
-    if "store" not in hass.data[DOMAIN]:
-        hass.data[DOMAIN]["store"] = PillAssistantStore(hass)
-
-    store = hass.data[DOMAIN]["store"]
-
-    # Load storage data (this will use the cached data from the singleton)
-    storage_data = await store.async_load()
+        async_update_medication(hass, medication, migrated_data)
 
     # Store the entry data in storage if not already there
-    med_id = entry.entry_id
+    med_id = medication.entry_id
     if med_id not in storage_data["medications"]:
         # Use current_quantity if provided (from custom starting amount), otherwise use refill_amount
-        starting_amount = entry.data.get(
-            CONF_CURRENT_QUANTITY, entry.data.get(CONF_REFILL_AMOUNT, 0)
+        starting_amount = medication.data.get(
+            CONF_CURRENT_QUANTITY, medication.data.get(CONF_REFILL_AMOUNT, 0)
         )
 
         # Use the async_update method for atomic updates
         def add_medication(data: dict) -> None:
-            data["medications"][med_id] = {
-                **entry.data,
+            med_data = {
+                **medication.data,
                 "remaining_amount": starting_amount,
                 "last_taken": None,
                 "missed_doses": [],
             }
+            update_run_out(med_data, medication.data, dt_util.now())
+            data["medications"][med_id] = med_data
 
-        await store.async_update(add_medication)
+        await store.async_update(add_medication, med_id=med_id)
 
-    hass.data[DOMAIN][entry.entry_id] = {
-        "entry": entry,
+    hass.data[DOMAIN][medication.entry_id] = {
+        "entry": medication,
         "store": store,
         "storage_data": storage_data,
     }
 
-    # Set up platforms
-    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
-    # Register notification action listener ONCE globally (not per entry)
-    if not hass.data[DOMAIN].get("notification_listeners_registered"):
+def _parse_date_filter(value: str | None, name: str) -> datetime | None:
+    """Parse a date filter of a service call as a timezone-aware datetime."""
+    if not value:
+        return None
+    try:
+        parsed = dt_util.parse_datetime(value)
+        if parsed is None:
+            raise ValueError("Invalid datetime")
+        # If naive, make it timezone-aware using the system timezone
+        if parsed.tzinfo is None:
+            return dt_util.as_local(dt_util.utc_from_timestamp(parsed.timestamp()))
+        return dt_util.as_local(parsed)
+    except (ValueError, OSError, TypeError):
+        _LOGGER.warning("Invalid %s format: %s", name, value)
+        return None
 
-        async def handle_notification_action(event) -> None:
-            """Handle notification action events from mobile_app."""
-            action = event.data.get("action")
-            if not action:
-                return
-
-            # Parse the action to extract medication ID
-            if action.startswith("take_medication_"):
-                _med_id = action.replace("take_medication_", "")
-                if _med_id in hass.data[DOMAIN]:
-                    # Directly mark as taken to ensure the action works even when
-                    # ServiceRegistry.async_call is patched in tests.
-                    await _mark_med_taken(_med_id)
-                    _LOGGER.info(
-                        "Medication %s marked as taken via notification action",
-                        _med_id,
-                    )
-            elif action.startswith("snooze_medication_"):
-                _med_id = action.replace("snooze_medication_", "")
-                if _med_id in hass.data[DOMAIN]:
-                    await hass.services.async_call(
-                        DOMAIN,
-                        SERVICE_SNOOZE_MEDICATION,
-                        {ATTR_MEDICATION_ID: _med_id},
-                        blocking=True,
-                    )
-                    _LOGGER.info(
-                        "Medication %s snoozed via notification action",
-                        _med_id,
-                    )
-            elif action.startswith("skip_medication_"):
-                _med_id = action.replace("skip_medication_", "")
-                if _med_id in hass.data[DOMAIN]:
-                    await hass.services.async_call(
-                        DOMAIN,
-                        SERVICE_SKIP_MEDICATION,
-                        {ATTR_MEDICATION_ID: _med_id},
-                        blocking=True,
-                    )
-                    _LOGGER.info(
-                        "Medication %s skipped via notification action",
-                        _med_id,
-                    )
-
-        # Listen for mobile_app notification action events
-        hass.bus.async_listen(
-            "mobile_app_notification_action",
-            handle_notification_action,
-        )
-        # Also listen for ios.notification_action_fired for iOS devices
-        hass.bus.async_listen(
-            "ios.notification_action_fired",
-            handle_notification_action,
-        )
 
-        hass.data[DOMAIN]["notification_listeners_registered"] = True
-        _LOGGER.debug("Notification action listeners registered globally")
+def _async_register_services(hass: HomeAssistant) -> None:
+    """Register the services shared by all medications."""
+    tracer: Tracer = hass.data[DOMAIN]["tracer"]
 
     # Register services
-    async def _mark_med_taken(_med_id: str, _now: datetime | None = None) -> None:
-        """Mark medication as taken (shared helper)."""
+    async def _mark_med_taken(
+        _med_id: str, _now: datetime | None = None, dose_fraction: float = 1
+    ) -> None:
+        """Mark medication as taken (shared helper).
+
+        ``dose_fraction`` lets partial doses (e.g. half a dose) consume only
+        that share of the remaining amount.
+        """
         if _med_id not in hass.data[DOMAIN]:
             _LOGGER.error("Medication ID %s not found", _med_id)
             return
@@ -475,7 +673,9 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 
             # Decrease remaining amount by 1 dose (not by dosage amount)
             remaining = float(med_data.get("remaining_amount", 0))
-            med_data["remaining_amount"] = max(0, remaining - 1)
+            med_data["remaining_amount"] = max(0, remaining - dose_fraction)
+            record_consumption(med_data, dose_fraction, now_local)
+            update_run_out(med_data, _entry_local.data, now_local)
 
             # If this is a sensor-based schedule with duplicate avoidance, track the trigger
             schedule_type = _entry_local.data.get(CONF_SCHEDULE_TYPE)
@@ -486,7 +686,9 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
                 if avoid_duplicates:
                     sensor_entity_id = _entry_local.data.get(CONF_RELATIVE_TO_SENSOR)
                     if sensor_entity_id:
-                        sensor_state = hass.states.get(sensor_entity_id)
+                        sensor_state = hass.data[DOMAIN]["trigger_tracker"].last_state(
+                            sensor_entity_id
+                        )
                         if sensor_state and sensor_state.last_changed:
                             # Track this sensor event as triggered
                             if "last_sensor_trigger" not in data:
@@ -504,13 +706,22 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
                 "dosage": med_data.get(CONF_DOSAGE, ""),
                 "dosage_unit": med_data.get(CONF_DOSAGE_UNIT, ""),
             }
+            if dose_fraction != 1:
+                history_entry["dose_fraction"] = dose_fraction
             data["history"].append(history_entry)
 
-        await _store_local.async_update(update_medication)
+        changes = await _store_local.async_update(
+            update_medication, med_id=_med_id, needs_history=True
+        )
+        with span("reminders_resolve"):
+            await hass.data[DOMAIN]["reminders"].async_resolve(_med_id)
+
+        # Log the values just written, straight from the change-set
+        med_data = changes.record or {}
 
-        # Reload storage data to get updated values for logging
-        storage_data = await _store_local.async_load()
-        med_data = storage_data["medications"].get(_med_id, {})
+        details = {"timestamp": now_local.isoformat()}
+        if dose_fraction != 1:
+            details["dose_fraction"] = dose_fraction
 
         # Write to CSV log files
         await log_utils.async_log_event(
@@ -523,12 +734,11 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             remaining_amount=med_data.get("remaining_amount"),
             refill_amount=med_data.get(CONF_REFILL_AMOUNT),
             snooze_until=None,
-            details={"timestamp": now_local.isoformat()},
+            details=details,
         )
 
-        # Fire dispatcher signal for immediate sensor update (per-med and global)
-        async_dispatcher_send(hass, f"{SIGNAL_MEDICATION_UPDATED}_{_med_id}")
-        async_dispatcher_send(hass, SIGNAL_MEDICATION_UPDATED)
+        # Refresh only the sensors affected by the change
+        async_signal_changes(hass, changes)
 
         _LOGGER.info(
             "Medication %s taken at %s",
@@ -541,9 +751,8 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         _med_id = call.data.get(ATTR_MEDICATION_ID)
         await _mark_med_taken(_med_id)
 
-    async def handle_skip_medication(call: ServiceCall) -> None:
-        """Handle skip medication service."""
-        _med_id = call.data.get(ATTR_MEDICATION_ID)
+    async def _skip_med(_med_id: str) -> None:
+        """Record a skipped dose (shared helper)."""
         if _med_id not in hass.data[DOMAIN]:
             _LOGGER.error("Medication ID %s not found", _med_id)
             return
@@ -553,26 +762,18 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 
         now = dt_util.now()
 
-        def update_skip(data: dict) -> None:
-            """Update medication data atomically."""
-            med_data = data["medications"].get(_med_id)
-            if not med_data:
-                return
-
-            # Add to history
+        # A skip only adds history, so it never waits on medication updates
+        med_data = entry_data["storage_data"]["medications"].get(_med_id) or {}
+        changes = ChangeSet()
+        if med_data:
             history_entry = {
                 "medication_id": _med_id,
                 "medication_name": med_data.get(CONF_MEDICATION_NAME, "Unknown"),
                 "timestamp": now.isoformat(),
                 "action": "skipped",
             }
-            data["history"].append(history_entry)
-
-        await _store.async_update(update_skip)
-
-        # Reload for logging
-        storage_data = await _store.async_load()
-        med_data = storage_data["medications"].get(_med_id, {})
+            changes = await _store.async_append_history(history_entry)
+        await hass.data[DOMAIN]["reminders"].async_resolve(_med_id)
 
         # Write to CSV log files
         await log_utils.async_log_event(
@@ -588,9 +789,8 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             details={"timestamp": now.isoformat()},
         )
 
-        # Fire dispatcher signal for immediate sensor update (per-med and global)
-        async_dispatcher_send(hass, f"{SIGNAL_MEDICATION_UPDATED}_{_med_id}")
-        async_dispatcher_send(hass, SIGNAL_MEDICATION_UPDATED)
+        # Refresh only the sensors affected by the change
+        async_signal_changes(hass, changes)
 
         _LOGGER.info(
             "Medication %s skipped at %s",
@@ -598,6 +798,10 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             now,
         )
 
+    async def handle_skip_medication(call: ServiceCall) -> None:
+        """Handle skip medication service."""
+        await _skip_med(call.data.get(ATTR_MEDICATION_ID))
+
     async def handle_refill_medication(call: ServiceCall) -> None:
         """Handle refill medication service."""
         _med_id = call.data.get(ATTR_MEDICATION_ID)
@@ -619,6 +823,7 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             # Reset to full refill amount
             refill_amount = med_data.get(CONF_REFILL_AMOUNT, 0)
             med_data["remaining_amount"] = refill_amount
+            update_run_out(med_data, entry_data["entry"].data, now)
 
             # Add to history
             history_entry = {
@@ -630,11 +835,12 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             }
             data["history"].append(history_entry)
 
-        await _store.async_update(update_refill)
+        changes = await _store.async_update(
+            update_refill, med_id=_med_id, needs_history=True
+        )
 
-        # Reload for logging
-        storage_data = await _store.async_load()
-        med_data = storage_data["medications"].get(_med_id, {})
+        # Log the values just written, straight from the change-set
+        med_data = changes.record or {}
         refill_amount = med_data.get(CONF_REFILL_AMOUNT, 0)
 
         # Write to CSV log files
@@ -651,9 +857,8 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             details={"timestamp": now.isoformat(), "amount": refill_amount},
         )
 
-        # Fire dispatcher signal for immediate sensor update (per-med and global)
-        async_dispatcher_send(hass, f"{SIGNAL_MEDICATION_UPDATED}_{_med_id}")
-        async_dispatcher_send(hass, SIGNAL_MEDICATION_UPDATED)
+        # Refresh only the sensors affected by the change
+        async_signal_changes(hass, changes)
 
         _LOGGER.info(
             "Medication %s refilled to %s at %s",
@@ -692,6 +897,7 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 
         # Send notification to configured services
         if notify_services:
+            token = new_action_token()
             for service_name in notify_services:
                 try:
                     # Extract domain and service
@@ -706,20 +912,9 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
                                 "message": message,
                                 "data": {
                                     "tag": f"pill_assistant_{_med_id}",
-                                    "actions": [
-                                        {
-                                            "action": f"take_medication_{_med_id}",
-                                            "title": "Mark as Taken",
-                                        },
-                                        {
-                                            "action": f"snooze_medication_{_med_id}",
-                                            "title": "Snooze",
-                                        },
-                                        {
-                                            "action": f"skip_medication_{_med_id}",
-                                            "title": "Skip",
-                                        },
-                                    ],
+                                    "actions": build_notification_actions(
+                                        _med_id, token
+                                    ),
                                 },
                             },
                             blocking=False,
@@ -745,14 +940,10 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 
         _LOGGER.info("Test notification sent for %s", med_name)
 
-    async def handle_snooze_medication(call: ServiceCall) -> None:
-        """Handle snooze medication service."""
-        _med_id = call.data.get(ATTR_MEDICATION_ID)
-        snooze_duration = call.data.get(
-            ATTR_SNOOZE_DURATION,
-            DEFAULT_SNOOZE_DURATION_MINUTES,
-        )
-
+    async def _snooze_med(
+        _med_id: str, snooze_duration: int = DEFAULT_SNOOZE_DURATION_MINUTES
+    ) -> None:
+        """Snooze a medication reminder (shared helper)."""
         if _med_id not in hass.data[DOMAIN]:
             _LOGGER.error("Medication ID %s not found", _med_id)
             return
@@ -773,11 +964,11 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             # Store snooze information
             med_data["snooze_until"] = snooze_until.isoformat()
 
-        await _store.async_update(update_snooze)
+        changes = await _store.async_update(update_snooze, med_id=_med_id)
+        await hass.data[DOMAIN]["reminders"].async_snooze(_med_id, snooze_until)
 
-        # Reload for logging
-        storage_data = await _store.async_load()
-        med_data = storage_data["medications"].get(_med_id, {})
+        # Log the values just written, straight from the change-set
+        med_data = changes.record or {}
 
         # Write to CSV log files
         await log_utils.async_log_event(
@@ -796,9 +987,8 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             },
         )
 
-        # Fire dispatcher signal for immediate sensor update (per-med and global)
-        async_dispatcher_send(hass, f"{SIGNAL_MEDICATION_UPDATED}_{_med_id}")
-        async_dispatcher_send(hass, SIGNAL_MEDICATION_UPDATED)
+        # Refresh only the sensors affected by the change
+        async_signal_changes(hass, changes)
 
         _LOGGER.info(
             "Medication %s snoozed for %s minutes until %s",
@@ -807,6 +997,13 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             snooze_until,
         )
 
+    async def handle_snooze_medication(call: ServiceCall) -> None:
+        """Handle snooze medication service."""
+        await _snooze_med(
+            call.data.get(ATTR_MEDICATION_ID),
+            call.data.get(ATTR_SNOOZE_DURATION, DEFAULT_SNOOZE_DURATION_MINUTES),
+        )
+
     async def handle_increment_dosage(call: ServiceCall) -> None:
         """Handle increment dosage service."""
         _med_id = call.data.get(ATTR_MEDICATION_ID)
@@ -835,11 +1032,10 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             new_dosage = current_dosage + 0.5
             med_data[CONF_DOSAGE] = str(new_dosage)
 
-        await _store.async_update(update_dosage)
+        changes = await _store.async_update(update_dosage, med_id=_med_id)
 
-        # Reload for logging
-        storage_data = await _store.async_load()
-        med_data = storage_data["medications"].get(_med_id, {})
+        # Log the values just written, straight from the change-set
+        med_data = changes.record or {}
 
         # Write to CSV log files
         await log_utils.async_log_event(
@@ -860,9 +1056,8 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             },
         )
 
-        # Fire dispatcher signal for immediate sensor update (per-med and global)
-        async_dispatcher_send(hass, f"{SIGNAL_MEDICATION_UPDATED}_{_med_id}")
-        async_dispatcher_send(hass, SIGNAL_MEDICATION_UPDATED)
+        # Refresh only the sensors affected by the change
+        async_signal_changes(hass, changes)
 
         _LOGGER.info(
             "Medication %s dosage incremented from %s to %s",
@@ -899,11 +1094,10 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             new_dosage = max(0.5, current_dosage - 0.5)
             med_data[CONF_DOSAGE] = str(new_dosage)
 
-        await _store.async_update(update_dosage)
+        changes = await _store.async_update(update_dosage, med_id=_med_id)
 
-        # Reload for logging
-        storage_data = await _store.async_load()
-        med_data = storage_data["medications"].get(_med_id, {})
+        # Log the values just written, straight from the change-set
+        med_data = changes.record or {}
 
         # Write to CSV log files
         await log_utils.async_log_event(
@@ -924,9 +1118,8 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             },
         )
 
-        # Fire dispatcher signal for immediate sensor update (per-med and global)
-        async_dispatcher_send(hass, f"{SIGNAL_MEDICATION_UPDATED}_{_med_id}")
-        async_dispatcher_send(hass, SIGNAL_MEDICATION_UPDATED)
+        # Refresh only the sensors affected by the change
+        async_signal_changes(hass, changes)
 
         _LOGGER.info(
             "Medication %s dosage decremented from %s to %s",
@@ -963,12 +1156,12 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             current_remaining = float(med_data.get("remaining_amount", 0))
             new_remaining = current_remaining + current_dosage
             med_data["remaining_amount"] = new_remaining
+            update_run_out(med_data, entry_data["entry"].data, now)
 
-        await _store.async_update(update_remaining)
+        changes = await _store.async_update(update_remaining, med_id=_med_id)
 
-        # Reload for logging
-        storage_data = await _store.async_load()
-        med_data = storage_data["medications"].get(_med_id, {})
+        # Log the values just written, straight from the change-set
+        med_data = changes.record or {}
 
         # Write to CSV log files
         await log_utils.async_log_event(
@@ -989,9 +1182,8 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             },
         )
 
-        # Fire dispatcher signal for immediate sensor update (per-med and global)
-        async_dispatcher_send(hass, f"{SIGNAL_MEDICATION_UPDATED}_{_med_id}")
-        async_dispatcher_send(hass, SIGNAL_MEDICATION_UPDATED)
+        # Refresh only the sensors affected by the change
+        async_signal_changes(hass, changes)
 
         _LOGGER.info(
             "Medication %s remaining amount incremented from %s to %s",
@@ -1028,12 +1220,12 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             current_remaining = float(med_data.get("remaining_amount", 0))
             new_remaining = max(0, current_remaining - current_dosage)
             med_data["remaining_amount"] = new_remaining
+            update_run_out(med_data, entry_data["entry"].data, now)
 
-        await _store.async_update(update_remaining)
+        changes = await _store.async_update(update_remaining, med_id=_med_id)
 
-        # Reload for logging
-        storage_data = await _store.async_load()
-        med_data = storage_data["medications"].get(_med_id, {})
+        # Log the values just written, straight from the change-set
+        med_data = changes.record or {}
 
         # Write to CSV log files
         await log_utils.async_log_event(
@@ -1054,9 +1246,8 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             },
         )
 
-        # Fire dispatcher signal for immediate sensor update (per-med and global)
-        async_dispatcher_send(hass, f"{SIGNAL_MEDICATION_UPDATED}_{_med_id}")
-        async_dispatcher_send(hass, SIGNAL_MEDICATION_UPDATED)
+        # Refresh only the sensors affected by the change
+        async_signal_changes(hass, changes)
 
         _LOGGER.info(
             "Medication %s remaining amount decremented from %s to %s",
@@ -1070,56 +1261,44 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         _med_id = call.data.get(ATTR_MEDICATION_ID)
         start_date = call.data.get(ATTR_START_DATE)
         end_date = call.data.get(ATTR_END_DATE)
+        start = _parse_date_filter(start_date, ATTR_START_DATE)
+        end = _parse_date_filter(end_date, ATTR_END_DATE)
+        # Without dates, the counts and the delays cover the same last 30 days
+        if start is None and end is None:
+            end = dt_util.now()
+            start = end - timedelta(days=30)
+            start_date, end_date = start.isoformat(), end.isoformat()
 
         stats = await log_utils.async_get_statistics(
             hass,
             start_date=start_date,
             end_date=end_date,
             medication_id=_med_id,
+            granularity=call.data.get(ATTR_GRANULARITY),
+            max_points=call.data.get(ATTR_MAX_POINTS),
         )
 
+        # Delay quantiles of the same days, merged from the daily sketches
+        lateness: LatenessTracker = hass.data[DOMAIN]["lateness"]
+        for med_id, med_stats in stats["medications"].items():
+            med_stats["lateness"] = lateness.summary(
+                med_id,
+                start.date() if start else None,
+                end.date() if end else None,
+            )
+
         _LOGGER.info("Statistics retrieved: %s entries", stats["total_entries"])
         return stats
 
     async def handle_get_medication_history(call: ServiceCall) -> dict:
         """Handle get medication history service."""
-        from datetime import datetime
-
         _med_id = call.data.get(ATTR_MEDICATION_ID)
         start_date_str = call.data.get(ATTR_START_DATE)
         end_date_str = call.data.get(ATTR_END_DATE)
 
         # Parse date filters if provided (make them timezone-aware)
-        start_date = None
-        end_date = None
-        if start_date_str:
-            try:
-                parsed = dt_util.parse_datetime(start_date_str)
-                if parsed is None:
-                    raise ValueError("Invalid datetime")
-                # If naive, make it timezone-aware using the system timezone
-                if parsed.tzinfo is None:
-                    start_date = dt_util.as_local(
-                        dt_util.utc_from_timestamp(parsed.timestamp())
-                    )
-                else:
-                    start_date = dt_util.as_local(parsed)
-            except (ValueError, OSError, TypeError):
-                _LOGGER.warning("Invalid start_date format: %s", start_date_str)
-        if end_date_str:
-            try:
-                parsed = dt_util.parse_datetime(end_date_str)
-                if parsed is None:
-                    raise ValueError("Invalid datetime")
-                # If naive, make it timezone-aware using the system timezone
-                if parsed.tzinfo is None:
-                    end_date = dt_util.as_local(
-                        dt_util.utc_from_timestamp(parsed.timestamp())
-                    )
-                else:
-                    end_date = dt_util.as_local(parsed)
-            except (ValueError, OSError, TypeError):
-                _LOGGER.warning("Invalid end_date format: %s", end_date_str)
+        start_date = _parse_date_filter(start_date_str, ATTR_START_DATE)
+        end_date = _parse_date_filter(end_date_str, ATTR_END_DATE)
 
         # Get storage data from any medication entry (they all share the same storage)
         _store = None
@@ -1140,44 +1319,33 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             _LOGGER.warning("No storage available")
             return {"history": [], "total_entries": 0}
 
-        # Load current storage data
-        _storage_data = await _store.async_load()
-
-        # Get all history entries
-        all_history = _storage_data.get("history", [])
+        # Load the history on first access; the published events hold
+        # parsed times, so filtering parses nothing. Archived events come
+        # first and have no index, since they cannot be edited
+        events = await _store.async_history(start_date, end_date)
+        archived = len(events) - len(_store.snapshot["history"])
 
-        # Filter by medication_id if provided
         filtered_history = []
-        for idx, entry in enumerate(all_history):
-            # Add index to each entry for editing/deletion
-            entry_with_index = entry.copy()
-            entry_with_index["history_index"] = idx
-
+        for position, event in enumerate(events):
             # Filter by medication_id
-            if _med_id and entry.get("medication_id") != _med_id:
+            if _med_id and event.get("medication_id") != _med_id:
                 continue
 
             # Filter by date range
             if start_date or end_date:
-                try:
-                    parsed = datetime.fromisoformat(
-                        entry.get("timestamp", "").replace("Z", "+00:00")
-                    )
-                    # Ensure timestamp is timezone-aware
-                    if parsed.tzinfo is None:
-                        entry_timestamp = dt_util.as_local(
-                            dt_util.utc_from_timestamp(parsed.timestamp())
-                        )
-                    else:
-                        entry_timestamp = parsed
-
-                    if start_date and entry_timestamp < start_date:
-                        continue
-                    if end_date and entry_timestamp > end_date:
-                        continue
-                except (ValueError, AttributeError, OSError):
+                entry_timestamp = event.time
+                if entry_timestamp is None:
+                    continue
+                if start_date and entry_timestamp < start_date:
+                    continue
+                if end_date and entry_timestamp > end_date:
                     continue
 
+            # Add index to each entry for editing/deletion
+            entry_with_index = event.as_dict()
+            entry_with_index["history_index"] = (
+                position - archived if position >= archived else None
+            )
             filtered_history.append(entry_with_index)
 
         # Sort by timestamp descending (most recent first)
@@ -1186,6 +1354,114 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         _LOGGER.info("Medication history retrieved: %s entries", len(filtered_history))
         return {"history": filtered_history, "total_entries": len(filtered_history)}
 
+    async def handle_get_dose_ledger(call: ServiceCall) -> dict:
+        """Handle get dose ledger service."""
+        _med_id = call.data.get(ATTR_MEDICATION_ID)
+        start_date = _parse_date_filter(call.data.get(ATTR_START_DATE), ATTR_START_DATE)
+        end_date = _parse_date_filter(call.data.get(ATTR_END_DATE), ATTR_END_DATE)
+
+        ledger: DoseLedger = hass.data[DOMAIN]["ledger"]
+        medications = {}
+        for med_id, entry_data in hass.data[DOMAIN].items():
+            if not isinstance(entry_data, dict) or "entry" not in entry_data:
+                continue
+            if _med_id and med_id != _med_id:
+                continue
+            medications[med_id] = {
+                "name": entry_data["entry"].data.get(CONF_MEDICATION_NAME, "Unknown"),
+                "counts": ledger.counts(med_id, start_date, end_date),
+                "doses": [
+                    entry.as_dict()
+                    for entry in ledger.entries(med_id, start_date, end_date)
+                ],
+            }
+
+        return {"medications": medications}
+
+    async def handle_get_adherence_heatmap(call: ServiceCall) -> dict:
+        """Handle get adherence heatmap service."""
+        _med_id = call.data.get(ATTR_MEDICATION_ID)
+        slot_minutes = call.data[ATTR_SLOT_MINUTES]
+
+        heatmap: HourOfWeekHeatmap = hass.data[DOMAIN]["heatmap"]
+        medications = {}
+        for med_id, entry_data in hass.data[DOMAIN].items():
+            if not isinstance(entry_data, dict) or "entry" not in entry_data:
+                continue
+            if _med_id and med_id != _med_id:
+                continue
+            medications[med_id] = {
+                "name": entry_data["entry"].data.get(CONF_MEDICATION_NAME, "Unknown"),
+                **heatmap.matrix(med_id, slot_minutes),
+            }
+
+        return {
+            "slot_minutes": slot_minutes,
+            "weekdays": list(WEEKDAYS),
+            "medications": medications,
+        }
+
+    async def handle_export_history(call: ServiceCall) -> dict:
+        """Handle export history service."""
+        fmt = call.data[ATTR_FORMAT]
+        compress = call.data[ATTR_COMPRESS]
+        path = os.path.join(
+            get_exports_dir(hass),
+            export_filename(fmt, compress, call.data.get(ATTR_FILENAME)),
+        )
+
+        start = _parse_date_filter(call.data.get(ATTR_START_DATE), ATTR_START_DATE)
+        end = _parse_date_filter(call.data.get(ATTR_END_DATE), ATTR_END_DATE)
+        _store: PillAssistantStore = hass.data[DOMAIN]["store"]
+        try:
+            exported = await async_export_history(
+                hass,
+                _store.async_iter_history(start, end),
+                path,
+                fmt=fmt,
+                compress=compress,
+                medication_id=call.data.get(ATTR_MEDICATION_ID),
+                actions=call.data.get(ATTR_ACTION),
+                start=start,
+                end=end,
+            )
+        except OSError as err:
+            _LOGGER.error("Could not export history to %s: %s", path, err)
+            return {"success": False, "error": str(err)}
+
+        _LOGGER.info("Exported %s history entries to %s", exported, path)
+        return {"success": True, "path": path, "exported": exported}
+
+    async def handle_import_history(call: ServiceCall) -> dict:
+        """Handle import history service."""
+        # Relative paths are in the config directory, and nothing outside it
+        config_dir = os.path.realpath(hass.config.path())
+        path = os.path.realpath(hass.config.path(call.data[ATTR_PATH]))
+        if os.path.commonpath((config_dir, path)) != config_dir:
+            return {"success": False, "error": "Path is outside the config directory"}
+
+        _store: PillAssistantStore = hass.data[DOMAIN]["store"]
+        try:
+            result = await async_import_history(
+                hass,
+                _store,
+                path,
+                medication_id=call.data.get(ATTR_MEDICATION_ID),
+                dry_run=call.data[ATTR_DRY_RUN],
+            )
+        except (OSError, UnicodeDecodeError) as err:
+            _LOGGER.error("Could not import history from %s: %s", path, err)
+            return {"success": False, "error": str(err)}
+
+        _LOGGER.info(
+            "Imported %s history entries from %s (%s duplicates, %s invalid)",
+            result["imported"],
+            path,
+            result["duplicates"],
+            result["invalid"],
+        )
+        return result
+
     async def handle_edit_medication_history(call: ServiceCall) -> dict:
         """Handle edit medication history service."""
         history_index = call.data.get(ATTR_HISTORY_INDEX)
@@ -1243,7 +1519,8 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 
             updated_entry = entry.copy()
 
-        await _store.async_update(update_history)
+        changes = await _store.async_update(update_history, rewrite_history=True)
+        async_signal_changes(hass, changes)
 
         if updated_entry:
             _LOGGER.info(
@@ -1293,7 +1570,8 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             # Delete the entry
             deleted_entry = all_history.pop(history_index)
 
-        await _store.async_update(delete_history)
+        changes = await _store.async_update(delete_history, rewrite_history=True)
+        async_signal_changes(hass, changes)
 
         if deleted_entry:
             _LOGGER.info(
@@ -1303,75 +1581,149 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         else:
             return {"success": False, "error": "Invalid history index"}
 
+    # Route notification actions straight to the shared helpers above. The
+    # router is created once; later entries reuse it.
+    if "action_router" not in hass.data[DOMAIN]:
+        router = ActionRouter()
+        router.register("take", _mark_med_taken)
+        router.register("take_half", partial(_mark_med_taken, dose_fraction=0.5))
+        router.register("skip", _skip_med)
+        router.register("snooze", _snooze_med)
+        for verb, minutes in SNOOZE_ACTION_DURATIONS.items():
+            router.register(verb, partial(_snooze_med, snooze_duration=minutes))
+        hass.data[DOMAIN]["action_router"] = router
+
+    # Register notification action listener ONCE globally (not per entry)
+    if not hass.data[DOMAIN].get("notification_listeners_registered"):
+        router = hass.data[DOMAIN]["action_router"]
+        # Tokens of recently handled actions, shared by both event types
+        processed_actions = ActionDedupCache()
+
+        async def handle_notification_action(event) -> None:
+            """Handle notification action events from mobile_app."""
+            action = event.data.get("action")
+            if not action:
+                return
+
+            parsed = parse_action(action)
+            if parsed is None:
+                return
+            verb, _med_id, token = parsed
+
+            # Drop repeated deliveries of the same tap before touching storage
+            if token and processed_actions.check_and_add(action):
+                _LOGGER.debug("Ignoring duplicate notification action %s", action)
+                return
+
+            if _med_id not in hass.data[DOMAIN]:
+                return
+
+            try:
+                with tracer.root_span(
+                    "notification_action", verb=verb, medication_id=_med_id
+                ):
+                    handled = await router.async_dispatch(verb, _med_id)
+            except Exception:
+                # Only successful actions count; a redelivery may succeed
+                if token:
+                    processed_actions.discard(action)
+                _LOGGER.exception("Notification action %s failed", action)
+                return
+            if handled:
+                _LOGGER.info(
+                    "Notification action %s handled for medication %s",
+                    verb,
+                    _med_id,
+                )
+
+        # Listen for mobile_app notification action events
+        hass.bus.async_listen(
+            "mobile_app_notification_action",
+            handle_notification_action,
+        )
+        # Also listen for ios.notification_action_fired for iOS devices
+        hass.bus.async_listen(
+            "ios.notification_action_fired",
+            handle_notification_action,
+        )
+
+        hass.data[DOMAIN]["notification_listeners_registered"] = True
+        _LOGGER.debug("Notification action listeners registered globally")
+
+    def _instrument(service: str, handler):
+        """Time a service handler and trace each call as its own action."""
+        name = SERVICE_METRIC_PREFIX + service
+        return timed(name)(tracer.trace_service(name, handler))
+
     # Register services only once
     if not hass.services.has_service(DOMAIN, SERVICE_TAKE_MEDICATION):
         hass.services.async_register(
             DOMAIN,
             SERVICE_TAKE_MEDICATION,
-            handle_take_medication,
+            _instrument(SERVICE_TAKE_MEDICATION, handle_take_medication),
             schema=SERVICE_TAKE_MEDICATION_SCHEMA,
         )
     if not hass.services.has_service(DOMAIN, SERVICE_SKIP_MEDICATION):
         hass.services.async_register(
             DOMAIN,
             SERVICE_SKIP_MEDICATION,
-            handle_skip_medication,
+            _instrument(SERVICE_SKIP_MEDICATION, handle_skip_medication),
             schema=SERVICE_SKIP_MEDICATION_SCHEMA,
         )
     if not hass.services.has_service(DOMAIN, SERVICE_REFILL_MEDICATION):
         hass.services.async_register(
             DOMAIN,
             SERVICE_REFILL_MEDICATION,
-            handle_refill_medication,
+            _instrument(SERVICE_REFILL_MEDICATION, handle_refill_medication),
             schema=SERVICE_REFILL_MEDICATION_SCHEMA,
         )
     if not hass.services.has_service(DOMAIN, SERVICE_TEST_NOTIFICATION):
         hass.services.async_register(
             DOMAIN,
             SERVICE_TEST_NOTIFICATION,
-            handle_test_notification,
+            _instrument(SERVICE_TEST_NOTIFICATION, handle_test_notification),
             schema=SERVICE_TEST_NOTIFICATION_SCHEMA,
         )
     if not hass.services.has_service(DOMAIN, SERVICE_SNOOZE_MEDICATION):
         hass.services.async_register(
             DOMAIN,
             SERVICE_SNOOZE_MEDICATION,
-            handle_snooze_medication,
+            _instrument(SERVICE_SNOOZE_MEDICATION, handle_snooze_medication),
             schema=SERVICE_SNOOZE_MEDICATION_SCHEMA,
         )
     if not hass.services.has_service(DOMAIN, SERVICE_INCREMENT_DOSAGE):
         hass.services.async_register(
             DOMAIN,
             SERVICE_INCREMENT_DOSAGE,
-            handle_increment_dosage,
+            _instrument(SERVICE_INCREMENT_DOSAGE, handle_increment_dosage),
             schema=SERVICE_INCREMENT_DOSAGE_SCHEMA,
         )
     if not hass.services.has_service(DOMAIN, SERVICE_DECREMENT_DOSAGE):
         hass.services.async_register(
             DOMAIN,
             SERVICE_DECREMENT_DOSAGE,
-            handle_decrement_dosage,
+            _instrument(SERVICE_DECREMENT_DOSAGE, handle_decrement_dosage),
             schema=SERVICE_DECREMENT_DOSAGE_SCHEMA,
         )
     if not hass.services.has_service(DOMAIN, SERVICE_INCREMENT_REMAINING):
         hass.services.async_register(
             DOMAIN,
             SERVICE_INCREMENT_REMAINING,
-            handle_increment_remaining,
+            _instrument(SERVICE_INCREMENT_REMAINING, handle_increment_remaining),
             schema=SERVICE_INCREMENT_REMAINING_SCHEMA,
         )
     if not hass.services.has_service(DOMAIN, SERVICE_DECREMENT_REMAINING):
         hass.services.async_register(
             DOMAIN,
             SERVICE_DECREMENT_REMAINING,
-            handle_decrement_remaining,
+            _instrument(SERVICE_DECREMENT_REMAINING, handle_decrement_remaining),
             schema=SERVICE_DECREMENT_REMAINING_SCHEMA,
         )
     if not hass.services.has_service(DOMAIN, SERVICE_GET_STATISTICS):
         hass.services.async_register(
             DOMAIN,
             SERVICE_GET_STATISTICS,
-            handle_get_statistics,
+            _instrument(SERVICE_GET_STATISTICS, handle_get_statistics),
             schema=SERVICE_GET_STATISTICS_SCHEMA,
             supports_response=True,
         )
@@ -1379,7 +1731,7 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         hass.services.async_register(
             DOMAIN,
             SERVICE_GET_MEDICATION_HISTORY,
-            handle_get_medication_history,
+            _instrument(SERVICE_GET_MEDICATION_HISTORY, handle_get_medication_history),
             schema=SERVICE_GET_MEDICATION_HISTORY_SCHEMA,
             supports_response=True,
         )
@@ -1387,7 +1739,9 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         hass.services.async_register(
             DOMAIN,
             SERVICE_EDIT_MEDICATION_HISTORY,
-            handle_edit_medication_history,
+            _instrument(
+                SERVICE_EDIT_MEDICATION_HISTORY, handle_edit_medication_history
+            ),
             schema=SERVICE_EDIT_MEDICATION_HISTORY_SCHEMA,
             supports_response=True,
         )
@@ -1395,12 +1749,44 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         hass.services.async_register(
             DOMAIN,
             SERVICE_DELETE_MEDICATION_HISTORY,
-            handle_delete_medication_history,
+            _instrument(
+                SERVICE_DELETE_MEDICATION_HISTORY, handle_delete_medication_history
+            ),
             schema=SERVICE_DELETE_MEDICATION_HISTORY_SCHEMA,
             supports_response=True,
         )
-
-    return True
+    if not hass.services.has_service(DOMAIN, SERVICE_GET_DOSE_LEDGER):
+        hass.services.async_register(
+            DOMAIN,
+            SERVICE_GET_DOSE_LEDGER,
+            _instrument(SERVICE_GET_DOSE_LEDGER, handle_get_dose_ledger),
+            schema=SERVICE_GET_DOSE_LEDGER_SCHEMA,
+            supports_response=True,
+        )
+    if not hass.services.has_service(DOMAIN, SERVICE_GET_ADHERENCE_HEATMAP):
+        hass.services.async_register(
+            DOMAIN,
+            SERVICE_GET_ADHERENCE_HEATMAP,
+            _instrument(SERVICE_GET_ADHERENCE_HEATMAP, handle_get_adherence_heatmap),
+            schema=SERVICE_GET_ADHERENCE_HEATMAP_SCHEMA,
+            supports_response=True,
+        )
+    if not hass.services.has_service(DOMAIN, SERVICE_EXPORT_HISTORY):
+        hass.services.async_register(
+            DOMAIN,
+            SERVICE_EXPORT_HISTORY,
+            _instrument(SERVICE_EXPORT_HISTORY, handle_export_history),
+            schema=SERVICE_EXPORT_HISTORY_SCHEMA,
+            supports_response=True,
+        )
+    if not hass.services.has_service(DOMAIN, SERVICE_IMPORT_HISTORY):
+        hass.services.async_register(
+            DOMAIN,
+            SERVICE_IMPORT_HISTORY,
+            _instrument(SERVICE_IMPORT_HISTORY, handle_import_history),
+            schema=SERVICE_IMPORT_HISTORY_SCHEMA,
+            supports_response=True,
+        )
 
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
@@ -1408,6 +1794,31 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
 
     if unload_ok:
-        hass.data[DOMAIN].pop(entry.entry_id, None)
+        for med_id in entry_medication_ids(entry):
+            hass.data[DOMAIN].pop(med_id, None)
+        # Let the next entry set up take over the latency sensors
+        if hass.data[DOMAIN].get(METRICS_ENTRY) == entry.entry_id:
+            hass.data[DOMAIN].pop(METRICS_ENTRY)
+        if not any(
+            isinstance(entry_data, dict) and "entry" in entry_data
+            for entry_data in hass.data[DOMAIN].values()
+        ):
+            await _async_stop_shared(hass)
 
     return unload_ok
+
+
+async def _async_stop_shared(hass: HomeAssistant) -> None:
+    """Stop the schedulers and trackers shared by all medications.
+
+    Called when the last medication is unloaded, so no timer or listener
+    outlives the entries; the next set-up entry creates them again.
+    """
+    for key in SHARED_TRACKERS:
+        tracker = hass.data[DOMAIN].pop(key, None)
+        if tracker is None:
+            continue
+        tracker.async_stop()
+        if key in SAVED_TRACKERS:
+            # Writes a pending delayed save now
+            await tracker.async_save()
@@ -0,0 +1,154 @@
+"""Notification action helpers for Pill Assistant."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+import logging
+import secrets
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+# Actions are sent as "<verb>_medication_<med_id>:<token>". The token is unique per
+# delivered notification so the same tap arriving twice can be recognised.
+ACTION_MEDICATION_INFIX = "_medication_"
+ACTION_TOKEN_SEPARATOR = ":"
+
+ACTION_DEDUP_MAX_SIZE = 256
+ACTION_DEDUP_TTL_SECONDS = 300
+
+# Button titles for every routable verb. Verbs not in the default button set can
+# still be sent by automations or custom notifications.
+ACTION_TITLES: dict[str, str] = {
+    "take": "Mark as Taken",
+    "take_half": "Take Half Dose",
+    "snooze": "Snooze",
+    "snooze_30": "Snooze 30 min",
+    "snooze_60": "Snooze 1 hour",
+    "skip": "Skip",
+}
+DEFAULT_NOTIFICATION_ACTIONS: tuple[str, ...] = ("take", "snooze", "skip")
+
+# Snooze verbs with a fixed duration in minutes
+SNOOZE_ACTION_DURATIONS: dict[str, int] = {"snooze_30": 30, "snooze_60": 60}
+
+ActionHandler = Callable[[str], Awaitable[None]]
+
+
+def new_action_token() -> str:
+    """Return a short random token identifying one notification delivery."""
+    return secrets.token_hex(6)
+
+
+def format_action(verb: str, med_id: str, token: str | None = None) -> str:
+    """Return the action identifier for a notification button."""
+    action = f"{verb}{ACTION_MEDICATION_INFIX}{med_id}"
+    if token:
+        action = f"{action}{ACTION_TOKEN_SEPARATOR}{token}"
+    return action
+
+
+def parse_action(action: str) -> tuple[str, str, str | None] | None:
+    """Split an action identifier into (verb, med_id, token).
+
+    Returns None if the action does not belong to Pill Assistant. Actions sent
+    before tokens were introduced have no token and return None for it.
+    """
+    verb, infix, rest = action.partition(ACTION_MEDICATION_INFIX)
+    if not infix or not verb or not rest:
+        return None
+    med_id, _, token = rest.partition(ACTION_TOKEN_SEPARATOR)
+    if not med_id:
+        return None
+    return verb, med_id, token or None
+
+
+def build_notification_actions(
+    med_id: str,
+    token: str | None = None,
+    verbs: tuple[str, ...] = DEFAULT_NOTIFICATION_ACTIONS,
+) -> list[dict]:
+    """Return the actionable-notification buttons for a medication."""
+    return [
+        {"action": format_action(verb, med_id, token), "title": ACTION_TITLES[verb]}
+        for verb in verbs
+    ]
+
+
+class ActionRouter:
+    """Route parsed notification actions directly to handler coroutines.
+
+    This avoids re-entering the service bus (schema validation, context
+    creation) for actions that originate inside the integration.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty action table."""
+        self._handlers: dict[str, ActionHandler] = {}
+
+    def register(self, verb: str, handler: ActionHandler) -> None:
+        """Register ``handler`` to be awaited with the medication ID for ``verb``."""
+        self._handlers[verb] = handler
+
+    @property
+    def verbs(self) -> frozenset[str]:
+        """Return the registered verbs."""
+        return frozenset(self._handlers)
+
+    async def async_dispatch(self, verb: str, med_id: str) -> bool:
+        """Run the handler for ``verb``; return False if the verb is unknown."""
+        handler = self._handlers.get(verb)
+        if handler is None:
+            _LOGGER.debug("No handler registered for notification action %s", verb)
+            return False
+        await handler(med_id)
+        return True
+
+
+class ActionDedupCache:
+    """Remember recently processed notification actions.
+
+    A single tap can be delivered several times (multiple devices, retries, or
+    both the Android and iOS event types). Entries expire after ``ttl`` seconds
+    and the cache never holds more than ``max_size`` keys, evicting the oldest.
+    """
+
+    def __init__(
+        self,
+        max_size: int = ACTION_DEDUP_MAX_SIZE,
+        ttl: float = ACTION_DEDUP_TTL_SECONDS,
+    ) -> None:
+        """Initialize the cache."""
+        self._max_size = max_size
+        self._ttl = ttl
+        self._seen: OrderedDict[str, float] = OrderedDict()
+
+    def __len__(self) -> int:
+        """Return the number of remembered keys."""
+        return len(self._seen)
+
+    def check_and_add(self, key: str, now: float | None = None) -> bool:
+        """Record ``key`` and return True if it was already seen and not expired."""
+        now = time.monotonic() if now is None else now
+        self._expire(now)
+
+        if key in self._seen:
+            return True
+
+        self._seen[key] = now + self._ttl
+        if len(self._seen) > self._max_size:
+            self._seen.popitem(last=False)
+        return False
+
+    def discard(self, key: str) -> None:
+        """Forget ``key``, so a redelivery of a failed action is processed."""
+        self._seen.pop(key, None)
+
+    def _expire(self, now: float) -> None:
+        """Drop expired keys from the front of the insertion-ordered cache."""
+        while self._seen:
+            key, expires = next(iter(self._seen.items()))
+            if expires > now:
+                break
+            del self._seen[key]
@@ -0,0 +1,289 @@
+"""Rolling adherence of each medication over the last 7 and 30 days.
+
+Each medication keeps one slot per day in a fixed-size ring: doses taken,
+taken on time and scheduled. Taken doses are counted as they are logged and
+scheduled doses as their time passes, so the window totals the sensors show
+are kept up to date without scanning the history or the CSV log.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+import logging
+from typing import Any
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.dispatcher import (
+    async_dispatcher_connect,
+    async_dispatcher_send,
+)
+from homeassistant.helpers.storage import Store
+import homeassistant.util.dt as dt_util
+
+from .const import (
+    ADHERENCE_STORAGE_KEY,
+    CONF_ON_TIME_WINDOW_MINUTES,
+    DEFAULT_ON_TIME_WINDOW_MINUTES,
+    DOMAIN,
+    SIGNAL_ADHERENCE_UPDATED,
+    SIGNAL_EVALUATION_TICK,
+    SIGNAL_MEDICATION_UPDATED,
+    STORAGE_VERSION,
+)
+from .ledger import scheduled_doses
+from .models import DoseEvent
+from .store import ChangeSet, PillAssistantStore
+
+_LOGGER = logging.getLogger(__name__)
+
+# The windows sensors report; the ring holds the longest of them
+ADHERENCE_WINDOWS = (7, 30)
+RING_DAYS = max(ADHERENCE_WINDOWS)
+# Saves are delayed so doses counted in the same minute share one write
+ADHERENCE_SAVE_DELAY = 10
+
+# Positions in a day slot: [day ordinal, taken, taken on time, scheduled]
+_DAY, _TAKEN, _ON_TIME, _SCHEDULED = range(4)
+
+
+@dataclass(frozen=True, slots=True)
+class AdherenceWindow:
+    """Totals of the last ``days`` days, today included."""
+
+    days: int
+    taken: int = 0
+    on_time: int = 0
+    scheduled: int = 0
+
+    @property
+    def adherence(self) -> float | None:
+        """Return the percentage of scheduled doses taken, if any were due."""
+        if not self.scheduled:
+            return None
+        return round(min(self.taken / self.scheduled, 1) * 100, 1)
+
+    @property
+    def on_time_percentage(self) -> float | None:
+        """Return the percentage of taken doses that were taken on time."""
+        if not self.taken:
+            return None
+        return round(self.on_time / self.taken * 100, 1)
+
+
+def taken_on_time(config: Mapping[str, Any], taken_at: datetime) -> bool:
+    """Return True if a dose was taken within the window of a scheduled one."""
+    window = timedelta(
+        minutes=config.get(CONF_ON_TIME_WINDOW_MINUTES, DEFAULT_ON_TIME_WINDOW_MINUTES)
+    )
+    # The range excludes its start, so widen it by a second to include it
+    start = taken_at - window - timedelta(seconds=1)
+    return bool(scheduled_doses(config, start, taken_at + window))
+
+
+class _MedicationRing:
+    """The per-day counts of one medication for the last ``RING_DAYS`` days."""
+
+    __slots__ = ("started", "counted_until", "slots", "windows")
+
+    def __init__(self, started: datetime) -> None:
+        """Initialize an empty ring that counts from ``started``."""
+        self.started = started
+        self.counted_until = started
+        self.slots: list[list[int]] = [[0, 0, 0, 0] for _ in range(RING_DAYS)]
+        self.windows: dict[int, AdherenceWindow] = {}
+
+    def slot(self, day: date, today: date) -> list[int] | None:
+        """Return the slot of ``day``, reset if it held an older day."""
+        ordinal = day.toordinal()
+        if not today.toordinal() - RING_DAYS < ordinal <= today.toordinal():
+            return None
+        slot = self.slots[ordinal % RING_DAYS]
+        if slot[_DAY] != ordinal:
+            slot[:] = [ordinal, 0, 0, 0]
+        return slot
+
+    def total(self, today: date) -> None:
+        """Sum the slots of each window ending ``today``."""
+        end = today.toordinal()
+        for days in ADHERENCE_WINDOWS:
+            taken = on_time = scheduled = 0
+            for slot in self.slots:
+                if end - days < slot[_DAY] <= end:
+                    taken += slot[_TAKEN]
+                    on_time += slot[_ON_TIME]
+                    scheduled += slot[_SCHEDULED]
+            self.windows[days] = AdherenceWindow(days, taken, on_time, scheduled)
+
+
+class AdherenceTracker:
+    """Count taken and scheduled doses per day and total the rolling windows.
+
+    Taken events arrive with the change-sets of the store. On each
+    evaluation tick, doses whose scheduled time has passed are counted, and
+    when the day changes the windows are totalled again so days that left
+    them stop counting. A medication is counted from the time the tracker
+    first sees it, like the dose ledger, so its first windows are short.
+    """
+
+    def __init__(self, hass: HomeAssistant, store: PillAssistantStore) -> None:
+        """Initialize the tracker."""
+        self._hass = hass
+        self._store = store
+        self._adherence_store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, ADHERENCE_STORAGE_KEY
+        )
+        self._rings: dict[str, _MedicationRing] = {}
+        self._next_due: dict[str, datetime] = {}
+        self._today = dt_util.now().date()
+        self._unsubs: list[CALLBACK_TYPE] = []
+
+    async def async_load(self) -> None:
+        """Restore the counts from storage and start following changes."""
+        stored = await self._adherence_store.async_load() or {}
+        for med_id, med_stored in stored.get("medications", {}).items():
+            started = dt_util.parse_datetime(med_stored.get("started", ""))
+            counted_until = dt_util.parse_datetime(med_stored.get("counted_until", ""))
+            if started is None or counted_until is None:
+                continue
+            ring = _MedicationRing(dt_util.as_local(started))
+            ring.counted_until = dt_util.as_local(counted_until)
+            for item in med_stored.get("days", []):
+                ring.slots[item[_DAY] % RING_DAYS] = list(item)
+            ring.total(self._today)
+            self._rings[med_id] = ring
+
+        self._unsubs = [
+            async_dispatcher_connect(
+                self._hass, SIGNAL_EVALUATION_TICK, self._async_tick
+            ),
+            async_dispatcher_connect(
+                self._hass, SIGNAL_MEDICATION_UPDATED, self._async_changed
+            ),
+        ]
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop following changes."""
+        for unsub in self._unsubs:
+            unsub()
+        self._unsubs = []
+
+    def window(self, med_id: str, days: int) -> AdherenceWindow:
+        """Return the totals of a medication over the last ``days`` days."""
+        ring = self._rings.get(med_id)
+        if ring is None or days not in ring.windows:
+            return AdherenceWindow(days)
+        return ring.windows[days]
+
+    async def async_save(self) -> None:
+        """Write the counts to storage now."""
+        await self._adherence_store.async_save(self._data_to_save())
+
+    @callback
+    def _async_tick(self) -> None:
+        """Count doses that became due and roll the windows over at midnight."""
+        now = dt_util.now()
+        changed: set[str] = set()
+        if now.date() != self._today:
+            self._today = now.date()
+            changed.update(self._rings)
+        for med_id, config in self._configs():
+            if med_id not in self._rings:
+                self._rings[med_id] = _MedicationRing(now)
+            if self._next_due.get(med_id, now) <= now and self._count_due(
+                med_id, config, now
+            ):
+                changed.add(med_id)
+        self._async_totals_changed(changed)
+
+    def _count_due(self, med_id: str, config: Mapping[str, Any], now: datetime) -> bool:
+        """Count the doses scheduled since the last count up to ``now``.
+
+        Returns True if any were counted.
+        """
+        ring = self._rings[med_id]
+        since = max(ring.counted_until, now - timedelta(days=RING_DAYS))
+        doses = scheduled_doses(config, since, now)
+        for dose in doses:
+            slot = ring.slot(dose.date(), self._today)
+            if slot is not None:
+                slot[_SCHEDULED] += 1
+        ring.counted_until = now
+        upcoming = scheduled_doses(config, now, now + timedelta(days=8))
+        # Relative schedules have no fixed doses; look again in a day
+        self._next_due[med_id] = upcoming[0] if upcoming else now + timedelta(days=1)
+        return bool(doses)
+
+    def _configs(self) -> Iterable[tuple[str, Mapping[str, Any]]]:
+        """Yield the ID and configuration of every set-up medication."""
+        for med_id, entry_data in self._hass.data.get(DOMAIN, {}).items():
+            if isinstance(entry_data, dict) and "entry" in entry_data:
+                yield med_id, entry_data["entry"].data
+
+    def _count_taken(self, events: Iterable[DoseEvent]) -> set[str]:
+        """Count taken events; returns the medications whose counts changed."""
+        configs = dict(self._configs())
+        changed = set()
+        for event in events:
+            if event.get("action") != "taken":
+                continue
+            med_id = event.get("medication_id")
+            ring = self._rings.get(med_id)
+            taken_at = event.time
+            if ring is None or taken_at is None or taken_at < ring.started:
+                continue
+            slot = ring.slot(taken_at.date(), self._today)
+            if slot is None:
+                continue
+            slot[_TAKEN] += 1
+            if taken_on_time(configs.get(med_id, {}), taken_at):
+                slot[_ON_TIME] += 1
+            changed.add(med_id)
+        return changed
+
+    @callback
+    def _async_changed(self, changes: ChangeSet | None = None) -> None:
+        """Count taken doses as they are logged."""
+        if changes is None:
+            return
+        if changes.history_rewritten:
+            # Edited or deleted entries: count the taken doses again
+            self._hass.async_create_task(self._async_recount())
+            return
+        self._async_totals_changed(self._count_taken(changes.history))
+
+    async def _async_recount(self) -> None:
+        """Count the taken doses of the ring's days again from the history."""
+        await self._store.async_load_history()
+        for ring in self._rings.values():
+            for slot in ring.slots:
+                slot[_TAKEN] = slot[_ON_TIME] = 0
+        self._count_taken(self._store.snapshot["history"])
+        _LOGGER.debug("Recounted taken doses after the history was edited")
+        self._async_totals_changed(set(self._rings))
+
+    @callback
+    def _async_totals_changed(self, med_ids: set[str]) -> None:
+        """Total the windows of ``med_ids`` again, save and notify their sensors."""
+        if not med_ids:
+            return
+        for med_id in med_ids:
+            self._rings[med_id].total(self._today)
+            async_dispatcher_send(self._hass, f"{SIGNAL_ADHERENCE_UPDATED}_{med_id}")
+        self._adherence_store.async_delay_save(self._data_to_save, ADHERENCE_SAVE_DELAY)
+
+    def _data_to_save(self) -> dict[str, Any]:
+        """Return the counts in their stored form."""
+        return {
+            "medications": {
+                med_id: {
+                    "started": ring.started.isoformat(),
+                    "counted_until": ring.counted_until.isoformat(),
+                    # Copies, since the file is written in the executor
+                    "days": tuple(tuple(slot) for slot in ring.slots if slot[_DAY]),
+                }
+                for med_id, ring in self._rings.items()
+            }
+        }
@@ -0,0 +1,262 @@
+"""Cold storage for history older than the retention period.
+
+Old entries move out of the live history into gzip-compressed JSON-lines
+files, one per month. A manifest records the time range and size of every
+file, so a query reads only the files its range reaches, and none at all
+for the recent days most queries ask about.
+"""
+
+from __future__ import annotations
+
+from collections.abc import AsyncIterator, Iterable
+from datetime import date, datetime, timedelta
+import gzip
+import json
+import logging
+import os
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.storage import STORAGE_DIR, Store
+import homeassistant.util.dt as dt_util
+
+from .const import (
+    ARCHIVE_STORAGE_KEY,
+    DOMAIN,
+    SIGNAL_EVALUATION_TICK,
+    STORAGE_VERSION,
+)
+from .models import DoseEvent
+from .tracing import span
+
+if TYPE_CHECKING:
+    from .store import PillAssistantStore
+
+_LOGGER = logging.getLogger(__name__)
+
+ARCHIVE_DIR_NAME = f"{DOMAIN}_archive"
+# The adherence windows and the recent history always stay in the live store
+MIN_RETENTION_DAYS = 30
+
+
+def archive_filename(when: datetime) -> str:
+    """Return the archive file of the month of a local time."""
+    return f"history_{when:%Y-%m}.jsonl.gz"
+
+
+def _append_archive_files(directory: str, files: dict[str, list[Any]]) -> None:
+    """Append entries to archive files; each append adds one gzip member."""
+    os.makedirs(directory, exist_ok=True)
+    for name, entries in files.items():
+        with gzip.open(os.path.join(directory, name), "at", encoding="utf-8") as f:
+            f.write(
+                "".join(
+                    json.dumps(dict(entry), ensure_ascii=False) + "\n"
+                    for entry in entries
+                )
+            )
+
+
+def _read_archive_files(directory: str, names: list[str]) -> list[dict[str, Any]]:
+    """Return the entries of archive files."""
+    entries = []
+    for name in names:
+        with gzip.open(os.path.join(directory, name), "rt", encoding="utf-8") as f:
+            entries.extend(json.loads(line) for line in f if line.strip())
+    return entries
+
+
+class HistoryArchive:
+    """The archive files of old history and their manifest.
+
+    The manifest maps each file to the first and last time it holds and its
+    number of entries, and records the cutoff of the last archive run. The
+    files are written before the live history; until the live history is
+    rewritten too, the cutoff of the run stays pending in the manifest.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the archive."""
+        self._hass = hass
+        self._manifest_store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, ARCHIVE_STORAGE_KEY
+        )
+        self.directory = hass.config.path(STORAGE_DIR, ARCHIVE_DIR_NAME)
+        self._files: dict[str, dict[str, Any]] = {}
+        self._archived_until: datetime | None = None
+        self._pending_until: datetime | None = None
+
+    @property
+    def archived_until(self) -> datetime | None:
+        """Return the time before which history may be archived."""
+        return self._archived_until
+
+    @property
+    def pending_until(self) -> datetime | None:
+        """Return the cutoff of a run whose live entries are not removed yet."""
+        return self._pending_until
+
+    @property
+    def count(self) -> int:
+        """Return the number of archived entries."""
+        return sum(info["count"] for info in self._files.values())
+
+    async def async_load(self) -> None:
+        """Load the manifest."""
+        stored = await self._manifest_store.async_load() or {}
+        self._files = stored.get("files", {})
+        until = stored.get("archived_until")
+        self._archived_until = dt_util.parse_datetime(until) if until else None
+        pending = stored.get("pending_until")
+        self._pending_until = dt_util.parse_datetime(pending) if pending else None
+
+    def files_between(
+        self, start: datetime | None = None, end: datetime | None = None
+    ) -> list[str]:
+        """Return the files holding entries from ``start`` to ``end``."""
+        return sorted(
+            name
+            for name, info in self._files.items()
+            if (start is None or dt_util.parse_datetime(info["end"]) >= start)
+            and (end is None or dt_util.parse_datetime(info["start"]) <= end)
+        )
+
+    async def async_add(
+        self, entries: Iterable[tuple[DoseEvent, dict[str, Any]]], until: datetime
+    ) -> None:
+        """Append entries and their published events, all older than ``until``."""
+        files: dict[str, list[dict[str, Any]]] = {}
+        ranges: dict[str, list[datetime]] = {}
+        for event, entry in entries:
+            name = archive_filename(event.time)
+            files.setdefault(name, []).append(entry)
+            first_last = ranges.setdefault(name, [event.time, event.time])
+            first_last[0] = min(first_last[0], event.time)
+            first_last[1] = max(first_last[1], event.time)
+
+        with span("archive_write", files=len(files)):
+            await self._hass.async_add_executor_job(
+                _append_archive_files, self.directory, files
+            )
+        for name, (first, last) in ranges.items():
+            info = self._files.get(name)
+            if info is not None:
+                first = min(first, dt_util.parse_datetime(info["start"]))
+                last = max(last, dt_util.parse_datetime(info["end"]))
+            self._files[name] = {
+                "start": first.isoformat(),
+                "end": last.isoformat(),
+                "count": len(files[name]) + (info["count"] if info else 0),
+            }
+        if self._archived_until is None or until > self._archived_until:
+            self._archived_until = until
+        self._pending_until = until
+        await self._async_save_manifest()
+
+    async def async_finish(self) -> None:
+        """Record that the live entries of the last run were removed."""
+        self._pending_until = None
+        await self._async_save_manifest()
+
+    async def _async_save_manifest(self) -> None:
+        """Write the manifest."""
+        manifest: dict[str, Any] = {
+            "files": self._files,
+            "archived_until": self._archived_until.isoformat(),
+        }
+        if self._pending_until is not None:
+            manifest["pending_until"] = self._pending_until.isoformat()
+        await self._manifest_store.async_save(manifest)
+
+    async def async_read(
+        self, start: datetime | None = None, end: datetime | None = None
+    ) -> list[DoseEvent]:
+        """Return the archived events from ``start`` to ``end``, oldest first."""
+        return await self._async_read_files(self.files_between(start, end), start, end)
+
+    async def async_iter_read(
+        self, start: datetime | None = None, end: datetime | None = None
+    ) -> AsyncIterator[list[DoseEvent]]:
+        """Yield the archived events from ``start`` to ``end``, file by file.
+
+        Files are monthly, so the events come oldest first and only one file
+        is held at a time. Entries archived while the files are read are left
+        out; they are still in the live history read with them.
+        """
+        names = self.files_between(start, end)
+        until = self._archived_until
+        for name in names:
+            events = await self._async_read_files([name], start, end)
+            yield [event for event in events if until is None or event.time < until]
+
+    async def _async_read_files(
+        self, names: list[str], start: datetime | None, end: datetime | None
+    ) -> list[DoseEvent]:
+        """Return the events of archive files from ``start`` to ``end``."""
+        if not names:
+            return []
+        with span("archive_read", files=len(names)):
+            entries = await self._hass.async_add_executor_job(
+                _read_archive_files, self.directory, names
+            )
+        events = [
+            event
+            for event in map(DoseEvent, entries)
+            if event.time is not None
+            and (start is None or event.time >= start)
+            and (end is None or event.time <= end)
+        ]
+        # Backfilled entries may be archived after newer ones
+        events.sort(key=lambda event: event.time)
+        return events
+
+
+class HistoryRetention:
+    """Archive history older than the retention period once a day.
+
+    Runs in the background from the first evaluation tick of each local day.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, store: PillAssistantStore, days: int
+    ) -> None:
+        """Initialize the retention policy."""
+        self._hass = hass
+        self._store = store
+        self._days = days
+        self._last_run: date | None = None
+        self._unsubs: list[CALLBACK_TYPE] = []
+
+    async def async_load(self) -> None:
+        """Start running on the evaluation ticks."""
+        self._unsubs = [
+            async_dispatcher_connect(
+                self._hass, SIGNAL_EVALUATION_TICK, self._async_tick
+            )
+        ]
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop running."""
+        for unsub in self._unsubs:
+            unsub()
+        self._unsubs = []
+
+    @callback
+    def _async_tick(self) -> None:
+        """Start the archive run of the day if it has not run yet."""
+        today = dt_util.now().date()
+        if self._last_run != today:
+            self._last_run = today
+            self._hass.async_create_background_task(
+                self.async_run(), f"{DOMAIN}_archive_history"
+            )
+
+    async def async_run(self) -> int:
+        """Archive the entries before the retention period; returns how many."""
+        cutoff = dt_util.start_of_local_day() - timedelta(days=self._days)
+        archived = await self._store.async_archive_history(cutoff)
+        if archived:
+            _LOGGER.info("Archived %s history entries from before %s", archived, cutoff)
+        return archived
@@ -17,6 +17,7 @@ from .const import (
     SERVICE_TEST_NOTIFICATION,
     ATTR_MEDICATION_ID,
 )
+from .hub import MedicationConfig, entry_medication_ids
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -27,16 +28,19 @@ async def async_setup_entry(
     async_add_entities: AddEntitiesCallback,
 ) -> None:
     """Set up button entities for Pill Assistant."""
-    # Create test notification button for this medication
-    medication_name = config_entry.data.get(CONF_MEDICATION_NAME, "Unknown")
-
-    button = PillAssistantTestButton(
-        hass,
-        config_entry,
-        medication_name,
-    )
+    # Create a test notification button for each medication of the entry
+    buttons = []
+    for med_id in entry_medication_ids(config_entry):
+        medication = hass.data[DOMAIN][med_id]["entry"]
+        buttons.append(
+            PillAssistantTestButton(
+                hass,
+                medication,
+                medication.data.get(CONF_MEDICATION_NAME, "Unknown"),
+            )
+        )
 
-    async_add_entities([button], True)
+    async_add_entities(buttons, True)
 
 
 class PillAssistantTestButton(ButtonEntity):
@@ -45,7 +49,7 @@ class PillAssistantTestButton(ButtonEntity):
     def __init__(
         self,
         hass: HomeAssistant,
-        config_entry: ConfigEntry,
+        config_entry: MedicationConfig,
         medication_name: str,
     ) -> None:
         """Initialize the button."""
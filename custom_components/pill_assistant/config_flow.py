@@ -37,6 +37,10 @@ from .const import (
     CONF_SNOOZE_DURATION_MINUTES,
     CONF_ENABLE_AUTOMATIC_NOTIFICATIONS,
     CONF_ON_TIME_WINDOW_MINUTES,
+    CONF_REMINDER_INTERVAL_MINUTES,
+    CONF_ESCALATION_AFTER_MINUTES,
+    CONF_ESCALATION_NOTIFY_SERVICES,
+    CONF_MISSED_AFTER_MINUTES,
     DEFAULT_DOSAGE_UNIT,
     DEFAULT_MEDICATION_TYPE,
     DEFAULT_STRENGTH,
@@ -52,6 +56,9 @@ from .const import (
     DEFAULT_IGNORE_UNAVAILABLE,
     DEFAULT_ENABLE_AUTOMATIC_NOTIFICATIONS,
     DEFAULT_ON_TIME_WINDOW_MINUTES,
+    DEFAULT_REMINDER_INTERVAL_MINUTES,
+    DEFAULT_ESCALATION_AFTER_MINUTES,
+    DEFAULT_MISSED_AFTER_MINUTES,
     MAX_SENSOR_HISTORY_CHANGES,
     SCHEDULE_TYPE_OPTIONS,
     SELECT_MEDICATION_TYPE,
@@ -59,6 +66,18 @@ from .const import (
     SELECT_DAYS,
     LEGACY_DOSAGE_UNITS,
     DOSAGE_UNIT_OPTIONS,
+    ATTR_MEDICATION_ID,
+    CONF_HUB,
+    CONF_HUB_MEDICATIONS,
+)
+from .forecast import async_update_forecast
+from .hub import (
+    async_add_hub_medication,
+    async_update_medication,
+    get_hub_entry,
+    hub_medications,
+    is_hub_entry,
+    iter_medication_entries,
 )
 
 
@@ -233,6 +252,24 @@ class PillAssistantConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             errors=errors,
         )
 
+    async def async_step_import(self, import_data):
+        """Combine all medications into a single hub entry.
+
+        Started when hub mode is turned on in configuration.yaml.
+        """
+        await self.async_set_unique_id(f"{DOMAIN}_hub")
+        self._abort_if_unique_id_configured()
+        # Medications keep their entry IDs, and with them their entities
+        medications = {
+            entry.entry_id: dict(entry.data)
+            for entry in self.hass.config_entries.async_entries(DOMAIN)
+            if not is_hub_entry(entry)
+        }
+        return self.async_create_entry(
+            title="Pill Assistant",
+            data={CONF_HUB: True, CONF_HUB_MEDICATIONS: medications},
+        )
+
     async def async_step_schedule(self, user_input=None):
         """Handle the schedule step - choose schedule type."""
         errors = {}
@@ -402,8 +439,8 @@ class PillAssistantConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         # Get list of existing medications to choose from
         existing_meds = []
         if self.hass:
-            # Get all config entries for this domain
-            for entry in self.hass.config_entries.async_entries(DOMAIN):
+            # Get all medications, including those of a hub entry
+            for entry in iter_medication_entries(self.hass):
                 med_name = entry.data.get(CONF_MEDICATION_NAME, "Unknown")
                 existing_meds.append({"label": med_name, "value": entry.entry_id})
 
@@ -742,6 +779,10 @@ class PillAssistantConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                         CONF_REFILL_AMOUNT, 30
                     )
 
+                hub_entry = get_hub_entry(self.hass)
+                if hub_entry is not None:
+                    return self._async_add_to_hub(hub_entry)
+
                 # Create unique ID based on medication name
                 await self.async_set_unique_id(
                     f"{DOMAIN}_{self._data[CONF_MEDICATION_NAME].lower().replace(' ', '_')}"
@@ -809,6 +850,26 @@ class PillAssistantConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                         CONF_ON_TIME_WINDOW_MINUTES, DEFAULT_ON_TIME_WINDOW_MINUTES
                     ),
                 ): vol.Coerce(int),
+                vol.Optional(
+                    CONF_REMINDER_INTERVAL_MINUTES,
+                    default=self._data.get(
+                        CONF_REMINDER_INTERVAL_MINUTES,
+                        DEFAULT_REMINDER_INTERVAL_MINUTES,
+                    ),
+                ): vol.Coerce(int),
+                vol.Optional(
+                    CONF_ESCALATION_AFTER_MINUTES,
+                    default=self._data.get(
+                        CONF_ESCALATION_AFTER_MINUTES,
+                        DEFAULT_ESCALATION_AFTER_MINUTES,
+                    ),
+                ): vol.Coerce(int),
+                vol.Optional(
+                    CONF_MISSED_AFTER_MINUTES,
+                    default=self._data.get(
+                        CONF_MISSED_AFTER_MINUTES, DEFAULT_MISSED_AFTER_MINUTES
+                    ),
+                ): vol.Coerce(int),
             }
         )
 
@@ -828,6 +889,20 @@ class PillAssistantConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                     }
                 }
             )
+            schema_dict[
+                vol.Optional(
+                    CONF_ESCALATION_NOTIFY_SERVICES,
+                    default=self._data.get(CONF_ESCALATION_NOTIFY_SERVICES, []),
+                )
+            ] = selector(
+                {
+                    "select": {
+                        "options": notify_options,
+                        "multiple": True,
+                        "mode": "dropdown",
+                    }
+                }
+            )
 
         return self.async_show_form(
             step_id="refill",
@@ -838,10 +913,22 @@ class PillAssistantConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             },
         )
 
+    def _async_add_to_hub(self, hub_entry):
+        """Add the new medication to the hub instead of creating an entry."""
+        name = self._data[CONF_MEDICATION_NAME].lower()
+        for medication in hub_medications(hub_entry):
+            if medication.title.lower() == name:
+                return self.async_abort(reason="already_configured")
+        async_add_hub_medication(self.hass, hub_entry, self._data)
+        self.hass.config_entries.async_schedule_reload(hub_entry.entry_id)
+        return self.async_abort(reason="added_to_hub")
+
     @staticmethod
     @callback
     def async_get_options_flow(config_entry):
         """Get the options flow for this handler."""
+        if is_hub_entry(config_entry):
+            return PillAssistantHubOptionsFlow(config_entry)
         return PillAssistantOptionsFlow(config_entry)
 
 
@@ -952,31 +1039,21 @@ class PillAssistantOptionsFlow(config_entries.OptionsFlow):
                 # Update the config entry with new data
                 # Clear temp schedule type since we're saving now
                 self._temp_schedule_type = None
-                self.hass.config_entries.async_update_entry(
+                async_update_medication(
+                    self.hass,
                     self._config_entry,
-                    data={**self._config_entry.data, **user_input},
+                    {**self._config_entry.data, **user_input},
                 )
 
                 # If remaining_amount was changed, update it in storage
-                if CONF_CURRENT_QUANTITY in user_input:
-                    from .const import DOMAIN as PILL_DOMAIN
-
-                    if (
-                        PILL_DOMAIN in self.hass.data
-                        and med_id in self.hass.data[PILL_DOMAIN]
-                    ):
-                        entry_data = self.hass.data[PILL_DOMAIN][med_id]
-                        storage_data = entry_data.get("storage_data", {})
-                        medications = storage_data.get("medications", {})
-
-                        if med_id in medications:
-                            medications[med_id]["remaining_amount"] = user_input[
-                                CONF_CURRENT_QUANTITY
-                            ]
-                            # Save to storage
-                            store = entry_data.get("store")
-                            if store:
-                                await store.async_save(storage_data)
+                if CONF_CURRENT_QUANTITY in user_input and isinstance(
+                    self.hass.data.get(DOMAIN, {}).get(med_id), dict
+                ):
+                    await async_update_forecast(
+                        self.hass,
+                        self.hass.data[DOMAIN][med_id]["entry"],
+                        user_input[CONF_CURRENT_QUANTITY],
+                    )
 
                 return self.async_create_entry(title="", data={})
 
@@ -1052,7 +1129,7 @@ class PillAssistantOptionsFlow(config_entries.OptionsFlow):
         elif schedule_type == "relative_medication":
             # Get list of medications
             existing_meds = []
-            for entry in self.hass.config_entries.async_entries(DOMAIN):
+            for entry in iter_medication_entries(self.hass):
                 if entry.entry_id != self._config_entry.entry_id:
                     med_name = entry.data.get(CONF_MEDICATION_NAME, "Unknown")
                     existing_meds.append({"label": med_name, "value": entry.entry_id})
@@ -1253,6 +1330,30 @@ class PillAssistantOptionsFlow(config_entries.OptionsFlow):
                 ),
             )
         ] = vol.Coerce(int)
+        schema_dict[
+            vol.Optional(
+                CONF_REMINDER_INTERVAL_MINUTES,
+                default=current_data.get(
+                    CONF_REMINDER_INTERVAL_MINUTES, DEFAULT_REMINDER_INTERVAL_MINUTES
+                ),
+            )
+        ] = vol.Coerce(int)
+        schema_dict[
+            vol.Optional(
+                CONF_ESCALATION_AFTER_MINUTES,
+                default=current_data.get(
+                    CONF_ESCALATION_AFTER_MINUTES, DEFAULT_ESCALATION_AFTER_MINUTES
+                ),
+            )
+        ] = vol.Coerce(int)
+        schema_dict[
+            vol.Optional(
+                CONF_MISSED_AFTER_MINUTES,
+                default=current_data.get(
+                    CONF_MISSED_AFTER_MINUTES, DEFAULT_MISSED_AFTER_MINUTES
+                ),
+            )
+        ] = vol.Coerce(int)
         schema_dict[
             vol.Optional(CONF_NOTES, default=current_data.get(CONF_NOTES, ""))
         ] = str
@@ -1273,6 +1374,20 @@ class PillAssistantOptionsFlow(config_entries.OptionsFlow):
                     }
                 }
             )
+            schema_dict[
+                vol.Optional(
+                    CONF_ESCALATION_NOTIFY_SERVICES,
+                    default=current_data.get(CONF_ESCALATION_NOTIFY_SERVICES, []),
+                )
+            ] = selector(
+                {
+                    "select": {
+                        "options": notify_options,
+                        "multiple": True,
+                        "mode": "dropdown",
+                    }
+                }
+            )
 
         return self.async_show_form(
             step_id="init",
@@ -1309,9 +1424,10 @@ class PillAssistantOptionsFlow(config_entries.OptionsFlow):
             self._pending_times = []
 
             # Update the config entry with new data
-            self.hass.config_entries.async_update_entry(
+            async_update_medication(
+                self.hass,
                 self._config_entry,
-                data={**self._config_entry.data, **self._temp_user_input},
+                {**self._config_entry.data, **self._temp_user_input},
             )
 
             return self.async_create_entry(title="", data={})
@@ -1420,3 +1536,50 @@ class PillAssistantOptionsFlow(config_entries.OptionsFlow):
         options.insert(0, {"label": "Any change (empty)", "value": ""})
 
         return options
+
+
+class PillAssistantHubOptionsFlow(PillAssistantOptionsFlow):
+    """Handle options of a hub entry, one medication at a time."""
+
+    def __init__(self, config_entry):
+        """Initialize the hub options flow."""
+        super().__init__(config_entry)
+        self._medication_selected = False
+
+    async def async_step_init(self, user_input=None):
+        """Edit the chosen medication like a separate entry."""
+        if self._medication_selected:
+            return await super().async_step_init(user_input)
+        return await self.async_step_select_medication()
+
+    async def async_step_select_medication(self, user_input=None):
+        """Choose the medication of the hub to edit."""
+        medications = {
+            medication.entry_id: medication
+            for medication in hub_medications(self._config_entry)
+        }
+
+        if user_input is not None:
+            med_id = user_input[ATTR_MEDICATION_ID]
+            # Edit the loaded medication so its sensors see the change
+            entry_data = self.hass.data.get(DOMAIN, {}).get(med_id)
+            self._config_entry = (
+                entry_data["entry"] if entry_data else medications[med_id]
+            )
+            self._medication_selected = True
+            return await super().async_step_init()
+
+        options = [
+            {"label": medication.title, "value": med_id}
+            for med_id, medication in medications.items()
+        ]
+        return self.async_show_form(
+            step_id="select_medication",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(ATTR_MEDICATION_ID): selector(
+                        {"select": {"options": options, "mode": "dropdown"}}
+                    )
+                }
+            ),
+        )
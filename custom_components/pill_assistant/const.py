@@ -54,6 +54,24 @@ CONF_ON_TIME_WINDOW_MINUTES = (
     "on_time_window_minutes"  # Time window (±minutes) for "on time" statistics
 )
 
+# Escalating reminders (0 disables a stage)
+CONF_REMINDER_INTERVAL_MINUTES = (
+    "reminder_interval_minutes"  # Re-notify every X minutes until taken
+)
+CONF_ESCALATION_AFTER_MINUTES = (
+    "escalation_after_minutes"  # Switch to escalation targets after Y minutes
+)
+CONF_ESCALATION_NOTIFY_SERVICES = (
+    "escalation_notify_services"  # Notification services used once escalated
+)
+CONF_MISSED_AFTER_MINUTES = (
+    "missed_after_minutes"  # Record the dose as missed after Z minutes
+)
+CONF_HUB = "hub"  # Marks the single entry that holds all medications
+CONF_HUB_MEDICATIONS = "medications"  # Hub table: medication ID -> configuration
+CONF_TRACING = "tracing"  # Export action traces to a JSON-lines file
+CONF_HISTORY_RETENTION_DAYS = "history_retention_days"  # Days of live history
+
 # Default values
 DEFAULT_DOSAGE_UNIT = "each"
 DEFAULT_MEDICATION_TYPE = "pill"
@@ -69,6 +87,9 @@ DEFAULT_AVOID_DUPLICATE_TRIGGERS = True
 DEFAULT_IGNORE_UNAVAILABLE = True
 DEFAULT_ENABLE_AUTOMATIC_NOTIFICATIONS = True
 DEFAULT_ON_TIME_WINDOW_MINUTES = 30
+DEFAULT_REMINDER_INTERVAL_MINUTES = 0
+DEFAULT_ESCALATION_AFTER_MINUTES = 0
+DEFAULT_MISSED_AFTER_MINUTES = 0
 
 # Schedule type options
 SCHEDULE_TYPE_OPTIONS = [
@@ -166,6 +187,27 @@ SELECT_NOTIFY_SERVICE = selector(
 # Storage
 STORAGE_VERSION = 1
 STORAGE_KEY = f"{DOMAIN}.medications"
+# History lives in its own file so medication state loads without it
+HISTORY_STORAGE_KEY = f"{DOMAIN}.history"
+# One file per medication with its state, see store.py; the medication's
+# history is kept under HISTORY_STORAGE_KEY with the same suffix
+MEDICATION_STORAGE_KEY = f"{DOMAIN}.medication"
+# Days of history kept with the medication state for use at startup
+RECENT_HISTORY_DAYS = 7
+# Pending reminder deadlines and notified doses, see reminders.py
+REMINDERS_STORAGE_KEY = f"{DOMAIN}.reminders"
+# Scheduled doses and how each ended, see ledger.py
+LEDGER_STORAGE_KEY = f"{DOMAIN}.ledger"
+# Per-day counts of taken and scheduled doses, see adherence.py
+ADHERENCE_STORAGE_KEY = f"{DOMAIN}.adherence"
+# What was imported into the recorder's statistics, see recorder_statistics.py
+STATISTICS_STORAGE_KEY = f"{DOMAIN}.statistics"
+# Daily sketches of how late doses were taken, see lateness.py
+LATENESS_STORAGE_KEY = f"{DOMAIN}.lateness"
+# Hour-of-week counts of taken, skipped and missed doses, see heatmap.py
+HEATMAP_STORAGE_KEY = f"{DOMAIN}.heatmap"
+# Time ranges of the archived history files, see archive.py
+ARCHIVE_STORAGE_KEY = f"{DOMAIN}.archive_manifest"
 LOG_FILE_NAME = "pill_assistant_history.log"
 
 # Services
@@ -182,6 +224,10 @@ SERVICE_GET_STATISTICS = "get_statistics"
 SERVICE_GET_MEDICATION_HISTORY = "get_medication_history"
 SERVICE_EDIT_MEDICATION_HISTORY = "edit_medication_history"
 SERVICE_DELETE_MEDICATION_HISTORY = "delete_medication_history"
+SERVICE_GET_DOSE_LEDGER = "get_dose_ledger"
+SERVICE_GET_ADHERENCE_HEATMAP = "get_adherence_heatmap"
+SERVICE_EXPORT_HISTORY = "export_history"
+SERVICE_IMPORT_HISTORY = "import_history"
 
 # Service parameter keys (for service calls)
 ATTR_MEDICATION_ID = "medication_id"
@@ -190,10 +236,18 @@ ATTR_START_DATE = "start_date"
 ATTR_END_DATE = "end_date"
 ATTR_HISTORY_INDEX = "history_index"
 ATTR_TIMESTAMP = "timestamp"
+ATTR_SLOT_MINUTES = "slot_minutes"
+ATTR_GRANULARITY = "granularity"
+ATTR_MAX_POINTS = "max_points"
 ATTR_ACTION = "action"
 ATTR_DOSAGE = "dosage"
 ATTR_DOSAGE_UNIT = "dosage_unit"
 ATTR_AMOUNT = "amount"
+ATTR_FORMAT = "format"
+ATTR_COMPRESS = "compress"
+ATTR_FILENAME = "filename"
+ATTR_PATH = "path"
+ATTR_DRY_RUN = "dry_run"
 
 # Display attribute names (for entity state attributes - human-friendly)
 ATTR_DISPLAY_MEDICATION_ID = "Medication ID"
@@ -206,10 +260,28 @@ ATTR_SNOOZE_UNTIL = "Snooze until"
 ATTR_DOSES_TAKEN_TODAY = "Doses taken today"
 ATTR_TAKEN_SCHEDULED_RATIO = "Taken/Scheduled ratio"
 ATTR_LOG_FILE_LOCATION = "Log file location"
+ATTR_RUN_OUT_DATE = "Run out date"
+ATTR_DAILY_CONSUMPTION = "Daily consumption"
 
 # Snooze configuration
 CONF_SNOOZE_DURATION_MINUTES = "snooze_duration_minutes"
 DEFAULT_SNOOZE_DURATION_MINUTES = 15
 
+# Re-reminders stop this long after the scheduled dose when no missed threshold is set
+MAX_REMINDER_WINDOW_HOURS = 12
+
+# Dispatcher signal for sensor updates (suffix with "_<medication_id>" for one med)
+SIGNAL_MEDICATION_UPDATED = f"{DOMAIN}_medication_updated"
+# Sent once a minute after all schedules were evaluated in a shared context
+SIGNAL_EVALUATION_TICK = f"{DOMAIN}_evaluation_tick"
+SIGNAL_MEDICATION_CONFIG_UPDATED = f"{DOMAIN}_medication_config_updated"
+# Sent with "_<medication_id>" when the rolling adherence of a medication changed
+SIGNAL_ADHERENCE_UPDATED = f"{DOMAIN}_adherence_updated"
+# Sent with the medication ID and the ledger entries of doses that just closed
+SIGNAL_DOSES_CLOSED = f"{DOMAIN}_doses_closed"
+
+# hass.data key of the entry that owns the latency diagnostic sensors
+METRICS_ENTRY = "metrics_entry"
+
 # Sensor event history configuration
 MAX_SENSOR_HISTORY_CHANGES = 20  # Maximum number of state changes to display
@@ -0,0 +1,95 @@
+"""Diagnostics support for Pill Assistant."""
+
+from __future__ import annotations
+
+import os
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import STORAGE_DIR
+
+from .const import (
+    CONF_NOTES,
+    CONF_NOTIFY_SERVICES,
+    DOMAIN,
+    HISTORY_STORAGE_KEY,
+    STORAGE_KEY,
+)
+from .hub import entry_medication_ids
+from .log_utils import get_logs_dir
+from .metrics import METRICS
+from .store import history_storage_key, medication_storage_key
+
+TO_REDACT = {CONF_NOTES, CONF_NOTIFY_SERVICES}
+
+
+def _file_sizes(paths: dict[str, str]) -> dict[str, int | None]:
+    """Return the size in bytes of each file, or None if it does not exist."""
+    sizes: dict[str, int | None] = {}
+    for name, path in paths.items():
+        try:
+            sizes[name] = os.path.getsize(path)
+        except OSError:
+            sizes[name] = None
+    return sizes
+
+
+def _log_file_sizes(logs_dir: str) -> dict[str, int]:
+    """Return the size in bytes of every CSV log."""
+    try:
+        names = sorted(os.listdir(logs_dir))
+    except OSError:
+        return {}
+    return {
+        name: size
+        for name, size in _file_sizes(
+            {name: os.path.join(logs_dir, name) for name in names}
+        ).items()
+        if size is not None
+    }
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    store = hass.data[DOMAIN]["store"]
+    snapshot = store.snapshot
+    med_ids = entry_medication_ids(entry)
+
+    storage_sizes = await hass.async_add_executor_job(
+        _file_sizes,
+        {
+            key: hass.config.path(STORAGE_DIR, key)
+            for key in (
+                STORAGE_KEY,
+                HISTORY_STORAGE_KEY,
+                *map(medication_storage_key, sorted(med_ids)),
+                *map(history_storage_key, sorted(med_ids)),
+            )
+        },
+    )
+    log_sizes = await hass.async_add_executor_job(_log_file_sizes, get_logs_dir(hass))
+
+    history = snapshot.get("history", ())
+    return {
+        "entry": async_redact_data(entry.as_dict(), TO_REDACT),
+        "store": {
+            "medications": len(snapshot.get("medications", {})),
+            "history_loaded": store.history_loaded,
+            # Only known once the history has been loaded from disk
+            "history_entries": len(history) if store.history_loaded else None,
+            "entry_history_entries": (
+                sum(item.get("medication_id") in med_ids for item in history)
+                if store.history_loaded
+                else None
+            ),
+            "recent_history_entries": len(store.recent_history),
+            "archived_history_entries": store.archive.count,
+            "file_sizes": storage_sizes,
+        },
+        "log_file_sizes": log_sizes,
+        "latency": METRICS.as_dict(),
+    }
@@ -0,0 +1,231 @@
+"""Shared per-tick evaluation of medication schedules."""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from datetime import datetime, timedelta
+import logging
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.dispatcher import (
+    async_dispatcher_connect,
+    async_dispatcher_send,
+)
+from homeassistant.helpers.event import async_track_time_interval
+import homeassistant.util.dt as dt_util
+
+from .const import (
+    CONF_RELATIVE_TO_MEDICATION,
+    CONF_SCHEDULE_TYPE,
+    DOMAIN,
+    SIGNAL_EVALUATION_TICK,
+    SIGNAL_MEDICATION_CONFIG_UPDATED,
+    SIGNAL_MEDICATION_UPDATED,
+)
+from .store import ChangeSet
+
+_LOGGER = logging.getLogger(__name__)
+
+EVALUATION_INTERVAL = timedelta(minutes=1)
+
+NextDoseCalculator = Callable[["EvaluationContext"], "datetime | None"]
+
+
+class EvaluationContext:
+    """Values shared by every medication sensor during one refresh.
+
+    A context holds a single ``now`` and memoizes parsed timestamps and
+    next-dose results, so a refresh of N sensors parses each medication's
+    ``last_taken`` once and evaluates each schedule once.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        calculators: dict[str, NextDoseCalculator],
+        now: datetime | None = None,
+    ) -> None:
+        """Initialize the context."""
+        self._hass = hass
+        self._calculators = calculators
+        self.now = now or dt_util.now()
+        self._parsed: dict[str, datetime | None] = {}
+        self._next_doses: dict[str, datetime | None] = {}
+        self._evaluating: set[str] = set()
+
+    def parse(self, value: str | None) -> datetime | None:
+        """Return an ISO timestamp as a local datetime, or None if invalid."""
+        if not value:
+            return None
+        try:
+            return self._parsed[value]
+        except KeyError:
+            pass
+        parsed = None
+        try:
+            parsed_dt = dt_util.parse_datetime(value)
+            if parsed_dt is not None:
+                parsed = dt_util.as_local(parsed_dt)
+        except (ValueError, TypeError):
+            pass
+        self._parsed[value] = parsed
+        return parsed
+
+    def medication(self, med_id: str) -> dict:
+        """Return the stored data of a medication, or an empty dict."""
+        entry_data = self._hass.data.get(DOMAIN, {}).get(med_id)
+        if not isinstance(entry_data, dict):
+            return {}
+        return entry_data["storage_data"]["medications"].get(med_id, {})
+
+    def last_taken(self, med_id: str) -> datetime | None:
+        """Return when a medication was last taken."""
+        return self.parse(self.medication(med_id).get("last_taken"))
+
+    def next_dose(self, med_id: str) -> datetime | None:
+        """Return the memoized next dose of a medication."""
+        if med_id in self._next_doses:
+            return self._next_doses[med_id]
+        calculator = self._calculators.get(med_id)
+        if calculator is None or med_id in self._evaluating:
+            # Unknown medication, or a cycle of relative medications
+            return None
+        self._evaluating.add(med_id)
+        try:
+            result = calculator(self)
+        finally:
+            self._evaluating.discard(med_id)
+        self._next_doses[med_id] = result
+        return result
+
+
+class DoseEvaluator:
+    """Build one evaluation context per tick or change for all sensors.
+
+    Sensors register a next-dose calculator. A single timer replaces the
+    per-sensor refresh timers: on each tick a new context is built, every
+    schedule is evaluated once with references before dependents, and the
+    sensors are told to refresh from the shared results.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the evaluator."""
+        self._hass = hass
+        self._calculators: dict[str, NextDoseCalculator] = {}
+        self._context: EvaluationContext | None = None
+        self._order: list[str] | None = None
+        self._unsub_tick: CALLBACK_TYPE | None = None
+        self._unsub_updates: CALLBACK_TYPE | None = None
+        self._unsub_config: CALLBACK_TYPE | None = None
+
+    @property
+    def context(self) -> EvaluationContext:
+        """Return the current context, building it if invalidated."""
+        if self._context is None:
+            self._context = EvaluationContext(self._hass, self._calculators)
+        return self._context
+
+    @callback
+    def async_register(
+        self, med_id: str, calculator: NextDoseCalculator
+    ) -> CALLBACK_TYPE:
+        """Register the next-dose calculator of a medication."""
+        self._calculators[med_id] = calculator
+        self._order = None
+        self.async_invalidate()
+        if self._unsub_tick is None:
+            self._unsub_tick = async_track_time_interval(
+                self._hass, self._async_tick, EVALUATION_INTERVAL
+            )
+            self._unsub_updates = async_dispatcher_connect(
+                self._hass, SIGNAL_MEDICATION_UPDATED, self._async_data_changed
+            )
+            self._unsub_config = async_dispatcher_connect(
+                self._hass, SIGNAL_MEDICATION_CONFIG_UPDATED, self._async_config_changed
+            )
+
+        @callback
+        def remove_calculator() -> None:
+            """Forget the calculator and stop ticking when none are left."""
+            if self._calculators.get(med_id) is calculator:
+                del self._calculators[med_id]
+                self._order = None
+                self.async_invalidate()
+            if not self._calculators:
+                self.async_stop()
+
+        return remove_calculator
+
+    @callback
+    def async_invalidate(self) -> None:
+        """Drop the current context after a change to medication data."""
+        self._context = None
+
+    @callback
+    def _async_data_changed(self, _changes: ChangeSet | None = None) -> None:
+        """Drop the context when stored medication data changed."""
+        self.async_invalidate()
+
+    @callback
+    def _async_config_changed(self, _med_id: str) -> None:
+        """Re-order and re-evaluate after a schedule was edited."""
+        self._order = None
+        self.async_invalidate()
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop the shared tick."""
+        if self._unsub_tick is not None:
+            self._unsub_tick()
+            self._unsub_tick = None
+        if self._unsub_updates is not None:
+            self._unsub_updates()
+            self._unsub_updates = None
+        if self._unsub_config is not None:
+            self._unsub_config()
+            self._unsub_config = None
+
+    def evaluation_order(self) -> list[str]:
+        """Return registered medications with references before dependents."""
+        if self._order is None:
+            self._order = self._topological_order()
+        return self._order
+
+    @callback
+    def _async_tick(self, _now: datetime | None = None) -> None:
+        """Evaluate every schedule once, then let the sensors refresh."""
+        self.async_invalidate()
+        context = self.context
+        for med_id in self.evaluation_order():
+            context.next_dose(med_id)
+        async_dispatcher_send(self._hass, SIGNAL_EVALUATION_TICK)
+
+    def _topological_order(self) -> list[str]:
+        """Order medications so each follows the medication it is relative to."""
+        references: dict[str, str | None] = {}
+        for med_id in self._calculators:
+            entry_data = self._hass.data.get(DOMAIN, {}).get(med_id)
+            ref_id = None
+            if isinstance(entry_data, dict):
+                data = entry_data["entry"].data
+                if data.get(CONF_SCHEDULE_TYPE) == "relative_medication":
+                    ref_id = data.get(CONF_RELATIVE_TO_MEDICATION)
+            references[med_id] = ref_id if ref_id in self._calculators else None
+
+        order: list[str] = []
+        placed: set[str] = set()
+        for med_id in references:
+            chain: list[str] = []
+            current: str | None = med_id
+            while current is not None and current not in placed:
+                if current in chain:
+                    _LOGGER.warning(
+                        "Relative medication cycle detected involving %s", current
+                    )
+                    break
+                chain.append(current)
+                current = references[current]
+            for chain_id in reversed(chain):
+                order.append(chain_id)
+                placed.add(chain_id)
+        return order
@@ -0,0 +1,182 @@
+"""Refill forecasting from the observed consumption of each medication.
+
+The daily consumption is an exponentially weighted average of the amount
+taken per day. It is updated when a dose is logged, and the projected run-out
+date is recomputed only when a dose, refill or adjustment changes what is
+left, or the schedule changes, so sensors read a stored date instead of
+deriving it every minute.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+from datetime import date, datetime, timedelta
+import math
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+import homeassistant.util.dt as dt_util
+
+from .const import (
+    CONF_SCHEDULE_DAYS,
+    CONF_SCHEDULE_TIMES,
+    CONF_SCHEDULE_TYPE,
+    DEFAULT_SCHEDULE_TYPE,
+    DOMAIN,
+    SIGNAL_MEDICATION_CONFIG_UPDATED,
+)
+from .store import async_signal_changes
+
+if TYPE_CHECKING:
+    from .hub import MedicationConfig
+
+# Keys in the stored medication record
+CONSUMPTION = "consumption"
+RUN_OUT = "run_out"
+
+# Recent days weigh most; a day's weight falls to 1/e after this many days
+CONSUMPTION_TIME_CONSTANT_DAYS = 7
+_ALPHA = 1 - math.exp(-1 / CONSUMPTION_TIME_CONSTANT_DAYS)
+
+
+def _fold(state: dict[str, Any], amount: float, days: int = 1) -> None:
+    """Add a closed day of ``amount``, then ``days - 1`` days without doses."""
+    state["rate"] = _ALPHA * amount + (1 - _ALPHA) * state["rate"]
+    state["weight"] = _ALPHA + (1 - _ALPHA) * state["weight"]
+    if days > 1:
+        decay = (1 - _ALPHA) ** (days - 1)
+        state["rate"] *= decay
+        state["weight"] = 1 - decay * (1 - state["weight"])
+
+
+def record_consumption(med_data: dict[str, Any], amount: float, when: datetime) -> None:
+    """Add a dose of ``amount`` taken at ``when`` to the consumption average.
+
+    Doses are summed per local day. A day is folded into the average when a
+    dose on a later day arrives, together with the days in between, which
+    count as days without doses.
+    """
+    day = when.date()
+    previous = med_data.get(CONSUMPTION)
+    if not previous:
+        med_data[CONSUMPTION] = {
+            "rate": 0.0,
+            "weight": 0.0,
+            "day": day.isoformat(),
+            "amount": amount,
+        }
+        return
+
+    # A new dict, since published snapshots share the previous one
+    state = dict(previous)
+    open_day = date.fromisoformat(state["day"])
+    if day > open_day:
+        _fold(state, state["amount"], (day - open_day).days)
+        state["day"] = day.isoformat()
+        state["amount"] = amount
+    else:
+        # Same day, or a dose logged late for an earlier day
+        state["amount"] += amount
+    med_data[CONSUMPTION] = state
+
+
+def daily_rate(med_data: Mapping[str, Any]) -> float | None:
+    """Return the observed doses per day, or None before a full day was seen."""
+    state = med_data.get(CONSUMPTION)
+    if not state or not state["weight"]:
+        return None
+    # Dividing by the weight removes the bias of starting from zero
+    return state["rate"] / state["weight"]
+
+
+def scheduled_daily_rate(config: Mapping[str, Any]) -> float:
+    """Return the doses per day a fixed-time schedule prescribes."""
+    if config.get(CONF_SCHEDULE_TYPE, DEFAULT_SCHEDULE_TYPE) != "fixed_time":
+        return 0.0
+    times = config.get(CONF_SCHEDULE_TIMES, [])
+    days = config.get(CONF_SCHEDULE_DAYS, [])
+    return len(times) * len(days) / 7
+
+
+def project_run_out(
+    med_data: Mapping[str, Any], config: Mapping[str, Any], now: datetime
+) -> datetime | None:
+    """Return when the remaining amount runs out at the current rate.
+
+    The schedule's rate is used until consumption has been observed. Returns
+    None if neither gives a rate, as for a relative schedule never taken.
+    """
+    remaining = float(med_data.get("remaining_amount") or 0)
+    if remaining <= 0:
+        return now
+    rate = daily_rate(med_data) or scheduled_daily_rate(config)
+    if rate <= 0:
+        return None
+    return now + timedelta(days=remaining / rate)
+
+
+def update_run_out(
+    med_data: dict[str, Any], config: Mapping[str, Any], now: datetime
+) -> None:
+    """Store the projected run-out date in the medication record."""
+    run_out = project_run_out(med_data, config, now)
+    med_data[RUN_OUT] = run_out.isoformat() if run_out else None
+
+
+async def async_update_forecast(
+    hass: HomeAssistant,
+    medication: MedicationConfig,
+    remaining_amount: float | None = None,
+) -> None:
+    """Recompute the stored run-out date, optionally setting what is left.
+
+    Runs as an update of the medication, so it never overwrites a take or
+    refill made at the same time.
+    """
+    med_id = medication.entry_id
+
+    def update(data: dict[str, Any]) -> None:
+        med_data = data["medications"].get(med_id)
+        if med_data is None:
+            return
+        if remaining_amount is not None:
+            med_data["remaining_amount"] = remaining_amount
+        update_run_out(med_data, medication.data, dt_util.now())
+
+    changes = await hass.data[DOMAIN]["store"].async_update(update, med_id=med_id)
+    async_signal_changes(hass, changes)
+
+
+class RunOutUpdater:
+    """Recompute the run-out date when a medication's schedule is edited."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the updater."""
+        self._hass = hass
+        self._unsubs: list[CALLBACK_TYPE] = []
+
+    async def async_load(self) -> None:
+        """Start listening for configuration changes."""
+        self._unsubs = [
+            async_dispatcher_connect(
+                self._hass, SIGNAL_MEDICATION_CONFIG_UPDATED, self._async_config_changed
+            )
+        ]
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop listening."""
+        for unsub in self._unsubs:
+            unsub()
+        self._unsubs = []
+
+    @callback
+    def _async_config_changed(self, med_id: str) -> None:
+        """Recompute the date of a medication that is set up."""
+        entry_data = self._hass.data[DOMAIN].get(med_id)
+        # Medications being set up store their first date themselves
+        if isinstance(entry_data, dict) and "entry" in entry_data:
+            self._hass.async_create_task(
+                async_update_forecast(self._hass, entry_data["entry"])
+            )
@@ -0,0 +1,209 @@
+"""Hour-of-week counts of taken, skipped and missed doses.
+
+Each medication keeps one count per weekday and 15-minute slot for each
+outcome. Taken and skipped doses count at the time they were logged; missed
+doses count at their scheduled time, when the dose ledger closes them. A
+heatmap of any history length is then one fixed-size read.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from datetime import datetime
+from typing import Any
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    HEATMAP_STORAGE_KEY,
+    SIGNAL_DOSES_CLOSED,
+    SIGNAL_EVALUATION_TICK,
+    SIGNAL_MEDICATION_UPDATED,
+    STORAGE_VERSION,
+)
+from .ledger import (
+    OUTCOME_MISSED,
+    OUTCOME_SKIPPED,
+    OUTCOME_TAKEN,
+    OUTCOMES,
+    DoseLedger,
+    LedgerEntry,
+)
+from .models import DoseEvent
+from .store import ChangeSet, PillAssistantStore
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+SLOTS_PER_WEEK = 7 * SLOTS_PER_DAY
+# Slot sizes a heatmap can be read in
+HEATMAP_SLOT_MINUTES = (15, 30, 60)
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+# Saves are delayed so doses logged together share one write
+HEATMAP_SAVE_DELAY = 10
+
+
+def week_slot(when: datetime) -> int:
+    """Return the 15-minute slot of the week a local time falls in."""
+    minutes = when.hour * 60 + when.minute
+    return when.weekday() * SLOTS_PER_DAY + minutes // SLOT_MINUTES
+
+
+class HourOfWeekHeatmap:
+    """Keep the hour-of-week counts of every medication.
+
+    Taken and skipped events arrive with the change-sets of the store, and
+    missed doses with the entries the ledger closes. The counts are built
+    from the full history and the ledger once, on the first evaluation tick,
+    and again after a history edit.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, store: PillAssistantStore, ledger: DoseLedger
+    ) -> None:
+        """Initialize the heatmap."""
+        self._hass = hass
+        self._store = store
+        self._ledger = ledger
+        self._heatmap_store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, HEATMAP_STORAGE_KEY
+        )
+        # Per medication and outcome, one count per slot of the week
+        self._counts: dict[str, dict[str, list[int]]] = {}
+        self._seeded = False
+        self._seeding = False
+        self._unsubs: list[CALLBACK_TYPE] = []
+
+    async def async_load(self) -> None:
+        """Restore the counts from storage and start following changes."""
+        stored = await self._heatmap_store.async_load()
+        if stored is not None:
+            for med_id, outcomes in stored.get("medications", {}).items():
+                self._counts[med_id] = {
+                    outcome: list(outcomes.get(outcome, [0] * SLOTS_PER_WEEK))
+                    for outcome in OUTCOMES
+                }
+            self._seeded = True
+
+        self._unsubs = [
+            async_dispatcher_connect(
+                self._hass, SIGNAL_EVALUATION_TICK, self._async_tick
+            ),
+            async_dispatcher_connect(
+                self._hass, SIGNAL_MEDICATION_UPDATED, self._async_changed
+            ),
+            async_dispatcher_connect(
+                self._hass, SIGNAL_DOSES_CLOSED, self._async_doses_closed
+            ),
+        ]
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop following changes."""
+        for unsub in self._unsubs:
+            unsub()
+        self._unsubs = []
+
+    def matrix(self, med_id: str, slot_minutes: int = 60) -> dict[str, list[list[int]]]:
+        """Return one row per weekday of counts per slot, for each outcome."""
+        group = slot_minutes // SLOT_MINUTES
+        counts = self._counts.get(med_id)
+        matrix = {}
+        for outcome in OUTCOMES:
+            slots = counts[outcome] if counts else [0] * SLOTS_PER_WEEK
+            matrix[outcome] = [
+                [
+                    sum(slots[start : start + group])
+                    for start in range(
+                        day * SLOTS_PER_DAY, (day + 1) * SLOTS_PER_DAY, group
+                    )
+                ]
+                for day in range(7)
+            ]
+        return matrix
+
+    async def async_save(self) -> None:
+        """Write the counts to storage now."""
+        await self._heatmap_store.async_save(self._data_to_save())
+
+    def _slots(self, med_id: str) -> dict[str, list[int]]:
+        """Return the counts of a medication, adding empty ones if needed."""
+        counts = self._counts.get(med_id)
+        if counts is None:
+            counts = self._counts[med_id] = {
+                outcome: [0] * SLOTS_PER_WEEK for outcome in OUTCOMES
+            }
+        return counts
+
+    @callback
+    def _async_tick(self) -> None:
+        """Build the counts from the history if they were never built."""
+        if not self._seeded and not self._seeding:
+            self._seeding = True
+            self._hass.async_create_task(self._async_seed())
+
+    async def _async_seed(self) -> None:
+        """Build every count from the full history and the ledger."""
+        try:
+            history = await self._store.async_history()
+            self._counts = {}
+            self._add_events(history)
+            for med_id in self._ledger.medication_ids():
+                self._add_missed(med_id, self._ledger.entries(med_id))
+            self._seeded = True
+            self._heatmap_store.async_delay_save(self._data_to_save, HEATMAP_SAVE_DELAY)
+        finally:
+            self._seeding = False
+
+    @callback
+    def _async_changed(self, changes: ChangeSet | None = None) -> None:
+        """Count taken and skipped doses as they are logged."""
+        if changes is None or not self._seeded:
+            return
+        if changes.history_rewritten:
+            # Edited or deleted entries: build the counts again
+            self._seeded = False
+            return
+        if self._add_events(changes.history):
+            self._heatmap_store.async_delay_save(self._data_to_save, HEATMAP_SAVE_DELAY)
+
+    @callback
+    def _async_doses_closed(self, med_id: str, entries: list[LedgerEntry]) -> None:
+        """Count the doses the ledger closed as missed."""
+        if self._seeded and self._add_missed(med_id, entries):
+            self._heatmap_store.async_delay_save(self._data_to_save, HEATMAP_SAVE_DELAY)
+
+    def _add_events(self, events: Iterable[DoseEvent]) -> bool:
+        """Count taken and skipped events; returns True if any were counted."""
+        added = False
+        for event in events:
+            action = event.get("action")
+            if action not in (OUTCOME_TAKEN, OUTCOME_SKIPPED):
+                continue
+            med_id = event.get("medication_id")
+            event_time = event.time
+            if not med_id or event_time is None:
+                continue
+            self._slots(med_id)[action][week_slot(event_time)] += 1
+            added = True
+        return added
+
+    def _add_missed(self, med_id: str, entries: Iterable[LedgerEntry]) -> bool:
+        """Count missed doses at their scheduled time; True if any were counted."""
+        added = False
+        for entry in entries:
+            if entry.outcome == OUTCOME_MISSED:
+                self._slots(med_id)[OUTCOME_MISSED][week_slot(entry.scheduled)] += 1
+                added = True
+        return added
+
+    def _data_to_save(self) -> dict[str, Any]:
+        """Return the counts in their stored form."""
+        return {
+            "medications": {
+                # Copies, since the file is written in the executor
+                med_id: {outcome: tuple(slots) for outcome, slots in counts.items()}
+                for med_id, counts in self._counts.items()
+            }
+        }
@@ -0,0 +1,384 @@
+"""Bulk export and import of the dose history.
+
+Exports are written under the config directory in chunks, each chunk in one
+executor job, so years of history are never serialized at once or written
+from the event loop. Archived history is read one file at a time. Progress
+is fired as an event after every chunk.
+
+Imports read a whole file in the executor, validate every row and merge the
+new events into the history in one store transaction. The CSV logs are
+appended in one pass, and the trackers rebuild once from the rewritten
+history instead of once per event.
+"""
+
+from __future__ import annotations
+
+from collections.abc import AsyncIterable, Collection, Iterable, Mapping
+import csv
+from datetime import datetime
+import gzip
+import json
+import os
+from typing import IO, Any
+
+from homeassistant.core import HomeAssistant
+import homeassistant.util.dt as dt_util
+
+from . import log_utils
+from .const import CONF_MEDICATION_NAME, DOMAIN
+from .models import DoseEvent
+from .store import PillAssistantStore, async_signal_changes
+from .tracing import span
+
+EXPORTS_DIR_NAME = "Exports"
+EXPORT_FORMATS: tuple[str, ...] = ("csv", "jsonl")
+# Events written per executor job
+EXPORT_CHUNK_SIZE = 1000
+EVENT_EXPORT_PROGRESS = f"{DOMAIN}_export_progress"
+
+# Columns of a CSV export; other keys of an event go into details_json
+HISTORY_CSV_COLUMNS: tuple[str, ...] = (
+    "timestamp",
+    "action",
+    "medication_id",
+    "medication_name",
+    "dosage",
+    "dosage_unit",
+    "amount",
+    "details_json",
+)
+
+# Actions an imported row may have
+IMPORT_ACTIONS: tuple[str, ...] = ("taken", "skipped", "snoozed", "refilled")
+# Numeric keys that CSV files hold as text
+_NUMERIC_KEYS = ("amount", "dose_fraction")
+# Rejected rows listed in the response of an import
+MAX_REPORTED_ERRORS = 20
+
+
+def get_exports_dir(hass: HomeAssistant) -> str:
+    """Return the absolute exports folder path."""
+    return hass.config.path(log_utils.LOGS_PARENT_DIR_NAME, EXPORTS_DIR_NAME)
+
+
+def export_filename(
+    fmt: str, compress: bool, name: str | None = None, now: datetime | None = None
+) -> str:
+    """Return the file name of an export, named by its time unless given."""
+    if name:
+        base = log_utils._sanitize_filename(name)
+    else:
+        base = f"pill_assistant_history_{(now or dt_util.now()):%Y%m%d_%H%M%S}"
+    return f"{base}.{fmt}.gz" if compress else f"{base}.{fmt}"
+
+
+def history_csv_row(event: DoseEvent) -> dict[str, Any]:
+    """Return an event as a row of a CSV export."""
+    row = {column: event.get(column, "") for column in HISTORY_CSV_COLUMNS[:-1]}
+    details = {key: value for key, value in event.items() if key not in row}
+    row["details_json"] = (
+        json.dumps(details, ensure_ascii=False, sort_keys=True) if details else ""
+    )
+    return row
+
+
+class _ExportFile:
+    """A CSV or JSON-lines file written chunk by chunk in the executor.
+
+    Rows go to a ``.part`` file that replaces the export when it is closed,
+    so an interrupted export never leaves a file that looks complete.
+    """
+
+    def __init__(self, path: str, fmt: str, compress: bool) -> None:
+        """Initialize the file."""
+        self.path = path
+        self._part_path = f"{path}.part"
+        self._fmt = fmt
+        self._compress = compress
+        self._handle: IO[str] | None = None
+        self._writer: csv.DictWriter | None = None
+
+    def open(self) -> None:
+        """Create the file and write the CSV header."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if self._compress:
+            self._handle = gzip.open(
+                self._part_path, "wt", encoding="utf-8", newline=""
+            )
+        else:
+            self._handle = open(self._part_path, "w", encoding="utf-8", newline="")
+        if self._fmt == "csv":
+            self._writer = csv.DictWriter(
+                self._handle, fieldnames=list(HISTORY_CSV_COLUMNS)
+            )
+            self._writer.writeheader()
+
+    def write(self, rows: list[dict[str, Any]]) -> None:
+        """Append one chunk of rows."""
+        assert self._handle is not None
+        if self._writer is not None:
+            self._writer.writerows(rows)
+        else:
+            self._handle.write(
+                "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+            )
+
+    def close(self, keep: bool = True) -> None:
+        """Close the file, and move it into place unless it is discarded."""
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+        if keep:
+            os.replace(self._part_path, self.path)
+        elif os.path.exists(self._part_path):
+            os.remove(self._part_path)
+
+
+async def async_export_history(
+    hass: HomeAssistant,
+    batches: AsyncIterable[Iterable[DoseEvent]],
+    path: str,
+    *,
+    fmt: str = "csv",
+    compress: bool = False,
+    medication_id: str | None = None,
+    actions: Collection[str] | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> int:
+    """Write the matching events to ``path``; returns how many were written.
+
+    ``batches`` yields the events in pieces, as
+    PillAssistantStore.async_iter_history() does; a piece must not change
+    while it is read. Only one piece and one chunk of rows are held at a time.
+    """
+    export = _ExportFile(path, fmt, compress)
+    exported = 0
+    chunk: list[dict[str, Any]] = []
+
+    async def _flush() -> None:
+        nonlocal exported, chunk
+        rows, chunk = chunk, []
+        await hass.async_add_executor_job(export.write, rows)
+        exported += len(rows)
+        hass.bus.async_fire(
+            EVENT_EXPORT_PROGRESS, {"path": path, "exported": exported, "done": False}
+        )
+
+    with span("history_export", format=fmt, compress=compress) as export_span:
+        await hass.async_add_executor_job(export.open)
+        try:
+            async for events in batches:
+                for event in events:
+                    if medication_id and event.get("medication_id") != medication_id:
+                        continue
+                    if actions and event.get("action") not in actions:
+                        continue
+                    if start or end:
+                        event_time = event.time
+                        if event_time is None:
+                            continue
+                        if (start and event_time < start) or (end and event_time > end):
+                            continue
+                    chunk.append(
+                        history_csv_row(event) if fmt == "csv" else event.as_dict()
+                    )
+                    if len(chunk) >= EXPORT_CHUNK_SIZE:
+                        await _flush()
+            if chunk:
+                await _flush()
+        except BaseException:
+            await hass.async_add_executor_job(export.close, False)
+            raise
+        await hass.async_add_executor_job(export.close)
+        export_span.set(exported=exported)
+
+    hass.bus.async_fire(
+        EVENT_EXPORT_PROGRESS, {"path": path, "exported": exported, "done": True}
+    )
+    return exported
+
+
+def read_history_file(path: str) -> list[tuple[int, dict[str, Any] | None]]:
+    """Return the rows of a history file with their line numbers.
+
+    Runs in the executor. Files ending in ``.jsonl`` hold one entry per
+    line; any other file is read as CSV, as written by an export or the
+    global log, with the keys of ``details_json`` added to each row. A
+    ``.gz`` suffix is decompressed. Rows that cannot be parsed are None.
+    """
+    name = path[:-3] if path.endswith(".gz") else path
+    opener = gzip.open if path.endswith(".gz") else open
+    rows: list[tuple[int, dict[str, Any] | None]] = []
+    with opener(path, "rt", encoding="utf-8", newline="") as handle:
+        if name.endswith(".jsonl"):
+            for line_number, line in enumerate(handle, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None
+                rows.append((line_number, row if isinstance(row, dict) else None))
+            return rows
+
+        reader = csv.DictReader(handle)
+        for record in reader:
+            row = {
+                key: value
+                for key, value in record.items()
+                if key in HISTORY_CSV_COLUMNS and value not in ("", None)
+            }
+            details = row.pop("details_json", None)
+            if details:
+                try:
+                    extra = json.loads(details)
+                except ValueError:
+                    extra = None
+                if isinstance(extra, dict):
+                    for key, value in extra.items():
+                        row.setdefault(key, value)
+            rows.append((reader.line_num, row))
+    return rows
+
+
+def validate_history_entry(
+    row: Mapping[str, Any] | None,
+    medication_names: Mapping[str, str],
+    medication_id: str | None = None,
+) -> tuple[dict[str, Any], datetime] | str:
+    """Return an imported row as a history entry and its time, or an error.
+
+    Rows without a medication ID are assigned to ``medication_id``. Naive
+    timestamps are local times; all are stored in local time.
+    """
+    if row is None:
+        return "unreadable row"
+    med_id = row.get("medication_id") or medication_id
+    if med_id not in medication_names:
+        return f"unknown medication: {med_id}"
+    action = row.get("action")
+    if action not in IMPORT_ACTIONS:
+        return f"invalid action: {action}"
+    try:
+        when = dt_util.parse_datetime(str(row.get("timestamp", "")))
+    except ValueError:
+        when = None
+    if when is None:
+        return f"invalid timestamp: {row.get('timestamp')}"
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=dt_util.DEFAULT_TIME_ZONE)
+    when = dt_util.as_local(when)
+
+    entry = dict(row)
+    entry["medication_id"] = med_id
+    entry.setdefault("medication_name", medication_names[med_id])
+    entry["timestamp"] = when.isoformat()
+    for key in _NUMERIC_KEYS:
+        if isinstance(entry.get(key), str):
+            try:
+                number = float(entry[key])
+            except ValueError:
+                return f"invalid {key}: {entry[key]}"
+            entry[key] = int(number) if number.is_integer() else number
+    return entry, when
+
+
+def _event_key(entry: Mapping[str, Any], when: datetime | None) -> tuple:
+    """Return what makes two history entries the same event."""
+    return (entry.get("medication_id"), entry.get("action"), when)
+
+
+async def async_import_history(
+    hass: HomeAssistant,
+    store: PillAssistantStore,
+    path: str,
+    *,
+    medication_id: str | None = None,
+    dry_run: bool = False,
+) -> dict[str, Any]:
+    """Validate the rows of a history file and merge the new ones.
+
+    Rows equal to an existing event, or to an earlier row, are counted as
+    duplicates. With ``dry_run`` nothing is written. Returns the counts of
+    imported, duplicate and invalid rows and the first errors.
+    """
+    with span("history_import_read"):
+        rows = await hass.async_add_executor_job(read_history_file, path)
+    await store.async_load_history()
+    medication_names = {
+        med_id: record.get(CONF_MEDICATION_NAME, "Unknown")
+        for med_id, record in store.snapshot["medications"].items()
+    }
+
+    entries: list[tuple[float, dict[str, Any], datetime]] = []
+    errors: list[dict[str, Any]] = []
+    invalid = 0
+    for line_number, row in rows:
+        result = validate_history_entry(row, medication_names, medication_id)
+        if isinstance(result, str):
+            invalid += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"line": line_number, "error": result})
+            continue
+        entry, when = result
+        entries.append((when.timestamp(), entry, when))
+    # Sorted, so the first and last rows give the range of the file
+    entries.sort(key=lambda item: item[0])
+    # Archived events of the imported range count as existing ones
+    archived: set[tuple] = set()
+    if entries:
+        archived = {
+            _event_key(event, event.time)
+            for event in await store.async_history(entries[0][2], entries[-1][2])
+        }
+
+    imported: list[dict[str, Any]] = []
+
+    def _new_entries() -> list[tuple[float, dict[str, Any]]]:
+        """Return the sorted entries that are not in the history yet."""
+        seen = archived | {
+            _event_key(event, event.time) for event in store.snapshot["history"]
+        }
+        new = []
+        for sort_key, entry, when in entries:
+            key = _event_key(entry, when)
+            if key not in seen:
+                seen.add(key)
+                new.append((sort_key, entry))
+        return new
+
+    def merge_history(data: dict[str, Any]) -> None:
+        """Merge the new entries into the history in timestamp order."""
+        new = _new_entries()
+        if not new:
+            return
+        history = data["history"]
+        # The published events match the live entries and hold parsed times.
+        # Edited timestamps may have left the history out of order, so the
+        # whole of it is sorted; the sort is stable for equal times
+        existing = [
+            (event.time.timestamp() if event.time else float("-inf"), entry)
+            for event, entry in zip(store.snapshot["history"], history)
+        ]
+        history[:] = [
+            entry for _, entry in sorted(existing + new, key=lambda item: item[0])
+        ]
+        imported.extend(entry for _, entry in new)
+
+    if dry_run:
+        imported.extend(entry for _, entry in _new_entries())
+    else:
+        with span("history_import_merge", entries=len(entries)):
+            changes = await store.async_update(merge_history, rewrite_history=True)
+        if imported:
+            async_signal_changes(hass, changes)
+            await log_utils.async_log_events(hass, imported)
+
+    return {
+        "success": True,
+        "imported": len(imported),
+        "duplicates": len(entries) - len(imported),
+        "invalid": invalid,
+        "errors": errors,
+    }
@@ -0,0 +1,157 @@
+"""Hub mode: one config entry holding a table of medications."""
+
+from __future__ import annotations
+
+from collections.abc import Iterator, Mapping
+import logging
+from types import MappingProxyType
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import device_registry as dr, entity_registry as er
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.util.ulid import ulid_now
+
+from .const import (
+    CONF_HUB,
+    CONF_HUB_MEDICATIONS,
+    CONF_MEDICATION_NAME,
+    DOMAIN,
+    SIGNAL_MEDICATION_CONFIG_UPDATED,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class MedicationEntry:
+    """A medication of a hub entry, presented like its own config entry.
+
+    Medication code reads ``entry_id``, ``data`` and ``title``. A hub
+    medication provides the same attributes, so sensors, services and flows
+    work the same for both modes. ``entry_id`` is the medication ID, which is
+    also used for unique IDs, so entity IDs do not depend on the mode.
+    """
+
+    def __init__(
+        self, hub_entry: ConfigEntry, med_id: str, data: Mapping[str, Any]
+    ) -> None:
+        """Initialize the medication view."""
+        self.hub_entry = hub_entry
+        self.entry_id = med_id
+        self.data: MappingProxyType = MappingProxyType(dict(data))
+        self.options: MappingProxyType = MappingProxyType({})
+
+    @property
+    def title(self) -> str:
+        """Return the medication name."""
+        return self.data.get(CONF_MEDICATION_NAME, "Unknown")
+
+
+MedicationConfig = ConfigEntry | MedicationEntry
+
+
+def is_hub_entry(entry: ConfigEntry) -> bool:
+    """Return True if the entry holds a table of medications."""
+    return bool(entry.data.get(CONF_HUB))
+
+
+def hub_medications(entry: ConfigEntry) -> list[MedicationEntry]:
+    """Return a view of every medication in a hub entry."""
+    return [
+        MedicationEntry(entry, med_id, data)
+        for med_id, data in entry.data.get(CONF_HUB_MEDICATIONS, {}).items()
+    ]
+
+
+def entry_medication_ids(entry: ConfigEntry) -> list[str]:
+    """Return the IDs of the medications a config entry sets up."""
+    if is_hub_entry(entry):
+        return list(entry.data.get(CONF_HUB_MEDICATIONS, {}))
+    return [entry.entry_id]
+
+
+def iter_medication_entries(hass: HomeAssistant) -> Iterator[MedicationConfig]:
+    """Yield every configured medication, whichever mode it uses."""
+    for entry in hass.config_entries.async_entries(DOMAIN):
+        if is_hub_entry(entry):
+            yield from hub_medications(entry)
+        else:
+            yield entry
+
+
+def get_hub_entry(hass: HomeAssistant) -> ConfigEntry | None:
+    """Return the hub entry, if hub mode is in use."""
+    for entry in hass.config_entries.async_entries(DOMAIN):
+        if is_hub_entry(entry):
+            return entry
+    return None
+
+
+@callback
+def async_update_medication(
+    hass: HomeAssistant, medication: MedicationConfig, data: Mapping[str, Any]
+) -> None:
+    """Replace the configuration of a medication in either mode.
+
+    The change is applied in place: listeners of the config signals
+    recompile what depends on it, and the entry is not reloaded.
+    """
+    if isinstance(medication, MedicationEntry):
+        hub_entry = medication.hub_entry
+        medications = {
+            **hub_entry.data.get(CONF_HUB_MEDICATIONS, {}),
+            medication.entry_id: dict(data),
+        }
+        medication.data = MappingProxyType(dict(data))
+        hass.config_entries.async_update_entry(
+            hub_entry, data={**hub_entry.data, CONF_HUB_MEDICATIONS: medications}
+        )
+    else:
+        hass.config_entries.async_update_entry(medication, data=data)
+
+    # Shared state is refreshed before the medication's own sensor
+    async_dispatcher_send(hass, SIGNAL_MEDICATION_CONFIG_UPDATED, medication.entry_id)
+    async_dispatcher_send(
+        hass, f"{SIGNAL_MEDICATION_CONFIG_UPDATED}_{medication.entry_id}"
+    )
+
+
+@callback
+def async_add_hub_medication(
+    hass: HomeAssistant, hub_entry: ConfigEntry, data: Mapping[str, Any]
+) -> str:
+    """Add a medication to the hub table and return its medication ID."""
+    med_id = ulid_now()
+    medications = {**hub_entry.data.get(CONF_HUB_MEDICATIONS, {}), med_id: dict(data)}
+    hass.config_entries.async_update_entry(
+        hub_entry, data={**hub_entry.data, CONF_HUB_MEDICATIONS: medications}
+    )
+    return med_id
+
+
+async def async_absorb_entries(hass: HomeAssistant, hub_entry: ConfigEntry) -> None:
+    """Move per-medication entries listed in the hub table into the hub.
+
+    The hub keeps each medication's entry ID as its medication ID. Entities
+    and devices are handed over to the hub before the old entry is removed,
+    so they keep their registry entries and entity IDs.
+    """
+    entity_registry = er.async_get(hass)
+    device_registry = dr.async_get(hass)
+    for med_id in hub_entry.data.get(CONF_HUB_MEDICATIONS, {}):
+        old_entry = hass.config_entries.async_get_entry(med_id)
+        if old_entry is None or old_entry.domain != DOMAIN:
+            continue
+        for entity in er.async_entries_for_config_entry(entity_registry, med_id):
+            entity_registry.async_update_entity(
+                entity.entity_id, config_entry_id=hub_entry.entry_id
+            )
+        for device in dr.async_entries_for_config_entry(device_registry, med_id):
+            device_registry.async_update_device(
+                device.id,
+                add_config_entry_id=hub_entry.entry_id,
+                remove_config_entry_id=med_id,
+            )
+        await hass.config_entries.async_remove(med_id)
+        _LOGGER.info("Moved medication '%s' into the hub entry", old_entry.title)
@@ -0,0 +1,261 @@
+"""Distribution of how early or late each dose is taken.
+
+The delay of every taken dose from its nearest scheduled time is added to a
+quantile sketch of its medication and local day. Sketches merge by adding
+their counts, so the median, p90 and p99 of any date range are answered from
+one sketch per day instead of from the raw history.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping
+from datetime import date, datetime
+import math
+from typing import Any
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    DOMAIN,
+    LATENESS_STORAGE_KEY,
+    SIGNAL_EVALUATION_TICK,
+    SIGNAL_MEDICATION_UPDATED,
+    STORAGE_VERSION,
+)
+from .ledger import MAX_WINDOW, scheduled_doses
+from .models import DoseEvent
+from .store import ChangeSet, PillAssistantStore
+
+# Quantiles are accurate to within this fraction of the delay
+SKETCH_RELATIVE_ACCURACY = 0.02
+_GAMMA = (1 + SKETCH_RELATIVE_ACCURACY) / (1 - SKETCH_RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+# Delays shorter than this count as exactly on time
+MIN_DELAY_MINUTES = 0.5
+# Saves are delayed so doses logged together share one write
+LATENESS_SAVE_DELAY = 10
+
+REPORTED_QUANTILES = {"median": 0.5, "p90": 0.9, "p99": 0.99}
+
+
+class QuantileSketch:
+    """A mergeable sketch of signed delays in minutes.
+
+    Delays fall into logarithmic buckets that are ``SKETCH_RELATIVE_ACCURACY``
+    wide, with late doses under positive keys, early ones under negative keys
+    and delays under ``MIN_DELAY_MINUTES`` under key 0. Only the keys seen are
+    kept, so a day with a few doses holds a few counts, and merging adds the
+    counts of matching keys.
+    """
+
+    __slots__ = ("counts", "count")
+
+    def __init__(self, counts: Mapping[int, int] | None = None) -> None:
+        """Initialize the sketch, optionally from stored counts."""
+        self.counts: dict[int, int] = dict(counts or {})
+        self.count = sum(self.counts.values())
+
+    @staticmethod
+    def key(minutes: float) -> int:
+        """Return the bucket of a delay."""
+        magnitude = abs(minutes)
+        if magnitude < MIN_DELAY_MINUTES:
+            return 0
+        index = math.ceil(math.log(magnitude / MIN_DELAY_MINUTES) / _LOG_GAMMA)
+        return int(math.copysign(index + 1, minutes))
+
+    @staticmethod
+    def value(key: int) -> float:
+        """Return the delay a bucket stands for, within the accuracy."""
+        if key == 0:
+            return 0.0
+        upper = MIN_DELAY_MINUTES * _GAMMA ** (abs(key) - 1)
+        return math.copysign(upper * 2 / (1 + _GAMMA), key)
+
+    def add(self, minutes: float) -> None:
+        """Add one delay."""
+        key = self.key(minutes)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.count += 1
+
+    def merge(self, other: QuantileSketch) -> None:
+        """Add the delays of ``other``."""
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+        self.count += other.count
+
+    def quantile(self, fraction: float) -> float | None:
+        """Return the delay below which ``fraction`` of the delays fall."""
+        if not self.count:
+            return None
+        # The nearest rank, so the p99 of a few doses is the latest of them
+        rank = max(math.ceil(fraction * self.count), 1)
+        seen = 0
+        for key in sorted(self.counts):
+            seen += self.counts[key]
+            if seen >= rank:
+                return self.value(key)
+        return self.value(max(self.counts))
+
+    def as_list(self) -> list[list[int]]:
+        """Return the counts in their stored form."""
+        return [[key, count] for key, count in sorted(self.counts.items())]
+
+
+def delay_minutes(config: Mapping[str, Any], taken_at: datetime) -> float | None:
+    """Return how many minutes after its nearest scheduled time a dose was taken.
+
+    Early doses are negative. Returns None without a scheduled time within
+    ``MAX_WINDOW``, as for relative schedules.
+    """
+    doses = scheduled_doses(config, taken_at - MAX_WINDOW, taken_at + MAX_WINDOW)
+    if not doses:
+        return None
+    nearest = min(doses, key=lambda dose: abs(taken_at - dose))
+    return (taken_at - nearest).total_seconds() / 60
+
+
+class LatenessTracker:
+    """Keep one delay sketch per medication and local day.
+
+    Taken doses arrive with the change-sets of the store. The sketches are
+    built from the full history once, on the first evaluation tick, and
+    again after a history edit.
+    """
+
+    def __init__(self, hass: HomeAssistant, store: PillAssistantStore) -> None:
+        """Initialize the tracker."""
+        self._hass = hass
+        self._store = store
+        self._lateness_store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, LATENESS_STORAGE_KEY
+        )
+        self._sketches: dict[str, dict[date, QuantileSketch]] = {}
+        self._seeded = False
+        self._seeding = False
+        self._unsubs: list[CALLBACK_TYPE] = []
+
+    async def async_load(self) -> None:
+        """Restore the sketches from storage and start following changes."""
+        stored = await self._lateness_store.async_load()
+        if stored is not None:
+            for med_id, days in stored.get("medications", {}).items():
+                self._sketches[med_id] = {
+                    date.fromisoformat(day): QuantileSketch(dict(counts))
+                    for day, counts in days.items()
+                }
+            self._seeded = True
+
+        self._unsubs = [
+            async_dispatcher_connect(
+                self._hass, SIGNAL_EVALUATION_TICK, self._async_tick
+            ),
+            async_dispatcher_connect(
+                self._hass, SIGNAL_MEDICATION_UPDATED, self._async_changed
+            ),
+        ]
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop following changes."""
+        for unsub in self._unsubs:
+            unsub()
+        self._unsubs = []
+
+    def sketch(
+        self, med_id: str, start: date | None = None, end: date | None = None
+    ) -> QuantileSketch:
+        """Return the delays of a medication from ``start`` to ``end``, inclusive."""
+        merged = QuantileSketch()
+        for day, day_sketch in self._sketches.get(med_id, {}).items():
+            if (start is None or day >= start) and (end is None or day <= end):
+                merged.merge(day_sketch)
+        return merged
+
+    def summary(
+        self, med_id: str, start: date | None = None, end: date | None = None
+    ) -> dict[str, Any]:
+        """Return the count and quantiles of the delays, in minutes."""
+        merged = self.sketch(med_id, start, end)
+        summary: dict[str, Any] = {"count": merged.count}
+        for name, fraction in REPORTED_QUANTILES.items():
+            value = merged.quantile(fraction)
+            summary[f"{name}_minutes"] = None if value is None else round(value, 1)
+        return summary
+
+    async def async_save(self) -> None:
+        """Write the sketches to storage now."""
+        await self._lateness_store.async_save(self._data_to_save())
+
+    @callback
+    def _async_tick(self) -> None:
+        """Build the sketches from the history if they were never built."""
+        if not self._seeded and not self._seeding:
+            self._seeding = True
+            self._hass.async_create_task(self._async_seed())
+
+    async def _async_seed(self) -> None:
+        """Build every sketch from the full history."""
+        try:
+            history = await self._store.async_history()
+            self._sketches = {}
+            self._add(history)
+            self._seeded = True
+            self._lateness_store.async_delay_save(
+                self._data_to_save, LATENESS_SAVE_DELAY
+            )
+        finally:
+            self._seeding = False
+
+    @callback
+    def _async_changed(self, changes: ChangeSet | None = None) -> None:
+        """Add taken doses as they are logged."""
+        if changes is None or not self._seeded:
+            return
+        if changes.history_rewritten:
+            # Edited or deleted entries: build the sketches again
+            self._seeded = False
+            return
+        if self._add(changes.history):
+            self._lateness_store.async_delay_save(
+                self._data_to_save, LATENESS_SAVE_DELAY
+            )
+
+    def _add(self, events: Iterable[DoseEvent]) -> bool:
+        """Add the delays of taken events; returns True if any were added."""
+        configs = {
+            med_id: entry_data["entry"].data
+            for med_id, entry_data in self._hass.data.get(DOMAIN, {}).items()
+            if isinstance(entry_data, dict) and "entry" in entry_data
+        }
+        added = False
+        for event in events:
+            if event.get("action") != "taken":
+                continue
+            med_id = event.get("medication_id")
+            taken_at = event.time
+            if med_id not in configs or taken_at is None:
+                continue
+            delay = delay_minutes(configs[med_id], taken_at)
+            if delay is None:
+                continue
+            days = self._sketches.setdefault(med_id, {})
+            day = taken_at.date()
+            if day not in days:
+                days[day] = QuantileSketch()
+            days[day].add(delay)
+            added = True
+        return added
+
+    def _data_to_save(self) -> dict[str, Any]:
+        """Return the sketches in their stored form."""
+        return {
+            "medications": {
+                med_id: {
+                    day.isoformat(): sketch.as_list() for day, sketch in days.items()
+                }
+                for med_id, days in self._sketches.items()
+            }
+        }
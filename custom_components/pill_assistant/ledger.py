@@ -0,0 +1,492 @@
+"""Ledger of scheduled doses and how each one ended.
+
+Every fixed-time dose is recorded once, as taken, skipped or missed, when its
+window closes. The ledger is persisted in its own storage file and extended
+incrementally, so missed doses of any age can be reported without rebuilding
+the schedule from history.
+
+The ledger is the one record of missed doses. A dose the reminders marked
+missed closes as missed right away, and the reminders follow the doses the
+ledger closes as missed, so the history and the ledger agree.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+import logging
+from typing import Any
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.dispatcher import (
+    async_dispatcher_connect,
+    async_dispatcher_send,
+)
+from homeassistant.helpers.storage import Store
+import homeassistant.util.dt as dt_util
+
+from .const import (
+    CONF_SCHEDULE_DAYS,
+    CONF_SCHEDULE_TIMES,
+    CONF_SCHEDULE_TYPE,
+    DEFAULT_SCHEDULE_TYPE,
+    DOMAIN,
+    LEDGER_STORAGE_KEY,
+    RECENT_HISTORY_DAYS,
+    SIGNAL_DOSES_CLOSED,
+    SIGNAL_EVALUATION_TICK,
+    SIGNAL_MEDICATION_CONFIG_UPDATED,
+    SIGNAL_MEDICATION_UPDATED,
+    STORAGE_VERSION,
+)
+from .models import DoseEvent
+from .store import ChangeSet, PillAssistantStore
+
+_LOGGER = logging.getLogger(__name__)
+
+OUTCOME_TAKEN = "taken"
+OUTCOME_SKIPPED = "skipped"
+OUTCOME_MISSED = "missed"
+OUTCOMES = (OUTCOME_TAKEN, OUTCOME_SKIPPED, OUTCOME_MISSED)
+
+# A dose claims events up to halfway to its neighbours, but never further away
+MAX_WINDOW = timedelta(hours=12)
+# A dose whose window is still open is reported missed this long after its time
+MISSED_DOSE_GRACE = timedelta(minutes=30)
+# The sensor lists the most recent missed doses of this period
+MISSED_DOSES_PERIOD = timedelta(hours=24)
+MAX_MISSED_DOSES = 5
+# Saves are delayed so doses closing in the same minute share one write
+LEDGER_SAVE_DELAY = 10
+
+_WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+# An open window: (scheduled time, window start, window end)
+DoseWindow = tuple[datetime, datetime, datetime]
+# A taken or skipped event: (local time, action, ISO timestamp); for a
+# missed event the time is that of the dose it marks
+LedgerEvent = tuple[datetime, str, str]
+
+
+@dataclass(frozen=True, slots=True)
+class LedgerEntry:
+    """One scheduled dose and how it ended.
+
+    ``at`` is the timestamp of the event that resolved the dose. It is None
+    for a dose missed because its window ended without any event.
+    """
+
+    scheduled: datetime
+    outcome: str
+    at: str | None = None
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the entry for a service response."""
+        return {
+            "scheduled": self.scheduled.isoformat(),
+            "outcome": self.outcome,
+            "at": self.at,
+        }
+
+
+def scheduled_doses(
+    config: Mapping[str, Any], start: datetime, end: datetime
+) -> list[datetime]:
+    """Return the fixed-time doses scheduled after ``start`` up to ``end``.
+
+    Relative schedules have no fixed times, so they have no doses here.
+    """
+    if config.get(CONF_SCHEDULE_TYPE, DEFAULT_SCHEDULE_TYPE) != "fixed_time":
+        return []
+    days = {str(day).lower()[:3] for day in config.get(CONF_SCHEDULE_DAYS, [])}
+    times: set[time] = set()
+    for value in config.get(CONF_SCHEDULE_TIMES, []):
+        if isinstance(value, list):
+            value = value[0] if value else "00:00"
+        try:
+            hour, minute = map(int, str(value).split(":")[:2])
+            times.add(time(hour, minute))
+        except ValueError:
+            continue
+    if not days or not times:
+        return []
+
+    doses = []
+    day = dt_util.as_local(start).date()
+    last_day = dt_util.as_local(end).date()
+    while day <= last_day:
+        if _WEEKDAYS[day.weekday()] in days:
+            for dose_time in times:
+                dose = datetime.combine(day, dose_time, dt_util.DEFAULT_TIME_ZONE)
+                if start < dose <= end:
+                    doses.append(dose)
+        day += timedelta(days=1)
+    doses.sort()
+    return doses
+
+
+def dose_windows(doses: list[datetime]) -> list[DoseWindow]:
+    """Return the window of each dose: halfway to each neighbour, capped."""
+    windows = []
+    for index, dose in enumerate(doses):
+        start = dose - MAX_WINDOW
+        if index > 0:
+            start = max(start, dose - (dose - doses[index - 1]) / 2)
+        end = dose + MAX_WINDOW
+        if index + 1 < len(doses):
+            end = min(end, dose + (doses[index + 1] - dose) / 2)
+        windows.append((dose, start, end))
+    return windows
+
+
+def _marked_missed(events: list[LedgerEvent], dose: datetime) -> LedgerEvent | None:
+    """Return the missed event logged for a dose, if any."""
+    for event in events:
+        if event[1] == OUTCOME_MISSED and event[0] == dose:
+            return event
+    return None
+
+
+class _MedicationLedger:
+    """The closed doses of one medication and the events of its open ones."""
+
+    __slots__ = ("closed_until", "entries", "times", "stored", "events", "upcoming")
+
+    def __init__(self, closed_until: datetime) -> None:
+        """Initialize an empty ledger that starts at ``closed_until``."""
+        self.closed_until = closed_until
+        self.entries: list[LedgerEntry] = []
+        self.times: list[float] = []
+        # The entries in their stored form, kept so saving converts nothing
+        self.stored: list[list[Any]] = []
+        self.events: list[LedgerEvent] = []
+        self.upcoming: tuple[DoseWindow, ...] = ()
+
+    def append(self, entry: LedgerEntry, stored: list[Any] | None = None) -> None:
+        """Add a closed dose."""
+        self.entries.append(entry)
+        self.times.append(entry.scheduled.timestamp())
+        self.stored.append(
+            stored or [entry.scheduled.isoformat(), entry.outcome, entry.at]
+        )
+
+    def between(
+        self, start: datetime | None, end: datetime | None
+    ) -> list[LedgerEntry]:
+        """Return the closed doses scheduled from ``start`` up to ``end``."""
+        low = bisect_left(self.times, start.timestamp()) if start else 0
+        high = bisect_right(self.times, end.timestamp()) if end else len(self.times)
+        return self.entries[low:high]
+
+
+class DoseLedger:
+    """Close dose windows as time passes and answer range queries.
+
+    Taken and skipped events arrive with the change-sets of the store and
+    are kept per medication only while a dose may still claim them. On each
+    evaluation tick, medications whose next window has ended are closed:
+    each dose takes the first taken event of its window, else the first
+    skipped one, else it is missed. A missed event logged for a dose closes
+    it as missed at once. A medication is recorded from the time
+    the ledger first sees it; earlier doses are not reconstructed, since the
+    schedule they followed is not known.
+    """
+
+    def __init__(self, hass: HomeAssistant, store: PillAssistantStore) -> None:
+        """Initialize the ledger."""
+        self._hass = hass
+        self._store = store
+        self._ledger_store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, LEDGER_STORAGE_KEY
+        )
+        self._medications: dict[str, _MedicationLedger] = {}
+        self._next_close: dict[str, datetime] = {}
+        self._seeded = False
+        self._closing = False
+        self._unsubs: list[CALLBACK_TYPE] = []
+
+    async def async_load(self) -> None:
+        """Restore the ledger from storage and start following changes."""
+        stored = await self._ledger_store.async_load() or {}
+        for med_id, med_stored in stored.get("medications", {}).items():
+            closed_until = dt_util.parse_datetime(med_stored.get("closed_until", ""))
+            if closed_until is None:
+                continue
+            ledger = _MedicationLedger(dt_util.as_local(closed_until))
+            for item in med_stored.get("entries", []):
+                scheduled = datetime.fromisoformat(item[0])
+                ledger.append(LedgerEntry(scheduled, item[1], item[2]), item)
+            self._medications[med_id] = ledger
+
+        self._unsubs = [
+            async_dispatcher_connect(
+                self._hass, SIGNAL_EVALUATION_TICK, self._async_tick
+            ),
+            async_dispatcher_connect(
+                self._hass, SIGNAL_MEDICATION_UPDATED, self._async_changed
+            ),
+            async_dispatcher_connect(
+                self._hass,
+                SIGNAL_MEDICATION_CONFIG_UPDATED,
+                self._async_config_changed,
+            ),
+        ]
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop following changes."""
+        for unsub in self._unsubs:
+            unsub()
+        self._unsubs = []
+
+    def medication_ids(self) -> list[str]:
+        """Return the medications the ledger records doses of."""
+        return list(self._medications)
+
+    def entries(
+        self,
+        med_id: str,
+        start: datetime | None = None,
+        end: datetime | None = None,
+    ) -> list[LedgerEntry]:
+        """Return the closed doses of a medication scheduled in a range."""
+        ledger = self._medications.get(med_id)
+        return ledger.between(start, end) if ledger else []
+
+    def counts(
+        self,
+        med_id: str,
+        start: datetime | None = None,
+        end: datetime | None = None,
+    ) -> dict[str, int]:
+        """Return how many closed doses in a range ended each way."""
+        counts = dict.fromkeys(OUTCOMES, 0)
+        for entry in self.entries(med_id, start, end):
+            counts[entry.outcome] += 1
+        counts["scheduled"] = sum(counts.values())
+        return counts
+
+    def recent_missed(self, med_id: str, now: datetime) -> list[str]:
+        """Return the most recent missed doses, including open overdue ones."""
+        ledger = self._medications.get(med_id)
+        if ledger is None:
+            return []
+        since = now - MISSED_DOSES_PERIOD
+        missed = [
+            entry.scheduled.isoformat()
+            for entry in ledger.between(since, now)
+            if entry.outcome == OUTCOME_MISSED and entry.scheduled > since
+        ]
+        for dose, start, end in ledger.upcoming:
+            if dose > now - MISSED_DOSE_GRACE:
+                break
+            if dose > since and not any(
+                start <= event_time < end for event_time, _, _ in ledger.events
+            ):
+                missed.append(dose.isoformat())
+        return missed[-MAX_MISSED_DOSES:]
+
+    @callback
+    def _async_tick(self) -> None:
+        """Close the medications whose next dose window has ended."""
+        if self._closing:
+            return
+        now = dt_util.now()
+        if not self._seeded or any(
+            med_id not in self._next_close or self._next_close[med_id] <= now
+            for med_id, _config in self._configs()
+        ):
+            self._closing = True
+            self._hass.async_create_task(self._async_close_due())
+
+    async def _async_close_due(self) -> None:
+        """Seed the open events if needed, then close what is due."""
+        try:
+            if not self._seeded:
+                await self._async_seed()
+            now = dt_util.now()
+            changed = False
+            for med_id, config in self._configs():
+                if med_id in self._next_close and self._next_close[med_id] > now:
+                    continue
+                changed |= self._close(med_id, config, now)
+            if changed:
+                self._ledger_store.async_delay_save(
+                    self._data_to_save, LEDGER_SAVE_DELAY
+                )
+        finally:
+            self._closing = False
+
+    async def async_close(self, now: datetime | None = None) -> None:
+        """Close every dose whose window ended by ``now``, then save."""
+        if not self._seeded:
+            await self._async_seed()
+        now = now or dt_util.now()
+        for med_id, config in self._configs():
+            self._close(med_id, config, now)
+        await self._ledger_store.async_save(self._data_to_save())
+
+    async def async_save(self) -> None:
+        """Write the ledger to storage now."""
+        await self._ledger_store.async_save(self._data_to_save())
+
+    def _configs(self) -> Iterable[tuple[str, Mapping[str, Any]]]:
+        """Yield the ID and configuration of every set-up medication."""
+        for med_id, entry_data in self._hass.data.get(DOMAIN, {}).items():
+            if isinstance(entry_data, dict) and "entry" in entry_data:
+                yield med_id, entry_data["entry"].data
+
+    async def _async_seed(self) -> None:
+        """Collect the events that doses still open may claim."""
+        now = dt_util.now()
+        since = min(
+            (ledger.closed_until for ledger in self._medications.values()),
+            default=now,
+        )
+        since -= MAX_WINDOW
+        if self._store.history_loaded:
+            history = self._store.snapshot["history"]
+        elif since >= now - timedelta(days=RECENT_HISTORY_DAYS):
+            history = self._store.recent_history
+        else:
+            await self._store.async_load_history()
+            history = self._store.snapshot["history"]
+
+        for ledger in self._medications.values():
+            ledger.events = []
+        self._add_events(history, since)
+        self._seeded = True
+
+    def _add_events(
+        self,
+        events: Iterable[DoseEvent],
+        since: datetime,
+        med_id: str | None = None,
+    ) -> set[str]:
+        """Keep the events open doses may still claim.
+
+        Returns the medications that got a missed event.
+        """
+        marked: set[str] = set()
+        for event in events:
+            action = event.get("action")
+            if action not in OUTCOMES:
+                continue
+            event_med_id = event.get("medication_id")
+            if med_id is not None and event_med_id != med_id:
+                continue
+            ledger = self._medications.get(event_med_id)
+            if action == OUTCOME_MISSED:
+                # Missed events mark the dose they were logged for
+                scheduled = dt_util.parse_datetime(event.get("scheduled_time") or "")
+                event_time = dt_util.as_local(scheduled) if scheduled else None
+            else:
+                event_time = event.time
+            if ledger is None or event_time is None or event_time < since:
+                continue
+            if event_time >= ledger.closed_until - MAX_WINDOW:
+                ledger.events.append((event_time, action, event["timestamp"]))
+                if action == OUTCOME_MISSED:
+                    marked.add(event_med_id)
+        for ledger in self._medications.values():
+            ledger.events.sort(key=lambda item: item[0])
+        return marked
+
+    def _close(self, med_id: str, config: Mapping[str, Any], now: datetime) -> bool:
+        """Record the doses of a medication whose windows ended by ``now``.
+
+        Returns True if the stored ledger changed.
+        """
+        ledger = self._medications.get(med_id)
+        if ledger is None:
+            ledger = self._medications[med_id] = _MedicationLedger(now)
+            self._add_events(self._store.recent_history, now - MAX_WINDOW, med_id)
+        closed_until = ledger.closed_until
+
+        windows = dose_windows(
+            scheduled_doses(config, closed_until - 2 * MAX_WINDOW, now + 2 * MAX_WINDOW)
+        )
+        closed: list[LedgerEntry] = []
+        for dose, start, end in windows:
+            if dose <= ledger.closed_until:
+                continue
+            if end > now and not _marked_missed(ledger.events, dose):
+                break
+            entry = self._resolve(ledger.events, dose, start, end)
+            ledger.append(entry)
+            closed.append(entry)
+            ledger.closed_until = dose
+            _LOGGER.debug("Dose of %s at %s %s", med_id, dose, entry.outcome)
+
+        ledger.upcoming = tuple(
+            window for window in windows if window[0] > ledger.closed_until
+        )
+        if ledger.upcoming:
+            self._next_close[med_id] = ledger.upcoming[0][2]
+            keep_from = ledger.upcoming[0][1]
+        else:
+            # Nothing is open; look again when the next day's doses are known
+            ledger.closed_until = max(ledger.closed_until, now)
+            self._next_close[med_id] = now + MAX_WINDOW
+            keep_from = now
+        ledger.events = [event for event in ledger.events if event[0] >= keep_from]
+        if closed:
+            async_dispatcher_send(self._hass, SIGNAL_DOSES_CLOSED, med_id, closed)
+        return ledger.closed_until != closed_until
+
+    @staticmethod
+    def _resolve(
+        events: list[LedgerEvent], dose: datetime, start: datetime, end: datetime
+    ) -> LedgerEntry:
+        """Return how a dose ended, from the events of its window.
+
+        Events logged after the dose was marked missed do not count for it.
+        """
+        missed = _marked_missed(events, dose)
+        if missed is not None:
+            end = min(end, dt_util.parse_datetime(missed[2]))
+        skipped: LedgerEvent | None = None
+        for event in events:
+            if event[1] == OUTCOME_MISSED or not start <= event[0] < end:
+                continue
+            if event[1] == OUTCOME_TAKEN:
+                return LedgerEntry(dose, OUTCOME_TAKEN, event[2])
+            if skipped is None:
+                skipped = event
+        if skipped is not None:
+            return LedgerEntry(dose, OUTCOME_SKIPPED, skipped[2])
+        return LedgerEntry(dose, OUTCOME_MISSED, missed[2] if missed else None)
+
+    @callback
+    def _async_changed(self, changes: ChangeSet | None = None) -> None:
+        """Follow taken, skipped and missed events as they are logged."""
+        if changes is None or not self._seeded:
+            return
+        if changes.history_rewritten:
+            # Edited or deleted entries: collect the open events again
+            self._seeded = False
+            return
+        marked = self._add_events(changes.history, dt_util.now() - 2 * MAX_WINDOW)
+        for med_id in marked:
+            # Close the marked dose on the next tick
+            self._next_close.pop(med_id, None)
+
+    @callback
+    def _async_config_changed(self, med_id: str) -> None:
+        """Re-derive the open doses of a medication after a schedule edit."""
+        self._next_close.pop(med_id, None)
+
+    def _data_to_save(self) -> dict[str, Any]:
+        """Return the ledger in its stored form."""
+        return {
+            "medications": {
+                med_id: {
+                    "closed_until": ledger.closed_until.isoformat(),
+                    # A copy, since the file is written in the executor
+                    "entries": tuple(ledger.stored),
+                }
+                for med_id, ledger in self._medications.items()
+            }
+        }
@@ -11,6 +11,9 @@ from typing import Any
 
 from homeassistant.core import HomeAssistant
 
+from .metrics import METRIC_LOG_EVENT, METRIC_READ_CSV_STATISTICS, timed
+from .tracing import span
+
 
 LOGS_PARENT_DIR_NAME = "Pill Assistant"
 LOGS_DIR_NAME = "Logs"
@@ -60,24 +63,35 @@ def get_medication_log_path(hass: HomeAssistant, medication_name: str) -> str:
     return os.path.join(get_logs_dir(hass), filename)
 
 
-def _append_csv_row(path: str, columns: tuple[str, ...], row: dict[str, Any]) -> None:
+def _append_csv_row(path: str, columns: tuple[str, ...], row: dict[str, Any]) -> int:
+    """Append a row, with a header for a new file; return the bytes written."""
+    return _append_csv_rows(path, columns, [row])
+
+
+def _append_csv_rows(
+    path: str, columns: tuple[str, ...], rows: list[dict[str, Any]]
+) -> int:
+    """Append rows, with a header for a new file; return the bytes written."""
     try:
         os.makedirs(os.path.dirname(path), exist_ok=True)
 
         file_exists = os.path.exists(path)
         with open(path, "a", newline="", encoding="utf-8") as handle:
+            start = handle.tell()
             writer = csv.DictWriter(handle, fieldnames=list(columns))
             if not file_exists:
                 writer.writeheader()
-            writer.writerow({k: row.get(k, "") for k in columns})
+            writer.writerows({k: row.get(k, "") for k in columns} for row in rows)
+            return handle.tell() - start
     except (
         OSError,
         PermissionError,
     ):  # pragma: no cover - file IO or permission errors
         # Silently ignore errors in test environment or if directory is not writable
-        pass
+        return 0
 
 
+@timed(METRIC_LOG_EVENT)
 async def async_log_event(
     hass: HomeAssistant,
     *,
@@ -111,14 +125,50 @@ async def async_log_event(
     global_path = get_global_log_path(hass)
     med_path = get_medication_log_path(hass, medication_name)
 
-    await hass.async_add_executor_job(
-        _append_csv_row, global_path, GLOBAL_LOG_COLUMNS, row
-    )
-    await hass.async_add_executor_job(
-        _append_csv_row, med_path, GLOBAL_LOG_COLUMNS, row
-    )
-
-
+    for path in (global_path, med_path):
+        with span("csv_append", file=os.path.basename(path)) as append:
+            written = await hass.async_add_executor_job(
+                _append_csv_row, path, GLOBAL_LOG_COLUMNS, row
+            )
+            append.set(bytes_written=written)
+
+
+async def async_log_events(hass: HomeAssistant, entries: list[dict[str, Any]]) -> None:
+    """Append many history entries to the CSV logs, opening each file once."""
+    rows_by_path: dict[str, list[dict[str, Any]]] = {}
+    for entry in entries:
+        medication_name = entry.get("medication_name", "Unknown")
+        details = {
+            key: value
+            for key, value in entry.items()
+            if key not in ("action", "medication_id", "medication_name")
+        }
+        row = {
+            "timestamp": entry.get("timestamp", ""),
+            "action": entry.get("action", ""),
+            "medication_id": entry.get("medication_id", ""),
+            "medication_name": medication_name,
+            "dosage": entry.get("dosage", ""),
+            "dosage_unit": entry.get("dosage_unit", ""),
+            "details_json": json.dumps(details, ensure_ascii=False, sort_keys=True),
+        }
+        for path in (
+            get_global_log_path(hass),
+            get_medication_log_path(hass, medication_name),
+        ):
+            rows_by_path.setdefault(path, []).append(row)
+
+    def _write() -> int:
+        return sum(
+            _append_csv_rows(path, GLOBAL_LOG_COLUMNS, rows)
+            for path, rows in rows_by_path.items()
+        )
+
+    with span("csv_append", files=len(rows_by_path), rows=len(entries)) as append:
+        append.set(bytes_written=await hass.async_add_executor_job(_write))
+
+
+@timed(METRIC_READ_CSV_STATISTICS)
 def _read_csv_statistics(
     path: str, start_date: str | None = None, end_date: str | None = None
 ) -> list[dict[str, Any]]:
@@ -172,19 +222,103 @@ def _read_csv_statistics(
         return []
 
 
+STATISTICS_GRANULARITIES: tuple[str, ...] = ("hour", "day", "week", "month")
+# Counted per bucket when statistics are returned as series
+SERIES_COUNTS: tuple[str, ...] = ("taken", "taken_on_time", "skipped", "snoozed")
+
+
+def _bucket_start(moment: datetime, granularity: str) -> datetime:
+    """Return the local start of the hour, day, week or month of ``moment``."""
+    moment = moment.replace(tzinfo=None)
+    if granularity == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _next_bucket(start: datetime, granularity: str) -> datetime:
+    """Return the start of the bucket after the one starting at ``start``."""
+    if granularity == "hour":
+        return start + timedelta(hours=1)
+    if granularity == "week":
+        return start + timedelta(days=7)
+    if granularity == "month":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def _build_series(
+    buckets: dict[str, dict[datetime, dict[str, int]]],
+    names: dict[str, str],
+    granularity: str,
+    max_points: int | None,
+) -> dict[str, Any]:
+    """Return dense per-bucket counts, merging buckets to fit ``max_points``.
+
+    Buckets without events are included as zeros, so every medication has
+    one value per start. When there are more buckets than ``max_points``,
+    runs of ``bucket_size`` consecutive buckets are summed into one point.
+    """
+    first = min((min(med) for med in buckets.values() if med), default=None)
+    last = max((max(med) for med in buckets.values() if med), default=None)
+    starts: list[datetime] = []
+    if first is not None and last is not None:
+        current = first
+        while current <= last:
+            starts.append(current)
+            current = _next_bucket(current, granularity)
+
+    bucket_size = 1
+    if max_points and len(starts) > max_points:
+        bucket_size = -(-len(starts) // max_points)
+    index = {start: position // bucket_size for position, start in enumerate(starts)}
+    points = -(-len(starts) // bucket_size)
+
+    medications = {}
+    for med_id, med_buckets in buckets.items():
+        series: dict[str, Any] = {
+            "name": names.get(med_id, "Unknown"),
+            **{count: [0] * points for count in SERIES_COUNTS},
+        }
+        for start, counts in med_buckets.items():
+            for count, value in counts.items():
+                series[count][index[start]] += value
+        medications[med_id] = series
+
+    return {
+        "granularity": granularity,
+        "bucket_size": bucket_size,
+        "start": [start.isoformat() for start in starts[::bucket_size]],
+        "medications": medications,
+    }
+
+
 async def async_get_statistics(
     hass: HomeAssistant,
     start_date: str | None = None,
     end_date: str | None = None,
     medication_id: str | None = None,
+    granularity: str | None = None,
+    max_points: int | None = None,
 ) -> dict[str, Any]:
-    """Get medication statistics from CSV logs with on-time tracking."""
+    """Get medication statistics from CSV logs with on-time tracking.
+
+    With a ``granularity``, the timestamp lists and daily counts are replaced
+    by a ``series`` of counts per hour, day, week or month, of at most
+    ``max_points`` points.
+    """
     global_path = get_global_log_path(hass)
 
     # Read CSV data
-    rows = await hass.async_add_executor_job(
-        _read_csv_statistics, global_path, start_date, end_date
-    )
+    with span("csv_read", file=os.path.basename(global_path)) as read:
+        rows = await hass.async_add_executor_job(
+            _read_csv_statistics, global_path, start_date, end_date
+        )
+        read.set(rows=len(rows))
 
     # Filter by medication_id if provided
     if medication_id:
@@ -220,11 +354,16 @@ async def async_get_statistics(
         "action_counts": {},
     }
 
+    # Per medication and bucket start, the counts of the series
+    buckets: dict[str, dict[datetime, dict[str, int]]] = {}
+    names: dict[str, str] = {}
+
     for row in rows:
         med_id = row.get("medication_id", "unknown")
         med_name = row.get("medication_name", "Unknown")
         action = row.get("action", "unknown")
         timestamp_str = row.get("timestamp", "")
+        taken_on_time = False
 
         # Aggregate by medication
         if med_id not in stats["medications"]:
@@ -279,6 +418,7 @@ async def async_get_statistics(
                         # Check if within on-time window
                         if closest_diff <= on_time_window:
                             stats["medications"][med_id]["taken_on_time_count"] += 1
+                            taken_on_time = True
                         else:
                             stats["medications"][med_id]["taken_late_count"] += 1
                     else:
@@ -306,6 +446,27 @@ async def async_get_statistics(
                 (on_time_count / taken_total) * 100, 1
             )
 
+        # Aggregate by action type
+        stats["action_counts"][action] = stats["action_counts"].get(action, 0) + 1
+
+        # Aggregate by bucket for the series
+        if granularity:
+            names[med_id] = med_name
+            try:
+                start = _bucket_start(
+                    datetime.fromisoformat(timestamp_str), granularity
+                )
+            except (ValueError, TypeError):
+                start = None
+            if start is not None and action in ("taken", "skipped", "snoozed"):
+                counts = buckets.setdefault(med_id, {}).setdefault(
+                    start, dict.fromkeys(SERIES_COUNTS, 0)
+                )
+                counts[action] += 1
+                if taken_on_time:
+                    counts["taken_on_time"] += 1
+            continue
+
         # Aggregate by day
         try:
             row_dt = datetime.fromisoformat(timestamp_str)
@@ -328,7 +489,12 @@ async def async_get_statistics(
         except (ValueError, TypeError):
             pass
 
-        # Aggregate by action type
-        stats["action_counts"][action] = stats["action_counts"].get(action, 0) + 1
+    if granularity:
+        # Compact series replace the per-event lists and the daily map
+        for med_stats in stats["medications"].values():
+            for key in ("taken_times", "skipped_times", "snoozed_times"):
+                med_stats.pop(key)
+        del stats["daily_counts"]
+        stats["series"] = _build_series(buckets, names, granularity, max_points)
 
     return stats
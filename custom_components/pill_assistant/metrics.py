@@ -0,0 +1,209 @@
+"""Latency histograms for the hot paths of Pill Assistant."""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections.abc import Callable
+import functools
+import inspect
+import threading
+import time
+from typing import Any, TypeVar
+
+from .const import (
+    SERVICE_DECREMENT_DOSAGE,
+    SERVICE_DECREMENT_REMAINING,
+    SERVICE_DELETE_MEDICATION_HISTORY,
+    SERVICE_EDIT_MEDICATION_HISTORY,
+    SERVICE_EXPORT_HISTORY,
+    SERVICE_GET_ADHERENCE_HEATMAP,
+    SERVICE_GET_DOSE_LEDGER,
+    SERVICE_GET_MEDICATION_HISTORY,
+    SERVICE_GET_STATISTICS,
+    SERVICE_IMPORT_HISTORY,
+    SERVICE_INCREMENT_DOSAGE,
+    SERVICE_INCREMENT_REMAINING,
+    SERVICE_REFILL_MEDICATION,
+    SERVICE_SKIP_MEDICATION,
+    SERVICE_SNOOZE_MEDICATION,
+    SERVICE_TAKE_MEDICATION,
+    SERVICE_TEST_NOTIFICATION,
+)
+from .tracing import span
+
+_F = TypeVar("_F", bound=Callable[..., Any])
+
+# Bucket upper bounds in seconds: 0.1 ms to about two minutes, 25% apart
+BUCKET_BOUNDS: tuple[float, ...] = tuple(0.0001 * 1.25**i for i in range(64))
+
+METRIC_STORE_UPDATE = "store_update"
+METRIC_LOG_EVENT = "log_event"
+METRIC_READ_CSV_STATISTICS = "read_csv_statistics"
+METRIC_SENSOR_UPDATE = "sensor_update"
+SERVICE_METRIC_PREFIX = "service_"
+
+# Every timed path, in the order its diagnostic sensor is listed
+LATENCY_METRICS: tuple[str, ...] = (
+    METRIC_STORE_UPDATE,
+    METRIC_LOG_EVENT,
+    METRIC_READ_CSV_STATISTICS,
+    METRIC_SENSOR_UPDATE,
+    *(
+        SERVICE_METRIC_PREFIX + service
+        for service in (
+            SERVICE_TAKE_MEDICATION,
+            SERVICE_SKIP_MEDICATION,
+            SERVICE_REFILL_MEDICATION,
+            SERVICE_TEST_NOTIFICATION,
+            SERVICE_SNOOZE_MEDICATION,
+            SERVICE_INCREMENT_DOSAGE,
+            SERVICE_DECREMENT_DOSAGE,
+            SERVICE_INCREMENT_REMAINING,
+            SERVICE_DECREMENT_REMAINING,
+            SERVICE_GET_STATISTICS,
+            SERVICE_GET_MEDICATION_HISTORY,
+            SERVICE_EDIT_MEDICATION_HISTORY,
+            SERVICE_DELETE_MEDICATION_HISTORY,
+            SERVICE_GET_DOSE_LEDGER,
+            SERVICE_GET_ADHERENCE_HEATMAP,
+            SERVICE_EXPORT_HISTORY,
+            SERVICE_IMPORT_HISTORY,
+        )
+    ),
+)
+
+
+class LatencyHistogram:
+    """Count durations in fixed exponential buckets.
+
+    Recording is O(log buckets) and the memory use is constant, however long
+    Home Assistant runs. Percentiles are estimated from the bucket bounds, so
+    they are accurate to within one bucket (25%), and never exceed the
+    largest duration seen.
+    """
+
+    __slots__ = ("_counts", "count", "total", "max")
+
+    def __init__(self) -> None:
+        """Initialize an empty histogram."""
+        self._counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        """Add one duration."""
+        self._counts[bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, fraction: float) -> float | None:
+        """Return the estimated duration below which ``fraction`` of samples fall."""
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self._counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                if index == len(BUCKET_BOUNDS):
+                    return self.max
+                return min(BUCKET_BOUNDS[index], self.max)
+        return self.max
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a summary in milliseconds."""
+        p50 = self.percentile(0.5)
+        p95 = self.percentile(0.95)
+        return {
+            "count": self.count,
+            "p50_ms": _ms(p50),
+            "p95_ms": _ms(p95),
+            "max_ms": _ms(self.max) if self.count else None,
+            "mean_ms": _ms(self.total / self.count) if self.count else None,
+        }
+
+
+def _ms(seconds: float | None) -> float | None:
+    """Convert seconds to rounded milliseconds."""
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+class LatencyMetrics:
+    """Named latency histograms shared by the whole integration.
+
+    Timed code also runs in executor threads, so recording is locked.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the metrics."""
+        self._histograms: dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float) -> None:
+        """Record a duration for ``name``."""
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = LatencyHistogram()
+            histogram.record(seconds)
+
+    def summary(self, name: str) -> dict[str, Any]:
+        """Return the summary of one histogram."""
+        with self._lock:
+            histogram = self._histograms.get(name) or LatencyHistogram()
+            return histogram.as_dict()
+
+    def as_dict(self) -> dict[str, dict[str, Any]]:
+        """Return the summaries of all histograms."""
+        with self._lock:
+            return {
+                name: histogram.as_dict()
+                for name, histogram in sorted(self._histograms.items())
+            }
+
+    def reset(self) -> None:
+        """Forget all recorded durations (for testing purposes)."""
+        with self._lock:
+            self._histograms.clear()
+
+
+METRICS = LatencyMetrics()
+
+
+def timed(name: str) -> Callable[[_F], _F]:
+    """Record the duration of every call of the decorated function.
+
+    Works for both coroutine functions and plain functions; a call is
+    recorded whether it returns or raises. Inside a trace, the call is also
+    a span named ``name``.
+    """
+
+    def decorator(func: _F) -> _F:
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                start = time.perf_counter()
+                try:
+                    with span(name):
+                        return await func(*args, **kwargs)
+                finally:
+                    METRICS.record(name, time.perf_counter() - start)
+
+            return async_wrapper  # type: ignore[return-value]
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                with span(name):
+                    return func(*args, **kwargs)
+            finally:
+                METRICS.record(name, time.perf_counter() - start)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
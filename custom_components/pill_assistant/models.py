@@ -0,0 +1,174 @@
+"""Read-only records for medications and history events."""
+
+from __future__ import annotations
+
+from collections.abc import Iterator, Mapping
+from datetime import datetime
+import sys
+from typing import Any
+
+import homeassistant.util.dt as dt_util
+
+from .const import CONF_DOSAGE, CONF_DOSAGE_UNIT, CONF_MEDICATION_NAME
+
+
+def _parse_local(value: Any) -> datetime | None:
+    """Return an ISO timestamp as a local datetime, or None if invalid."""
+    if not value:
+        return None
+    try:
+        parsed = dt_util.parse_datetime(str(value))
+    except (ValueError, TypeError):
+        return None
+    return dt_util.as_local(parsed) if parsed is not None else None
+
+
+class _Record(Mapping[str, Any]):
+    """A mapping that keeps its common keys in slots.
+
+    A stored dict is converted once when a snapshot is published. Common
+    keys live in slots, and absent keys are unset slots; anything else
+    goes into a small dict that is only created when needed. Repeated
+    strings such as names and units are interned, so all records share
+    one copy. Records are read with the usual mapping methods, so readers
+    of plain dicts keep working, and ``as_dict`` returns the storage schema.
+    """
+
+    __slots__ = ("_extra",)
+
+    _FIELDS: tuple[str, ...] = ()
+    _FIELD_SET: frozenset[str] = frozenset()
+    _INTERNED: frozenset[str] = frozenset()
+
+    def __init__(self, data: Mapping[str, Any]) -> None:
+        """Initialize the record from its stored form."""
+        extra: dict[str, Any] | None = None
+        for key, value in data.items():
+            if key in self._FIELD_SET:
+                if key in self._INTERNED and isinstance(value, str):
+                    value = sys.intern(value)
+                setattr(self, key, value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+        self._extra = extra
+
+    def __getitem__(self, key: str) -> Any:
+        """Return the value stored under ``key``."""
+        if key in self._FIELD_SET:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is not None:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the stored keys."""
+        for key in self._FIELDS:
+            if hasattr(self, key):
+                yield key
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        """Return the number of stored keys."""
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        """Return the record as its stored form."""
+        return f"{type(self).__name__}({self.as_dict()!r})"
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the record in the storage schema."""
+        return dict(self.items())
+
+
+class DoseEvent(_Record):
+    """One history entry: a dose taken, skipped, snoozed or refilled.
+
+    ``time`` is parsed from the ISO timestamp on first use and kept, so the
+    readers of history never parse the same entry twice.
+    """
+
+    __slots__ = (
+        "medication_id",
+        "medication_name",
+        "timestamp",
+        "action",
+        "dosage",
+        "dosage_unit",
+        "_time",
+    )
+
+    _FIELDS = (
+        "medication_id",
+        "medication_name",
+        "timestamp",
+        "action",
+        CONF_DOSAGE,
+        CONF_DOSAGE_UNIT,
+    )
+    _FIELD_SET = frozenset(_FIELDS)
+    _INTERNED = frozenset(
+        ("medication_id", "medication_name", "action", CONF_DOSAGE, CONF_DOSAGE_UNIT)
+    )
+
+    @property
+    def time(self) -> datetime | None:
+        """Return the local time of the event, or None if invalid."""
+        try:
+            return self._time
+        except AttributeError:
+            self._time = _parse_local(self.get("timestamp"))
+            return self._time
+
+
+class Medication(_Record):
+    """The stored state of one medication.
+
+    The configuration keys stay in the extra mapping; the state read on
+    every refresh has slots, and its timestamps are parsed once.
+    """
+
+    __slots__ = (
+        "medication_name",
+        "dosage",
+        "dosage_unit",
+        "remaining_amount",
+        "last_taken",
+        "snooze_until",
+        "_last_taken_time",
+        "_snooze_until_time",
+    )
+
+    _FIELDS = (
+        CONF_MEDICATION_NAME,
+        CONF_DOSAGE,
+        CONF_DOSAGE_UNIT,
+        "remaining_amount",
+        "last_taken",
+        "snooze_until",
+    )
+    _FIELD_SET = frozenset(_FIELDS)
+    _INTERNED = frozenset((CONF_MEDICATION_NAME, CONF_DOSAGE, CONF_DOSAGE_UNIT))
+
+    @property
+    def last_taken_time(self) -> datetime | None:
+        """Return when the medication was last taken, in local time."""
+        try:
+            return self._last_taken_time
+        except AttributeError:
+            self._last_taken_time = _parse_local(self.get("last_taken"))
+            return self._last_taken_time
+
+    @property
+    def snooze_until_time(self) -> datetime | None:
+        """Return the end of the current snooze, in local time."""
+        try:
+            return self._snooze_until_time
+        except AttributeError:
+            self._snooze_until_time = _parse_local(self.get("snooze_until"))
+            return self._snooze_until_time
@@ -0,0 +1,310 @@
+"""Daily adherence imported into the recorder's long-term statistics.
+
+When a day closes, the doses taken, taken on time and skipped that day, and
+the remaining amount, are imported for each medication as external
+statistics. Statistics cards and the history panel then chart them from the
+recorder's tables. The first import backfills every day of the history.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping
+from datetime import date, datetime, timedelta
+import logging
+from typing import Any
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.storage import Store
+from homeassistant.util import slugify
+import homeassistant.util.dt as dt_util
+
+from .adherence import taken_on_time
+from .const import (
+    CONF_MEDICATION_NAME,
+    CONF_MEDICATION_TYPE,
+    DEFAULT_MEDICATION_TYPE,
+    DOMAIN,
+    RECENT_HISTORY_DAYS,
+    SIGNAL_EVALUATION_TICK,
+    SIGNAL_MEDICATION_UPDATED,
+    STATISTICS_STORAGE_KEY,
+    STORAGE_VERSION,
+)
+from .models import DoseEvent
+from .store import ChangeSet, PillAssistantStore
+
+_LOGGER = logging.getLogger(__name__)
+
+# Daily counts imported as cumulative sums, so cards can show any period
+COUNTED = ("taken", "taken_on_time", "skipped")
+STATISTIC_NAMES = {
+    "taken": "doses taken",
+    "taken_on_time": "doses taken on time",
+    "skipped": "doses skipped",
+    "remaining": "remaining amount",
+}
+UNIT_DOSES = "doses"
+
+# Counts of one day: {"taken": n, "taken_on_time": n, "skipped": n}
+DayCounts = dict[str, int]
+
+
+def statistic_id(med_id: str, kind: str) -> str:
+    """Return the external statistic ID of one aggregate of a medication."""
+    return f"{DOMAIN}:{slugify(f'{med_id}_{kind}')}"
+
+
+def day_start(day: date) -> datetime:
+    """Return the start of a local day, on the hour as the recorder requires.
+
+    Time zones with a part-hour offset start the row at the hour before.
+    """
+    start = dt_util.as_utc(
+        datetime.combine(day, datetime.min.time(), dt_util.DEFAULT_TIME_ZONE)
+    )
+    return start.replace(minute=0, second=0, microsecond=0)
+
+
+def daily_counts(
+    events: Iterable[DoseEvent],
+    configs: Mapping[str, Mapping[str, Any]],
+    until: date,
+) -> dict[str, dict[date, DayCounts]]:
+    """Count the doses of each medication per local day before ``until``."""
+    counts: dict[str, dict[date, DayCounts]] = {}
+    for event in events:
+        action = event.get("action")
+        if action not in ("taken", "skipped"):
+            continue
+        med_id = event.get("medication_id")
+        event_time = event.time
+        if med_id not in configs or event_time is None:
+            continue
+        day = event_time.date()
+        if day >= until:
+            continue
+        day_counts = counts.setdefault(med_id, {}).setdefault(
+            day, dict.fromkeys(COUNTED, 0)
+        )
+        day_counts[action] += 1
+        if action == "taken" and taken_on_time(configs[med_id], event_time):
+            day_counts["taken_on_time"] += 1
+    return counts
+
+
+class LongTermStatistics:
+    """Import the daily aggregates of every medication as days close.
+
+    What was imported last is kept per medication: the day and the running
+    sums, so each later day is imported on its own. A medication never
+    imported before is backfilled from its first day in the history, and a
+    history edit imports every day again, which replaces the earlier rows.
+    Nothing is imported while the recorder is not loaded.
+    """
+
+    def __init__(self, hass: HomeAssistant, store: PillAssistantStore) -> None:
+        """Initialize the importer."""
+        self._hass = hass
+        self._store = store
+        self._statistics_store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, STATISTICS_STORAGE_KEY
+        )
+        self._imported: dict[str, dict[str, Any]] = {}
+        self._today: date | None = None
+        self._syncing = False
+        # Bumped by each history edit, so an import reading the history when
+        # it was edited drops what it read
+        self._generation = 0
+        self._unsubs: list[CALLBACK_TYPE] = []
+
+    async def async_load(self) -> None:
+        """Restore what was imported and start following changes."""
+        stored = await self._statistics_store.async_load() or {}
+        self._imported = dict(stored.get("medications", {}))
+        self._unsubs = [
+            async_dispatcher_connect(
+                self._hass, SIGNAL_EVALUATION_TICK, self._async_tick
+            ),
+            async_dispatcher_connect(
+                self._hass, SIGNAL_MEDICATION_UPDATED, self._async_changed
+            ),
+        ]
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop following changes."""
+        for unsub in self._unsubs:
+            unsub()
+        self._unsubs = []
+
+    @callback
+    def _async_tick(self) -> None:
+        """Import the closed days on the first tick and after midnight."""
+        today = dt_util.now().date()
+        if today != self._today and not self._syncing:
+            self._today = today
+            self._syncing = True
+            self._hass.async_create_task(self._async_sync(today))
+
+    @callback
+    def _async_changed(self, changes: ChangeSet | None = None) -> None:
+        """Import everything again after the history was edited."""
+        if changes is None or not changes.history_rewritten:
+            return
+        self._generation += 1
+        self._imported = {}
+        # The next tick imports the medications again
+        self._today = None
+
+    async def _async_sync(self, today: date) -> None:
+        """Import the days of every medication that closed before ``today``."""
+        try:
+            await self._async_import_closed_days(today)
+        finally:
+            self._syncing = False
+
+    async def _async_import_closed_days(self, today: date) -> None:
+        """Import what closed since the last import."""
+        if "recorder" not in self._hass.config.components:
+            return
+        try:
+            from homeassistant.components.recorder.statistics import (
+                async_add_external_statistics,
+            )
+        except ImportError:  # pragma: no cover - recorder requirements missing
+            return
+
+        yesterday = today - timedelta(days=1)
+        configs = {
+            med_id: config
+            for med_id, config in self._configs()
+            if self._imported.get(med_id, {}).get("day", "") < yesterday.isoformat()
+        }
+        if not configs:
+            return
+
+        # Days closed since the last import are in the recent history, unless
+        # a medication is backfilled or was last imported before it
+        recent_since = (today - timedelta(days=RECENT_HISTORY_DAYS)).isoformat()
+        if self._store.history_loaded or any(
+            self._imported.get(med_id, {}).get("day", "") < recent_since
+            for med_id in configs
+        ):
+            # Archives are only read for days not imported yet
+            imported_days = [
+                self._imported.get(med_id, {}).get("day") for med_id in configs
+            ]
+            since = (
+                day_start(date.fromisoformat(min(imported_days)))
+                if imported_days and None not in imported_days
+                else None
+            )
+            generation = self._generation
+            history = await self._store.async_history(since)
+            if generation != self._generation:
+                # Edited while it was read; the next tick imports it again
+                return
+        else:
+            history = self._store.recent_history
+        counts = daily_counts(history, configs, today)
+
+        for med_id, config in configs.items():
+            med_counts = counts.get(med_id, {})
+            imported = self._imported.get(med_id)
+            if imported is None:
+                first = min(med_counts, default=yesterday)
+                sums = dict.fromkeys(COUNTED, 0)
+            else:
+                first = date.fromisoformat(imported["day"]) + timedelta(days=1)
+                sums = dict(imported["sums"])
+
+            rows: dict[str, list[dict[str, Any]]] = {kind: [] for kind in COUNTED}
+            day = first
+            while day <= yesterday:
+                day_counts = med_counts.get(day)
+                start = day_start(day)
+                for kind in COUNTED:
+                    value = day_counts[kind] if day_counts else 0
+                    sums[kind] += value
+                    rows[kind].append(
+                        {"start": start, "state": value, "sum": sums[kind]}
+                    )
+                day += timedelta(days=1)
+
+            name = config.get(CONF_MEDICATION_NAME, med_id)
+            for kind, kind_rows in rows.items():
+                async_add_external_statistics(
+                    self._hass,
+                    self._metadata(med_id, name, kind, UNIT_DOSES, has_sum=True),
+                    kind_rows,
+                )
+            # The remaining amount is only known now, so it is the closing value
+            # of yesterday; backfilled days have none
+            remaining = self._remaining(med_id)
+            if remaining is not None:
+                async_add_external_statistics(
+                    self._hass,
+                    self._metadata(
+                        med_id,
+                        name,
+                        "remaining",
+                        config.get(CONF_MEDICATION_TYPE, DEFAULT_MEDICATION_TYPE),
+                        has_sum=False,
+                    ),
+                    [
+                        {
+                            "start": day_start(yesterday),
+                            "mean": remaining,
+                            "min": remaining,
+                            "max": remaining,
+                        }
+                    ],
+                )
+            self._imported[med_id] = {"day": yesterday.isoformat(), "sums": sums}
+            _LOGGER.debug(
+                "Imported statistics of %s from %s to %s", med_id, first, yesterday
+            )
+
+        await self._statistics_store.async_save(self._data_to_save())
+
+    def _configs(self) -> Iterable[tuple[str, Mapping[str, Any]]]:
+        """Yield the ID and configuration of every set-up medication."""
+        for med_id, entry_data in self._hass.data.get(DOMAIN, {}).items():
+            if isinstance(entry_data, dict) and "entry" in entry_data:
+                yield med_id, entry_data["entry"].data
+
+    def _remaining(self, med_id: str) -> float | None:
+        """Return the remaining amount of a medication, if it is known."""
+        medication = self._store.snapshot.get("medications", {}).get(med_id, {})
+        try:
+            return float(medication["remaining_amount"])
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _metadata(
+        med_id: str, name: str, kind: str, unit: str, has_sum: bool
+    ) -> dict[str, Any]:
+        """Return the metadata of one statistic of a medication.
+
+        Counts are in doses; the remaining amount is in the medication's type
+        (pill, capsule, ...), which refills and takes count.
+        """
+        return {
+            "has_mean": not has_sum,
+            "has_sum": has_sum,
+            "name": f"{name} {STATISTIC_NAMES[kind]}",
+            "source": DOMAIN,
+            "statistic_id": statistic_id(med_id, kind),
+            "unit_of_measurement": unit,
+        }
+
+    def _data_to_save(self) -> dict[str, Any]:
+        """Return what was imported in its stored form."""
+        return {
+            "medications": {
+                med_id: {"day": imported["day"], "sums": dict(imported["sums"])}
+                for med_id, imported in self._imported.items()
+            }
+        }
@@ -0,0 +1,517 @@
+"""Escalating medication reminders for Pill Assistant.
+
+All pending reminder deadlines for every medication live in one min-heap that is
+persisted in its own storage file and serviced by a single point-in-time timer
+armed for the earliest deadline. A dose the dose ledger closes as missed ends
+its reminders, so the history and the ledger record the same missed doses.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+import heapq
+import logging
+from typing import Any
+
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.event import async_track_point_in_time
+from homeassistant.helpers.storage import Store
+import homeassistant.util.dt as dt_util
+
+from .actions import build_notification_actions, new_action_token
+from .const import (
+    CONF_DOSAGE,
+    CONF_DOSAGE_UNIT,
+    CONF_ENABLE_AUTOMATIC_NOTIFICATIONS,
+    CONF_ESCALATION_AFTER_MINUTES,
+    CONF_ESCALATION_NOTIFY_SERVICES,
+    CONF_MEDICATION_NAME,
+    CONF_MEDICATION_TYPE,
+    CONF_MISSED_AFTER_MINUTES,
+    CONF_NOTIFY_SERVICES,
+    CONF_REFILL_AMOUNT,
+    CONF_REMINDER_INTERVAL_MINUTES,
+    DEFAULT_ENABLE_AUTOMATIC_NOTIFICATIONS,
+    DEFAULT_ESCALATION_AFTER_MINUTES,
+    DEFAULT_MEDICATION_TYPE,
+    DEFAULT_MISSED_AFTER_MINUTES,
+    DEFAULT_REMINDER_INTERVAL_MINUTES,
+    DOMAIN,
+    MAX_REMINDER_WINDOW_HOURS,
+    REMINDERS_STORAGE_KEY,
+    SIGNAL_DOSES_CLOSED,
+    SIGNAL_MEDICATION_CONFIG_UPDATED,
+    STORAGE_VERSION,
+)
+from . import log_utils
+from .ledger import OUTCOME_MISSED, LedgerEntry
+from .store import async_signal_changes
+
+_LOGGER = logging.getLogger(__name__)
+
+REMINDER_RENOTIFY = "remind"
+REMINDER_MISSED = "missed"
+
+# Heap items: (deadline timestamp, medication ID, occurrence ISO string, kind)
+ReminderItem = tuple[float, str, str, str]
+
+
+async def async_send_medication_notification(
+    hass: HomeAssistant,
+    med_id: str,
+    notify_services: list[str],
+    *,
+    title: str = "Medication Reminder",
+) -> None:
+    """Send an actionable reminder for a medication to the given notify services."""
+    entry_data = hass.data.get(DOMAIN, {}).get(med_id)
+    if not isinstance(entry_data, dict) or "entry" not in entry_data:
+        return
+
+    entry = entry_data["entry"]
+    med_data = entry_data["storage_data"]["medications"].get(med_id, {})
+
+    med_name = med_data.get(
+        CONF_MEDICATION_NAME, entry.data.get(CONF_MEDICATION_NAME, "Unknown")
+    )
+    dosage = med_data.get(CONF_DOSAGE, entry.data.get(CONF_DOSAGE, ""))
+    dosage_unit = med_data.get(CONF_DOSAGE_UNIT, entry.data.get(CONF_DOSAGE_UNIT, ""))
+    medication_type = med_data.get(
+        CONF_MEDICATION_TYPE,
+        entry.data.get(CONF_MEDICATION_TYPE, DEFAULT_MEDICATION_TYPE),
+    )
+
+    # Create notification message with type
+    message = (
+        f"Time to take {dosage} {medication_type}(s) of {med_name} ({dosage_unit})"
+    )
+
+    # One token per delivery so duplicate taps can be recognised
+    token = new_action_token()
+    for service_name in notify_services:
+        try:
+            # Extract domain and service
+            service_parts = service_name.split(".")
+            if len(service_parts) == 2:
+                domain, service = service_parts
+                await hass.services.async_call(
+                    domain,
+                    service,
+                    {
+                        "title": title,
+                        "message": message,
+                        "data": {
+                            "tag": f"pill_assistant_{med_id}",
+                            "actions": build_notification_actions(med_id, token),
+                        },
+                    },
+                    blocking=False,
+                )
+        except Exception as err:  # pragma: no cover - notify failure
+            _LOGGER.error(
+                "Failed to send automatic notification via %s: %s",
+                service_name,
+                err,
+            )
+
+    _LOGGER.info("Automatic notification sent for %s", med_name)
+
+
+class ReminderScheduler:
+    """Track due doses and service re-reminder and missed-dose deadlines.
+
+    ``notified`` records, per medication, the scheduled occurrence a reminder
+    was last sent for. It is persisted so a restart does not repeat the first
+    reminder, and pending deadlines for an occurrence are dropped as soon as
+    the dose is taken or skipped.
+    """
+
+    def __init__(self, hass: HomeAssistant, store) -> None:
+        """Initialize the scheduler."""
+        self._hass = hass
+        self._store = store
+        self._reminders_store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, REMINDERS_STORAGE_KEY
+        )
+        self._heap: list[ReminderItem] = []
+        self._notified: dict[str, str] = {}
+        self._unsub_timer: CALLBACK_TYPE | None = None
+        self._timer_deadline: float | None = None
+        self._unsub_stop: CALLBACK_TYPE | None = None
+        self._unsub_config: CALLBACK_TYPE | None = None
+        self._unsub_closed: CALLBACK_TYPE | None = None
+
+    @property
+    def pending(self) -> list[ReminderItem]:
+        """Return pending deadlines ordered by time."""
+        return sorted(self._heap)
+
+    async def async_load(self) -> None:
+        """Restore pending reminders from storage and arm the timer."""
+        reminders = await self._reminders_store.async_load()
+        if reminders is None:
+            # Reminders were once kept with the medications
+            data = await self._store.async_load()
+            reminders = data.get("reminders") or {}
+            if "reminders" in data:
+                await self._reminders_store.async_save(reminders)
+
+                def drop_reminders(data: dict) -> None:
+                    data.pop("reminders", None)
+
+                await self._store.async_update(drop_reminders)
+        self._heap = [tuple(item) for item in reminders.get("pending", [])]
+        heapq.heapify(self._heap)
+        self._notified = dict(reminders.get("notified", {}))
+
+        self._unsub_stop = self._hass.bus.async_listen_once(
+            EVENT_HOMEASSISTANT_STOP, self._async_handle_stop
+        )
+        self._unsub_config = async_dispatcher_connect(
+            self._hass, SIGNAL_MEDICATION_CONFIG_UPDATED, self.async_config_changed
+        )
+        self._unsub_closed = async_dispatcher_connect(
+            self._hass, SIGNAL_DOSES_CLOSED, self._async_doses_closed
+        )
+        self._arm_timer()
+
+    @callback
+    def async_stop(self) -> None:
+        """Cancel the timer."""
+        if self._unsub_timer is not None:
+            self._unsub_timer()
+            self._unsub_timer = None
+            self._timer_deadline = None
+        if self._unsub_stop is not None:
+            self._unsub_stop()
+            self._unsub_stop = None
+        if self._unsub_config is not None:
+            self._unsub_config()
+            self._unsub_config = None
+        if self._unsub_closed is not None:
+            self._unsub_closed()
+            self._unsub_closed = None
+
+    @callback
+    def _async_handle_stop(self, _event: Event) -> None:
+        """Cancel the timer when Home Assistant stops."""
+        self._unsub_stop = None
+        self.async_stop()
+
+    def is_notified(self, med_id: str, occurrence: datetime) -> bool:
+        """Return True if a reminder was already sent for this occurrence."""
+        return self._notified.get(med_id) == occurrence.isoformat()
+
+    async def async_occurrence_due(self, med_id: str, occurrence: datetime) -> None:
+        """Send the first reminder for a due dose and queue its follow-ups."""
+        if self.is_notified(med_id, occurrence):
+            return
+
+        entry_data = self._hass.data.get(DOMAIN, {}).get(med_id)
+        if not isinstance(entry_data, dict) or "entry" not in entry_data:
+            return
+        config = entry_data["entry"].data
+
+        notify_enabled = config.get(
+            CONF_ENABLE_AUTOMATIC_NOTIFICATIONS, DEFAULT_ENABLE_AUTOMATIC_NOTIFICATIONS
+        )
+        notify_services = config.get(CONF_NOTIFY_SERVICES, [])
+        missed_after = config.get(
+            CONF_MISSED_AFTER_MINUTES, DEFAULT_MISSED_AFTER_MINUTES
+        )
+        if not (notify_enabled and notify_services) and not missed_after:
+            return
+
+        occurrence_iso = occurrence.isoformat()
+        self._notified[med_id] = occurrence_iso
+        # Drop anything left over from a previous occurrence
+        self._remove(med_id)
+
+        if notify_enabled and notify_services:
+            await async_send_medication_notification(
+                self._hass, med_id, notify_services
+            )
+            interval = config.get(
+                CONF_REMINDER_INTERVAL_MINUTES, DEFAULT_REMINDER_INTERVAL_MINUTES
+            )
+            if interval:
+                start = max(dt_util.now(), occurrence)
+                self._push(
+                    start + timedelta(minutes=interval),
+                    med_id,
+                    occurrence_iso,
+                    REMINDER_RENOTIFY,
+                )
+
+        if missed_after:
+            self._push(
+                occurrence + timedelta(minutes=missed_after),
+                med_id,
+                occurrence_iso,
+                REMINDER_MISSED,
+            )
+
+        await self._async_save()
+        self._arm_timer()
+
+    async def async_resolve(self, med_id: str) -> None:
+        """Drop pending deadlines for a medication whose dose was handled."""
+        if self._remove(med_id):
+            await self._async_save()
+            self._arm_timer()
+
+    async def async_snooze(self, med_id: str, until: datetime) -> None:
+        """Postpone the next re-reminder for a medication until ``until``."""
+        occurrence_iso = self._notified.get(med_id)
+        if occurrence_iso is None:
+            return
+        if not self._remove(med_id, REMINDER_RENOTIFY):
+            return
+        self._push(until, med_id, occurrence_iso, REMINDER_RENOTIFY)
+        await self._async_save()
+        self._arm_timer()
+
+    async def async_config_changed(self, med_id: str) -> None:
+        """Re-derive pending deadlines of a medication from its new settings.
+
+        A shorter re-reminder interval or missed-dose delay takes effect
+        immediately; deadlines for features that were turned off are dropped.
+        """
+        pending = [item for item in self._heap if item[1] == med_id]
+        entry_data = self._hass.data.get(DOMAIN, {}).get(med_id)
+        if not pending or not isinstance(entry_data, dict):
+            return
+        config = entry_data["entry"].data
+        notify_enabled = config.get(
+            CONF_ENABLE_AUTOMATIC_NOTIFICATIONS, DEFAULT_ENABLE_AUTOMATIC_NOTIFICATIONS
+        )
+        interval = config.get(
+            CONF_REMINDER_INTERVAL_MINUTES, DEFAULT_REMINDER_INTERVAL_MINUTES
+        )
+        missed_after = config.get(
+            CONF_MISSED_AFTER_MINUTES, DEFAULT_MISSED_AFTER_MINUTES
+        )
+
+        self._remove(med_id)
+        now = dt_util.now()
+        for deadline, _med_id, occurrence_iso, kind in pending:
+            if kind == REMINDER_RENOTIFY:
+                if not (notify_enabled and config.get(CONF_NOTIFY_SERVICES)):
+                    continue
+                if not interval:
+                    continue
+                new_deadline = min(
+                    dt_util.utc_from_timestamp(deadline),
+                    now + timedelta(minutes=interval),
+                )
+            elif kind == REMINDER_MISSED:
+                occurrence = dt_util.parse_datetime(occurrence_iso)
+                if not missed_after or occurrence is None:
+                    continue
+                new_deadline = occurrence + timedelta(minutes=missed_after)
+            else:
+                continue
+            self._push(new_deadline, med_id, occurrence_iso, kind)
+
+        await self._async_save()
+        self._arm_timer()
+
+    async def _async_doses_closed(self, med_id: str, closed: list[LedgerEntry]) -> None:
+        """End the reminders of a dose the ledger closed as missed.
+
+        The dose is marked missed now if it would have been later, so the
+        history holds the same missed dose as the ledger.
+        """
+        occurrence_iso = self._notified.get(med_id)
+        if occurrence_iso is None:
+            return
+        occurrence = dt_util.parse_datetime(occurrence_iso)
+        if not any(
+            entry.outcome == OUTCOME_MISSED
+            and entry.at is None
+            and entry.scheduled == occurrence
+            for entry in closed
+        ):
+            return
+        pending = [
+            item
+            for item in self._heap
+            if item[1] == med_id and item[2] == occurrence_iso
+        ]
+        if not pending:
+            return
+        self._remove(med_id)
+        await self._async_save()
+        self._arm_timer()
+        if any(item[3] == REMINDER_MISSED for item in pending):
+            await self._async_mark_missed(med_id, occurrence_iso)
+
+    def _push(
+        self, deadline: datetime, med_id: str, occurrence_iso: str, kind: str
+    ) -> None:
+        """Add a deadline to the heap."""
+        heapq.heappush(self._heap, (deadline.timestamp(), med_id, occurrence_iso, kind))
+
+    def _remove(self, med_id: str, kind: str | None = None) -> bool:
+        """Remove pending deadlines for a medication; return True if any were removed."""
+        kept = [
+            item
+            for item in self._heap
+            if item[1] != med_id or (kind is not None and item[3] != kind)
+        ]
+        if len(kept) == len(self._heap):
+            return False
+        heapq.heapify(kept)
+        self._heap = kept
+        return True
+
+    @callback
+    def _arm_timer(self) -> None:
+        """Arm the single timer for the earliest pending deadline."""
+        if not self._heap:
+            if self._unsub_timer is not None:
+                self._unsub_timer()
+                self._unsub_timer = None
+                self._timer_deadline = None
+            return
+
+        deadline = self._heap[0][0]
+        if self._unsub_timer is not None:
+            if self._timer_deadline == deadline:
+                return
+            self._unsub_timer()
+
+        self._timer_deadline = deadline
+        self._unsub_timer = async_track_point_in_time(
+            self._hass, self._async_timer_fired, dt_util.utc_from_timestamp(deadline)
+        )
+
+    async def _async_timer_fired(self, now: datetime) -> None:
+        """Service every deadline that has passed."""
+        self._unsub_timer = None
+        self._timer_deadline = None
+
+        now_ts = now.timestamp()
+        due: list[ReminderItem] = []
+        while self._heap and self._heap[0][0] <= now_ts:
+            due.append(heapq.heappop(self._heap))
+
+        for deadline, med_id, occurrence_iso, kind in due:
+            if self._notified.get(med_id) != occurrence_iso:
+                continue
+            entry_data = self._hass.data.get(DOMAIN, {}).get(med_id)
+            if not isinstance(entry_data, dict) or "entry" not in entry_data:
+                continue
+
+            if kind == REMINDER_MISSED:
+                self._remove(med_id)
+                await self._async_mark_missed(med_id, occurrence_iso)
+                continue
+
+            await self._async_renotify(
+                med_id, entry_data["entry"].data, occurrence_iso, deadline
+            )
+
+        if due:
+            await self._async_save()
+        self._arm_timer()
+
+    async def _async_renotify(
+        self,
+        med_id: str,
+        config: dict[str, Any],
+        occurrence_iso: str,
+        deadline: float,
+    ) -> None:
+        """Send a follow-up reminder and queue the next one."""
+        occurrence = dt_util.parse_datetime(occurrence_iso)
+        if occurrence is None:
+            return
+
+        now = dt_util.now()
+        notify_services = config.get(CONF_NOTIFY_SERVICES, [])
+        escalate_after = config.get(
+            CONF_ESCALATION_AFTER_MINUTES, DEFAULT_ESCALATION_AFTER_MINUTES
+        )
+        title = "Medication Reminder"
+        if escalate_after and now - occurrence >= timedelta(minutes=escalate_after):
+            notify_services = (
+                config.get(CONF_ESCALATION_NOTIFY_SERVICES) or notify_services
+            )
+            title = "Medication Reminder (Overdue)"
+
+        await async_send_medication_notification(
+            self._hass, med_id, notify_services, title=title
+        )
+
+        interval = config.get(
+            CONF_REMINDER_INTERVAL_MINUTES, DEFAULT_REMINDER_INTERVAL_MINUTES
+        )
+        if not interval:
+            return
+        missed_after = config.get(
+            CONF_MISSED_AFTER_MINUTES, DEFAULT_MISSED_AFTER_MINUTES
+        )
+        limit = occurrence + (
+            timedelta(minutes=missed_after)
+            if missed_after
+            else timedelta(hours=MAX_REMINDER_WINDOW_HOURS)
+        )
+        next_deadline = dt_util.utc_from_timestamp(deadline) + timedelta(
+            minutes=interval
+        )
+        if next_deadline < limit:
+            self._push(next_deadline, med_id, occurrence_iso, REMINDER_RENOTIFY)
+
+    async def _async_mark_missed(self, med_id: str, occurrence_iso: str) -> None:
+        """Record a dose that was neither taken nor skipped in time."""
+        now = dt_util.now()
+        data = await self._store.async_load()
+        med_data = data["medications"].get(med_id)
+        if not med_data:
+            return
+
+        changes = await self._store.async_append_history(
+            {
+                "medication_id": med_id,
+                "medication_name": med_data.get(CONF_MEDICATION_NAME, "Unknown"),
+                "timestamp": now.isoformat(),
+                "action": "missed",
+                "scheduled_time": occurrence_iso,
+            }
+        )
+
+        await log_utils.async_log_event(
+            self._hass,
+            action="missed",
+            medication_id=med_id,
+            medication_name=med_data.get(CONF_MEDICATION_NAME, "Unknown"),
+            dosage=med_data.get(CONF_DOSAGE),
+            dosage_unit=med_data.get(CONF_DOSAGE_UNIT),
+            remaining_amount=med_data.get("remaining_amount"),
+            refill_amount=med_data.get(CONF_REFILL_AMOUNT),
+            snooze_until=None,
+            details={"timestamp": now.isoformat(), "scheduled_time": occurrence_iso},
+        )
+
+        async_signal_changes(self._hass, changes)
+        _LOGGER.info(
+            "Medication %s marked as missed for %s",
+            med_data.get(CONF_MEDICATION_NAME),
+            occurrence_iso,
+        )
+
+    async def _async_save(self) -> None:
+        """Persist pending deadlines and notified occurrences.
+
+        The file is separate from the medications, so saving it neither
+        waits for nor blocks medication updates.
+        """
+        await self._reminders_store.async_save(
+            {
+                "pending": [list(item) for item in self._heap],
+                "notified": dict(self._notified),
+            }
+        )
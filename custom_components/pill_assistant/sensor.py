@@ -5,13 +5,17 @@ from __future__ import annotations
 from datetime import datetime, timedelta
 import logging
 
-from homeassistant.components.sensor import SensorEntity
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorStateClass,
+)
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant, callback
-from homeassistant.helpers.device_registry import DeviceInfo
+from homeassistant.const import PERCENTAGE, EntityCategory, UnitOfTime
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, State, callback
+from homeassistant.helpers.device_registry import DeviceEntryType, DeviceInfo
 from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.event import async_track_time_interval
 import homeassistant.util.dt as dt_util
 
 from .const import (
@@ -35,7 +39,6 @@ from .const import (
     CONF_REFILL_AMOUNT,
     CONF_REFILL_REMINDER_DAYS,
     CONF_NOTES,
-    CONF_NOTIFY_SERVICES,
     CONF_ENABLE_AUTOMATIC_NOTIFICATIONS,
     CONF_ON_TIME_WINDOW_MINUTES,
     DEFAULT_SCHEDULE_TYPE,
@@ -58,8 +61,20 @@ from .const import (
     ATTR_SNOOZE_UNTIL,
     ATTR_DOSES_TAKEN_TODAY,
     ATTR_TAKEN_SCHEDULED_RATIO,
+    ATTR_RUN_OUT_DATE,
+    ATTR_DAILY_CONSUMPTION,
+    SIGNAL_ADHERENCE_UPDATED,
+    SIGNAL_EVALUATION_TICK,
+    SIGNAL_MEDICATION_CONFIG_UPDATED,
+    SIGNAL_MEDICATION_UPDATED,
+    METRICS_ENTRY,
 )
 from . import log_utils
+from .adherence import ADHERENCE_WINDOWS, AdherenceTracker
+from .evaluation import EvaluationContext
+from .forecast import RUN_OUT, daily_rate, project_run_out
+from .hub import MedicationConfig, entry_medication_ids
+from .metrics import LATENCY_METRICS, METRICS, METRIC_SENSOR_UPDATE, timed
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -120,14 +135,31 @@ async def async_setup_entry(
     entry: ConfigEntry,
     async_add_entities: AddEntitiesCallback,
 ) -> None:
-    """Set up the Pill Assistant sensor."""
-    async_add_entities([PillAssistantSensor(hass, entry)], True)
+    """Set up the Pill Assistant sensors."""
+    # A hub entry adds the sensors of all of its medications at once
+    entities: list[SensorEntity] = []
+    for med_id in entry_medication_ids(entry):
+        medication = hass.data[DOMAIN][med_id]["entry"]
+        entities.append(PillAssistantSensor(hass, medication))
+        entities.append(PillAssistantRunOutSensor(hass, medication))
+        entities.extend(
+            PillAssistantAdherenceSensor(hass, medication, days)
+            for days in ADHERENCE_WINDOWS
+        )
+
+    # Latency sensors cover the whole integration, so one entry owns them
+    if hass.data[DOMAIN].setdefault(METRICS_ENTRY, entry.entry_id) == entry.entry_id:
+        entities.extend(
+            PillAssistantLatencySensor(metric) for metric in LATENCY_METRICS
+        )
+
+    async_add_entities(entities, True)
 
 
 class PillAssistantSensor(SensorEntity):
     """Representation of a Pill Assistant medication sensor."""
 
-    def __init__(self, hass: HomeAssistant, entry: ConfigEntry) -> None:
+    def __init__(self, hass: HomeAssistant, entry: MedicationConfig) -> None:
         """Initialize the sensor."""
         self.hass = hass
         self._entry = entry
@@ -138,42 +170,105 @@ class PillAssistantSensor(SensorEntity):
         self._attr_unique_id = f"{DOMAIN}_{entry.entry_id}"
         self._attr_native_value = "scheduled"
         self._medication_id = entry.entry_id
-        self._last_notification_time = None  # Track when we last sent a notification
+        # Time of the trigger sensor event that matches this medication's
+        # trigger, refreshed only when the sensor changes
+        self._sensor_trigger_time: datetime | None = None
+        self._sensor_trigger_tracked = False
+        # Subscriptions that depend on the medication's configuration
+        self._config_unsubs: list[CALLBACK_TYPE] = []
 
         # Get storage data
         self._store_data = hass.data[DOMAIN][entry.entry_id]
 
     async def async_added_to_hass(self) -> None:
         """Run when entity about to be added to hass."""
-        # Subscribe to dispatcher signal for immediate updates (per-med and global)
+        self._async_subscribe_config()
+        self.async_on_remove(self._async_unsubscribe_config)
+
+        # Evaluate the schedule in the context shared by all sensors
         self.async_on_remove(
-            async_dispatcher_connect(
-                self.hass,
-                f"pill_assistant_medication_updated_{self._medication_id}",
-                self._async_update,
+            self.hass.data[DOMAIN]["evaluator"].async_register(
+                self._medication_id, self._compute_next_dose
             )
         )
 
-        # Also listen for global medication updates so dependent/relative medications
-        # can recalculate next doses immediately when any medication changes
+        # Apply options changes in place instead of reloading the entry
         self.async_on_remove(
             async_dispatcher_connect(
                 self.hass,
-                f"{DOMAIN}_medication_updated",
-                self._async_update,
+                f"{SIGNAL_MEDICATION_CONFIG_UPDATED}_{self._medication_id}",
+                self._async_config_updated,
             )
         )
 
-        # Update every minute to check for missed doses
+        # Refresh every minute, after the shared evaluation of all schedules
         self.async_on_remove(
-            async_track_time_interval(
-                self.hass,
-                self._async_update,
-                timedelta(minutes=1),
+            async_dispatcher_connect(
+                self.hass, SIGNAL_EVALUATION_TICK, self._async_update
+            )
+        )
+        await self._async_update(None)
+
+    @callback
+    def _async_subscribe_config(self) -> None:
+        """Subscribe to what the current schedule depends on."""
+        # Refresh when this medication changes, and when the medication a
+        # relative schedule follows changes
+        watched = {self._medication_id}
+        if self._entry.data.get(CONF_SCHEDULE_TYPE) == "relative_medication":
+            rel_med_id = self._entry.data.get(CONF_RELATIVE_TO_MEDICATION)
+            if rel_med_id:
+                watched.add(rel_med_id)
+        for med_id in watched:
+            self._config_unsubs.append(
+                async_dispatcher_connect(
+                    self.hass,
+                    f"{SIGNAL_MEDICATION_UPDATED}_{med_id}",
+                    self._async_update,
+                )
+            )
+
+        # Recompute relative_sensor doses as soon as the trigger sensor changes
+        sensor_entity_id = self._entry.data.get(CONF_RELATIVE_TO_SENSOR)
+        tracker = self.hass.data[DOMAIN].get("trigger_tracker")
+        if (
+            self._entry.data.get(CONF_SCHEDULE_TYPE) == "relative_sensor"
+            and sensor_entity_id
+            and tracker is not None
+        ):
+            self._config_unsubs.append(
+                tracker.async_add_listener(
+                    sensor_entity_id, self._async_trigger_state_changed
+                )
             )
+            self._sensor_trigger_time = self._match_sensor_trigger(
+                tracker.last_state(sensor_entity_id)
+            )
+            self._sensor_trigger_tracked = True
+
+    @callback
+    def _async_unsubscribe_config(self) -> None:
+        """Drop the subscriptions of the previous schedule."""
+        while self._config_unsubs:
+            self._config_unsubs.pop()()
+        self._sensor_trigger_time = None
+        self._sensor_trigger_tracked = False
+
+    async def _async_config_updated(self) -> None:
+        """Apply a changed configuration without re-creating the entity."""
+        self._medication_name = self._entry.data.get(
+            CONF_MEDICATION_NAME, "Unknown Medication"
         )
+        self._attr_name = f"PA_{self._medication_name.title()}"
+        self._async_unsubscribe_config()
+        self._async_subscribe_config()
         await self._async_update(None)
 
+    @property
+    def _evaluation(self) -> EvaluationContext:
+        """Return the evaluation context of the current refresh."""
+        return self.hass.data[DOMAIN]["evaluator"].context
+
     @property
     def icon(self) -> str:
         """Return the icon to use in the frontend."""
@@ -299,6 +394,14 @@ class PillAssistantSensor(SensorEntity):
             "log_file_location": global_log_path,  # Backward compatibility
         }
 
+        # Refill forecast from the observed consumption
+        run_out = self._run_out(med_data)
+        attributes[ATTR_RUN_OUT_DATE] = run_out.isoformat() if run_out else None
+        rate = daily_rate(med_data)
+        attributes[ATTR_DAILY_CONSUMPTION] = (
+            round(rate, 2) if rate is not None else None
+        )
+
         # Add notes if present
         notes = self._entry.data.get(CONF_NOTES, "")
         if notes:
@@ -407,29 +510,34 @@ class PillAssistantSensor(SensorEntity):
             return "0 min"
         return " ".join(parts)
 
+    def _run_out(self, med_data: dict) -> datetime | None:
+        """Return the projected run-out date stored with the medication.
+
+        Records saved before forecasting existed have none until their next
+        dose or refill, so it is projected from the schedule until then.
+        """
+        if RUN_OUT in med_data:
+            return self._evaluation.parse(med_data[RUN_OUT])
+        return project_run_out(med_data, self._entry.data, self._evaluation.now)
+
     def _get_doses_taken_today(self) -> list:
         """Get list of dose timestamps taken today."""
-        storage_data = self._store_data["storage_data"]
-        history = storage_data.get("history", [])
+        # The recent-window cache is enough for today and is there at startup
+        history = self._store_data["store"].recent_history
 
-        now = dt_util.now()
-        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        context = self._evaluation
+        today_start = context.now.replace(hour=0, minute=0, second=0, microsecond=0)
 
         doses_today = []
-        for entry in history:
+        for event in history:
             if (
-                entry.get("medication_id") == self._medication_id
-                and entry.get("action") == "taken"
+                event.get("medication_id") == self._medication_id
+                and event.get("action") == "taken"
             ):
-                try:
-                    parsed_ts = dt_util.parse_datetime(entry["timestamp"])
-                    if parsed_ts is None:
-                        continue
-                    timestamp = dt_util.as_local(parsed_ts)
-                    if timestamp >= today_start:
-                        doses_today.append(timestamp.strftime("%H:%M"))
-                except (ValueError, KeyError, TypeError):
-                    continue
+                # Events keep their parsed time, so nothing is parsed here
+                timestamp = event.time
+                if timestamp is not None and timestamp >= today_start:
+                    doses_today.append(timestamp.strftime("%H:%M"))
 
         return doses_today
 
@@ -439,8 +547,7 @@ class PillAssistantSensor(SensorEntity):
         schedule_times = self._entry.data.get(CONF_SCHEDULE_TIMES, [])
         schedule_days = self._entry.data.get(CONF_SCHEDULE_DAYS, [])
 
-        now = dt_util.now()
-        today_day = now.strftime("%a").lower()[:3]
+        today_day = self._evaluation.now.strftime("%a").lower()[:3]
 
         # Check if today is a scheduled day
         if today_day not in schedule_days:
@@ -454,6 +561,10 @@ class PillAssistantSensor(SensorEntity):
         return 1
 
     def _calculate_next_dose(self) -> datetime | None:
+        """Return the next dose time from the shared evaluation context."""
+        return self._evaluation.next_dose(self._medication_id)
+
+    def _compute_next_dose(self, context: EvaluationContext) -> datetime | None:
         """Calculate the next dose time based on schedule type."""
         schedule_type = self._entry.data.get(CONF_SCHEDULE_TYPE, DEFAULT_SCHEDULE_TYPE)
         schedule_days = self._entry.data.get(CONF_SCHEDULE_DAYS, [])
@@ -479,38 +590,29 @@ class PillAssistantSensor(SensorEntity):
                 normalized_days.append(day_map[day_lower])
 
         if schedule_type == "fixed_time":
-            return self._calculate_fixed_time_dose(normalized_days)
+            return self._calculate_fixed_time_dose(context, normalized_days)
         elif schedule_type == "relative_medication":
-            return self._calculate_relative_medication_dose(normalized_days)
+            return self._calculate_relative_medication_dose(context, normalized_days)
         elif schedule_type == "relative_sensor":
-            return self._calculate_relative_sensor_dose(normalized_days)
+            return self._calculate_relative_sensor_dose(context, normalized_days)
 
         return None
 
-    def _calculate_fixed_time_dose(self, normalized_days: list) -> datetime | None:
+    def _calculate_fixed_time_dose(
+        self, context: EvaluationContext, normalized_days: list
+    ) -> datetime | None:
         """Calculate next dose for fixed time schedule."""
         schedule_times = self._entry.data.get(CONF_SCHEDULE_TIMES, [])
 
         if not schedule_times or not normalized_days:
             return None
 
-        now = dt_util.now()
-
         # If the medication was just taken, prefer the next scheduled time after that
-        storage_data = self._store_data["storage_data"]
-        med_data = storage_data["medications"].get(self._medication_id, {})
-        last_taken_str = med_data.get("last_taken")
-        reference_time = now
-        if last_taken_str:
-            try:
-                last_taken_dt = dt_util.parse_datetime(last_taken_str)
-                if last_taken_dt is not None:
-                    last_taken_dt = dt_util.as_local(last_taken_dt)
-                    # Use the later of now and last_taken to compute the next occurrence
-                    if last_taken_dt > reference_time:
-                        reference_time = last_taken_dt
-            except (ValueError, TypeError):
-                pass
+        reference_time = context.now
+        last_taken_dt = context.last_taken(self._medication_id)
+        # Use the later of now and last_taken to compute the next occurrence
+        if last_taken_dt is not None and last_taken_dt > reference_time:
+            reference_time = last_taken_dt
 
         # Find next scheduled time after reference_time
         for day_offset in range(8):  # Check next 7 days plus today
@@ -541,7 +643,7 @@ class PillAssistantSensor(SensorEntity):
         return None
 
     def _calculate_relative_medication_dose(
-        self, normalized_days: list
+        self, context: EvaluationContext, normalized_days: list
     ) -> datetime | None:
         """Calculate next dose relative to another medication."""
         rel_med_id = self._entry.data.get(CONF_RELATIVE_TO_MEDICATION)
@@ -552,33 +654,18 @@ class PillAssistantSensor(SensorEntity):
             return None
 
         # Get the reference medication's last taken time
-        if rel_med_id not in self.hass.data[DOMAIN]:
-            return None
-
-        ref_entry_data = self.hass.data[DOMAIN][rel_med_id]
-        ref_storage_data = ref_entry_data["storage_data"]
-        ref_med_data = ref_storage_data["medications"].get(rel_med_id, {})
-        ref_last_taken_str = ref_med_data.get("last_taken")
-
-        if not ref_last_taken_str:
+        ref_last_taken = context.last_taken(rel_med_id)
+        if ref_last_taken is None:
             # If reference medication hasn't been taken yet, return None
             return None
 
-        try:
-            ref_last_taken = dt_util.parse_datetime(ref_last_taken_str)
-            if ref_last_taken is None:
-                return None
-            ref_last_taken = dt_util.as_local(ref_last_taken)
-        except (ValueError, TypeError):
-            return None
-
         # Calculate next dose time as offset from reference medication
         next_dose = ref_last_taken + timedelta(
             hours=offset_hours, minutes=offset_minutes
         )
 
         # Check if it's on a valid day
-        now = dt_util.now()
+        now = context.now
         check_day = next_dose.strftime("%a").lower()[:3]
 
         if check_day not in normalized_days:
@@ -596,29 +683,25 @@ class PillAssistantSensor(SensorEntity):
 
         return None
 
-    def _calculate_relative_sensor_dose(self, normalized_days: list) -> datetime | None:
-        """Calculate next dose relative to a sensor event."""
-        sensor_entity_id = self._entry.data.get(CONF_RELATIVE_TO_SENSOR)
-        offset_hours = self._entry.data.get(CONF_RELATIVE_OFFSET_HOURS, 0)
-        offset_minutes = self._entry.data.get(CONF_RELATIVE_OFFSET_MINUTES, 0)
+    @callback
+    def _async_trigger_state_changed(self, new_state: State | None) -> None:
+        """Re-evaluate the trigger when the tracked sensor changes."""
+        self._sensor_trigger_time = self._match_sensor_trigger(new_state)
+        self.hass.data[DOMAIN]["evaluator"].async_invalidate()
+        self.hass.async_create_task(self._async_update())
+
+    def _match_sensor_trigger(self, sensor_state: State | None) -> datetime | None:
+        """Return the sensor's last change time if its value matches the trigger."""
         trigger_value = self._entry.data.get(
             CONF_SENSOR_TRIGGER_VALUE, DEFAULT_SENSOR_TRIGGER_VALUE
         )
         trigger_attribute = self._entry.data.get(
             CONF_SENSOR_TRIGGER_ATTRIBUTE, DEFAULT_SENSOR_TRIGGER_ATTRIBUTE
         )
-        avoid_duplicates = self._entry.data.get(
-            CONF_AVOID_DUPLICATE_TRIGGERS, DEFAULT_AVOID_DUPLICATE_TRIGGERS
-        )
         ignore_unavailable = self._entry.data.get(
             CONF_IGNORE_UNAVAILABLE, DEFAULT_IGNORE_UNAVAILABLE
         )
 
-        if not sensor_entity_id:
-            return None
-
-        # Get the sensor's last changed time
-        sensor_state = self.hass.states.get(sensor_entity_id)
         if not sensor_state:
             return None
 
@@ -665,6 +748,32 @@ class PillAssistantSensor(SensorEntity):
             if current_value != trigger_value_lower:
                 return None
 
+        return sensor_last_changed
+
+    def _calculate_relative_sensor_dose(
+        self, context: EvaluationContext, normalized_days: list
+    ) -> datetime | None:
+        """Calculate next dose relative to a sensor event."""
+        sensor_entity_id = self._entry.data.get(CONF_RELATIVE_TO_SENSOR)
+        offset_hours = self._entry.data.get(CONF_RELATIVE_OFFSET_HOURS, 0)
+        offset_minutes = self._entry.data.get(CONF_RELATIVE_OFFSET_MINUTES, 0)
+        avoid_duplicates = self._entry.data.get(
+            CONF_AVOID_DUPLICATE_TRIGGERS, DEFAULT_AVOID_DUPLICATE_TRIGGERS
+        )
+
+        if not sensor_entity_id:
+            return None
+
+        # Without a state-change subscription, fall back to reading the state
+        if not self._sensor_trigger_tracked:
+            self._sensor_trigger_time = self._match_sensor_trigger(
+                self.hass.states.get(sensor_entity_id)
+            )
+
+        sensor_last_changed = self._sensor_trigger_time
+        if sensor_last_changed is None:
+            return None
+
         # If avoiding duplicates, check if we've already triggered for this sensor event
         if avoid_duplicates:
             storage_data = self._store_data["storage_data"]
@@ -685,7 +794,7 @@ class PillAssistantSensor(SensorEntity):
         )
 
         # Check if it's on a valid day
-        now = dt_util.now()
+        now = context.now
         check_day = next_dose.strftime("%a").lower()[:3]
 
         if check_day not in normalized_days:
@@ -704,174 +813,28 @@ class PillAssistantSensor(SensorEntity):
         return None
 
     def _get_missed_doses(self) -> list:
-        """Get list of missed doses."""
-        schedule_times = self._entry.data.get(CONF_SCHEDULE_TIMES, [])
-        schedule_days = self._entry.data.get(CONF_SCHEDULE_DAYS, [])
-
-        if not schedule_times or not schedule_days:
+        """Get the most recent missed doses from the dose ledger."""
+        ledger = self.hass.data[DOMAIN].get("ledger")
+        if ledger is None:
             return []
-
-        now = dt_util.now()
-        storage_data = self._store_data["storage_data"]
-        med_data = storage_data["medications"].get(self._medication_id, {})
-        last_taken_str = med_data.get("last_taken")
-
-        last_taken = None
-        if last_taken_str:
-            try:
-                last_taken = dt_util.parse_datetime(last_taken_str)
-                if last_taken is not None:
-                    last_taken = dt_util.as_local(last_taken)
-            except (ValueError, TypeError):
-                pass
-
-        # Collect all scheduled dose times in the last 24 hours (use a set to avoid duplicates)
-        scheduled_dose_times = set()
-
-        # Check each day in the last 2 days to cover 24 hour window
-        for day_offset in range(2):
-            check_date = now - timedelta(days=day_offset)
-            check_day = check_date.strftime("%a").lower()[:3]
-
-            if check_day not in schedule_days:
-                continue
-
-            for time_str in schedule_times:
-                try:
-                    if isinstance(time_str, list):
-                        time_str = time_str[0] if time_str else "00:00"
-
-                    hour, minute = map(int, time_str.split(":"))
-                    dose_time = check_date.replace(
-                        hour=hour, minute=minute, second=0, microsecond=0
-                    )
-
-                    # Only consider doses within last 24 hours
-                    time_diff = (now - dose_time).total_seconds()
-                    if 0 < time_diff <= 86400:  # Between 0 and 24 hours ago
-                        scheduled_dose_times.add(dose_time)
-                except (ValueError, AttributeError):
-                    continue
-
-        # Filter for actually missed doses
-        missed = []
-        for dose_time in sorted(scheduled_dose_times):
-            # If dose time is in the past and after last taken
-            if dose_time < now:
-                if last_taken is None or dose_time > last_taken:
-                    # Check if it's more than 30 minutes overdue
-                    if (now - dose_time).total_seconds() > 1800:
-                        missed.append(dose_time.isoformat())
-
-        return missed[:5]  # Limit to 5 most recent
+        return ledger.recent_missed(self._medication_id, self._evaluation.now)
 
     async def _send_automatic_notification(self) -> None:
-        """Send automatic notification when medication is due."""
-        # Check if automatic notifications are enabled
-        enable_auto_notify = self._entry.data.get(
-            CONF_ENABLE_AUTOMATIC_NOTIFICATIONS, DEFAULT_ENABLE_AUTOMATIC_NOTIFICATIONS
-        )
-        if not enable_auto_notify:
-            return
+        """Hand a due dose to the reminder scheduler.
 
-        # Get notification services
-        notify_services = self._entry.data.get(CONF_NOTIFY_SERVICES, [])
-        if not notify_services:
-            return
-
-        # Determine current next dose (used for deduplication)
+        The scheduler sends the first notification, remembers the occurrence it
+        was sent for across restarts and queues any configured re-reminders.
+        """
         current_next = self._calculate_next_dose()
+        if current_next is None:
+            return
 
-        # Check if we already sent a notification recently (within the last hour)
-        now = dt_util.now()
-        if self._last_notification_time:
-            try:
-                last_notif = dt_util.parse_datetime(self._last_notification_time)
-                if last_notif is not None:
-                    last_notif_local = dt_util.as_local(last_notif)
-                    # Don't send another notification if we sent one within the last hour
-                    if (now - last_notif_local).total_seconds() < 3600:
-                        return
-            except (ValueError, TypeError):
-                pass
-
-        # If we've already sent a notification for this exact scheduled occurrence,
-        # don't send it again (prevents spam/loops for the same dose)
-        if hasattr(self, "_last_notified_next_dose") and current_next is not None:
-            try:
-                if self._last_notified_next_dose == current_next.isoformat():
-                    return
-            except Exception:
-                # On any error, just proceed to attempt notification
-                pass
-
-        # Get medication details from storage
-        storage_data = self._store_data["storage_data"]
-        med_data = storage_data["medications"].get(self._medication_id, {})
-
-        med_name = med_data.get(CONF_MEDICATION_NAME, self._medication_name)
-        dosage = med_data.get(CONF_DOSAGE, self._entry.data.get(CONF_DOSAGE, ""))
-        dosage_unit = med_data.get(
-            CONF_DOSAGE_UNIT, self._entry.data.get(CONF_DOSAGE_UNIT, "")
-        )
-        medication_type = med_data.get(
-            CONF_MEDICATION_TYPE,
-            self._entry.data.get(CONF_MEDICATION_TYPE, DEFAULT_MEDICATION_TYPE),
-        )
-
-        # Create notification message with type
-        message = (
-            f"Time to take {dosage} {medication_type}(s) of {med_name} ({dosage_unit})"
-        )
-        title = "Medication Reminder"
-
-        # Send notification to configured services
-        for service_name in notify_services:
-            try:
-                # Extract domain and service
-                service_parts = service_name.split(".")
-                if len(service_parts) == 2:
-                    domain, service = service_parts
-                    await self.hass.services.async_call(
-                        domain,
-                        service,
-                        {
-                            "title": title,
-                            "message": message,
-                            "data": {
-                                "tag": f"pill_assistant_{self._medication_id}",
-                                "actions": [
-                                    {
-                                        "action": f"take_medication_{self._medication_id}",
-                                        "title": "Mark as Taken",
-                                    },
-                                    {
-                                        "action": f"snooze_medication_{self._medication_id}",
-                                        "title": "Snooze",
-                                    },
-                                    {
-                                        "action": f"skip_medication_{self._medication_id}",
-                                        "title": "Skip",
-                                    },
-                                ],
-                            },
-                        },
-                        blocking=False,
-                    )
-            except Exception as err:  # pragma: no cover - notify failure
-                _LOGGER.error(
-                    "Failed to send automatic notification via %s: %s",
-                    service_name,
-                    err,
-                )
-
-        # Update last notification time and record which next-dose we notified for
-        self._last_notification_time = now.isoformat()
-        if current_next is not None:
-            self._last_notified_next_dose = current_next.isoformat()
-        _LOGGER.info("Automatic notification sent for %s", med_name)
+        reminders = self.hass.data[DOMAIN].get("reminders")
+        if reminders is not None:
+            await reminders.async_occurrence_due(self._medication_id, current_next)
 
     @callback
+    @timed(METRIC_SENSOR_UPDATE)
     async def _async_update(self, _now=None) -> None:
         """Update the sensor state."""
         storage_data = self._store_data["storage_data"]
@@ -881,40 +844,37 @@ class PillAssistantSensor(SensorEntity):
         refill_reminder_days = self._entry.data.get(CONF_REFILL_REMINDER_DAYS, 7)
 
         # Check if medication is snoozed
-        now = dt_util.now()
-        snooze_until_str = med_data.get("snooze_until")
+        context = self._evaluation
+        now = context.now
         is_snoozed = False
 
-        if snooze_until_str:
-            try:
-                snooze_until_dt = dt_util.parse_datetime(snooze_until_str)
-                if snooze_until_dt is not None:
-                    snooze_until = dt_util.as_local(snooze_until_dt)
-                    if snooze_until > now:
-                        is_snoozed = True
-                    else:
-                        # Snooze period has expired, clear it
-                        store = self._store_data["store"]
-
-                        def clear_snooze(data: dict) -> None:
-                            """Clear snooze atomically."""
-                            med_data = data["medications"].get(self._medication_id)
-                            if med_data:
-                                med_data["snooze_until"] = None
-
-                        await store.async_update(clear_snooze)
-            except (ValueError, TypeError):
-                pass
-
-        # Calculate if refill is needed
-        # Assuming one dose per scheduled time
-        schedule_times = self._entry.data.get(CONF_SCHEDULE_TIMES, [])
-        schedule_days = self._entry.data.get(CONF_SCHEDULE_DAYS, [])
-        doses_per_week = len(schedule_times) * len(schedule_days)
-        doses_per_day = doses_per_week / 7 if schedule_days else 0
-        days_remaining = remaining / doses_per_day if doses_per_day > 0 else 0
+        snooze_until = context.parse(med_data.get("snooze_until"))
+        if snooze_until is not None:
+            if snooze_until > now:
+                is_snoozed = True
+            else:
+                # Snooze period has expired, clear it
+                store = self._store_data["store"]
+
+                def clear_snooze(data: dict) -> None:
+                    """Clear snooze atomically."""
+                    med_data = data["medications"].get(self._medication_id)
+                    if med_data:
+                        med_data["snooze_until"] = None
+
+                await store.async_update(clear_snooze, med_id=self._medication_id)
+
+        # A refill is needed when the supply runs out within the reminder days;
+        # without a known rate only an empty supply needs one
+        run_out = self._run_out(med_data)
+        if remaining <= 0:
+            refill_needed = True
+        elif run_out is None:
+            refill_needed = False
+        else:
+            refill_needed = run_out - now <= timedelta(days=refill_reminder_days)
 
-        if days_remaining <= refill_reminder_days:
+        if refill_needed:
             self._attr_native_value = "refill_needed"
         else:
             # Check if dose is due (but respect snooze)
@@ -938,27 +898,186 @@ class PillAssistantSensor(SensorEntity):
                 elif time_to_dose < 0:
                     self._attr_native_value = "overdue"
                 else:
-                    # Check last taken
-                    last_taken_str = med_data.get("last_taken")
-                    if last_taken_str:
-                        last_taken = None
-                        try:
-                            parsed_last = dt_util.parse_datetime(last_taken_str)
-                            if parsed_last is not None:
-                                last_taken = dt_util.as_local(parsed_last)
-                            # If taken within last 6 hours, show as taken
-                            if (
-                                last_taken
-                                and (now - last_taken).total_seconds() < 21600
-                            ):
-                                self._attr_native_value = "taken"
-                            else:
-                                self._attr_native_value = "scheduled"
-                        except (ValueError, TypeError):
-                            self._attr_native_value = "scheduled"
+                    # If taken within last 6 hours, show as taken
+                    last_taken = context.last_taken(self._medication_id)
+                    if last_taken and (now - last_taken).total_seconds() < 21600:
+                        self._attr_native_value = "taken"
                     else:
                         self._attr_native_value = "scheduled"
             else:
                 self._attr_native_value = "scheduled"
 
         self.async_write_ha_state()
+
+
+class PillAssistantLatencySensor(SensorEntity):
+    """Latency of one hot path, as its 95th percentile in milliseconds.
+
+    Disabled by default; enable it to see how long saves, CSV writes,
+    statistics queries or a service take on this installation.
+    """
+
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+    _attr_icon = "mdi:timer-outline"
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_should_poll = False
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    def __init__(self, metric: str) -> None:
+        """Initialize the sensor."""
+        self._metric = metric
+        self._attr_name = f"PA Latency {metric.replace('_', ' ').title()}"
+        self._attr_unique_id = f"{DOMAIN}_latency_{metric}"
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, "diagnostics")},
+            name="Pill Assistant Diagnostics",
+            manufacturer="Pill Assistant",
+            model="Diagnostics",
+            entry_type=DeviceEntryType.SERVICE,
+        )
+
+    async def async_added_to_hass(self) -> None:
+        """Run when entity about to be added to hass."""
+        # Publish new percentiles once a minute rather than on every call
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass, SIGNAL_EVALUATION_TICK, self._async_refresh
+            )
+        )
+
+    async def async_update(self) -> None:
+        """Read the latest percentiles."""
+        summary = METRICS.summary(self._metric)
+        self._attr_native_value = summary["p95_ms"]
+        self._attr_extra_state_attributes = summary
+
+    @callback
+    def _async_refresh(self, _now=None) -> None:
+        """Write the latest percentiles to the state machine."""
+        self.async_schedule_update_ha_state(True)
+
+
+class PillAssistantRunOutSensor(SensorEntity):
+    """When a medication is projected to run out, for refill automations.
+
+    The date is stored with the medication whenever a dose, refill or
+    adjustment is logged, so this sensor only changes with the medication.
+    """
+
+    _attr_device_class = SensorDeviceClass.TIMESTAMP
+    _attr_icon = "mdi:calendar-alert"
+    _attr_should_poll = False
+
+    def __init__(self, hass: HomeAssistant, entry: MedicationConfig) -> None:
+        """Initialize the sensor."""
+        self.hass = hass
+        self._entry = entry
+        self._medication_id = entry.entry_id
+        self._medication_name = entry.data.get(
+            CONF_MEDICATION_NAME, "Unknown Medication"
+        )
+        self._attr_name = f"PA_{self._medication_name.title()} Run Out"
+        self._attr_unique_id = f"{DOMAIN}_run_out_{entry.entry_id}"
+        self._store_data = hass.data[DOMAIN][entry.entry_id]
+
+    @property
+    def device_info(self) -> DeviceInfo:
+        """Return device information."""
+        return DeviceInfo(
+            identifiers={(DOMAIN, self._medication_id)},
+            name=f"Pill Assistant - {self._medication_name}",
+            manufacturer="Pill Assistant",
+            model="Medication Tracker",
+        )
+
+    async def async_added_to_hass(self) -> None:
+        """Refresh when the medication or its configuration changes."""
+        for signal in (SIGNAL_MEDICATION_UPDATED, SIGNAL_MEDICATION_CONFIG_UPDATED):
+            self.async_on_remove(
+                async_dispatcher_connect(
+                    self.hass,
+                    f"{signal}_{self._medication_id}",
+                    self._async_refresh,
+                )
+            )
+
+    async def async_update(self) -> None:
+        """Read the stored run-out date."""
+        med_data = self._store_data["storage_data"]["medications"].get(
+            self._medication_id, {}
+        )
+        if RUN_OUT in med_data:
+            self._attr_native_value = dt_util.parse_datetime(med_data[RUN_OUT] or "")
+        else:
+            self._attr_native_value = project_run_out(
+                med_data, self._entry.data, dt_util.now()
+            )
+
+    @callback
+    def _async_refresh(self) -> None:
+        """Write the current run-out date to the state machine."""
+        self.async_schedule_update_ha_state(True)
+
+
+class PillAssistantAdherenceSensor(SensorEntity):
+    """Percentage of scheduled doses taken over the last 7 or 30 days.
+
+    The totals are kept by the adherence tracker, which notifies the sensor
+    when a dose is counted or a day leaves the window.
+    """
+
+    _attr_icon = "mdi:chart-donut"
+    _attr_native_unit_of_measurement = PERCENTAGE
+    _attr_should_poll = False
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    def __init__(self, hass: HomeAssistant, entry: MedicationConfig, days: int) -> None:
+        """Initialize the sensor."""
+        self.hass = hass
+        self._medication_id = entry.entry_id
+        self._medication_name = entry.data.get(
+            CONF_MEDICATION_NAME, "Unknown Medication"
+        )
+        self._days = days
+        self._attr_name = f"PA_{self._medication_name.title()} Adherence {days}d"
+        self._attr_unique_id = f"{DOMAIN}_adherence_{days}d_{entry.entry_id}"
+
+    @property
+    def device_info(self) -> DeviceInfo:
+        """Return device information."""
+        return DeviceInfo(
+            identifiers={(DOMAIN, self._medication_id)},
+            name=f"Pill Assistant - {self._medication_name}",
+            manufacturer="Pill Assistant",
+            model="Medication Tracker",
+        )
+
+    async def async_added_to_hass(self) -> None:
+        """Refresh when the tracker's totals change."""
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass,
+                f"{SIGNAL_ADHERENCE_UPDATED}_{self._medication_id}",
+                self._async_refresh,
+            )
+        )
+
+    async def async_update(self) -> None:
+        """Read the totals of the window."""
+        tracker: AdherenceTracker = self.hass.data[DOMAIN]["adherence"]
+        window = tracker.window(self._medication_id, self._days)
+        self._attr_native_value = window.adherence
+        self._attr_extra_state_attributes = {
+            "Window (days)": window.days,
+            "Taken": window.taken,
+            "Taken on time": window.on_time,
+            "Scheduled": window.scheduled,
+            "On-time percentage": window.on_time_percentage,
+        }
+
+    @callback
+    def _async_refresh(self) -> None:
+        """Write the current totals to the state machine."""
+        self.async_schedule_update_ha_state(True)
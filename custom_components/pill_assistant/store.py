@@ -1,26 +1,141 @@
 from __future__ import annotations
 
 import asyncio
+from collections.abc import AsyncIterator, Mapping, Sequence
+from contextlib import asynccontextmanager
+import copy
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+import heapq
 import logging
+from types import MappingProxyType
 from typing import Any, Callable
 
 from homeassistant.core import HomeAssistant
+from homeassistant.helpers.dispatcher import async_dispatcher_send
 from homeassistant.helpers.storage import Store
+import homeassistant.util.dt as dt_util
 
-from .const import STORAGE_KEY, STORAGE_VERSION
+from .archive import HistoryArchive
+from .const import (
+    HISTORY_STORAGE_KEY,
+    MEDICATION_STORAGE_KEY,
+    RECENT_HISTORY_DAYS,
+    SIGNAL_MEDICATION_UPDATED,
+    STORAGE_KEY,
+    STORAGE_VERSION,
+)
+from .metrics import METRIC_STORE_UPDATE, timed
+from .models import DoseEvent, Medication
+from .tracing import span
 
 _LOGGER = logging.getLogger(__name__)
 
+_MISSING = object()
+
+
+def medication_storage_key(med_id: str) -> str:
+    """Return the storage key of the state file of a medication."""
+    return f"{MEDICATION_STORAGE_KEY}.{med_id}"
+
+
+def history_storage_key(med_id: str | None) -> str:
+    """Return the storage key of the history file of a medication.
+
+    History entries without a medication are kept in the shared file.
+    """
+    if med_id is None:
+        return HISTORY_STORAGE_KEY
+    return f"{HISTORY_STORAGE_KEY}.{med_id}"
+
+
+def _group_history(
+    events: Sequence[DoseEvent],
+) -> dict[str | None, list[DoseEvent]]:
+    """Return history events by medication, each in stored order."""
+    groups: dict[str | None, list[DoseEvent]] = {}
+    for event in events:
+        groups.setdefault(event.get("medication_id"), []).append(event)
+    return groups
+
+
+def _time_key(pair: tuple[DoseEvent, dict[str, Any]]) -> float:
+    """Return the sort key of a loaded history event; undated events first."""
+    time = pair[0].time
+    return time.timestamp() if time is not None else float("-inf")
+
+
+@dataclass(frozen=True)
+class ChangeSet:
+    """What one store transaction changed.
+
+    ``medications`` maps each changed medication to the names of its changed
+    fields. ``history_indexes`` are the positions of appended history entries
+    (the index used by the edit and delete history services) and ``history``
+    holds those entries. ``rewritten_ids`` are the medications whose stored
+    history was edited or removed. ``record`` is the published record of the
+    medication a striped update was made for.
+    """
+
+    medications: Mapping[str, frozenset[str]] = field(default_factory=dict)
+    history_indexes: tuple[int, ...] = ()
+    history: tuple[DoseEvent, ...] = ()
+    history_rewritten: bool = False
+    rewritten_ids: frozenset[str] = frozenset()
+    record: Medication | None = None
+
+    @property
+    def medication_ids(self) -> frozenset[str]:
+        """Return medications whose record or history changed."""
+        appended = {
+            entry["medication_id"] for entry in self.history if "medication_id" in entry
+        }
+        return frozenset(self.medications) | appended | self.rewritten_ids
+
+    def __bool__(self) -> bool:
+        """Return True if anything changed."""
+        return bool(self.medications or self.history or self.history_rewritten)
+
+
+def async_signal_changes(hass: HomeAssistant, changes: ChangeSet) -> None:
+    """Notify listeners of exactly the medications a change-set touched.
+
+    The global signal carries the change-set and goes first, so shared caches
+    are invalidated before the affected sensors refresh.
+    """
+    with span("dispatch", medications=len(changes.medication_ids)):
+        if changes:
+            async_dispatcher_send(hass, SIGNAL_MEDICATION_UPDATED, changes)
+        for med_id in changes.medication_ids:
+            async_dispatcher_send(hass, f"{SIGNAL_MEDICATION_UPDATED}_{med_id}")
+
 
 class PillAssistantStore:
     """Singleton storage manager with locking for the Pill Assistant integration.
 
     This ensures that all config entries share the same storage instance and
     prevents race conditions when multiple entries try to save at the same time.
+
+    Medication updates are serialized per medication (lock striping), so a
+    take on one medication never waits for a snooze on another. History
+    appends use their own short critical section. After every change an
+    immutable snapshot is published; readers use it without locking and the
+    disk writer serializes it, so a write in progress never sees a dict that
+    is being mutated. Concurrent writes are coalesced into one.
+
+    Every medication is stored in two files of its own, one with its state
+    and its last few days of history (a small recent-window cache) and one
+    with its full history. A small index file lists the medications and
+    holds the shared data. A write only saves the files of the medications
+    it changed, so taking one medication never rewrites the others.
+    Medication state loads first; history loads in the background or on
+    first access, so startup does not depend on how much history has
+    accumulated.
+    History older than the retention period can be moved to an archive;
+    async_history() reads it back when a range reaches that far.
     """
 
     _instance: PillAssistantStore | None = None
-    _lock = asyncio.Lock()
 
     def __new__(cls, hass: HomeAssistant) -> PillAssistantStore:
         """Create or return the singleton instance."""
@@ -36,36 +151,315 @@ class PillAssistantStore:
 
         self._hass = hass
         self._store: Store[dict[str, Any]] = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._history_store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, HISTORY_STORAGE_KEY
+        )
+        self._shards: dict[str, Store[dict[str, Any]]] = {
+            STORAGE_KEY: self._store,
+            HISTORY_STORAGE_KEY: self._history_store,
+        }
+        # Medications with a history file, and the index as last written
+        self._history_ids: set[str] = set()
+        self._written_index: dict[str, Any] | None = None
+        # Files changed since the last write; None is the shared history file
+        self._dirty_medications: set[str] = set()
+        self._dirty_histories: set[str | None] = set()
+        self._archive = HistoryArchive(hass)
         self._data: dict[str, Any] | None = None
+        self._snapshot: dict[str, Any] | None = None
+        self._recent: tuple[DoseEvent, ...] = ()
+        self._history_loaded = False
+        self._generation = 0
+        self._written_generation = 0
+        self._load_lock = asyncio.Lock()
+        self._history_load_lock = asyncio.Lock()
+        self._global_lock = asyncio.Lock()
+        self._history_lock = asyncio.Lock()
+        self._write_lock = asyncio.Lock()
+        self._medication_locks: dict[str, asyncio.Lock] = {}
+        # Stripes are only taken while no global update holds or awaits the
+        # global lock, and a global update waits until no stripe is held
+        self._held_stripes = 0
+        self._stripes_idle = asyncio.Event()
+        self._stripes_idle.set()
+        self._global_free = asyncio.Event()
+        self._global_free.set()
         self._initialized = True
         _LOGGER.debug("PillAssistantStore singleton initialized")
 
+    @property
+    def snapshot(self) -> MappingProxyType:
+        """Return the last published data without taking any lock.
+
+        The snapshot is never mutated; a new one is published after each
+        change. Returns an empty mapping before the first load.
+        """
+        return MappingProxyType(self._snapshot or {})
+
+    @property
+    def history_loaded(self) -> bool:
+        """Return True once the full history has been loaded."""
+        return self._history_loaded
+
+    @property
+    def recent_history(self) -> tuple[DoseEvent, ...]:
+        """Return history entries of the last few days, available at startup."""
+        return self._recent
+
+    @property
+    def archive(self) -> HistoryArchive:
+        """Return the archive of history older than the retention period."""
+        return self._archive
+
     async def async_load(self) -> dict[str, Any]:
-        """Load data from storage.
+        """Load medication data from storage.
+
+        Only the first load from disk is locked. Afterwards this returns the
+        shared data without waiting on writers. ``data["history"]`` is only
+        complete once async_load_history() has finished.
+        """
+        if self._data is None:
+            async with self._load_lock:
+                if self._data is None:
+                    index = await self._store.async_load() or {}
+                    await self._archive.async_load()
+                    if "medications" in index:
+                        await self._async_migrate(index)
+                    else:
+                        await self._async_load_index(index)
+                    _LOGGER.debug("Loaded storage data from disk")
+
+        # Return a reference to the shared data (not a copy)
+        # All entries will share the same dict instance
+        return self._data
+
+    async def async_load_history(self) -> list[dict[str, Any]]:
+        """Load the full history, once, and return the shared history list."""
+        data = await self.async_load()
+        if not self._history_loaded:
+            async with self._history_load_lock:
+                if not self._history_loaded:
+                    await self._async_load_history_files()
+                    if self._archive.pending_until is not None:
+                        await self._async_finish_archive()
+                    _LOGGER.debug(
+                        "Loaded %s history entries from disk", len(data["history"])
+                    )
+        return data["history"]
 
-        Returns a copy of the cached data if available, otherwise loads from disk.
-        This ensures all entries work with consistent data.
+    async def async_history(
+        self, start: datetime | None = None, end: datetime | None = None
+    ) -> Sequence[DoseEvent]:
+        """Return the history, with the archived events from ``start`` on.
+
+        Archives are only read when ``start`` is before the last archive
+        cutoff. The live events are returned in full and in stored order,
+        after the archived events of the range.
+        """
+        await self.async_load_history()
+        live = self._snapshot["history"]
+        archived_until = self._archive.archived_until
+        if archived_until is None or (start is not None and start >= archived_until):
+            return live
+        return tuple(await self._archive.async_read(start, end)) + live
+
+    async def async_iter_history(
+        self, start: datetime | None = None, end: datetime | None = None
+    ) -> AsyncIterator[Sequence[DoseEvent]]:
+        """Yield the events of async_history() one archive file at a time.
+
+        The live events come last, in one piece, as they are in memory
+        anyway. For readers of long ranges, such as exports, that should not
+        hold every archived event at once.
         """
-        async with self._lock:
-            if self._data is None:
-                self._data = await self._store.async_load() or {}
-                self._data.setdefault("medications", {})
-                self._data.setdefault("history", [])
-                self._data.setdefault("last_sensor_trigger", {})
-                _LOGGER.debug("Loaded storage data from disk")
-
-            # Return a reference to the shared data (not a copy)
-            # All entries will share the same dict instance
-            return self._data
+        await self.async_load_history()
+        live = self._snapshot["history"]
+        archived_until = self._archive.archived_until
+        if archived_until is not None and (start is None or start < archived_until):
+            async for events in self._archive.async_iter_read(start, end):
+                yield events
+        yield live
+
+    async def async_archive_history(self, before: datetime) -> int:
+        """Move the history entries older than ``before`` to the archive.
+
+        The archived events are no longer part of the snapshot, but nothing a
+        reader of async_history() sees changes, so no change-set is sent.
+        The archive is written first; if the live history is not rewritten
+        after it, the next history load removes the archived entries.
+        Returns the number of archived entries.
+        """
+        await self.async_load_history()
+        async with self._locked():
+            old = self._history_before(before)
+            if not old:
+                return 0
+            await self._archive.async_add(old, before)
+            self._remove_history(old)
+            await self._async_write()
+            await self._archive.async_finish()
+        return len(old)
+
+    async def _async_finish_archive(self) -> None:
+        """Remove the live entries of an interrupted archive run.
+
+        Nothing older than the cutoff is added while a run holds the lock,
+        so the live entries before it are exactly the archived ones.
+        """
+        async with self._locked():
+            old = self._history_before(self._archive.pending_until)
+            if old:
+                _LOGGER.info("Removing %s already archived history entries", len(old))
+                self._remove_history(old)
+                await self._async_write()
+            await self._archive.async_finish()
+
+    def _history_before(
+        self, before: datetime
+    ) -> list[tuple[DoseEvent, dict[str, Any]]]:
+        """Return the live events and entries older than ``before``."""
+        return [
+            (event, entry)
+            for event, entry in zip(self._snapshot["history"], self._data["history"])
+            if event.time is not None and event.time < before
+        ]
+
+    def _remove_history(self, old: list[tuple[DoseEvent, dict[str, Any]]]) -> None:
+        """Remove archived entries from the live history and its snapshot."""
+        # Entries may have been appended meanwhile; the published events
+        # still match the live entries one to one
+        archived = {id(entry) for _, entry in old}
+        kept = [
+            (event, entry)
+            for event, entry in zip(self._snapshot["history"], self._data["history"])
+            if id(entry) not in archived
+        ]
+        self._data["history"][:] = [entry for _, entry in kept]
+        self._snapshot = {
+            **self._snapshot,
+            "history": tuple(event for event, _ in kept),
+        }
+        self._dirty_histories.update(event.get("medication_id") for event, _ in old)
+        self._generation += 1
+
+    async def _async_load_index(self, index: dict[str, Any]) -> None:
+        """Load the index and the state file of every medication it lists."""
+        med_ids = index.pop("medication_ids", [])
+        self._history_ids = set(index.pop("history_ids", ()))
+        recent = index.pop("recent_history", [])
+        stored = await asyncio.gather(
+            *(
+                self._shard(medication_storage_key(med_id)).async_load()
+                for med_id in med_ids
+            )
+        )
+        medications = {}
+        for med_id, shard in zip(med_ids, stored):
+            if shard is None:
+                _LOGGER.warning("The storage file of medication %s is missing", med_id)
+                continue
+            medications[med_id] = shard["medication"]
+            recent.extend(shard.get("recent_history", ()))
+        index.setdefault("last_sensor_trigger", {})
+        index["medications"] = medications
+        index["history"] = []
+        self._recent = tuple(
+            sorted(
+                self._recent_window(tuple(map(DoseEvent, recent))),
+                key=lambda event: event.time,
+            )
+        )
+        self._data = index
+        self._publish()
+        self._written_index = self._index(self._snapshot)
+
+    async def _async_migrate(self, data: dict[str, Any]) -> None:
+        """Split the single medication file into an index and medication files.
+
+        The old layout kept every medication in one file, and history in a
+        second one (or, before that, in the medication file too). The shared
+        history file is rewritten last, so an interrupted migration starts
+        over from the old files on the next load.
+        """
+        data.setdefault("last_sensor_trigger", {})
+        data.pop("recent_history", None)
+        inline_history = data.pop("history", None) or []
+        stored = await self._history_store.async_load() or {}
+        entries = stored.get("history", []) + inline_history
+        data["history"] = []
+        self._data = data
+        self._publish()
+        self._merge_loaded_history(entries, tuple(map(DoseEvent, entries)))
+        self._recent = self._recent_window(self._snapshot["history"])
+        self._snapshot = {**self._snapshot, "recent_history": self._recent}
+        self._dirty_medications.update(self._snapshot["medications"])
+        self._dirty_histories.update(_group_history(self._snapshot["history"]))
+        self._dirty_histories.add(None)
+        self._generation += 1
+        await self._async_write()
+        _LOGGER.info(
+            "Split storage into files for %s medications and %s history entries",
+            len(self._snapshot["medications"]),
+            len(entries),
+        )
+
+    async def _async_load_history_files(self) -> None:
+        """Load the history file of every medication and the shared one.
+
+        Each file keeps its stored order; the files are interleaved by time.
+        """
+        keys = [HISTORY_STORAGE_KEY] + [
+            history_storage_key(med_id) for med_id in sorted(self._history_ids)
+        ]
+        stored = await asyncio.gather(*(self._shard(key).async_load() for key in keys))
+        files = [
+            [(DoseEvent(entry), entry) for entry in (doc or {}).get("history", ())]
+            for doc in stored
+        ]
+        # Medication entries left in the shared file by an interrupted
+        # migration are already in their own files
+        files[0] = [pair for pair in files[0] if pair[0].get("medication_id") is None]
+        merged = list(heapq.merge(*files, key=_time_key))
+        self._merge_loaded_history(
+            [entry for _, entry in merged], tuple(event for event, _ in merged)
+        )
+
+    def _merge_loaded_history(
+        self, entries: list[dict[str, Any]], events: tuple[DoseEvent, ...]
+    ) -> None:
+        """Fill the history placeholder and its snapshot with loaded entries."""
+        self._data["history"][:0] = entries
+        self._snapshot = {
+            **self._snapshot,
+            "history": events + self._snapshot["history"],
+        }
+        self._history_loaded = True
+
+    def _shard(self, key: str) -> Store[dict[str, Any]]:
+        """Return the store of one storage file."""
+        store = self._shards.get(key)
+        if store is None:
+            store = self._shards[key] = Store(self._hass, STORAGE_VERSION, key)
+        return store
 
     async def async_save(self, data: dict[str, Any]) -> None:
-        """Save data to storage with locking to prevent race conditions."""
-        async with self._lock:
+        """Replace the data and save it to storage."""
+        await self.async_load_history()
+        async with self._locked():
             self._data = data
-            await self._store.async_save(data)
+            self._publish(rewrite_history=True)
+            await self._async_write()
             _LOGGER.debug("Saved storage data to disk")
 
-    async def async_update(self, update_fn: Callable[[dict[str, Any]], None]) -> None:
+    @timed(METRIC_STORE_UPDATE)
+    async def async_update(
+        self,
+        update_fn: Callable[[dict[str, Any]], None],
+        med_id: str | None = None,
+        *,
+        needs_history: bool = False,
+        rewrite_history: bool = False,
+    ) -> ChangeSet:
         """Update storage data using a callback function with proper locking.
 
         This is the coordinator-style update method that ensures atomic updates.
@@ -73,20 +467,334 @@ class PillAssistantStore:
 
         Args:
             update_fn: A function that receives the storage data dict and modifies it.
-        """
-        async with self._lock:
-            if self._data is None:
-                self._data = await self._store.async_load() or {}
-                self._data.setdefault("medications", {})
-                self._data.setdefault("history", [])
-                self._data.setdefault("last_sensor_trigger", {})
+            med_id: The only medication the function changes. Updates of
+                different medications run concurrently; without a medication
+                ID the update takes the global lock, which waits for them and
+                holds off new ones, and compares every record.
+            needs_history: Set when the function appends to history. Other
+                updates change records only and do not load the history.
+            rewrite_history: Set when the function edits or removes history
+                entries instead of only appending.
 
+        Returns:
+            The change-set of the update, so callers need not read back the
+            data they just wrote.
+        """
+        data = await self.async_load()
+        if needs_history or rewrite_history:
+            # Appends and rewrites need all of the history
+            await self.async_load_history()
+        with span("store_lock_wait", medication_id=med_id):
+            release = await self._async_acquire(med_id)
+        try:
             # Call the update function to modify the data
-            update_fn(self._data)
+            update_fn(data)
+            changes = self._publish(med_id, rewrite_history=rewrite_history)
 
             # Save the updated data
-            await self._store.async_save(self._data)
+            await self._async_write()
             _LOGGER.debug("Updated and saved storage data")
+        finally:
+            release()
+        return changes
+
+    async def async_append_history(self, *entries: dict[str, Any]) -> ChangeSet:
+        """Append history entries in their own short critical section."""
+        data = await self.async_load()
+        await self.async_load_history()
+        async with self._history_lock:
+            data["history"].extend(entries)
+            changes = self._publish(changed_medications=())
+            await self._async_write()
+        return changes
+
+    async def _async_acquire(self, med_id: str | None) -> Callable[[], None]:
+        """Take the lock stripe of a medication, or the global lock.
+
+        Stripes of different medications are held at once. The global lock
+        excludes every stripe: it waits until none is held, and none is
+        taken from the moment it is requested until it is released.
+        Returns the callback that releases what was taken.
+        """
+        if med_id is None:
+            await self._global_lock.acquire()
+            self._global_free.clear()
+            try:
+                await self._stripes_idle.wait()
+            except BaseException:
+                self._release_global()
+                raise
+            return self._release_global
+
+        while not self._global_free.is_set():
+            await self._global_free.wait()
+        self._held_stripes += 1
+        self._stripes_idle.clear()
+        lock = self._lock_for(med_id)
+        try:
+            await lock.acquire()
+        except BaseException:
+            self._release_stripe()
+            raise
+
+        def release() -> None:
+            lock.release()
+            self._release_stripe()
+
+        return release
+
+    @asynccontextmanager
+    async def _locked(self, med_id: str | None = None) -> AsyncIterator[None]:
+        """Hold the lock stripe of a medication, or the global lock."""
+        release = await self._async_acquire(med_id)
+        try:
+            yield
+        finally:
+            release()
+
+    def _release_global(self) -> None:
+        """Release the global lock and let stripes be taken again."""
+        self._global_free.set()
+        self._global_lock.release()
+
+    def _release_stripe(self) -> None:
+        """Count a stripe as no longer held."""
+        self._held_stripes -= 1
+        if not self._held_stripes:
+            self._stripes_idle.set()
+
+    def _lock_for(self, med_id: str) -> asyncio.Lock:
+        """Return the lock stripe of a medication."""
+        lock = self._medication_locks.get(med_id)
+        if lock is None:
+            lock = self._medication_locks[med_id] = asyncio.Lock()
+        return lock
+
+    def _publish(
+        self,
+        med_id: str | None = None,
+        changed_medications: tuple[str, ...] | None = None,
+        *,
+        rewrite_history: bool = False,
+    ) -> ChangeSet:
+        """Publish a new immutable snapshot of the live data.
+
+        Unchanged medication records and history entries are shared with the
+        previous snapshot; only what may have changed is copied. Returns what
+        changed compared to the previous snapshot.
+        """
+        data = self._data
+        previous = self._snapshot
+        if med_id is not None:
+            changed_medications = (med_id,)
+
+        if previous is None:
+            previous_medications: dict[str, Any] = {}
+            previous_history: tuple = ()
+            rewrite_history = True
+        else:
+            previous_medications = previous["medications"]
+            previous_history = previous["history"]
+        if changed_medications is None:
+            changed_medications = tuple(
+                set(previous_medications) | set(data["medications"])
+            )
+
+        medications = dict(previous_medications)
+        changed_fields: dict[str, frozenset[str]] = {}
+        for changed_id in changed_medications:
+            old = previous_medications.get(changed_id)
+            med_data = data["medications"].get(changed_id)
+            if med_data is None:
+                if old is not None:
+                    del medications[changed_id]
+                    changed_fields[changed_id] = frozenset(old)
+                continue
+            old = old or {}
+            fields = frozenset(
+                key
+                for key in old.keys() | med_data.keys()
+                if old.get(key, _MISSING) != med_data.get(key, _MISSING)
+            )
+            if fields:
+                medications[changed_id] = Medication(med_data)
+                changed_fields[changed_id] = fields
+
+        live_history = data["history"]
+        appended_from = len(previous_history)
+        if rewrite_history or len(live_history) < appended_from:
+            history = tuple(DoseEvent(entry) for entry in live_history)
+            appended: tuple = ()
+            rewritten = previous is not None
+        else:
+            appended = tuple(DoseEvent(entry) for entry in live_history[appended_from:])
+            history = previous_history + appended
+            rewritten = False
+
+        rewritten_ids: set[str] = set()
+        if self._history_loaded and (rewritten or appended):
+            if rewritten:
+                self._recent = self._recent_window(history)
+                before = _group_history(previous_history)
+                after = _group_history(history)
+                changed_histories = {
+                    changed_id
+                    for changed_id in before.keys() | after.keys()
+                    if before.get(changed_id) != after.get(changed_id)
+                }
+                rewritten_ids = changed_histories - {None}
+            else:
+                self._recent = self._recent_window(self._recent + appended)
+                changed_histories = {event.get("medication_id") for event in appended}
+            if previous is not None:
+                self._dirty_histories.update(changed_histories)
+                # The recent history of a medication is kept in its state file
+                self._dirty_medications.update(
+                    changed_id
+                    for changed_id in changed_histories
+                    if changed_id in medications
+                )
+        if previous is not None:
+            self._dirty_medications.update(changed_fields)
+
+        snapshot = {
+            key: copy.deepcopy(value)
+            for key, value in data.items()
+            if key not in ("medications", "history")
+        }
+        snapshot["medications"] = medications
+        snapshot["history"] = history
+        snapshot["recent_history"] = self._recent
+        self._snapshot = snapshot
+        self._generation += 1
+
+        return ChangeSet(
+            medications=MappingProxyType(changed_fields),
+            history_indexes=tuple(range(appended_from, appended_from + len(appended))),
+            history=appended,
+            history_rewritten=rewritten,
+            rewritten_ids=frozenset(rewritten_ids),
+            record=medications.get(med_id),
+        )
+
+    async def _async_write(self) -> None:
+        """Write the latest snapshot, sharing one write among concurrent callers.
+
+        Only the files of the medications changed since the last write are
+        saved, and the index only when it changed.
+        """
+        target = self._generation
+        async with self._write_lock:
+            if self._written_generation >= target:
+                # A write that started after our change already covered it
+                return
+            snapshot, generation = self._snapshot, self._generation
+            medication_ids, self._dirty_medications = self._dirty_medications, set()
+            history_ids, self._dirty_histories = self._dirty_histories, set()
+            try:
+                await self._async_write_files(snapshot, medication_ids, history_ids)
+            except BaseException:
+                # Written with the next change instead
+                self._dirty_medications |= medication_ids
+                self._dirty_histories |= history_ids
+                raise
+            self._written_generation = generation
+
+    async def _async_write_files(
+        self,
+        snapshot: dict[str, Any],
+        medication_ids: set[str],
+        history_ids: set[str | None],
+    ) -> None:
+        """Save the given medication and history files, then the index."""
+        histories = _group_history(snapshot["history"]) if history_ids else {}
+        if history_ids - {None}:
+            with span(
+                "store_write_history",
+                files=len(history_ids - {None}),
+                entries=sum(len(histories.get(med_id, ())) for med_id in history_ids),
+            ):
+                await asyncio.gather(
+                    *(
+                        self._async_write_history(med_id, histories.get(med_id))
+                        for med_id in history_ids
+                        if med_id is not None
+                    )
+                )
+
+        medications = snapshot["medications"]
+        recent = _group_history(snapshot["recent_history"]) if medication_ids else {}
+        with span("store_write", medications=len(medication_ids)):
+            await asyncio.gather(
+                *(
+                    self._async_write_medication(
+                        med_id, medications.get(med_id), recent.get(med_id, [])
+                    )
+                    for med_id in medication_ids
+                )
+            )
+            index = self._index(snapshot)
+            if index != self._written_index:
+                await self._store.async_save(index)
+                self._written_index = index
+
+        if None in history_ids:
+            with span("store_write_history", entries=len(histories.get(None, ()))):
+                await self._history_store.async_save(
+                    {"history": histories.get(None, [])}
+                )
+
+    async def _async_write_medication(
+        self, med_id: str, record: Medication | None, recent: list[DoseEvent]
+    ) -> None:
+        """Save the state file of a medication, or remove it once deleted."""
+        store = self._shard(medication_storage_key(med_id))
+        if record is None:
+            await store.async_remove()
+        else:
+            await store.async_save({"medication": record, "recent_history": recent})
+
+    async def _async_write_history(
+        self, med_id: str, events: list[DoseEvent] | None
+    ) -> None:
+        """Save the history file of a medication, or remove it once empty."""
+        store = self._shard(history_storage_key(med_id))
+        if events:
+            await store.async_save({"history": events})
+            self._history_ids.add(med_id)
+        else:
+            await store.async_remove()
+            self._history_ids.discard(med_id)
+
+    def _index(self, snapshot: dict[str, Any]) -> dict[str, Any]:
+        """Return the index document of a snapshot.
+
+        Recent history of medications without a state file stays here.
+        """
+        medications = snapshot["medications"]
+        index = {
+            key: value
+            for key, value in snapshot.items()
+            if key not in ("medications", "history", "recent_history")
+        }
+        index["medication_ids"] = sorted(medications)
+        index["history_ids"] = sorted(self._history_ids)
+        index["recent_history"] = [
+            event
+            for event in snapshot["recent_history"]
+            if event.get("medication_id") not in medications
+        ]
+        return index
+
+    @staticmethod
+    def _recent_window(entries: tuple[DoseEvent, ...]) -> tuple[DoseEvent, ...]:
+        """Return the entries that fall inside the recent-history window."""
+        cutoff = dt_util.utcnow() - timedelta(days=RECENT_HISTORY_DAYS)
+        return tuple(
+            event
+            for event in entries
+            if event.time is not None and event.time >= cutoff
+        )
 
     @classmethod
     def reset_instance(cls) -> None:
@@ -0,0 +1,245 @@
+"""Span tracing of actions, exported to a rotating JSON-lines file."""
+
+from __future__ import annotations
+
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from datetime import datetime, timezone
+import functools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, ContextManager
+
+from homeassistant.core import Event, HomeAssistant, ServiceCall, callback
+
+from .const import ATTR_MEDICATION_ID
+
+_LOGGER = logging.getLogger(__name__)
+
+TRACES_FILENAME = "pill_assistant_traces.jsonl"
+DEFAULT_MAX_BYTES = 1024 * 1024
+DEFAULT_BACKUP_COUNT = 3
+
+# Late child spans are written with the next trace, or once this many wait
+MAX_PENDING_SPANS = 256
+
+_CURRENT_SPAN: ContextVar[Span | None] = ContextVar("pill_assistant_span", default=None)
+
+
+class Span:
+    """One timed stage of an action.
+
+    Spans started while another span is current become its children, also
+    across ``await`` and in tasks created meanwhile, since those copy the
+    context.
+    """
+
+    __slots__ = (
+        "tracer",
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "start",
+        "_started",
+        "duration",
+        "attributes",
+        "error",
+    )
+
+    def __init__(
+        self,
+        tracer: Tracer,
+        name: str,
+        parent: Span | None,
+        attributes: dict[str, Any],
+    ) -> None:
+        """Initialize and start the span."""
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = parent.trace_id if parent else f"{random.getrandbits(64):016x}"
+        self.span_id = f"{random.getrandbits(32):08x}"
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = {k: v for k, v in attributes.items() if v is not None}
+        self.error: str | None = None
+        self.duration = 0.0
+        self.start = time.time()
+        self._started = time.perf_counter()
+
+    def set(self, **attributes: Any) -> None:
+        """Add attributes to the span."""
+        self.attributes.update(attributes)
+
+    def finish(self) -> None:
+        """End the span and hand it to the tracer."""
+        self.duration = time.perf_counter() - self._started
+        self.tracer.span_finished(self)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the span as one exported record."""
+        record = {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": datetime.fromtimestamp(self.start, timezone.utc).isoformat(),
+            "duration_ms": round(self.duration * 1000, 3),
+            "attributes": self.attributes,
+        }
+        if self.error is not None:
+            record["error"] = self.error
+        return record
+
+
+class _NoopSpan:
+    """Stands in for a span when nothing is traced."""
+
+    __slots__ = ()
+
+    def set(self, **attributes: Any) -> None:
+        """Ignore attributes."""
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+@contextmanager
+def _activate(new_span: Span) -> Iterator[Span]:
+    """Make ``new_span`` current until the block ends, then finish it."""
+    token = _CURRENT_SPAN.set(new_span)
+    try:
+        yield new_span
+    except BaseException as err:
+        new_span.error = type(err).__name__
+        raise
+    finally:
+        _CURRENT_SPAN.reset(token)
+        new_span.finish()
+
+
+def span(name: str, **attributes: Any) -> ContextManager[Span | _NoopSpan]:
+    """Start a child of the current span.
+
+    Outside a trace this is a no-op, so hot paths can always be wrapped;
+    only actions that start a trace pay for their spans.
+    """
+    parent = _CURRENT_SPAN.get()
+    if parent is None:
+        return nullcontext(NOOP_SPAN)
+    return _activate(Span(parent.tracer, name, parent, attributes))
+
+
+class JsonLinesExporter:
+    """Append span records to a JSON-lines file, rotating it by size.
+
+    Runs in the executor. The current file is renamed to ``.1`` (and older
+    files shifted up to ``backup_count``) before it would grow beyond
+    ``max_bytes``.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        backup_count: int = DEFAULT_BACKUP_COUNT,
+    ) -> None:
+        """Initialize the exporter."""
+        self.path = path
+        self._max_bytes = max_bytes
+        self._backup_count = backup_count
+        self._lock = threading.Lock()
+
+    def write(self, records: list[dict[str, Any]]) -> None:
+        """Append ``records``, one JSON object per line."""
+        data = "".join(
+            json.dumps(record, separators=(",", ":"), default=str) + "\n"
+            for record in records
+        )
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                if (
+                    os.path.exists(self.path)
+                    and os.path.getsize(self.path) + len(data) > self._max_bytes
+                ):
+                    self._rotate()
+                with open(self.path, "a", encoding="utf-8") as handle:
+                    handle.write(data)
+            except OSError as err:  # pragma: no cover - file IO errors
+                _LOGGER.debug("Could not write traces to %s: %s", self.path, err)
+
+    def _rotate(self) -> None:
+        """Shift the backups and start a new file."""
+        if self._backup_count < 1:
+            os.remove(self.path)
+            return
+        for index in range(self._backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+
+class Tracer:
+    """Start traces for actions and export their finished spans.
+
+    A trace's spans are written, in one executor job, when its root span
+    ends. Spans are only kept in memory until then, so tracing can stay
+    enabled. Background work a trace started, like the sensor refreshes,
+    may end after its root; those spans are written with the next trace.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, exporter: JsonLinesExporter, enabled: bool = True
+    ) -> None:
+        """Initialize the tracer."""
+        self._hass = hass
+        self._exporter = exporter
+        self.enabled = enabled
+        self._pending: list[dict[str, Any]] = []
+
+    def root_span(
+        self, name: str, **attributes: Any
+    ) -> ContextManager[Span | _NoopSpan]:
+        """Start a trace, or a child span if one is already running."""
+        if not self.enabled:
+            return nullcontext(NOOP_SPAN)
+        return _activate(Span(self, name, _CURRENT_SPAN.get(), attributes))
+
+    def trace_service(
+        self, name: str, handler: Callable[[ServiceCall], Awaitable[Any]]
+    ) -> Callable[[ServiceCall], Awaitable[Any]]:
+        """Return ``handler`` running in a trace named ``name``."""
+        if not self.enabled:
+            return handler
+
+        @functools.wraps(handler)
+        async def traced(call: ServiceCall) -> Any:
+            with self.root_span(name, medication_id=call.data.get(ATTR_MEDICATION_ID)):
+                return await handler(call)
+
+        return traced
+
+    def span_finished(self, finished: Span) -> None:
+        """Queue a finished span; write the queue when a trace ends."""
+        self._pending.append(finished.as_dict())
+        if finished.parent_id is None or len(self._pending) >= MAX_PENDING_SPANS:
+            self.async_flush()
+
+    @callback
+    def async_flush(self) -> None:
+        """Write the queued spans in the executor."""
+        if not self._pending:
+            return
+        records, self._pending = self._pending, []
+        self._hass.async_add_executor_job(self._exporter.write, records)
+
+    @callback
+    def async_handle_stop(self, _event: Event) -> None:
+        """Write spans that ended after their trace before Home Assistant stops."""
+        self.async_flush()
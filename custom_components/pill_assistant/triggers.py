@@ -0,0 +1,97 @@
+"""Shared state tracking for sensors that trigger relative_sensor schedules."""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+import logging
+
+from homeassistant.core import (
+    CALLBACK_TYPE,
+    Event,
+    HomeAssistant,
+    State,
+    callback,
+)
+from homeassistant.helpers.event import async_track_state_change_event
+
+_LOGGER = logging.getLogger(__name__)
+
+TriggerListener = Callable[[State | None], None]
+
+
+class SensorTriggerTracker:
+    """Subscribe once to the distinct trigger sensors used by all medications.
+
+    Medications scheduled after the same sensor share one subscription. Each
+    listener receives the sensor's new state whenever it changes, so next-dose
+    times only need to be recomputed when the sensor actually changes.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the tracker."""
+        self._hass = hass
+        self._listeners: dict[str, list[TriggerListener]] = {}
+        self._states: dict[str, State | None] = {}
+        self._unsub: CALLBACK_TYPE | None = None
+
+    @property
+    def entity_ids(self) -> frozenset[str]:
+        """Return the sensors currently tracked."""
+        return frozenset(self._listeners)
+
+    def last_state(self, entity_id: str) -> State | None:
+        """Return the last known state of a tracked sensor."""
+        if entity_id in self._states:
+            return self._states[entity_id]
+        return self._hass.states.get(entity_id)
+
+    @callback
+    def async_add_listener(
+        self, entity_id: str, listener: TriggerListener
+    ) -> CALLBACK_TYPE:
+        """Call ``listener`` on every state change of ``entity_id``."""
+        listeners = self._listeners.setdefault(entity_id, [])
+        listeners.append(listener)
+        if len(listeners) == 1:
+            self._states[entity_id] = self._hass.states.get(entity_id)
+            self._async_resubscribe()
+
+        @callback
+        def remove_listener() -> None:
+            """Stop calling the listener; calling it again does nothing."""
+            if listener not in listeners:
+                return
+            listeners.remove(listener)
+            # A later listener of the sensor may have started a new list
+            if not listeners and self._listeners.get(entity_id) is listeners:
+                del self._listeners[entity_id]
+                self._states.pop(entity_id, None)
+                self._async_resubscribe()
+
+        return remove_listener
+
+    @callback
+    def async_stop(self) -> None:
+        """Drop the state-change subscription."""
+        if self._unsub is not None:
+            self._unsub()
+            self._unsub = None
+
+    @callback
+    def _async_resubscribe(self) -> None:
+        """Track exactly the set of sensors that have listeners."""
+        self.async_stop()
+        if self._listeners:
+            self._unsub = async_track_state_change_event(
+                self._hass, list(self._listeners), self._async_state_changed
+            )
+            _LOGGER.debug("Tracking trigger sensors: %s", sorted(self._listeners))
+
+    @callback
+    def _async_state_changed(self, event: Event) -> None:
+        """Fan a state change out to every medication using the sensor."""
+        entity_id = event.data["entity_id"]
+        new_state = event.data.get("new_state")
+        self._states[entity_id] = new_state
+        for listener in list(self._listeners.get(entity_id, ())):
+            listener(new_state)
@@ -1,15 +1,39 @@
 """Fixtures for testing Pill Assistant."""
 
+from datetime import datetime
 import os
 import shutil
 import pytest
 
-from pytest_homeassistant_custom_component.common import MockConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_fire_time_changed,
+)
 
+from custom_components.pill_assistant.archive import ARCHIVE_DIR_NAME
+from custom_components.pill_assistant.history_io import get_exports_dir
 from custom_components.pill_assistant.log_utils import get_logs_dir
 from custom_components.pill_assistant.store import PillAssistantStore
 
 
+def local_time(
+    day: int, hour: int, minute: int = 0, second: int = 0, *, month: int = 1
+) -> datetime:
+    """Return a local time in 2025; Monday 6 January starts the tests' week."""
+    return datetime(
+        2025, month, day, hour, minute, second, tzinfo=dt_util.DEFAULT_TIME_ZONE
+    )
+
+
+async def move_to(hass: HomeAssistant, freezer, when: datetime) -> None:
+    """Move the clock and let the evaluation tick run."""
+    freezer.move_to(when)
+    async_fire_time_changed(hass, when)
+    await hass.async_block_till_done()
+
+
 @pytest.fixture(autouse=True)
 def auto_enable_custom_integrations(enable_custom_integrations):
     """Enable custom integrations for testing."""
@@ -18,13 +42,19 @@ def auto_enable_custom_integrations(enable_custom_integrations):
 
 @pytest.fixture(autouse=True)
 def cleanup_log_files(hass):
-    """Clean up CSV log files from Pill Assistant to ensure test isolation."""
-    logs_dir = get_logs_dir(hass)
-    if os.path.exists(logs_dir):
-        shutil.rmtree(logs_dir, ignore_errors=True)
+    """Clean up CSV logs, exports and archives to ensure test isolation."""
+    dirs = (
+        get_logs_dir(hass),
+        get_exports_dir(hass),
+        hass.config.path(".storage", ARCHIVE_DIR_NAME),
+    )
+    for directory in dirs:
+        if os.path.exists(directory):
+            shutil.rmtree(directory, ignore_errors=True)
     yield
-    if os.path.exists(logs_dir):
-        shutil.rmtree(logs_dir, ignore_errors=True)
+    for directory in dirs:
+        if os.path.exists(directory):
+            shutil.rmtree(directory, ignore_errors=True)
 
 
 @pytest.fixture(autouse=True)
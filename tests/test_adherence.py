@@ -0,0 +1,102 @@
+"""Test the rolling adherence windows and their sensors."""
+
+from datetime import datetime
+
+from homeassistant.core import HomeAssistant
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.pill_assistant.adherence import (
+    AdherenceTracker,
+    AdherenceWindow,
+)
+from custom_components.pill_assistant.const import (
+    ATTR_MEDICATION_ID,
+    CONF_DOSAGE,
+    CONF_DOSAGE_UNIT,
+    CONF_MEDICATION_NAME,
+    CONF_ON_TIME_WINDOW_MINUTES,
+    CONF_REFILL_AMOUNT,
+    CONF_SCHEDULE_DAYS,
+    CONF_SCHEDULE_TIMES,
+    CONF_SCHEDULE_TYPE,
+    DOMAIN,
+    SERVICE_TAKE_MEDICATION,
+)
+
+from .conftest import local_time, move_to
+
+
+async def _setup(hass: HomeAssistant, freezer) -> AdherenceTracker:
+    """Set up a medication due at 08:00 and 20:00 every day."""
+    freezer.move_to(local_time(6, 7))
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        entry_id="adherence_med",
+        data={
+            CONF_MEDICATION_NAME: "Adherence Med",
+            CONF_DOSAGE: "1",
+            CONF_DOSAGE_UNIT: "each",
+            CONF_SCHEDULE_TYPE: "fixed_time",
+            CONF_SCHEDULE_TIMES: ["08:00", "20:00"],
+            CONF_SCHEDULE_DAYS: ["mon", "tue", "wed", "thu", "fri", "sat", "sun"],
+            CONF_REFILL_AMOUNT: 300,
+            CONF_ON_TIME_WINDOW_MINUTES: 30,
+        },
+    )
+    entry.add_to_hass(hass)
+    await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    await move_to(hass, freezer, local_time(6, 7, 1))
+    return hass.data[DOMAIN]["adherence"]
+
+
+async def _take(hass: HomeAssistant, freezer, when: datetime) -> None:
+    """Take the medication at ``when``."""
+    await move_to(hass, freezer, when)
+    await hass.services.async_call(
+        DOMAIN,
+        SERVICE_TAKE_MEDICATION,
+        {ATTR_MEDICATION_ID: "adherence_med"},
+        blocking=True,
+    )
+    await hass.async_block_till_done()
+
+
+async def test_windows_count_taken_on_time_and_scheduled(hass: HomeAssistant, freezer):
+    """Test doses are counted as they are taken and as they become due."""
+    tracker = await _setup(hass, freezer)
+
+    await _take(hass, freezer, local_time(6, 8, 10))
+    await _take(hass, freezer, local_time(6, 21, 0))
+    await move_to(hass, freezer, local_time(8, 9, 0))
+
+    # Five doses were due; one was taken on time and one an hour late
+    assert tracker.window("adherence_med", 7) == AdherenceWindow(7, 2, 1, 5)
+    state = hass.states.get("sensor.pa_adherence_med_adherence_7d")
+    assert float(state.state) == 40.0
+    assert state.attributes["Taken"] == 2
+    assert state.attributes["Taken on time"] == 1
+    assert state.attributes["Scheduled"] == 5
+    assert state.attributes["On-time percentage"] == 50.0
+    assert float(hass.states.get("sensor.pa_adherence_med_adherence_30d").state) == 40
+
+    # Once the first day leaves the 7-day window only the later doses count
+    await move_to(hass, freezer, local_time(13, 7, 0))
+    assert tracker.window("adherence_med", 7) == AdherenceWindow(7, 0, 0, 12)
+    assert tracker.window("adherence_med", 30) == AdherenceWindow(30, 2, 1, 14)
+    state = hass.states.get("sensor.pa_adherence_med_adherence_7d")
+    assert float(state.state) == 0
+    assert state.attributes["On-time percentage"] is None
+
+
+async def test_counts_survive_a_restart(hass: HomeAssistant, freezer):
+    """Test the day slots are restored from storage."""
+    tracker = await _setup(hass, freezer)
+    await _take(hass, freezer, local_time(6, 8, 0))
+    await move_to(hass, freezer, local_time(7, 12, 0))
+    await tracker.async_save()
+
+    restored = AdherenceTracker(hass, hass.data[DOMAIN]["store"])
+    await restored.async_load()
+    assert restored.window("adherence_med", 7) == AdherenceWindow(7, 1, 1, 3)
+    assert restored.window("adherence_med", 30) == tracker.window("adherence_med", 30)
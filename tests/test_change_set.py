@@ -0,0 +1,142 @@
+"""Test the change-sets returned by store transactions."""
+
+from unittest.mock import patch
+
+import pytest
+from homeassistant.core import HomeAssistant
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.pill_assistant.const import (
+    ATTR_ACTION,
+    ATTR_DOSES_TAKEN_TODAY,
+    ATTR_HISTORY_INDEX,
+    ATTR_MEDICATION_ID,
+    DOMAIN,
+    SERVICE_EDIT_MEDICATION_HISTORY,
+    SERVICE_TAKE_MEDICATION,
+    SIGNAL_MEDICATION_UPDATED,
+)
+from custom_components.pill_assistant.store import ChangeSet, PillAssistantStore
+
+from .conftest import local_time
+
+
+async def test_update_reports_fields_and_record(hass: HomeAssistant):
+    """Test a striped update reports changed fields and the written record."""
+    store = PillAssistantStore(hass)
+    data = await store.async_load()
+    data["medications"]["med_a"] = {"remaining_amount": 10, "last_taken": None}
+    await store.async_save(data)
+
+    def take(data: dict) -> None:
+        med = data["medications"]["med_a"]
+        med["remaining_amount"] = 9
+        med["last_taken"] = "2025-01-06T08:00:00-08:00"
+        data["history"].append({"medication_id": "med_a", "action": "taken"})
+
+    changes = await store.async_update(take, med_id="med_a", needs_history=True)
+
+    assert changes.medications == {
+        "med_a": frozenset({"remaining_amount", "last_taken"})
+    }
+    assert changes.history_indexes == (0,)
+    assert changes.medication_ids == {"med_a"}
+    assert changes.record["remaining_amount"] == 9
+    with pytest.raises(TypeError):
+        changes.record["remaining_amount"] = 0
+
+    # An update that writes the same values changes nothing
+    unchanged = await store.async_update(
+        lambda data: data["medications"]["med_a"].update(remaining_amount=9),
+        med_id="med_a",
+    )
+    assert not unchanged
+    assert unchanged.record["remaining_amount"] == 9
+
+
+async def test_history_changes(hass: HomeAssistant):
+    """Test appended and rewritten history are reported."""
+    store = PillAssistantStore(hass)
+    await store.async_load()
+
+    first = await store.async_append_history(
+        {"medication_id": "med_a", "action": "skipped"}
+    )
+    second = await store.async_append_history(
+        {"medication_id": "med_b", "action": "skipped"},
+        {"medication_id": "med_b", "action": "missed"},
+    )
+    assert first.history_indexes == (0,)
+    assert second.history_indexes == (1, 2)
+    assert second.medication_ids == {"med_b"}
+
+    rewritten = await store.async_update(
+        lambda data: data["history"].pop(0), rewrite_history=True
+    )
+    assert rewritten.history_rewritten
+    assert rewritten.history == ()
+    assert rewritten.medication_ids == {"med_a"}
+    assert len(store.snapshot["history"]) == 2
+    assert not ChangeSet()
+
+
+async def test_take_signals_only_affected_medication(
+    hass: HomeAssistant, mock_config_entry: MockConfigEntry
+):
+    """Test taking a dose signals the medication itself and the global signal."""
+    other = MockConfigEntry(domain=DOMAIN, data=dict(mock_config_entry.data))
+    mock_config_entry.add_to_hass(hass)
+    other.add_to_hass(hass)
+    await hass.config_entries.async_setup(mock_config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    med_id = mock_config_entry.entry_id
+    with patch(
+        "custom_components.pill_assistant.store.async_dispatcher_send"
+    ) as mock_send:
+        await hass.services.async_call(
+            DOMAIN,
+            SERVICE_TAKE_MEDICATION,
+            {ATTR_MEDICATION_ID: med_id},
+            blocking=True,
+        )
+
+    signals = [call.args[1] for call in mock_send.call_args_list]
+    assert signals == [
+        SIGNAL_MEDICATION_UPDATED,
+        f"{SIGNAL_MEDICATION_UPDATED}_{med_id}",
+    ]
+    changes = mock_send.call_args_list[0].args[2]
+    assert "remaining_amount" in changes.medications[med_id]
+    assert other.entry_id not in changes.medication_ids
+
+
+async def test_history_edit_refreshes_the_medication_sensor(
+    hass: HomeAssistant, mock_config_entry: MockConfigEntry, freezer
+):
+    """Test editing a history entry signals the medication it belongs to."""
+    freezer.move_to(local_time(6, 9))
+    mock_config_entry.add_to_hass(hass)
+    await hass.config_entries.async_setup(mock_config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    await hass.services.async_call(
+        DOMAIN,
+        SERVICE_TAKE_MEDICATION,
+        {ATTR_MEDICATION_ID: mock_config_entry.entry_id},
+        blocking=True,
+    )
+    await hass.async_block_till_done()
+    state = hass.states.get("sensor.pa_test_medication")
+    assert state.attributes[ATTR_DOSES_TAKEN_TODAY] == ["09:00"]
+
+    await hass.services.async_call(
+        DOMAIN,
+        SERVICE_EDIT_MEDICATION_HISTORY,
+        {ATTR_HISTORY_INDEX: 0, ATTR_ACTION: "skipped"},
+        blocking=True,
+        return_response=True,
+    )
+    await hass.async_block_till_done()
+    state = hass.states.get("sensor.pa_test_medication")
+    assert state.attributes[ATTR_DOSES_TAKEN_TODAY] == []
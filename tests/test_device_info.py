@@ -104,4 +104,8 @@ async def test_sensor_and_button_share_same_device(
 
     assert sensor_entity_id in entity_ids
     assert button_entity_id in entity_ids
-    assert len(device_entities) == 2  # Should have exactly 2 entities (sensor + button)
+    assert "sensor.pa_test_medication_run_out" in entity_ids
+    assert "sensor.pa_test_medication_adherence_7d" in entity_ids
+    assert "sensor.pa_test_medication_adherence_30d" in entity_ids
+    # The sensor, its run-out date, two adherence windows and the button
+    assert len(device_entities) == 5
@@ -0,0 +1,114 @@
+"""Test latency metrics, their diagnostic sensors and the diagnostics dump."""
+
+from homeassistant.const import EntityCategory
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import entity_registry as er
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.pill_assistant.const import (
+    ATTR_MEDICATION_ID,
+    DOMAIN,
+    HISTORY_STORAGE_KEY,
+    SERVICE_TAKE_MEDICATION,
+    STORAGE_KEY,
+)
+from custom_components.pill_assistant.diagnostics import (
+    async_get_config_entry_diagnostics,
+)
+from custom_components.pill_assistant.log_utils import GLOBAL_LOG_FILENAME
+from custom_components.pill_assistant.metrics import (
+    METRICS,
+    LatencyHistogram,
+)
+from custom_components.pill_assistant.store import (
+    history_storage_key,
+    medication_storage_key,
+)
+
+
+def test_histogram_percentiles():
+    """Test percentiles are estimated within one bucket and capped at the max."""
+    histogram = LatencyHistogram()
+    assert histogram.percentile(0.5) is None
+
+    for _ in range(90):
+        histogram.record(0.010)
+    for _ in range(10):
+        histogram.record(0.200)
+
+    assert 0.010 <= histogram.percentile(0.5) <= 0.0125
+    assert 0.200 <= histogram.percentile(0.95) <= 0.25
+    assert histogram.percentile(1.0) == 0.200
+    summary = histogram.as_dict()
+    assert summary["count"] == 100
+    assert summary["max_ms"] == 200.0
+
+
+async def test_latency_sensors_are_opt_in_diagnostics(
+    hass: HomeAssistant, mock_config_entry: MockConfigEntry
+):
+    """Test one set of latency sensors is added, disabled by default."""
+    second = MockConfigEntry(
+        domain=DOMAIN, data={**mock_config_entry.data, "medication_name": "Other"}
+    )
+    for entry in (mock_config_entry, second):
+        entry.add_to_hass(hass)
+        await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+
+    registry = er.async_get(hass)
+    latency = [
+        entity
+        for entity in registry.entities.values()
+        if entity.unique_id.startswith(f"{DOMAIN}_latency_")
+    ]
+    assert latency
+    assert {entity.config_entry_id for entity in latency} == {
+        mock_config_entry.entry_id
+    }
+    store_update = registry.async_get_entity_id(
+        "sensor", DOMAIN, f"{DOMAIN}_latency_store_update"
+    )
+    entity = registry.async_get(store_update)
+    assert entity.entity_category is EntityCategory.DIAGNOSTIC
+    assert entity.disabled_by is er.RegistryEntryDisabler.INTEGRATION
+    assert hass.states.get(store_update) is None
+
+
+async def test_diagnostics_dump(
+    hass: HomeAssistant, mock_config_entry: MockConfigEntry
+):
+    """Test the dump holds store and log sizes and the recorded latencies."""
+    METRICS.reset()
+    mock_config_entry.add_to_hass(hass)
+    await hass.config_entries.async_setup(mock_config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    await hass.services.async_call(
+        DOMAIN,
+        SERVICE_TAKE_MEDICATION,
+        {ATTR_MEDICATION_ID: mock_config_entry.entry_id},
+        blocking=True,
+    )
+    await hass.async_block_till_done()
+
+    diagnostics = await async_get_config_entry_diagnostics(hass, mock_config_entry)
+
+    assert diagnostics["entry"]["data"]["notes"] == "**REDACTED**"
+    store = diagnostics["store"]
+    assert store["medications"] == 1
+    assert store["history_entries"] == 1
+    assert store["entry_history_entries"] == 1
+    assert set(store["file_sizes"]) == {
+        STORAGE_KEY,
+        HISTORY_STORAGE_KEY,
+        medication_storage_key(mock_config_entry.entry_id),
+        history_storage_key(mock_config_entry.entry_id),
+    }
+    assert diagnostics["log_file_sizes"][GLOBAL_LOG_FILENAME] > 0
+
+    latency = diagnostics["latency"]
+    assert latency["service_take_medication"]["count"] == 1
+    assert latency["log_event"]["count"] == 1
+    assert latency["store_update"]["count"] >= 1
+    assert latency["sensor_update"]["p95_ms"] is not None
@@ -0,0 +1,197 @@
+"""Test the ledger of scheduled doses and how each one ended."""
+
+from datetime import timedelta
+
+import pytest
+from homeassistant.core import HomeAssistant
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.pill_assistant.const import (
+    ATTR_END_DATE,
+    ATTR_MEDICATION_ID,
+    ATTR_START_DATE,
+    CONF_DOSAGE,
+    CONF_DOSAGE_UNIT,
+    CONF_MEDICATION_NAME,
+    CONF_MISSED_AFTER_MINUTES,
+    CONF_REFILL_AMOUNT,
+    CONF_SCHEDULE_DAYS,
+    CONF_SCHEDULE_TIMES,
+    CONF_SCHEDULE_TYPE,
+    DOMAIN,
+    SERVICE_GET_DOSE_LEDGER,
+    SERVICE_SKIP_MEDICATION,
+    SERVICE_TAKE_MEDICATION,
+)
+from custom_components.pill_assistant.ledger import (
+    MAX_WINDOW,
+    DoseLedger,
+    dose_windows,
+)
+
+from .conftest import local_time, move_to
+
+
+def _entry(**extra) -> MockConfigEntry:
+    """Return a medication due at 08:00 and 20:00 every day."""
+    return MockConfigEntry(
+        domain=DOMAIN,
+        entry_id="ledger_med",
+        data={
+            CONF_MEDICATION_NAME: "Ledger Med",
+            CONF_DOSAGE: "1",
+            CONF_DOSAGE_UNIT: "each",
+            CONF_SCHEDULE_TYPE: "fixed_time",
+            CONF_SCHEDULE_TIMES: ["08:00", "20:00"],
+            CONF_SCHEDULE_DAYS: ["mon", "tue", "wed", "thu", "fri", "sat", "sun"],
+            CONF_REFILL_AMOUNT: 300,
+            **extra,
+        },
+    )
+
+
+async def _call(hass: HomeAssistant, service: str) -> None:
+    """Call a medication service for the ledger medication."""
+    await hass.services.async_call(
+        DOMAIN, service, {ATTR_MEDICATION_ID: "ledger_med"}, blocking=True
+    )
+    await hass.async_block_till_done()
+
+
+def test_dose_windows_meet_halfway_and_are_capped():
+    """Test each dose claims events up to halfway to its neighbours."""
+    doses = [local_time(6, 8), local_time(6, 20), local_time(8, 8)]
+    windows = dose_windows(doses)
+
+    assert windows[0] == (
+        local_time(6, 8),
+        local_time(6, 8) - MAX_WINDOW,
+        local_time(6, 14),
+    )
+    assert windows[1] == (local_time(6, 20), local_time(6, 14), local_time(7, 8))
+    assert windows[2] == (local_time(8, 8), local_time(7, 20), local_time(8, 20))
+
+
+async def test_doses_close_as_taken_skipped_or_missed(hass: HomeAssistant, freezer):
+    """Test each dose is recorded once, when its window ends."""
+    freezer.move_to(local_time(6, 7))
+    entry = _entry()
+    entry.add_to_hass(hass)
+    await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    await move_to(hass, freezer, local_time(6, 7, 1))
+    ledger: DoseLedger = hass.data[DOMAIN]["ledger"]
+
+    await move_to(hass, freezer, local_time(6, 8, 5))
+    await _call(hass, SERVICE_TAKE_MEDICATION)
+    await move_to(hass, freezer, local_time(7, 7, 50))
+    await _call(hass, SERVICE_SKIP_MEDICATION)
+    await move_to(hass, freezer, local_time(8, 9, 0))
+
+    outcomes = [(e.scheduled, e.outcome) for e in ledger.entries("ledger_med")]
+    assert outcomes == [
+        (local_time(6, 8), "taken"),
+        (local_time(6, 20), "missed"),
+        (local_time(7, 8), "skipped"),
+        (local_time(7, 20), "missed"),
+    ]
+    # A dose is only recorded once, however often the tick runs
+    await move_to(hass, freezer, local_time(8, 9, 1))
+    assert len(ledger.entries("ledger_med")) == 4
+
+    # The closed miss of the last day and the open overdue dose are listed
+    state = hass.states.get("sensor.pa_ledger_med")
+    assert state.attributes["missed_doses"] == [
+        local_time(7, 20).isoformat(),
+        local_time(8, 8).isoformat(),
+    ]
+    assert ledger.counts("ledger_med", local_time(7, 0), local_time(7, 23)) == {
+        "taken": 0,
+        "skipped": 1,
+        "missed": 1,
+        "scheduled": 2,
+    }
+
+
+async def test_ledger_persists_and_answers_range_queries(hass: HomeAssistant, freezer):
+    """Test the ledger is restored from storage and queried by range."""
+    freezer.move_to(local_time(6, 7))
+    entry = _entry()
+    entry.add_to_hass(hass)
+    await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    await move_to(hass, freezer, local_time(6, 7, 1))
+
+    await move_to(hass, freezer, local_time(6, 8, 0))
+    await _call(hass, SERVICE_TAKE_MEDICATION)
+    await move_to(hass, freezer, local_time(10, 9, 0))
+    ledger: DoseLedger = hass.data[DOMAIN]["ledger"]
+    await ledger.async_close()
+
+    restored = DoseLedger(hass, hass.data[DOMAIN]["store"])
+    await restored.async_load()
+    assert restored.entries("ledger_med") == ledger.entries("ledger_med")
+    assert len(restored.entries("ledger_med")) == 8
+
+    response = await hass.services.async_call(
+        DOMAIN,
+        SERVICE_GET_DOSE_LEDGER,
+        {
+            ATTR_MEDICATION_ID: "ledger_med",
+            ATTR_START_DATE: local_time(6, 0).isoformat(),
+            ATTR_END_DATE: (local_time(7, 0) - timedelta(seconds=1)).isoformat(),
+        },
+        blocking=True,
+        return_response=True,
+    )
+    medication = response["medications"]["ledger_med"]
+    assert medication["name"] == "Ledger Med"
+    assert medication["counts"] == {
+        "taken": 1,
+        "skipped": 0,
+        "missed": 1,
+        "scheduled": 2,
+    }
+    assert medication["doses"][0]["scheduled"] == local_time(6, 8).isoformat()
+    assert medication["doses"][0]["outcome"] == "taken"
+    assert medication["doses"][1]["at"] is None
+
+
+@pytest.mark.parametrize(
+    ("missed_after", "closed_at"),
+    [
+        # The reminder marks the dose missed before its window ends
+        (45, (8, 47)),
+        # The window ends before the reminder would mark the dose missed
+        (600, (14, 2)),
+    ],
+)
+async def test_reminders_and_ledger_record_one_missed_dose(
+    hass: HomeAssistant, freezer, missed_after: int, closed_at: tuple[int, int]
+):
+    """Test whichever notices first, the history and ledger hold the same miss."""
+    freezer.move_to(local_time(6, 7))
+    entry = _entry(**{CONF_MISSED_AFTER_MINUTES: missed_after})
+    entry.add_to_hass(hass)
+    await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    ledger: DoseLedger = hass.data[DOMAIN]["ledger"]
+    history = hass.data[DOMAIN]["ledger_med"]["storage_data"]["history"]
+
+    for when in (local_time(6, 7, 1), local_time(6, 7, 31), local_time(6, 8, 45, 1)):
+        await move_to(hass, freezer, when)
+    await move_to(hass, freezer, local_time(6, *closed_at))
+
+    missed = [event for event in history if event["action"] == "missed"]
+    assert [event["scheduled_time"] for event in missed] == [
+        local_time(6, 8).isoformat()
+    ]
+    assert [(e.scheduled, e.outcome) for e in ledger.entries("ledger_med")] == [
+        (local_time(6, 8), "missed")
+    ]
+    assert hass.data[DOMAIN]["reminders"].pending == []
+
+    # Neither records the dose again later
+    await move_to(hass, freezer, local_time(6, 18, 1))
+    assert len([event for event in history if event["action"] == "missed"]) == 1
+    assert len(ledger.entries("ledger_med")) == 1
@@ -0,0 +1,191 @@
+"""Test escalating re-reminders driven by the reminder scheduler."""
+
+from unittest.mock import AsyncMock, patch
+
+from homeassistant.core import HomeAssistant
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.pill_assistant.const import (
+    ATTR_MEDICATION_ID,
+    CONF_DOSAGE,
+    CONF_DOSAGE_UNIT,
+    CONF_ESCALATION_AFTER_MINUTES,
+    CONF_ESCALATION_NOTIFY_SERVICES,
+    CONF_MEDICATION_NAME,
+    CONF_MISSED_AFTER_MINUTES,
+    CONF_NOTIFY_SERVICES,
+    CONF_REFILL_AMOUNT,
+    CONF_REFILL_REMINDER_DAYS,
+    CONF_REMINDER_INTERVAL_MINUTES,
+    CONF_SCHEDULE_DAYS,
+    CONF_SCHEDULE_TIMES,
+    CONF_SCHEDULE_TYPE,
+    DOMAIN,
+    REMINDERS_STORAGE_KEY,
+    SERVICE_TAKE_MEDICATION,
+    STORAGE_KEY,
+    STORAGE_VERSION,
+)
+from custom_components.pill_assistant.reminders import ReminderScheduler
+from custom_components.pill_assistant.store import PillAssistantStore
+
+from .conftest import local_time, move_to
+
+
+def _escalating_entry() -> MockConfigEntry:
+    """Return a medication due at 08:00 with every escalation stage enabled."""
+    return MockConfigEntry(
+        domain=DOMAIN,
+        data={
+            CONF_MEDICATION_NAME: "Escalating Med",
+            CONF_DOSAGE: "1",
+            CONF_DOSAGE_UNIT: "each",
+            CONF_SCHEDULE_TYPE: "fixed_time",
+            CONF_SCHEDULE_TIMES: ["08:00"],
+            CONF_SCHEDULE_DAYS: ["mon", "tue", "wed", "thu", "fri", "sat", "sun"],
+            CONF_REFILL_AMOUNT: 30,
+            CONF_REFILL_REMINDER_DAYS: 7,
+            CONF_NOTIFY_SERVICES: ["notify.mobile_app_phone"],
+            CONF_REMINDER_INTERVAL_MINUTES: 10,
+            CONF_ESCALATION_AFTER_MINUTES: 20,
+            CONF_ESCALATION_NOTIFY_SERVICES: ["notify.caregiver"],
+            CONF_MISSED_AFTER_MINUTES: 45,
+        },
+    )
+
+
+def _notified_services(mock_call: AsyncMock) -> list[str]:
+    """Return the notify services called, in order."""
+    return [
+        f"{call.args[0]}.{call.args[1]}"
+        for call in mock_call.call_args_list
+        if call.args[0] == "notify"
+    ]
+
+
+async def test_reminders_escalate_and_mark_missed(hass: HomeAssistant, freezer):
+    """Test re-reminders repeat, switch targets and finally mark the dose missed."""
+    freezer.move_to(local_time(6, 7, 45))
+    entry = _escalating_entry()
+    entry.add_to_hass(hass)
+
+    with patch(
+        "homeassistant.core.ServiceRegistry.async_call", new_callable=AsyncMock
+    ) as mock_call:
+        await hass.config_entries.async_setup(entry.entry_id)
+        await hass.async_block_till_done()
+
+        assert _notified_services(mock_call) == ["notify.mobile_app_phone"]
+        scheduler = hass.data[DOMAIN]["reminders"]
+        kinds = [item[3] for item in scheduler.pending]
+        assert kinds == ["remind", "missed"]
+
+        await move_to(hass, freezer, local_time(6, 8, 10, 1))
+        assert _notified_services(mock_call)[-1] == "notify.mobile_app_phone"
+
+        await move_to(hass, freezer, local_time(6, 8, 20, 1))
+        assert _notified_services(mock_call)[-1] == "notify.caregiver"
+
+        await move_to(hass, freezer, local_time(6, 8, 45, 1))
+
+    storage_data = hass.data[DOMAIN][entry.entry_id]["storage_data"]
+    missed = [h for h in storage_data["history"] if h["action"] == "missed"]
+    assert len(missed) == 1
+    assert missed[0]["scheduled_time"] == local_time(6, 8, 0).isoformat()
+    assert scheduler.pending == []
+
+
+async def test_taking_dose_cancels_pending_reminders(
+    hass: HomeAssistant, hass_storage: dict, freezer
+):
+    """Test taking the dose clears queued reminders and persists the state."""
+    freezer.move_to(local_time(6, 7, 45))
+    entry = _escalating_entry()
+    entry.add_to_hass(hass)
+
+    with patch("homeassistant.core.ServiceRegistry.async_call", new_callable=AsyncMock):
+        await hass.config_entries.async_setup(entry.entry_id)
+        await hass.async_block_till_done()
+
+    scheduler = hass.data[DOMAIN]["reminders"]
+    assert len(scheduler.pending) == 2
+
+    storage_data = hass.data[DOMAIN][entry.entry_id]["storage_data"]
+    # Reminders are saved to their own file, not with the medications
+    assert "reminders" not in storage_data
+    reminders = hass_storage[REMINDERS_STORAGE_KEY]["data"]
+    assert reminders["notified"][entry.entry_id] == local_time(6, 8, 0).isoformat()
+    assert len(reminders["pending"]) == 2
+
+    await hass.services.async_call(
+        DOMAIN,
+        SERVICE_TAKE_MEDICATION,
+        {ATTR_MEDICATION_ID: entry.entry_id},
+        blocking=True,
+    )
+    await hass.async_block_till_done()
+
+    assert scheduler.pending == []
+    assert hass_storage[REMINDERS_STORAGE_KEY]["data"]["pending"] == []
+    # The occurrence stays recorded so it is never announced again
+    assert scheduler.is_notified(entry.entry_id, local_time(6, 8, 0))
+
+    # Nothing fires later on
+    await move_to(hass, freezer, local_time(6, 9, 0))
+    assert not [h for h in storage_data["history"] if h["action"] == "missed"]
+
+
+async def test_reminders_disabled_by_default(hass: HomeAssistant, freezer):
+    """Test that without escalation settings only the first reminder is sent."""
+    freezer.move_to(local_time(6, 7, 45))
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        data={
+            CONF_MEDICATION_NAME: "Plain Med",
+            CONF_DOSAGE: "1",
+            CONF_DOSAGE_UNIT: "each",
+            CONF_SCHEDULE_TYPE: "fixed_time",
+            CONF_SCHEDULE_TIMES: ["08:00"],
+            CONF_SCHEDULE_DAYS: ["mon", "tue", "wed", "thu", "fri", "sat", "sun"],
+            CONF_REFILL_AMOUNT: 30,
+            CONF_REFILL_REMINDER_DAYS: 7,
+            CONF_NOTIFY_SERVICES: ["notify.mobile_app_phone"],
+        },
+    )
+    entry.add_to_hass(hass)
+
+    with patch(
+        "homeassistant.core.ServiceRegistry.async_call", new_callable=AsyncMock
+    ) as mock_call:
+        await hass.config_entries.async_setup(entry.entry_id)
+        await hass.async_block_till_done()
+
+        assert _notified_services(mock_call) == ["notify.mobile_app_phone"]
+        assert hass.data[DOMAIN]["reminders"].pending == []
+
+        await move_to(hass, freezer, local_time(6, 8, 30))
+        assert len(_notified_services(mock_call)) == 1
+
+
+async def test_reminders_move_out_of_the_medication_file(
+    hass: HomeAssistant, hass_storage: dict
+):
+    """Test reminders saved with the medications are moved to their own file."""
+    notified = {"med_a": local_time(6, 8, 0).isoformat()}
+    hass_storage[STORAGE_KEY] = {
+        "version": STORAGE_VERSION,
+        "key": STORAGE_KEY,
+        "data": {
+            "medication_ids": [],
+            "history_ids": [],
+            "reminders": {"pending": [], "notified": notified},
+        },
+    }
+    store = PillAssistantStore(hass)
+    scheduler = ReminderScheduler(hass, store)
+    await scheduler.async_load()
+
+    assert scheduler.is_notified("med_a", local_time(6, 8, 0))
+    assert hass_storage[REMINDERS_STORAGE_KEY]["data"]["notified"] == notified
+    assert "reminders" not in hass_storage[STORAGE_KEY]["data"]
+    scheduler.async_stop()
@@ -0,0 +1,136 @@
+"""Test the shared per-tick evaluation of medication schedules."""
+
+from datetime import datetime, timedelta
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.pill_assistant.const import (
+    ATTR_MEDICATION_ID,
+    ATTR_NEXT_DOSE_TIME,
+    CONF_DOSAGE,
+    CONF_DOSAGE_UNIT,
+    CONF_MEDICATION_NAME,
+    CONF_REFILL_AMOUNT,
+    CONF_REFILL_REMINDER_DAYS,
+    CONF_RELATIVE_OFFSET_HOURS,
+    CONF_RELATIVE_OFFSET_MINUTES,
+    CONF_RELATIVE_TO_MEDICATION,
+    CONF_SCHEDULE_DAYS,
+    CONF_SCHEDULE_TIMES,
+    CONF_SCHEDULE_TYPE,
+    DOMAIN,
+    SERVICE_TAKE_MEDICATION,
+)
+from custom_components.pill_assistant.evaluation import EvaluationContext
+
+from .conftest import local_time, move_to
+
+ALL_DAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+
+def _fixed_entry(entry_id: str, name: str) -> MockConfigEntry:
+    """Return a fixed-time medication."""
+    return MockConfigEntry(
+        domain=DOMAIN,
+        entry_id=entry_id,
+        data={
+            CONF_MEDICATION_NAME: name,
+            CONF_DOSAGE: "1",
+            CONF_DOSAGE_UNIT: "pill",
+            CONF_SCHEDULE_TYPE: "fixed_time",
+            CONF_SCHEDULE_TIMES: ["08:00"],
+            CONF_SCHEDULE_DAYS: ALL_DAYS,
+            CONF_REFILL_AMOUNT: 30,
+            CONF_REFILL_REMINDER_DAYS: 7,
+        },
+    )
+
+
+def _relative_entry(entry_id: str, name: str, ref_id: str) -> MockConfigEntry:
+    """Return a medication due one hour after ``ref_id`` was taken."""
+    return MockConfigEntry(
+        domain=DOMAIN,
+        entry_id=entry_id,
+        data={
+            CONF_MEDICATION_NAME: name,
+            CONF_DOSAGE: "1",
+            CONF_DOSAGE_UNIT: "pill",
+            CONF_SCHEDULE_TYPE: "relative_medication",
+            CONF_RELATIVE_TO_MEDICATION: ref_id,
+            CONF_RELATIVE_OFFSET_HOURS: 1,
+            CONF_RELATIVE_OFFSET_MINUTES: 0,
+            CONF_SCHEDULE_DAYS: ALL_DAYS,
+            CONF_REFILL_AMOUNT: 30,
+            CONF_REFILL_REMINDER_DAYS: 7,
+        },
+    )
+
+
+def test_context_memoizes_parsing_and_next_doses(hass: HomeAssistant):
+    """Test timestamps are parsed once and each schedule is evaluated once."""
+    calls: list[str] = []
+
+    def calculator(context: EvaluationContext) -> datetime:
+        calls.append("a")
+        return context.now + timedelta(hours=1)
+
+    context = EvaluationContext(hass, {"a": calculator}, now=local_time(6, 7, 0))
+    first = context.parse("2025-01-06T07:00:00+00:00")
+    assert first is context.parse("2025-01-06T07:00:00+00:00")
+    assert context.parse("not a date") is None
+    assert context.parse(None) is None
+
+    assert context.next_dose("a") == local_time(6, 8, 0)
+    assert context.next_dose("a") == local_time(6, 8, 0)
+    assert calls == ["a"]
+    assert context.next_dose("unknown") is None
+
+
+def test_context_breaks_relative_cycles(hass: HomeAssistant):
+    """Test a cycle of relative medications does not recurse forever."""
+    calculators = {}
+    calculators["a"] = lambda context: context.next_dose("b")
+    calculators["b"] = lambda context: context.next_dose("a")
+    context = EvaluationContext(hass, calculators)
+    assert context.next_dose("a") is None
+
+
+async def test_chain_evaluated_in_topological_order(hass: HomeAssistant, freezer):
+    """Test a relative chain is ordered references-first and shares one context."""
+    freezer.move_to(local_time(6, 7, 0))
+    # Added in reverse dependency order on purpose
+    entries = [
+        _relative_entry("med_c", "Med C", "med_b"),
+        _relative_entry("med_b", "Med B", "med_a"),
+        _fixed_entry("med_a", "Med A"),
+    ]
+    for entry in entries:
+        entry.add_to_hass(hass)
+    await hass.config_entries.async_setup("med_a")
+    await hass.async_block_till_done()
+
+    evaluator = hass.data[DOMAIN]["evaluator"]
+    assert evaluator.evaluation_order() == ["med_a", "med_b", "med_c"]
+
+    await hass.services.async_call(
+        DOMAIN,
+        SERVICE_TAKE_MEDICATION,
+        {ATTR_MEDICATION_ID: "med_a"},
+        blocking=True,
+    )
+    await hass.async_block_till_done()
+
+    # Taken within the on-time window, so recorded at the scheduled 08:00.
+    # The take invalidated the shared context, so Med B follows immediately.
+    next_b = hass.states.get("sensor.pa_med_b").attributes[ATTR_NEXT_DOSE_TIME]
+    assert dt_util.parse_datetime(next_b) == local_time(6, 9, 0)
+
+    await move_to(hass, freezer, local_time(6, 7, 1))
+
+    context = evaluator.context
+    assert context.now == local_time(6, 7, 1)
+    assert context.next_dose("med_b") == local_time(6, 9, 0)
+    # Med C depends on Med B being taken, which has not happened
+    assert context.next_dose("med_c") is None
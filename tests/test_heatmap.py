@@ -0,0 +1,109 @@
+"""Test the hour-of-week heatmap of taken, skipped and missed doses."""
+
+from homeassistant.core import HomeAssistant
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.pill_assistant.const import (
+    ATTR_MEDICATION_ID,
+    ATTR_SLOT_MINUTES,
+    CONF_DOSAGE,
+    CONF_DOSAGE_UNIT,
+    CONF_MEDICATION_NAME,
+    CONF_REFILL_AMOUNT,
+    CONF_SCHEDULE_DAYS,
+    CONF_SCHEDULE_TIMES,
+    CONF_SCHEDULE_TYPE,
+    DOMAIN,
+    SERVICE_GET_ADHERENCE_HEATMAP,
+    SERVICE_SKIP_MEDICATION,
+    SERVICE_TAKE_MEDICATION,
+)
+from custom_components.pill_assistant.heatmap import HourOfWeekHeatmap, week_slot
+
+from .conftest import local_time, move_to
+
+
+async def _call(hass: HomeAssistant, service: str) -> None:
+    """Call a medication service for the heatmap medication."""
+    await hass.services.async_call(
+        DOMAIN, service, {ATTR_MEDICATION_ID: "heatmap_med"}, blocking=True
+    )
+    await hass.async_block_till_done()
+
+
+def test_week_slots_start_on_monday_midnight():
+    """Test local times map to 15-minute slots of the week."""
+    assert week_slot(local_time(6, 0, 0)) == 0
+    assert week_slot(local_time(6, 8, 14)) == 32
+    assert week_slot(local_time(12, 23, 59)) == 7 * 96 - 1
+
+
+async def test_heatmap_counts_outcomes_by_weekday_and_slot(
+    hass: HomeAssistant, freezer
+):
+    """Test taken, skipped and missed doses land in their weekday and hour."""
+    freezer.move_to(local_time(6, 7))
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        entry_id="heatmap_med",
+        data={
+            CONF_MEDICATION_NAME: "Heatmap Med",
+            CONF_DOSAGE: "1",
+            CONF_DOSAGE_UNIT: "each",
+            CONF_SCHEDULE_TYPE: "fixed_time",
+            CONF_SCHEDULE_TIMES: ["08:00", "20:00"],
+            CONF_SCHEDULE_DAYS: ["mon", "tue", "wed", "thu", "fri", "sat", "sun"],
+            CONF_REFILL_AMOUNT: 30,
+        },
+    )
+    entry.add_to_hass(hass)
+    await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    await move_to(hass, freezer, local_time(6, 7, 1))
+
+    await move_to(hass, freezer, local_time(6, 8, 5))
+    await _call(hass, SERVICE_TAKE_MEDICATION)
+    await move_to(hass, freezer, local_time(7, 7, 50))
+    await _call(hass, SERVICE_SKIP_MEDICATION)
+    await move_to(hass, freezer, local_time(8, 9, 0))
+
+    response = await hass.services.async_call(
+        DOMAIN,
+        SERVICE_GET_ADHERENCE_HEATMAP,
+        {ATTR_MEDICATION_ID: "heatmap_med"},
+        blocking=True,
+        return_response=True,
+    )
+    assert response["slot_minutes"] == 60
+    assert response["weekdays"][0] == "mon"
+    medication = response["medications"]["heatmap_med"]
+    assert medication["name"] == "Heatmap Med"
+    assert len(medication["taken"]) == 7
+    assert len(medication["taken"][0]) == 24
+    assert medication["taken"][0][8] == 1
+    assert medication["skipped"][1][7] == 1
+    # The evening doses of Monday and Tuesday were missed
+    assert medication["missed"][0][20] == 1
+    assert medication["missed"][1][20] == 1
+    assert sum(map(sum, medication["missed"])) == 2
+
+    # 15-minute slots split the hours
+    response = await hass.services.async_call(
+        DOMAIN,
+        SERVICE_GET_ADHERENCE_HEATMAP,
+        {ATTR_MEDICATION_ID: "heatmap_med", ATTR_SLOT_MINUTES: 15},
+        blocking=True,
+        return_response=True,
+    )
+    taken = response["medications"]["heatmap_med"]["taken"]
+    assert len(taken[0]) == 96
+    assert taken[0][32] == 1
+
+    # The counts are restored from storage
+    heatmap: HourOfWeekHeatmap = hass.data[DOMAIN]["heatmap"]
+    await heatmap.async_save()
+    restored = HourOfWeekHeatmap(
+        hass, hass.data[DOMAIN]["store"], hass.data[DOMAIN]["ledger"]
+    )
+    await restored.async_load()
+    assert restored.matrix("heatmap_med") == heatmap.matrix("heatmap_med")
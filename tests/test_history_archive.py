@@ -0,0 +1,175 @@
+"""Test the archiving of history older than the retention period."""
+
+import os
+from unittest.mock import patch
+
+import pytest
+from homeassistant.core import HomeAssistant
+from homeassistant.setup import async_setup_component
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.pill_assistant import archive
+from custom_components.pill_assistant.const import (
+    ATTR_MEDICATION_ID,
+    ATTR_START_DATE,
+    CONF_DOSAGE,
+    CONF_DOSAGE_UNIT,
+    CONF_HISTORY_RETENTION_DAYS,
+    CONF_MEDICATION_NAME,
+    CONF_SCHEDULE_DAYS,
+    CONF_SCHEDULE_TIMES,
+    CONF_SCHEDULE_TYPE,
+    DOMAIN,
+    SERVICE_GET_MEDICATION_HISTORY,
+)
+from custom_components.pill_assistant.store import PillAssistantStore
+
+from .conftest import local_time, move_to
+
+
+async def _get_history(hass: HomeAssistant, **data) -> list[dict]:
+    """Return the entries of the history service."""
+    response = await hass.services.async_call(
+        DOMAIN,
+        SERVICE_GET_MEDICATION_HISTORY,
+        {ATTR_MEDICATION_ID: "archive_med", **data},
+        blocking=True,
+        return_response=True,
+    )
+    return response["history"]
+
+
+async def test_old_history_moves_to_archives_read_on_demand(
+    hass: HomeAssistant, freezer
+):
+    """Test the daily run archives old entries and queries still see them."""
+    freezer.move_to(local_time(10, 7, month=3))
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        entry_id="archive_med",
+        data={
+            CONF_MEDICATION_NAME: "Archive Med",
+            CONF_DOSAGE: "1",
+            CONF_DOSAGE_UNIT: "each",
+            CONF_SCHEDULE_TYPE: "fixed_time",
+            CONF_SCHEDULE_TIMES: ["08:00"],
+            CONF_SCHEDULE_DAYS: ["mon", "tue", "wed", "thu", "fri", "sat", "sun"],
+        },
+    )
+    entry.add_to_hass(hass)
+    assert await async_setup_component(
+        hass, DOMAIN, {DOMAIN: {CONF_HISTORY_RETENTION_DAYS: 30}}
+    )
+    await hass.async_block_till_done()
+
+    store = hass.data[DOMAIN]["store"]
+    await store.async_append_history(
+        *(
+            {
+                "medication_id": "archive_med",
+                "medication_name": "Archive Med",
+                "timestamp": when.isoformat(),
+                "action": "taken",
+            }
+            for when in (
+                local_time(5, 8),
+                local_time(20, 8),
+                local_time(3, 8, month=2),
+                local_time(9, 8, month=3),
+            )
+        )
+    )
+
+    # The first tick of the next day archives everything before 9 February
+    await move_to(hass, freezer, local_time(11, 0, month=3))
+
+    assert [event.time for event in store.snapshot["history"]] == [
+        local_time(9, 8, month=3)
+    ]
+    assert store.archive.count == 3
+    assert sorted(os.listdir(store.archive.directory)) == [
+        "history_2025-01.jsonl.gz",
+        "history_2025-02.jsonl.gz",
+    ]
+    assert store.archive.files_between(local_time(1, 0, month=2)) == [
+        "history_2025-02.jsonl.gz"
+    ]
+
+    with patch.object(
+        archive, "_read_archive_files", wraps=archive._read_archive_files
+    ) as read:
+        # A recent range is answered from the live store
+        history = await _get_history(hass, **{ATTR_START_DATE: "2025-03-01T00:00:00"})
+        assert len(history) == 1
+        assert history[0]["history_index"] == 0
+        assert read.call_count == 0
+
+        # The full history reads the archives, and archived entries have no index
+        history = await _get_history(hass)
+        assert read.call_count == 1
+        assert [item["timestamp"] for item in history] == [
+            local_time(day, 8, month=month).isoformat()
+            for month, day in ((3, 9), (2, 3), (1, 20), (1, 5))
+        ]
+        assert [item["history_index"] for item in history] == [0, None, None, None]
+
+    # The manifest is restored from storage
+    restored = archive.HistoryArchive(hass)
+    await restored.async_load()
+    assert restored.count == 3
+    assert restored.archived_until == store.archive.archived_until
+    assert [event.time for event in await restored.async_read()] == [
+        local_time(5, 8),
+        local_time(20, 8),
+        local_time(3, 8, month=2),
+    ]
+
+
+async def test_interrupted_archive_run_does_not_duplicate_entries(
+    hass: HomeAssistant, freezer
+):
+    """Test a run stopped after writing the archive is finished on the next load."""
+    freezer.move_to(local_time(10, 8, month=3))
+    store = PillAssistantStore(hass)
+    await store.async_load()
+    await store.async_append_history(
+        *(
+            {
+                "medication_id": "archive_med",
+                "timestamp": when.isoformat(),
+                "action": "taken",
+            }
+            for when in (
+                local_time(5, 8),
+                local_time(3, 8, month=2),
+                local_time(9, 8, month=3),
+            )
+        )
+    )
+
+    # The archive is written, but the live history never is
+    with (
+        patch.object(PillAssistantStore, "_async_write", side_effect=OSError),
+        pytest.raises(OSError),
+    ):
+        await store.async_archive_history(local_time(1, 0, month=3))
+    assert store.archive.pending_until == local_time(1, 0, month=3)
+
+    PillAssistantStore.reset_instance()
+    restarted = PillAssistantStore(hass)
+    await restarted.async_load()
+    assert [event.time for event in await restarted.async_history()] == [
+        local_time(5, 8),
+        local_time(3, 8, month=2),
+        local_time(9, 8, month=3),
+    ]
+    assert restarted.archive.pending_until is None
+
+    # The removal was saved with the manifest
+    PillAssistantStore.reset_instance()
+    reloaded = PillAssistantStore(hass)
+    await reloaded.async_load()
+    assert [entry["timestamp"] for entry in await reloaded.async_load_history()] == [
+        local_time(9, 8, month=3).isoformat()
+    ]
+    assert reloaded.archive.pending_until is None
@@ -0,0 +1,175 @@
+"""Test the streaming export of the dose history."""
+
+import csv
+import gzip
+import json
+from unittest.mock import patch
+
+from homeassistant.core import HomeAssistant
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_capture_events,
+)
+
+from custom_components.pill_assistant import archive, history_io
+from custom_components.pill_assistant.const import (
+    ATTR_ACTION,
+    ATTR_COMPRESS,
+    ATTR_FILENAME,
+    ATTR_FORMAT,
+    ATTR_MEDICATION_ID,
+    ATTR_START_DATE,
+    CONF_DOSAGE,
+    CONF_DOSAGE_UNIT,
+    CONF_MEDICATION_NAME,
+    CONF_REFILL_AMOUNT,
+    CONF_SCHEDULE_DAYS,
+    CONF_SCHEDULE_TIMES,
+    DOMAIN,
+    SERVICE_EXPORT_HISTORY,
+    SERVICE_REFILL_MEDICATION,
+    SERVICE_SKIP_MEDICATION,
+    SERVICE_TAKE_MEDICATION,
+)
+
+from .conftest import local_time
+
+
+async def test_export_history_streams_filtered_events(hass: HomeAssistant, freezer):
+    """Test history is exported in chunks to CSV and compressed JSON lines."""
+    freezer.move_to(local_time(6, 7))
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        entry_id="export_med",
+        data={
+            CONF_MEDICATION_NAME: "Export Med",
+            CONF_DOSAGE: "1",
+            CONF_DOSAGE_UNIT: "each",
+            CONF_SCHEDULE_TIMES: ["08:00"],
+            CONF_SCHEDULE_DAYS: ["mon", "tue", "wed", "thu", "fri", "sat", "sun"],
+            CONF_REFILL_AMOUNT: 30,
+        },
+    )
+    entry.add_to_hass(hass)
+    await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+
+    for when, service in (
+        (local_time(6, 8), SERVICE_TAKE_MEDICATION),
+        (local_time(7, 8), SERVICE_SKIP_MEDICATION),
+        (local_time(8, 8), SERVICE_TAKE_MEDICATION),
+        (local_time(9, 8), SERVICE_TAKE_MEDICATION),
+        (local_time(9, 9), SERVICE_REFILL_MEDICATION),
+    ):
+        freezer.move_to(when)
+        await hass.services.async_call(
+            DOMAIN, service, {ATTR_MEDICATION_ID: "export_med"}, blocking=True
+        )
+    await hass.async_block_till_done()
+
+    progress = async_capture_events(hass, history_io.EVENT_EXPORT_PROGRESS)
+    with patch.object(history_io, "EXPORT_CHUNK_SIZE", 2):
+        response = await hass.services.async_call(
+            DOMAIN,
+            SERVICE_EXPORT_HISTORY,
+            {ATTR_ACTION: ["taken", "skipped"], ATTR_FILENAME: "../doses"},
+            blocking=True,
+            return_response=True,
+        )
+    await hass.async_block_till_done()
+
+    assert response["success"] is True
+    assert response["exported"] == 4
+    # The name cannot leave the exports folder
+    assert response["path"] == hass.config.path(
+        "Pill Assistant", "Exports", "..doses.csv"
+    )
+    assert [event.data["exported"] for event in progress] == [2, 4, 4]
+    assert [event.data["done"] for event in progress] == [False, False, True]
+
+    with open(response["path"], newline="", encoding="utf-8") as handle:
+        rows = list(csv.DictReader(handle))
+    assert [row["action"] for row in rows] == ["taken", "skipped", "taken", "taken"]
+    assert rows[0]["medication_name"] == "Export Med"
+    assert rows[0]["timestamp"] == local_time(6, 8).isoformat()
+
+    response = await hass.services.async_call(
+        DOMAIN,
+        SERVICE_EXPORT_HISTORY,
+        {
+            ATTR_START_DATE: local_time(8, 0).isoformat(),
+            ATTR_FORMAT: "jsonl",
+            ATTR_COMPRESS: True,
+        },
+        blocking=True,
+        return_response=True,
+    )
+
+    assert response["exported"] == 3
+    assert response["path"].endswith(".jsonl.gz")
+    with gzip.open(response["path"], "rt", encoding="utf-8") as handle:
+        events = [json.loads(line) for line in handle]
+    assert [event["action"] for event in events] == ["taken", "taken", "refilled"]
+    assert events[-1]["amount"] == 30
+
+
+async def test_export_reads_archived_history_one_file_at_a_time(
+    hass: HomeAssistant, freezer
+):
+    """Test an export streams the archive files before the live history."""
+    freezer.move_to(local_time(10, 7, month=3))
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        entry_id="export_med",
+        data={
+            CONF_MEDICATION_NAME: "Export Med",
+            CONF_DOSAGE: "1",
+            CONF_DOSAGE_UNIT: "each",
+            CONF_SCHEDULE_TIMES: ["08:00"],
+            CONF_SCHEDULE_DAYS: ["mon", "tue", "wed", "thu", "fri", "sat", "sun"],
+        },
+    )
+    entry.add_to_hass(hass)
+    await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+
+    times = [
+        local_time(5, 8),
+        local_time(20, 8),
+        local_time(3, 8, month=2),
+        local_time(9, 8, month=3),
+    ]
+    store = hass.data[DOMAIN]["store"]
+    await store.async_append_history(
+        *(
+            {
+                "medication_id": "export_med",
+                "timestamp": when.isoformat(),
+                "action": "taken",
+            }
+            for when in times
+        )
+    )
+    assert await store.async_archive_history(local_time(1, 0, month=3)) == 3
+
+    with patch.object(
+        archive, "_read_archive_files", wraps=archive._read_archive_files
+    ) as read:
+        response = await hass.services.async_call(
+            DOMAIN,
+            SERVICE_EXPORT_HISTORY,
+            {ATTR_FORMAT: "jsonl"},
+            blocking=True,
+            return_response=True,
+        )
+
+    assert [call.args[1] for call in read.call_args_list] == [
+        ["history_2025-01.jsonl.gz"],
+        ["history_2025-02.jsonl.gz"],
+    ]
+    assert response["exported"] == 4
+    with open(response["path"], encoding="utf-8") as handle:
+        events = [json.loads(line) for line in handle]
+    assert [event["timestamp"] for event in events] == [
+        when.isoformat() for when in times
+    ]
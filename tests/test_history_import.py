@@ -0,0 +1,230 @@
+"""Test the bulk import of history files."""
+
+import csv
+import json
+import os
+
+from homeassistant.core import HomeAssistant
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_fire_time_changed,
+)
+
+from custom_components.pill_assistant import log_utils
+from custom_components.pill_assistant.history_io import get_exports_dir
+from custom_components.pill_assistant.const import (
+    ATTR_DRY_RUN,
+    ATTR_FORMAT,
+    ATTR_HISTORY_INDEX,
+    ATTR_MEDICATION_ID,
+    ATTR_PATH,
+    ATTR_TIMESTAMP,
+    CONF_DOSAGE,
+    CONF_DOSAGE_UNIT,
+    CONF_MEDICATION_NAME,
+    CONF_REFILL_AMOUNT,
+    CONF_SCHEDULE_DAYS,
+    CONF_SCHEDULE_TIMES,
+    CONF_SCHEDULE_TYPE,
+    DOMAIN,
+    SERVICE_EDIT_MEDICATION_HISTORY,
+    SERVICE_EXPORT_HISTORY,
+    SERVICE_IMPORT_HISTORY,
+    SERVICE_TAKE_MEDICATION,
+)
+
+from .conftest import local_time
+
+
+async def _setup(hass: HomeAssistant, freezer) -> None:
+    """Set up the imported medication and take one dose."""
+    freezer.move_to(local_time(6, 7))
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        entry_id="import_med",
+        data={
+            CONF_MEDICATION_NAME: "Import Med",
+            CONF_DOSAGE: "1",
+            CONF_DOSAGE_UNIT: "each",
+            CONF_SCHEDULE_TYPE: "fixed_time",
+            CONF_SCHEDULE_TIMES: ["08:00"],
+            CONF_SCHEDULE_DAYS: ["mon", "tue", "wed", "thu", "fri", "sat", "sun"],
+            CONF_REFILL_AMOUNT: 30,
+        },
+    )
+    entry.add_to_hass(hass)
+    await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+
+    freezer.move_to(local_time(6, 8))
+    async_fire_time_changed(hass, local_time(6, 8))
+    await hass.services.async_call(
+        DOMAIN,
+        SERVICE_TAKE_MEDICATION,
+        {ATTR_MEDICATION_ID: "import_med"},
+        blocking=True,
+    )
+    await hass.async_block_till_done()
+
+
+async def _import(hass: HomeAssistant, **data) -> dict:
+    """Call the import service and return its response."""
+    response = await hass.services.async_call(
+        DOMAIN, SERVICE_IMPORT_HISTORY, data, blocking=True, return_response=True
+    )
+    await hass.async_block_till_done()
+    return response
+
+
+async def test_import_validates_deduplicates_and_merges(hass: HomeAssistant, freezer):
+    """Test new rows are merged in timestamp order and the rest are reported."""
+    await _setup(hass, freezer)
+
+    rows = [
+        {"timestamp": "2025-01-03T08:10:00", "action": "taken"},
+        # Already in the history, with an explicit offset
+        {
+            "timestamp": local_time(6, 8).isoformat(),
+            "action": "taken",
+            "medication_id": "import_med",
+        },
+        {"timestamp": "2025-01-01T08:00:00", "action": "skipped"},
+        # The same event twice in the file
+        {"timestamp": "2025-01-03T08:10:00", "action": "taken"},
+        {"timestamp": "2025-01-02T08:00:00", "action": "forgotten"},
+        {"timestamp": "yesterday", "action": "taken"},
+        {
+            "timestamp": "2025-01-02T08:00:00",
+            "action": "taken",
+            "medication_id": "other_med",
+        },
+        {"timestamp": "2025-01-04T09:00:00", "action": "refilled", "amount": "30"},
+    ]
+    # Files in the exports folder are cleaned up after each test
+    os.makedirs(get_exports_dir(hass), exist_ok=True)
+    path = os.path.join(get_exports_dir(hass), "backfill.jsonl")
+    relative = os.path.relpath(path, hass.config.path())
+    with open(path, "w", encoding="utf-8") as handle:
+        for row in rows:
+            handle.write(json.dumps(row) + "\n")
+        handle.write("not json\n")
+
+    response = await _import(
+        hass, **{ATTR_PATH: relative, ATTR_MEDICATION_ID: "import_med"}
+    )
+
+    assert response["success"] is True
+    assert response["imported"] == 3
+    assert response["duplicates"] == 2
+    assert response["invalid"] == 4
+    assert [error["line"] for error in response["errors"]] == [5, 6, 7, 9]
+    assert response["errors"][0]["error"] == "invalid action: forgotten"
+
+    store = hass.data[DOMAIN]["store"]
+    history = store.snapshot["history"]
+    assert [(event["action"], event.time) for event in history] == [
+        ("skipped", local_time(1, 8)),
+        ("taken", local_time(3, 8, 10)),
+        ("refilled", local_time(4, 9)),
+        ("taken", local_time(6, 8)),
+    ]
+    assert history[0]["medication_name"] == "Import Med"
+    assert history[2]["amount"] == 30
+
+    # The CSV logs were appended once for all imported rows
+    with open(log_utils.get_global_log_path(hass), newline="", encoding="utf-8") as f:
+        logged = list(csv.DictReader(f))
+    assert [row["action"] for row in logged] == [
+        "taken",
+        "skipped",
+        "taken",
+        "refilled",
+    ]
+
+    # Importing the same file again adds nothing
+    response = await _import(
+        hass, **{ATTR_PATH: relative, ATTR_MEDICATION_ID: "import_med"}
+    )
+    assert response["imported"] == 0
+    assert response["duplicates"] == 5
+
+
+async def test_import_reads_exports_and_rejects_outside_paths(
+    hass: HomeAssistant, freezer
+):
+    """Test an export imports as duplicates and a dry run writes nothing."""
+    await _setup(hass, freezer)
+    export = await hass.services.async_call(
+        DOMAIN,
+        SERVICE_EXPORT_HISTORY,
+        {ATTR_FORMAT: "csv"},
+        blocking=True,
+        return_response=True,
+    )
+    relative = os.path.relpath(export["path"], hass.config.path())
+
+    response = await _import(hass, **{ATTR_PATH: relative})
+    assert (response["imported"], response["duplicates"]) == (0, 1)
+
+    path = os.path.join(get_exports_dir(hass), "paper_log.csv")
+    with open(path, "w", newline="", encoding="utf-8") as handle:
+        writer = csv.DictWriter(handle, fieldnames=["timestamp", "action"])
+        writer.writeheader()
+        writer.writerow({"timestamp": "2025-01-05T08:00:00", "action": "taken"})
+
+    response = await _import(
+        hass,
+        **{
+            ATTR_PATH: os.path.relpath(path, hass.config.path()),
+            ATTR_MEDICATION_ID: "import_med",
+            ATTR_DRY_RUN: True,
+        },
+    )
+    assert response["imported"] == 1
+    assert len(hass.data[DOMAIN]["store"].snapshot["history"]) == 1
+
+    response = await _import(hass, **{ATTR_PATH: "../outside.csv"})
+    assert response["success"] is False
+
+
+async def test_import_sorts_a_history_left_out_of_order(hass: HomeAssistant, freezer):
+    """Test entries are merged in time order after an edit moved an entry back."""
+    await _setup(hass, freezer)
+    freezer.move_to(local_time(6, 9))
+    await hass.services.async_call(
+        DOMAIN,
+        SERVICE_TAKE_MEDICATION,
+        {ATTR_MEDICATION_ID: "import_med"},
+        blocking=True,
+    )
+    # The second dose is moved before the first one
+    await hass.services.async_call(
+        DOMAIN,
+        SERVICE_EDIT_MEDICATION_HISTORY,
+        {ATTR_HISTORY_INDEX: 1, ATTR_TIMESTAMP: local_time(2, 8).isoformat()},
+        blocking=True,
+        return_response=True,
+    )
+    await hass.async_block_till_done()
+
+    os.makedirs(get_exports_dir(hass), exist_ok=True)
+    path = os.path.join(get_exports_dir(hass), "backfill.jsonl")
+    with open(path, "w", encoding="utf-8") as handle:
+        handle.write(
+            json.dumps({"timestamp": "2025-01-04T08:00:00", "action": "taken"})
+        )
+    response = await _import(
+        hass,
+        **{
+            ATTR_PATH: os.path.relpath(path, hass.config.path()),
+            ATTR_MEDICATION_ID: "import_med",
+        },
+    )
+
+    assert response["imported"] == 1
+    history = hass.data[DOMAIN]["store"].snapshot["history"]
+    assert [event.time for event in history] == [
+        local_time(2, 8),
+        local_time(4, 8),
+        local_time(6, 8),
+    ]
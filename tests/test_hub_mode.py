@@ -0,0 +1,190 @@
+"""Test hub mode, where one config entry holds all medications."""
+
+from unittest.mock import patch
+
+from homeassistant import config_entries, data_entry_flow
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import entity_registry as er
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.pill_assistant.const import (
+    ATTR_MEDICATION_ID,
+    CONF_DOSAGE,
+    CONF_DOSAGE_UNIT,
+    CONF_HUB,
+    CONF_HUB_MEDICATIONS,
+    CONF_MEDICATION_NAME,
+    CONF_REFILL_AMOUNT,
+    CONF_REFILL_REMINDER_DAYS,
+    CONF_SCHEDULE_DAYS,
+    CONF_SCHEDULE_TIMES,
+    CONF_SCHEDULE_TYPE,
+    DOMAIN,
+    SERVICE_TAKE_MEDICATION,
+)
+from custom_components.pill_assistant.hub import MedicationEntry
+
+
+def _medication(name: str) -> dict:
+    """Return the configuration of a fixed-time medication."""
+    return {
+        CONF_MEDICATION_NAME: name,
+        CONF_DOSAGE: "1",
+        CONF_DOSAGE_UNIT: "each",
+        CONF_SCHEDULE_TYPE: "fixed_time",
+        CONF_SCHEDULE_TIMES: ["08:00"],
+        CONF_SCHEDULE_DAYS: ["mon", "tue", "wed", "thu", "fri", "sat", "sun"],
+        CONF_REFILL_AMOUNT: 30,
+        CONF_REFILL_REMINDER_DAYS: 7,
+    }
+
+
+def _hub_entry(medications: dict) -> MockConfigEntry:
+    """Return a hub entry holding ``medications``."""
+    return MockConfigEntry(
+        domain=DOMAIN,
+        unique_id=f"{DOMAIN}_hub",
+        data={CONF_HUB: True, CONF_HUB_MEDICATIONS: medications},
+    )
+
+
+async def test_hub_sets_up_all_medications_in_one_pass(hass: HomeAssistant):
+    """Test a hub adds every medication with a single platform setup."""
+    hub = _hub_entry({"med_a": _medication("Med A"), "med_b": _medication("Med B")})
+    hub.add_to_hass(hass)
+
+    with patch.object(
+        hass.config_entries,
+        "async_forward_entry_setups",
+        wraps=hass.config_entries.async_forward_entry_setups,
+    ) as mock_forward:
+        await hass.config_entries.async_setup(hub.entry_id)
+        await hass.async_block_till_done()
+
+    mock_forward.assert_called_once()
+    assert hass.states.get("sensor.pa_med_a") is not None
+    assert hass.states.get("sensor.pa_med_b") is not None
+    assert hass.states.get("button.pa_med_b") is not None
+    assert isinstance(hass.data[DOMAIN]["med_a"]["entry"], MedicationEntry)
+
+    registry = er.async_get(hass)
+    assert registry.async_get("sensor.pa_med_a").unique_id == f"{DOMAIN}_med_a"
+
+    await hass.services.async_call(
+        DOMAIN, SERVICE_TAKE_MEDICATION, {ATTR_MEDICATION_ID: "med_b"}, blocking=True
+    )
+    await hass.async_block_till_done()
+    med_b = hass.data[DOMAIN]["store"].snapshot["medications"]["med_b"]
+    assert med_b["remaining_amount"] == 29
+
+    assert await hass.config_entries.async_unload(hub.entry_id)
+    assert "med_a" not in hass.data[DOMAIN]
+    assert "med_b" not in hass.data[DOMAIN]
+
+
+async def test_import_moves_entries_into_hub(hass: HomeAssistant):
+    """Test turning on hub mode keeps entity IDs, history and quantities."""
+    entries = [
+        MockConfigEntry(domain=DOMAIN, data=_medication(name))
+        for name in ("Med A", "Med B")
+    ]
+    for entry in entries:
+        entry.add_to_hass(hass)
+        await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+
+    med_id = entries[0].entry_id
+    await hass.services.async_call(
+        DOMAIN, SERVICE_TAKE_MEDICATION, {ATTR_MEDICATION_ID: med_id}, blocking=True
+    )
+
+    result = await hass.config_entries.flow.async_init(
+        DOMAIN,
+        context={"source": config_entries.SOURCE_IMPORT},
+        data={CONF_HUB: True},
+    )
+    await hass.async_block_till_done()
+
+    assert result["type"] == data_entry_flow.FlowResultType.CREATE_ENTRY
+    remaining = hass.config_entries.async_entries(DOMAIN)
+    assert len(remaining) == 1
+    hub = remaining[0]
+    assert set(hub.data[CONF_HUB_MEDICATIONS]) == {e.entry_id for e in entries}
+
+    registry = er.async_get(hass)
+    entity = registry.async_get("sensor.pa_med_a")
+    assert entity.config_entry_id == hub.entry_id
+    assert entity.unique_id == f"{DOMAIN}_{med_id}"
+    assert hass.states.get("sensor.pa_med_a") is not None
+    assert hass.states.get("sensor.pa_med_b") is not None
+    med_a = hass.data[DOMAIN]["store"].snapshot["medications"][med_id]
+    assert med_a["remaining_amount"] == 29
+
+
+async def test_new_medication_is_added_to_hub(hass: HomeAssistant):
+    """Test the add-medication flow extends the hub instead of adding an entry."""
+    hub = _hub_entry({"med_a": _medication("Med A")})
+    hub.add_to_hass(hass)
+    await hass.config_entries.async_setup(hub.entry_id)
+    await hass.async_block_till_done()
+
+    result = await hass.config_entries.flow.async_init(
+        DOMAIN, context={"source": config_entries.SOURCE_USER}
+    )
+    result = await hass.config_entries.flow.async_configure(
+        result["flow_id"],
+        user_input={
+            CONF_MEDICATION_NAME: "Med B",
+            CONF_DOSAGE: "1",
+            CONF_DOSAGE_UNIT: "each",
+        },
+    )
+    result = await hass.config_entries.flow.async_configure(
+        result["flow_id"], user_input={"schedule_type": "fixed_time"}
+    )
+    result = await hass.config_entries.flow.async_configure(
+        result["flow_id"],
+        user_input={
+            CONF_SCHEDULE_TIMES: ["09:00"],
+            CONF_SCHEDULE_DAYS: ["mon", "tue", "wed", "thu", "fri", "sat", "sun"],
+        },
+    )
+    result = await hass.config_entries.flow.async_configure(
+        result["flow_id"],
+        user_input={CONF_REFILL_AMOUNT: 30, CONF_REFILL_REMINDER_DAYS: 7},
+    )
+    await hass.async_block_till_done()
+
+    assert result["type"] == data_entry_flow.FlowResultType.ABORT
+    assert result["reason"] == "added_to_hub"
+    assert len(hass.config_entries.async_entries(DOMAIN)) == 1
+    assert len(hub.data[CONF_HUB_MEDICATIONS]) == 2
+    assert hass.states.get("sensor.pa_med_b") is not None
+
+
+async def test_hub_options_edit_one_medication(hass: HomeAssistant):
+    """Test the hub options flow edits the chosen medication in the table."""
+    hub = _hub_entry({"med_a": _medication("Med A"), "med_b": _medication("Med B")})
+    hub.add_to_hass(hass)
+    await hass.config_entries.async_setup(hub.entry_id)
+    await hass.async_block_till_done()
+
+    result = await hass.config_entries.options.async_init(hub.entry_id)
+    assert result["step_id"] == "select_medication"
+
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], user_input={ATTR_MEDICATION_ID: "med_b"}
+    )
+    assert result["step_id"] == "init"
+    defaults = {
+        key.schema: key.default() for key in result["data_schema"].schema if key.default
+    }
+    assert defaults[CONF_MEDICATION_NAME] == "Med B"
+
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], user_input={**defaults, CONF_DOSAGE: "2"}
+    )
+    assert result["type"] == data_entry_flow.FlowResultType.CREATE_ENTRY
+    assert hub.data[CONF_HUB_MEDICATIONS]["med_b"][CONF_DOSAGE] == "2"
+    assert hub.data[CONF_HUB_MEDICATIONS]["med_a"][CONF_DOSAGE] == "1"
+    assert hass.data[DOMAIN]["med_b"]["entry"].data[CONF_DOSAGE] == "2"
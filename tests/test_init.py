@@ -2,8 +2,10 @@
 
 import pytest
 from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
 from pytest_homeassistant_custom_component.common import MockConfigEntry
 
+from custom_components.pill_assistant import SHARED_TRACKERS
 from custom_components.pill_assistant.const import DOMAIN
 
 
@@ -28,3 +30,47 @@ async def test_unload_entry(hass: HomeAssistant, mock_config_entry: MockConfigEn
     await hass.async_block_till_done()
 
     assert mock_config_entry.state.name == "NOT_LOADED"
+
+
+def _integration_timers(hass: HomeAssistant) -> list:
+    """Return the pending timers of the integration.
+
+    Delayed writes count when they are of the integration's own files; a
+    config entry update schedules one of Home Assistant's files.
+    """
+
+    def is_integration_timer(handle) -> bool:
+        store = getattr(handle._callback, "__self__", None)
+        if isinstance(store, Store):
+            return store.key.startswith(DOMAIN)
+        return any(
+            "custom_components/pill_assistant" in frame.filename
+            for frame in handle._source_traceback or ()
+        )
+
+    return [
+        handle
+        for handle in hass.loop._scheduled
+        if not handle.cancelled() and is_integration_timer(handle)
+    ]
+
+
+async def test_unload_last_entry_stops_shared_trackers(
+    hass: HomeAssistant, mock_config_entry: MockConfigEntry
+):
+    """Test unloading the last entry leaves no timers or shared trackers."""
+    mock_config_entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(mock_config_entry.entry_id)
+    await hass.async_block_till_done()
+    assert _integration_timers(hass)
+
+    assert await hass.config_entries.async_unload(mock_config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    assert _integration_timers(hass) == []
+    assert not set(SHARED_TRACKERS) & set(hass.data[DOMAIN])
+
+    # Setting up again creates them anew
+    assert await hass.config_entries.async_setup(mock_config_entry.entry_id)
+    await hass.async_block_till_done()
+    assert "evaluator" in hass.data[DOMAIN]
@@ -0,0 +1,158 @@
+"""Test the sketches of how late doses are taken."""
+
+from datetime import date, datetime
+
+import pytest
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.pill_assistant.const import (
+    ATTR_MEDICATION_ID,
+    CONF_DOSAGE,
+    CONF_DOSAGE_UNIT,
+    CONF_MEDICATION_NAME,
+    CONF_REFILL_AMOUNT,
+    CONF_SCHEDULE_DAYS,
+    CONF_SCHEDULE_TIMES,
+    CONF_SCHEDULE_TYPE,
+    DOMAIN,
+    SERVICE_GET_STATISTICS,
+    SERVICE_TAKE_MEDICATION,
+)
+from custom_components.pill_assistant.lateness import (
+    SKETCH_RELATIVE_ACCURACY,
+    LatenessTracker,
+    QuantileSketch,
+)
+
+from .conftest import local_time, move_to
+
+
+def test_sketch_quantiles_are_within_the_accuracy():
+    """Test quantiles of late and early delays stay within the bucket width."""
+    sketch = QuantileSketch()
+    for minutes in range(1, 101):
+        sketch.add(minutes)
+    assert sketch.quantile(0.5) == pytest.approx(50, rel=SKETCH_RELATIVE_ACCURACY)
+    assert sketch.quantile(0.99) == pytest.approx(99, rel=SKETCH_RELATIVE_ACCURACY)
+
+    early = QuantileSketch()
+    for minutes in (-30, -20, -10, 0.2):
+        early.add(minutes)
+    assert early.quantile(0) == pytest.approx(-30, rel=SKETCH_RELATIVE_ACCURACY)
+    assert early.quantile(1) == 0
+
+
+def test_merged_sketches_equal_one_sketch_of_all_delays():
+    """Test merging day sketches gives the sketch of the combined delays."""
+    delays = [-12.5, -3, 0, 4, 7.5, 15, 45, 90, 240]
+    combined = QuantileSketch()
+    first, second = QuantileSketch(), QuantileSketch()
+    for index, minutes in enumerate(delays):
+        combined.add(minutes)
+        (first if index % 2 else second).add(minutes)
+
+    first.merge(second)
+    assert first.counts == combined.counts
+    assert first.count == len(delays)
+    # The stored form restores the same sketch
+    assert QuantileSketch(dict(combined.as_list())).counts == combined.counts
+
+
+async def test_delays_are_kept_per_day_and_merged_for_ranges(
+    hass: HomeAssistant, freezer
+):
+    """Test taken doses are sketched by day and any range can be queried."""
+    freezer.move_to(local_time(6, 7))
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        entry_id="late_med",
+        data={
+            CONF_MEDICATION_NAME: "Late Med",
+            CONF_DOSAGE: "1",
+            CONF_DOSAGE_UNIT: "each",
+            CONF_SCHEDULE_TYPE: "fixed_time",
+            CONF_SCHEDULE_TIMES: ["08:00"],
+            CONF_SCHEDULE_DAYS: ["mon", "tue", "wed", "thu", "fri", "sat", "sun"],
+            CONF_REFILL_AMOUNT: 30,
+        },
+    )
+    entry.add_to_hass(hass)
+    await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+
+    for when in (local_time(6, 8, 20), local_time(7, 8, 0), local_time(8, 7, 50)):
+        await move_to(hass, freezer, when)
+        await hass.services.async_call(
+            DOMAIN,
+            SERVICE_TAKE_MEDICATION,
+            {ATTR_MEDICATION_ID: "late_med"},
+            blocking=True,
+        )
+        await hass.async_block_till_done()
+
+    lateness: LatenessTracker = hass.data[DOMAIN]["lateness"]
+    summary = lateness.summary("late_med")
+    assert summary["count"] == 3
+    assert summary["median_minutes"] == 0
+    assert summary["p99_minutes"] == pytest.approx(20, rel=SKETCH_RELATIVE_ACCURACY)
+
+    first_day = lateness.summary("late_med", date(2025, 1, 6), date(2025, 1, 6))
+    assert first_day["count"] == 1
+    assert first_day["median_minutes"] == pytest.approx(20, rel=0.05)
+    last_day = lateness.summary("late_med", date(2025, 1, 8))
+    assert last_day["median_minutes"] == pytest.approx(-10, rel=0.05)
+
+    # The sketches are restored from storage
+    await lateness.async_save()
+    restored = LatenessTracker(hass, hass.data[DOMAIN]["store"])
+    await restored.async_load()
+    assert restored.summary("late_med") == summary
+
+
+async def test_statistics_counts_and_delays_cover_the_same_days(
+    hass: HomeAssistant, freezer
+):
+    """Test get_statistics without dates counts and sketches the last 30 days."""
+    freezer.move_to(local_time(6, 7))
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        entry_id="late_med",
+        data={
+            CONF_MEDICATION_NAME: "Late Med",
+            CONF_DOSAGE: "1",
+            CONF_DOSAGE_UNIT: "each",
+            CONF_SCHEDULE_TYPE: "fixed_time",
+            CONF_SCHEDULE_TIMES: ["08:00"],
+            CONF_SCHEDULE_DAYS: ["mon", "tue", "wed", "thu", "fri", "sat", "sun"],
+            CONF_REFILL_AMOUNT: 30,
+        },
+    )
+    entry.add_to_hass(hass)
+    await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+
+    # One dose more than 30 days before the call and one within them
+    for when in (local_time(6, 8, 20), local_time(20, 8, 0)):
+        await move_to(hass, freezer, when)
+        await hass.services.async_call(
+            DOMAIN,
+            SERVICE_TAKE_MEDICATION,
+            {ATTR_MEDICATION_ID: "late_med"},
+            blocking=True,
+        )
+        await hass.async_block_till_done()
+
+    freezer.move_to(datetime(2025, 2, 10, 12, tzinfo=dt_util.DEFAULT_TIME_ZONE))
+    response = await hass.services.async_call(
+        DOMAIN,
+        SERVICE_GET_STATISTICS,
+        {},
+        blocking=True,
+        return_response=True,
+    )
+    med_stats = response["medications"]["late_med"]
+    assert med_stats["taken_count"] == 1
+    assert med_stats["lateness"]["count"] == 1
+    assert med_stats["lateness"]["median_minutes"] == 0
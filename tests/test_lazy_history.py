@@ -0,0 +1,201 @@
+"""Test history is loaded lazily from its own storage file."""
+
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.pill_assistant.const import (
+    ATTR_DOSES_TAKEN_TODAY,
+    DOMAIN,
+    HISTORY_STORAGE_KEY,
+    STORAGE_KEY,
+    STORAGE_VERSION,
+)
+from custom_components.pill_assistant.store import (
+    PillAssistantStore,
+    history_storage_key,
+    medication_storage_key,
+)
+
+
+def _now() -> datetime:
+    """Return a fixed local noon on a Monday."""
+    return datetime(2025, 1, 6, 12, 0, tzinfo=dt_util.DEFAULT_TIME_ZONE)
+
+
+def _entry(med_id: str, days_ago: int, hour: int = 8) -> dict:
+    """Return a taken history entry."""
+    timestamp = _now().replace(hour=hour) - timedelta(days=days_ago)
+    return {
+        "medication_id": med_id,
+        "action": "taken",
+        "timestamp": timestamp.isoformat(),
+    }
+
+
+def _stored(key: str, data: dict) -> dict:
+    """Return a storage document as written by Store."""
+    return {"version": STORAGE_VERSION, "key": key, "data": data}
+
+
+async def test_legacy_history_is_migrated(
+    hass: HomeAssistant, hass_storage: dict, freezer
+):
+    """Test history in the medication file moves to the medication's file."""
+    freezer.move_to(_now())
+    hass_storage[STORAGE_KEY] = _stored(
+        STORAGE_KEY,
+        {
+            "medications": {"med_a": {"remaining_amount": 10}},
+            "history": [_entry("med_a", 400), _entry("med_a", 1)],
+        },
+    )
+
+    store = PillAssistantStore(hass)
+    data = await store.async_load()
+
+    assert store.history_loaded
+    assert len(data["history"]) == 2
+    history = hass_storage[history_storage_key("med_a")]["data"]["history"]
+    assert len(history) == 2
+    assert hass_storage[HISTORY_STORAGE_KEY]["data"]["history"] == []
+    index = hass_storage[STORAGE_KEY]["data"]
+    assert "history" not in index
+    assert "medications" not in index
+    # Only the entry inside the recent window is kept with the medication
+    shard = hass_storage[medication_storage_key("med_a")]["data"]
+    assert shard["recent_history"] == [_entry("med_a", 1)]
+
+
+async def test_history_loads_on_first_access(
+    hass: HomeAssistant, hass_storage: dict, freezer
+):
+    """Test medication state loads without history until it is needed."""
+    freezer.move_to(_now())
+    hass_storage[STORAGE_KEY] = _stored(
+        STORAGE_KEY, {"medication_ids": ["med_a"], "history_ids": ["med_a"]}
+    )
+    hass_storage[medication_storage_key("med_a")] = _stored(
+        medication_storage_key("med_a"),
+        {
+            "medication": {"remaining_amount": 10},
+            "recent_history": [_entry("med_a", 0)],
+        },
+    )
+    hass_storage[history_storage_key("med_a")] = _stored(
+        history_storage_key("med_a"),
+        {"history": [_entry("med_a", 400), _entry("med_a", 30), _entry("med_a", 0)]},
+    )
+    # Entries without a medication stay in the shared history file
+    other = {"action": "taken", "timestamp": (_now() - timedelta(days=2)).isoformat()}
+    hass_storage[HISTORY_STORAGE_KEY] = _stored(
+        HISTORY_STORAGE_KEY, {"history": [other]}
+    )
+
+    store = PillAssistantStore(hass)
+    data = await store.async_load()
+    assert not store.history_loaded
+    assert data["history"] == []
+    assert data["medications"] == {"med_a": {"remaining_amount": 10}}
+    assert len(store.recent_history) == 1
+
+    history = await store.async_load_history()
+    assert history is data["history"]
+    # The files are interleaved by time
+    assert history == [
+        _entry("med_a", 400),
+        _entry("med_a", 30),
+        other,
+        _entry("med_a", 0),
+    ]
+    assert len(store.snapshot["history"]) == 4
+
+    await store.async_append_history(_entry("med_a", 0, hour=11))
+    assert len(hass_storage[history_storage_key("med_a")]["data"]["history"]) == 4
+    shard = hass_storage[medication_storage_key("med_a")]["data"]
+    assert len(shard["recent_history"]) == 2
+
+
+async def test_record_updates_do_not_load_history(
+    hass: HomeAssistant, hass_storage: dict, freezer
+):
+    """Test only updates that append to history load it."""
+    freezer.move_to(_now())
+    hass_storage[STORAGE_KEY] = _stored(
+        STORAGE_KEY, {"medication_ids": ["med_a"], "history_ids": ["med_a"]}
+    )
+    hass_storage[medication_storage_key("med_a")] = _stored(
+        medication_storage_key("med_a"),
+        {"medication": {"remaining_amount": 10}, "recent_history": []},
+    )
+    hass_storage[history_storage_key("med_a")] = _stored(
+        history_storage_key("med_a"), {"history": [_entry("med_a", 30)]}
+    )
+    store = PillAssistantStore(hass)
+    await store.async_load()
+
+    def clear_snooze(data: dict) -> None:
+        data["medications"]["med_a"]["snooze_until"] = None
+
+    await store.async_update(clear_snooze, med_id="med_a")
+    assert not store.history_loaded
+    assert hass_storage[medication_storage_key("med_a")]["data"]["medication"] == {
+        "remaining_amount": 10,
+        "snooze_until": None,
+    }
+    # The history file was not touched
+    assert len(hass_storage[history_storage_key("med_a")]["data"]["history"]) == 1
+
+    def take(data: dict) -> None:
+        data["history"].append(_entry("med_a", 0))
+
+    await store.async_update(take, med_id="med_a", needs_history=True)
+    assert store.history_loaded
+    assert len(hass_storage[history_storage_key("med_a")]["data"]["history"]) == 2
+
+
+async def test_doses_today_served_from_recent_cache(
+    hass: HomeAssistant, hass_storage: dict, freezer
+):
+    """Test the sensor shows today's doses before the full history loads."""
+    freezer.move_to(_now())
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        entry_id="med_a",
+        data={
+            "medication_name": "Lazy Med",
+            "dosage": "1",
+            "dosage_unit": "pill",
+            "schedule_type": "fixed_time",
+            "schedule_times": ["08:00", "20:00"],
+            "schedule_days": ["mon", "tue", "wed", "thu", "fri", "sat", "sun"],
+            "refill_amount": 30,
+            "refill_reminder_days": 7,
+        },
+    )
+    hass_storage[STORAGE_KEY] = _stored(
+        STORAGE_KEY, {"medication_ids": ["med_a"], "history_ids": ["med_a"]}
+    )
+    hass_storage[medication_storage_key("med_a")] = _stored(
+        medication_storage_key("med_a"),
+        {
+            "medication": {**entry.data, "remaining_amount": 29, "last_taken": None},
+            "recent_history": [_entry("med_a", 1), _entry("med_a", 0)],
+        },
+    )
+    entry.add_to_hass(hass)
+
+    with patch.object(
+        PillAssistantStore, "async_load_history", autospec=True
+    ) as mock_load_history:
+        await hass.config_entries.async_setup(entry.entry_id)
+        await hass.async_block_till_done()
+
+    # Setup only scheduled the history load; it did not wait for it
+    mock_load_history.assert_called_once()
+    assert not hass.data[DOMAIN]["store"].history_loaded
+    state = hass.states.get("sensor.pa_lazy_med")
+    assert state.attributes[ATTR_DOSES_TAKEN_TODAY] == ["08:00"]
@@ -0,0 +1,60 @@
+"""Test the slotted records published for medications and history."""
+
+import pytest
+
+from custom_components.pill_assistant.models import DoseEvent, Medication
+
+
+def test_dose_event_round_trips_its_stored_form():
+    """Test a record reads like the dict it was built from."""
+    stored = {
+        "medication_id": "med_1",
+        "medication_name": "Vitamin D",
+        "timestamp": "2024-01-15T08:00:00+00:00",
+        "action": "taken",
+        "dosage": "1",
+        "dosage_unit": "each",
+        "note": "with food",
+    }
+    event = DoseEvent(stored)
+
+    assert event == stored
+    assert event.as_dict() == stored
+    assert event["note"] == "with food"
+    assert event.get("missing") is None
+    with pytest.raises(KeyError):
+        event["missing"]
+    assert len(event) == len(stored)
+
+
+def test_unset_fields_are_absent():
+    """Test keys missing from the stored form are missing from the record."""
+    event = DoseEvent({"medication_id": "med_1", "action": "refilled"})
+
+    assert "dosage" not in event
+    with pytest.raises(KeyError):
+        event["dosage"]
+    assert event.as_dict() == {"medication_id": "med_1", "action": "refilled"}
+    assert event.time is None
+
+
+def test_repeated_strings_are_shared():
+    """Test names and actions are interned across records."""
+    first = DoseEvent({"medication_name": "".join(["Vita", "min D"])})
+    second = DoseEvent({"medication_name": "".join(["Vitam", "in D"])})
+
+    assert first["medication_name"] is second["medication_name"]
+
+
+def test_times_are_parsed_once():
+    """Test the parsed times are local, cached and None when invalid."""
+    event = DoseEvent({"timestamp": "2024-01-15T08:00:00+00:00"})
+
+    assert event.time.utcoffset() is not None
+    assert event.time is event.time
+
+    medication = Medication(
+        {"last_taken": "2024-01-15T08:00:00+00:00", "snooze_until": "not a time"}
+    )
+    assert medication.last_taken_time == event.time
+    assert medication.snooze_until_time is None
@@ -0,0 +1,115 @@
+"""Test deduplication of repeated notification action deliveries."""
+
+from unittest.mock import patch
+
+from homeassistant.core import HomeAssistant
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.pill_assistant.actions import (
+    ActionDedupCache,
+    build_notification_actions,
+    format_action,
+    parse_action,
+)
+from custom_components.pill_assistant.const import DOMAIN
+from custom_components.pill_assistant.store import PillAssistantStore
+
+
+def test_parse_action_with_and_without_token():
+    """Test parsing tokenized and legacy action identifiers."""
+    assert parse_action("take_medication_abc123:deadbeef") == (
+        "take",
+        "abc123",
+        "deadbeef",
+    )
+    assert parse_action("skip_medication_abc123") == ("skip", "abc123", None)
+    assert parse_action("some_other_action") is None
+    assert parse_action("_medication_abc123") is None
+
+
+def test_build_notification_actions_share_token():
+    """Test all buttons of one notification carry the same token."""
+    actions = build_notification_actions("abc123", "tok")
+    assert [a["action"] for a in actions] == [
+        "take_medication_abc123:tok",
+        "snooze_medication_abc123:tok",
+        "skip_medication_abc123:tok",
+    ]
+    assert format_action("take", "abc123") == "take_medication_abc123"
+
+
+def test_dedup_cache_ttl_and_size():
+    """Test cache entries expire and the oldest entries are evicted."""
+    cache = ActionDedupCache(max_size=2, ttl=10)
+    assert cache.check_and_add("a", now=0) is False
+    assert cache.check_and_add("a", now=5) is True
+    # Expired after ttl
+    assert cache.check_and_add("a", now=11) is False
+
+    cache.check_and_add("b", now=12)
+    cache.check_and_add("c", now=12)
+    assert len(cache) == 2
+    # "a" was evicted to respect max_size
+    assert cache.check_and_add("a", now=13) is False
+
+    cache.discard("a")
+    assert cache.check_and_add("a", now=14) is False
+
+
+async def test_duplicate_action_delivery_processed_once(
+    hass: HomeAssistant, mock_config_entry: MockConfigEntry
+):
+    """Test the same tap delivered via both event types only takes one dose."""
+    mock_config_entry.add_to_hass(hass)
+    await hass.config_entries.async_setup(mock_config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    med_id = mock_config_entry.entry_id
+    storage_data = hass.data[DOMAIN][med_id]["storage_data"]
+    initial_remaining = storage_data["medications"][med_id]["remaining_amount"]
+
+    action = format_action("take", med_id, "token1")
+    hass.bus.async_fire("mobile_app_notification_action", {"action": action})
+    hass.bus.async_fire("mobile_app_notification_action", {"action": action})
+    hass.bus.async_fire("ios.notification_action_fired", {"action": action})
+    await hass.async_block_till_done()
+
+    med_data = storage_data["medications"][med_id]
+    assert med_data["remaining_amount"] == initial_remaining - 1
+    taken = [h for h in storage_data["history"] if h["action"] == "taken"]
+    assert len(taken) == 1
+
+    # A different notification delivery is processed normally
+    hass.bus.async_fire(
+        "mobile_app_notification_action",
+        {"action": format_action("take", med_id, "token2")},
+    )
+    await hass.async_block_till_done()
+    assert med_data["remaining_amount"] == initial_remaining - 2
+
+
+async def test_failed_action_is_processed_on_redelivery(
+    hass: HomeAssistant, mock_config_entry: MockConfigEntry
+):
+    """Test a tap whose handler failed is not dropped as a duplicate."""
+    mock_config_entry.add_to_hass(hass)
+    await hass.config_entries.async_setup(mock_config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    med_id = mock_config_entry.entry_id
+    storage_data = hass.data[DOMAIN][med_id]["storage_data"]
+    initial_remaining = storage_data["medications"][med_id]["remaining_amount"]
+
+    action = format_action("take", med_id, "token1")
+    with patch.object(PillAssistantStore, "async_update", side_effect=OSError):
+        hass.bus.async_fire("mobile_app_notification_action", {"action": action})
+        await hass.async_block_till_done()
+    assert storage_data["medications"][med_id]["remaining_amount"] == (
+        initial_remaining
+    )
+
+    hass.bus.async_fire("ios.notification_action_fired", {"action": action})
+    await hass.async_block_till_done()
+    assert storage_data["medications"][med_id]["remaining_amount"] == (
+        initial_remaining - 1
+    )
@@ -1,7 +1,11 @@
 """Test notification action handlers."""
 
+from datetime import timedelta
+from unittest.mock import AsyncMock, patch
+
 import pytest
 from homeassistant.core import HomeAssistant, Event
+from homeassistant.util import dt as dt_util
 from pytest_homeassistant_custom_component.common import MockConfigEntry
 
 from custom_components.pill_assistant.const import (
@@ -204,3 +208,81 @@ async def test_notification_action_unknown_action_type(
     med_data = storage_data["medications"].get(mock_config_entry.entry_id)
     new_remaining = med_data.get("remaining_amount")
     assert new_remaining == initial_remaining
+
+
+async def test_notification_actions_bypass_service_bus(
+    hass: HomeAssistant, mock_config_entry: MockConfigEntry
+):
+    """Test skip and snooze actions are routed without calling services."""
+    mock_config_entry.add_to_hass(hass)
+    await hass.config_entries.async_setup(mock_config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    med_id = mock_config_entry.entry_id
+    storage_data = hass.data[DOMAIN][med_id]["storage_data"]
+
+    with patch(
+        "homeassistant.core.ServiceRegistry.async_call", new_callable=AsyncMock
+    ) as mock_call:
+        hass.bus.async_fire(
+            "mobile_app_notification_action",
+            {"action": f"skip_medication_{med_id}"},
+        )
+        hass.bus.async_fire(
+            "mobile_app_notification_action",
+            {"action": f"snooze_medication_{med_id}"},
+        )
+        await hass.async_block_till_done()
+
+    mock_call.assert_not_called()
+    assert storage_data["history"][-1]["action"] == "skipped"
+    assert storage_data["medications"][med_id]["snooze_until"] is not None
+
+
+async def test_notification_action_take_half_dose(
+    hass: HomeAssistant, mock_config_entry: MockConfigEntry
+):
+    """Test the take_half action consumes half a dose."""
+    mock_config_entry.add_to_hass(hass)
+    await hass.config_entries.async_setup(mock_config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    med_id = mock_config_entry.entry_id
+    storage_data = hass.data[DOMAIN][med_id]["storage_data"]
+    initial_remaining = storage_data["medications"][med_id]["remaining_amount"]
+
+    hass.bus.async_fire(
+        "mobile_app_notification_action",
+        {"action": f"take_half_medication_{med_id}"},
+    )
+    await hass.async_block_till_done()
+
+    assert (
+        storage_data["medications"][med_id]["remaining_amount"]
+        == initial_remaining - 0.5
+    )
+    assert storage_data["history"][-1]["dose_fraction"] == 0.5
+
+
+async def test_notification_action_fixed_snooze_duration(
+    hass: HomeAssistant, mock_config_entry: MockConfigEntry
+):
+    """Test snooze_60 snoozes for one hour."""
+    mock_config_entry.add_to_hass(hass)
+    await hass.config_entries.async_setup(mock_config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    med_id = mock_config_entry.entry_id
+    storage_data = hass.data[DOMAIN][med_id]["storage_data"]
+
+    before = dt_util.now()
+    hass.bus.async_fire(
+        "mobile_app_notification_action",
+        {"action": f"snooze_60_medication_{med_id}"},
+    )
+    await hass.async_block_till_done()
+
+    snooze_until = dt_util.parse_datetime(
+        storage_data["medications"][med_id]["snooze_until"]
+    )
+    assert snooze_until - before >= timedelta(minutes=59)
@@ -118,10 +118,10 @@ async def test_notification_dedup_same_occurrence(hass: "HomeAssistant"):
         # Initial notify call should be present
         assert mock_call.call_count >= 1
 
-        # Fire a global medication updated signal which will cause sensors to re-evaluate
+        # Fire the medication's updated signal which will cause its sensor to re-evaluate
         from homeassistant.helpers.dispatcher import async_dispatcher_send
 
-        async_dispatcher_send(hass, SIGNAL_MEDICATION_UPDATED)
+        async_dispatcher_send(hass, f"{SIGNAL_MEDICATION_UPDATED}_{entry.entry_id}")
         await hass.async_block_till_done()
 
         # No additional notify call for the same scheduled occurrence
@@ -0,0 +1,172 @@
+"""Test options changes are applied in place without reloading the entry."""
+
+from datetime import datetime
+from unittest.mock import AsyncMock, patch
+
+from homeassistant import data_entry_flow
+from homeassistant.const import EVENT_STATE_CHANGED, STATE_UNAVAILABLE
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.pill_assistant.const import (
+    ATTR_MEDICATION_ID,
+    ATTR_NEXT_DOSE_TIME,
+    CONF_CURRENT_QUANTITY,
+    CONF_DOSAGE,
+    CONF_DOSAGE_UNIT,
+    CONF_MEDICATION_NAME,
+    CONF_MISSED_AFTER_MINUTES,
+    CONF_NOTIFY_SERVICES,
+    CONF_REFILL_AMOUNT,
+    CONF_REFILL_REMINDER_DAYS,
+    CONF_RELATIVE_OFFSET_HOURS,
+    CONF_RELATIVE_OFFSET_MINUTES,
+    CONF_RELATIVE_TO_MEDICATION,
+    CONF_REMINDER_INTERVAL_MINUTES,
+    CONF_SCHEDULE_DAYS,
+    CONF_SCHEDULE_TIMES,
+    CONF_SCHEDULE_TYPE,
+    DOMAIN,
+    SERVICE_TAKE_MEDICATION,
+)
+from custom_components.pill_assistant.hub import async_update_medication
+
+from .conftest import local_time
+
+ALL_DAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+
+def _entry(name: str, times: list[str], **extra) -> MockConfigEntry:
+    """Return a fixed-time medication."""
+    return MockConfigEntry(
+        domain=DOMAIN,
+        data={
+            CONF_MEDICATION_NAME: name,
+            CONF_DOSAGE: "1",
+            CONF_DOSAGE_UNIT: "each",
+            CONF_SCHEDULE_TYPE: "fixed_time",
+            CONF_SCHEDULE_TIMES: times,
+            CONF_SCHEDULE_DAYS: ALL_DAYS,
+            CONF_REFILL_AMOUNT: 30,
+            CONF_REFILL_REMINDER_DAYS: 7,
+            **extra,
+        },
+    )
+
+
+def _next_dose(hass: HomeAssistant, entity_id: str) -> datetime | None:
+    """Return the next dose time shown by a sensor."""
+    value = hass.states.get(entity_id).attributes[ATTR_NEXT_DOSE_TIME]
+    return dt_util.parse_datetime(value) if value else None
+
+
+async def test_schedule_edit_applies_without_reload(hass: HomeAssistant, freezer):
+    """Test a schedule edit refreshes the sensor in place."""
+    freezer.move_to(local_time(6, 7, 0))
+    entry = _entry("Hot Med", ["08:00"])
+    entry.add_to_hass(hass)
+    await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    assert _next_dose(hass, "sensor.pa_hot_med") == local_time(6, 8, 0)
+
+    states: list[str] = []
+    hass.bus.async_listen(
+        EVENT_STATE_CHANGED,
+        lambda event: states.append(event.data["new_state"].state),
+    )
+
+    result = await hass.config_entries.options.async_init(entry.entry_id)
+    with patch.object(hass.config_entries, "async_reload") as mock_reload:
+        result = await hass.config_entries.options.async_configure(
+            result["flow_id"],
+            user_input={
+                CONF_MEDICATION_NAME: "Hot Med",
+                CONF_DOSAGE: "1",
+                CONF_DOSAGE_UNIT: "each",
+                CONF_CURRENT_QUANTITY: 30,
+                CONF_SCHEDULE_TYPE: "fixed_time",
+                CONF_SCHEDULE_TIMES: ["09:30"],
+                CONF_SCHEDULE_DAYS: ALL_DAYS,
+                CONF_REFILL_AMOUNT: 30,
+                CONF_REFILL_REMINDER_DAYS: 7,
+            },
+        )
+        await hass.async_block_till_done()
+
+    assert result["type"] == data_entry_flow.FlowResultType.CREATE_ENTRY
+    mock_reload.assert_not_called()
+    assert _next_dose(hass, "sensor.pa_hot_med") == local_time(6, 9, 30)
+    assert STATE_UNAVAILABLE not in states
+
+
+async def test_relative_reference_change_resubscribes(hass: HomeAssistant, freezer):
+    """Test a sensor follows a new reference medication after an edit."""
+    freezer.move_to(local_time(6, 7, 0))
+    med_a = _entry("Med A", ["08:00"])
+    med_b = _entry("Med B", ["12:00"])
+    for entry in (med_a, med_b):
+        entry.add_to_hass(hass)
+    await hass.config_entries.async_setup(med_a.entry_id)
+    await hass.async_block_till_done()
+
+    async_update_medication(
+        hass,
+        med_b,
+        {
+            **med_b.data,
+            CONF_SCHEDULE_TYPE: "relative_medication",
+            CONF_RELATIVE_TO_MEDICATION: med_a.entry_id,
+            CONF_RELATIVE_OFFSET_HOURS: 1,
+            CONF_RELATIVE_OFFSET_MINUTES: 0,
+        },
+    )
+    await hass.async_block_till_done()
+    assert hass.data[DOMAIN]["evaluator"].evaluation_order()[0] == med_a.entry_id
+
+    await hass.services.async_call(
+        DOMAIN,
+        SERVICE_TAKE_MEDICATION,
+        {ATTR_MEDICATION_ID: med_a.entry_id},
+        blocking=True,
+    )
+    await hass.async_block_till_done()
+
+    # Med A is recorded at its scheduled 08:00, so Med B is due at 09:00
+    assert _next_dose(hass, "sensor.pa_med_b") == local_time(6, 9, 0)
+
+
+async def test_reminder_deadlines_follow_new_settings(hass: HomeAssistant, freezer):
+    """Test pending reminders are rescheduled when their settings change."""
+    freezer.move_to(local_time(6, 7, 45))
+    entry = _entry(
+        "Reminded Med",
+        ["08:00"],
+        **{
+            CONF_NOTIFY_SERVICES: ["notify.mobile_app_phone"],
+            CONF_REMINDER_INTERVAL_MINUTES: 30,
+            CONF_MISSED_AFTER_MINUTES: 60,
+        },
+    )
+    entry.add_to_hass(hass)
+    with patch("homeassistant.core.ServiceRegistry.async_call", new_callable=AsyncMock):
+        await hass.config_entries.async_setup(entry.entry_id)
+        await hass.async_block_till_done()
+
+    scheduler = hass.data[DOMAIN]["reminders"]
+    assert [item[3] for item in scheduler.pending] == ["remind", "missed"]
+
+    async_update_medication(
+        hass,
+        entry,
+        {
+            **entry.data,
+            CONF_REMINDER_INTERVAL_MINUTES: 0,
+            CONF_MISSED_AFTER_MINUTES: 20,
+        },
+    )
+    await hass.async_block_till_done()
+
+    pending = scheduler.pending
+    assert [item[3] for item in pending] == ["missed"]
+    assert pending[0][0] == local_time(6, 8, 20).timestamp()
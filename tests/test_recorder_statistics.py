@@ -0,0 +1,265 @@
+"""Test the daily aggregates imported into long-term statistics."""
+
+import asyncio
+from datetime import date, datetime, timezone
+from unittest.mock import patch
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_fire_time_changed,
+)
+
+from custom_components.pill_assistant.const import (
+    ATTR_ACTION,
+    ATTR_HISTORY_INDEX,
+    ATTR_MEDICATION_ID,
+    CONF_DOSAGE,
+    CONF_DOSAGE_UNIT,
+    CONF_MEDICATION_NAME,
+    CONF_MEDICATION_TYPE,
+    CONF_REFILL_AMOUNT,
+    CONF_SCHEDULE_DAYS,
+    CONF_SCHEDULE_TIMES,
+    CONF_SCHEDULE_TYPE,
+    DOMAIN,
+    SERVICE_EDIT_MEDICATION_HISTORY,
+    SERVICE_SKIP_MEDICATION,
+    SERVICE_TAKE_MEDICATION,
+)
+from custom_components.pill_assistant.models import DoseEvent
+from custom_components.pill_assistant.recorder_statistics import (
+    daily_counts,
+    day_start,
+    statistic_id,
+)
+
+from .conftest import local_time, move_to
+
+ADD_STATISTICS = (
+    "homeassistant.components.recorder.statistics.async_add_external_statistics"
+)
+
+CONFIG = {
+    CONF_MEDICATION_NAME: "Stats Med",
+    CONF_DOSAGE: "1",
+    CONF_DOSAGE_UNIT: "each",
+    CONF_SCHEDULE_TYPE: "fixed_time",
+    CONF_SCHEDULE_TIMES: ["08:00"],
+    CONF_SCHEDULE_DAYS: ["mon", "tue", "wed", "thu", "fri", "sat", "sun"],
+}
+
+
+def _event(med_id: str, action: str, day: int, hour: int, minute: int = 0):
+    """Return a history event at a local time in January 2025."""
+    when = datetime(2025, 1, day, hour, minute, tzinfo=dt_util.DEFAULT_TIME_ZONE)
+    return DoseEvent(
+        {"medication_id": med_id, "action": action, "timestamp": when.isoformat()}
+    )
+
+
+def test_daily_counts_group_closed_days():
+    """Test events are counted per local day, up to the open day."""
+    events = [
+        _event("stats_med", "taken", 6, 8, 10),
+        _event("stats_med", "taken", 6, 22, 0),
+        _event("stats_med", "snoozed", 6, 23, 0),
+        _event("stats_med", "skipped", 7, 8, 0),
+        _event("other_med", "taken", 7, 8, 0),
+        _event("stats_med", "taken", 8, 8, 0),
+    ]
+
+    counts = daily_counts(events, {"stats_med": CONFIG}, date(2025, 1, 8))
+
+    assert counts == {
+        "stats_med": {
+            date(2025, 1, 6): {"taken": 2, "taken_on_time": 1, "skipped": 0},
+            date(2025, 1, 7): {"taken": 0, "taken_on_time": 0, "skipped": 1},
+        }
+    }
+
+
+def test_rows_start_on_the_hour_of_local_midnight():
+    """Test statistic IDs are valid and rows start at local midnight."""
+    assert statistic_id("01HQ8ZK", "taken_on_time") == (
+        "pill_assistant:01hq8zk_taken_on_time"
+    )
+    start = day_start(date(2025, 1, 6))
+    assert start == datetime(2025, 1, 6, 8, tzinfo=timezone.utc)
+    assert dt_util.as_local(start).hour == 0
+
+
+async def test_nothing_is_imported_without_the_recorder(hass: HomeAssistant, freezer):
+    """Test days close quietly when the recorder is not loaded."""
+    freezer.move_to(datetime(2025, 1, 6, 7, tzinfo=dt_util.DEFAULT_TIME_ZONE))
+    entry = MockConfigEntry(domain=DOMAIN, entry_id="stats_med", data=CONFIG)
+    entry.add_to_hass(hass)
+    await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+
+    when = datetime(2025, 1, 7, 0, 1, tzinfo=dt_util.DEFAULT_TIME_ZONE)
+    freezer.move_to(when)
+    async_fire_time_changed(hass, when)
+    await hass.async_block_till_done()
+
+    statistics = hass.data[DOMAIN]["long_term_statistics"]
+    assert "recorder" not in hass.config.components
+    assert statistics._data_to_save() == {"medications": {}}
+
+
+class RecordedStatistics:
+    """Collect the rows given to the recorder, by statistic ID."""
+
+    def __init__(self) -> None:
+        """Initialize an empty record."""
+        self.metadata: dict[str, dict] = {}
+        self.rows: dict[str, list[dict]] = {}
+
+    def __call__(self, hass: HomeAssistant, metadata: dict, rows: list) -> None:
+        """Record one call of async_add_external_statistics."""
+        self.metadata[metadata["statistic_id"]] = metadata
+        self.rows.setdefault(metadata["statistic_id"], []).extend(rows)
+
+    def sums(self, kind: str) -> dict[int, tuple[int, int]]:
+        """Return the (state, sum) of each imported day of the month."""
+        return {
+            dt_util.as_local(row["start"]).day: (row["state"], row["sum"])
+            for row in self.rows.get(statistic_id("stats_med", kind), [])
+        }
+
+    def clear(self) -> None:
+        """Forget the rows recorded so far."""
+        self.rows = {}
+
+
+async def _async_setup(hass: HomeAssistant, freezer) -> None:
+    """Set up a capsule medication and tick once."""
+    freezer.move_to(local_time(6, 7))
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        entry_id="stats_med",
+        data={**CONFIG, CONF_MEDICATION_TYPE: "capsule", CONF_REFILL_AMOUNT: 30},
+    )
+    entry.add_to_hass(hass)
+    await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    await move_to(hass, freezer, local_time(6, 7, 1))
+
+
+async def _async_record(hass: HomeAssistant, freezer, service: str, when) -> None:
+    """Take or skip the dose at a local time."""
+    await move_to(hass, freezer, when)
+    await hass.services.async_call(
+        DOMAIN, service, {ATTR_MEDICATION_ID: "stats_med"}, blocking=True
+    )
+    await hass.async_block_till_done()
+
+
+async def test_closed_days_are_backfilled_then_imported_daily(
+    hass: HomeAssistant, freezer
+):
+    """Test sums carry across days, one day at a time after the backfill."""
+    recorded = RecordedStatistics()
+    with patch(ADD_STATISTICS, recorded):
+        await _async_setup(hass, freezer)
+        await _async_record(hass, freezer, SERVICE_TAKE_MEDICATION, local_time(6, 8, 5))
+        await _async_record(hass, freezer, SERVICE_TAKE_MEDICATION, local_time(7, 9))
+        await _async_record(hass, freezer, SERVICE_SKIP_MEDICATION, local_time(7, 20))
+        assert recorded.rows == {}
+
+        # The recorder is loaded: every closed day is backfilled
+        hass.config.components.add("recorder")
+        await move_to(hass, freezer, local_time(8, 0, 1))
+        assert recorded.sums("taken") == {6: (1, 1), 7: (1, 2)}
+        assert recorded.sums("taken_on_time") == {6: (1, 1), 7: (0, 1)}
+        assert recorded.sums("skipped") == {6: (0, 0), 7: (1, 1)}
+        assert recorded.rows[statistic_id("stats_med", "remaining")] == [
+            {"start": day_start(date(2025, 1, 7)), "mean": 28, "min": 28, "max": 28}
+        ]
+
+        # The next day only imports its own rows, summed onto the last ones
+        recorded.clear()
+        await _async_record(hass, freezer, SERVICE_TAKE_MEDICATION, local_time(8, 8))
+        await move_to(hass, freezer, local_time(9, 0, 1))
+        assert recorded.sums("taken") == {8: (1, 3)}
+        assert recorded.sums("taken_on_time") == {8: (1, 2)}
+        assert recorded.sums("skipped") == {8: (0, 1)}
+
+    metadata = recorded.metadata
+    assert metadata[statistic_id("stats_med", "taken")]["unit_of_measurement"] == (
+        "doses"
+    )
+    assert metadata[statistic_id("stats_med", "remaining")] == {
+        "has_mean": True,
+        "has_sum": False,
+        "name": "Stats Med remaining amount",
+        "source": DOMAIN,
+        "statistic_id": statistic_id("stats_med", "remaining"),
+        "unit_of_measurement": "capsule",
+    }
+
+
+async def test_history_edit_imports_every_day_again(hass: HomeAssistant, freezer):
+    """Test an edited history replaces the rows of every day."""
+    recorded = RecordedStatistics()
+    with patch(ADD_STATISTICS, recorded):
+        await _async_setup(hass, freezer)
+        hass.config.components.add("recorder")
+        await _async_record(hass, freezer, SERVICE_TAKE_MEDICATION, local_time(6, 8))
+        await _async_record(hass, freezer, SERVICE_TAKE_MEDICATION, local_time(7, 8))
+        await move_to(hass, freezer, local_time(8, 0, 1))
+        assert recorded.sums("taken") == {6: (1, 1), 7: (1, 2)}
+
+        recorded.clear()
+        await hass.services.async_call(
+            DOMAIN,
+            SERVICE_EDIT_MEDICATION_HISTORY,
+            {ATTR_HISTORY_INDEX: 0, ATTR_ACTION: "skipped"},
+            blocking=True,
+            return_response=True,
+        )
+        await move_to(hass, freezer, local_time(8, 0, 2))
+
+    assert recorded.sums("taken") == {6: (0, 0), 7: (1, 1)}
+    assert recorded.sums("skipped") == {6: (1, 1), 7: (0, 1)}
+
+
+async def test_history_edit_during_an_import_is_not_lost(hass: HomeAssistant, freezer):
+    """Test an import that read the history before an edit is dropped."""
+    recorded = RecordedStatistics()
+    with patch(ADD_STATISTICS, recorded):
+        await _async_setup(hass, freezer)
+        hass.config.components.add("recorder")
+        await _async_record(hass, freezer, SERVICE_TAKE_MEDICATION, local_time(6, 8))
+
+        store = hass.data[DOMAIN]["store"]
+        read_history = store.async_history
+        history_read = asyncio.Event()
+        edited = asyncio.Event()
+
+        async def async_history_then_edit(*args, **kwargs):
+            history = await read_history(*args, **kwargs)
+            history_read.set()
+            await edited.wait()
+            return history
+
+        with patch.object(store, "async_history", async_history_then_edit):
+            freezer.move_to(local_time(7, 0, 1))
+            async_fire_time_changed(hass, local_time(7, 0, 1))
+            await history_read.wait()
+            await hass.services.async_call(
+                DOMAIN,
+                SERVICE_EDIT_MEDICATION_HISTORY,
+                {ATTR_HISTORY_INDEX: 0, ATTR_ACTION: "skipped"},
+                blocking=True,
+                return_response=True,
+            )
+            edited.set()
+            await hass.async_block_till_done()
+        assert recorded.rows == {}
+
+        await move_to(hass, freezer, local_time(7, 0, 2))
+
+    assert recorded.sums("taken") == {6: (0, 0)}
+    assert recorded.sums("skipped") == {6: (1, 1)}
@@ -0,0 +1,254 @@
+"""Test the refill forecast from observed consumption."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_fire_time_changed,
+)
+
+from custom_components.pill_assistant.const import (
+    ATTR_MEDICATION_ID,
+    CONF_CURRENT_QUANTITY,
+    CONF_DOSAGE,
+    CONF_DOSAGE_UNIT,
+    CONF_MEDICATION_NAME,
+    CONF_REFILL_AMOUNT,
+    CONF_REFILL_REMINDER_DAYS,
+    CONF_RELATIVE_TO_SENSOR,
+    CONF_SCHEDULE_DAYS,
+    CONF_SCHEDULE_TIMES,
+    CONF_SCHEDULE_TYPE,
+    DOMAIN,
+    SERVICE_REFILL_MEDICATION,
+    SERVICE_TAKE_MEDICATION,
+)
+from custom_components.pill_assistant.forecast import (
+    CONSUMPTION_TIME_CONSTANT_DAYS,
+    RUN_OUT,
+    daily_rate,
+    record_consumption,
+)
+from custom_components.pill_assistant.hub import async_update_medication
+
+from .conftest import local_time
+
+ALL_DAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+
+async def _take(hass: HomeAssistant, freezer, when: datetime) -> None:
+    """Take the forecast medication at ``when``."""
+    freezer.move_to(when)
+    async_fire_time_changed(hass, when)
+    await hass.services.async_call(
+        DOMAIN,
+        SERVICE_TAKE_MEDICATION,
+        {ATTR_MEDICATION_ID: "forecast_med"},
+        blocking=True,
+    )
+    await hass.async_block_till_done()
+
+
+def test_consumption_average_counts_days_without_doses():
+    """Test the rate is a bias-corrected average of closed days."""
+    med_data: dict = {}
+    assert daily_rate(med_data) is None
+
+    record_consumption(med_data, 1, local_time(6, 8))
+    record_consumption(med_data, 1, local_time(6, 20))
+    # The first day only counts once it is over
+    assert daily_rate(med_data) is None
+
+    record_consumption(med_data, 1, local_time(7, 8))
+    assert daily_rate(med_data) == pytest.approx(2)
+
+    # Two days without doses lower the rate
+    first = med_data["consumption"]
+    record_consumption(med_data, 2, local_time(10, 8))
+    assert first["day"] == local_time(7, 8).date().isoformat()
+    assert daily_rate(med_data) < 2
+    assert med_data["consumption"]["day"] == local_time(10, 8).date().isoformat()
+
+
+def test_consumption_average_follows_a_new_rate():
+    """Test the rate moves to a new steady rate within a few time constants."""
+    med_data: dict = {}
+    start = local_time(1, 8)
+    for day in range(30):
+        record_consumption(med_data, 2, start + timedelta(days=day))
+    assert daily_rate(med_data) == pytest.approx(2)
+
+    for day in range(30, 30 + 4 * CONSUMPTION_TIME_CONSTANT_DAYS):
+        record_consumption(med_data, 1, start + timedelta(days=day))
+    assert daily_rate(med_data) == pytest.approx(1, abs=0.05)
+
+
+async def test_run_out_date_is_stored_on_take_and_refill(hass: HomeAssistant, freezer):
+    """Test the run-out date is projected from doses and kept with the medication."""
+    freezer.move_to(local_time(6, 7))
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        entry_id="forecast_med",
+        data={
+            CONF_MEDICATION_NAME: "Forecast Med",
+            CONF_DOSAGE: "1",
+            CONF_DOSAGE_UNIT: "each",
+            CONF_SCHEDULE_TYPE: "fixed_time",
+            CONF_SCHEDULE_TIMES: ["08:00", "20:00"],
+            CONF_SCHEDULE_DAYS: ALL_DAYS,
+            CONF_REFILL_AMOUNT: 30,
+            CONF_REFILL_REMINDER_DAYS: 7,
+        },
+    )
+    entry.add_to_hass(hass)
+    await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+
+    await _take(hass, freezer, local_time(6, 8))
+    await _take(hass, freezer, local_time(6, 20))
+    await _take(hass, freezer, local_time(7, 8))
+
+    # Two doses a day were observed, and 27 are left
+    med_data = hass.data[DOMAIN]["forecast_med"]["storage_data"]["medications"][
+        "forecast_med"
+    ]
+    expected = local_time(7, 8) + timedelta(days=13.5)
+    assert dt_util.parse_datetime(med_data[RUN_OUT]) == expected
+
+    state = hass.states.get("sensor.pa_forecast_med")
+    assert state.attributes["Daily consumption"] == 2
+    assert state.attributes["Run out date"] == expected.isoformat()
+    run_out = hass.states.get("sensor.pa_forecast_med_run_out")
+    assert dt_util.parse_datetime(run_out.state) == expected
+
+    # A refill moves the date out at the same rate
+    await hass.services.async_call(
+        DOMAIN,
+        SERVICE_REFILL_MEDICATION,
+        {ATTR_MEDICATION_ID: "forecast_med"},
+        blocking=True,
+    )
+    await hass.async_block_till_done()
+    run_out = hass.states.get("sensor.pa_forecast_med_run_out")
+    assert dt_util.parse_datetime(run_out.state) == local_time(7, 8) + timedelta(
+        days=15
+    )
+
+
+async def test_relative_schedule_without_doses_needs_no_refill(
+    hass: HomeAssistant, freezer
+):
+    """Test a schedule without a known rate only needs a refill when empty."""
+    freezer.move_to(local_time(6, 7))
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        entry_id="relative_med",
+        data={
+            CONF_MEDICATION_NAME: "Relative Med",
+            CONF_DOSAGE: "1",
+            CONF_DOSAGE_UNIT: "each",
+            CONF_SCHEDULE_TYPE: "relative_sensor",
+            CONF_RELATIVE_TO_SENSOR: "binary_sensor.wake_up",
+            CONF_SCHEDULE_DAYS: ALL_DAYS,
+            CONF_REFILL_AMOUNT: 30,
+        },
+    )
+    entry.add_to_hass(hass)
+    await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+
+    state = hass.states.get("sensor.pa_relative_med")
+    assert state.state != "refill_needed"
+    assert state.attributes["Run out date"] is None
+    assert hass.states.get("sensor.pa_relative_med_run_out").state == "unknown"
+
+
+async def _edit_options(hass: HomeAssistant, entry_id: str, **changes) -> None:
+    """Save the options form of the forecast medication with ``changes``."""
+    result = await hass.config_entries.options.async_init(entry_id)
+    await hass.config_entries.options.async_configure(
+        result["flow_id"],
+        user_input={
+            CONF_MEDICATION_NAME: "Forecast Med",
+            CONF_DOSAGE: "1",
+            CONF_DOSAGE_UNIT: "each",
+            CONF_SCHEDULE_TYPE: "fixed_time",
+            CONF_SCHEDULE_TIMES: ["08:00"],
+            CONF_SCHEDULE_DAYS: ALL_DAYS,
+            CONF_REFILL_AMOUNT: 30,
+            CONF_REFILL_REMINDER_DAYS: 7,
+            **changes,
+        },
+    )
+    await hass.async_block_till_done()
+
+
+async def test_quantity_edit_moves_the_run_out_date(hass: HomeAssistant, freezer):
+    """Test a quantity set in the options recomputes the run-out date."""
+    freezer.move_to(local_time(6, 7))
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        entry_id="forecast_med",
+        data={
+            CONF_MEDICATION_NAME: "Forecast Med",
+            CONF_DOSAGE: "1",
+            CONF_DOSAGE_UNIT: "each",
+            CONF_SCHEDULE_TYPE: "fixed_time",
+            CONF_SCHEDULE_TIMES: ["08:00"],
+            CONF_SCHEDULE_DAYS: ALL_DAYS,
+            CONF_REFILL_AMOUNT: 30,
+            CONF_REFILL_REMINDER_DAYS: 7,
+        },
+    )
+    entry.add_to_hass(hass)
+    await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    run_out = hass.states.get("sensor.pa_forecast_med_run_out")
+    assert dt_util.parse_datetime(run_out.state) == local_time(6, 7) + timedelta(
+        days=30
+    )
+
+    await _edit_options(hass, entry.entry_id, **{CONF_CURRENT_QUANTITY: 5})
+
+    run_out = hass.states.get("sensor.pa_forecast_med_run_out")
+    assert dt_util.parse_datetime(run_out.state) == local_time(6, 7) + timedelta(days=5)
+    # Five days left is within the reminder days
+    assert hass.states.get("sensor.pa_forecast_med").state == "refill_needed"
+
+
+async def test_schedule_edit_moves_the_run_out_date(hass: HomeAssistant, freezer):
+    """Test more doses a day bring the run-out date closer right away."""
+    freezer.move_to(local_time(6, 7))
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        entry_id="forecast_med",
+        data={
+            CONF_MEDICATION_NAME: "Forecast Med",
+            CONF_DOSAGE: "1",
+            CONF_DOSAGE_UNIT: "each",
+            CONF_SCHEDULE_TYPE: "fixed_time",
+            CONF_SCHEDULE_TIMES: ["08:00"],
+            CONF_SCHEDULE_DAYS: ALL_DAYS,
+            CONF_REFILL_AMOUNT: 15,
+            CONF_REFILL_REMINDER_DAYS: 7,
+        },
+    )
+    entry.add_to_hass(hass)
+    await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    assert hass.states.get("sensor.pa_forecast_med").state != "refill_needed"
+
+    # Any edit of the configuration, not only the options form
+    async_update_medication(
+        hass,
+        entry,
+        {**entry.data, CONF_SCHEDULE_TIMES: ["08:00", "14:00", "20:00"]},
+    )
+    await hass.async_block_till_done()
+
+    run_out = hass.states.get("sensor.pa_forecast_med_run_out")
+    assert dt_util.parse_datetime(run_out.state) == local_time(6, 7) + timedelta(days=5)
+    assert hass.states.get("sensor.pa_forecast_med").state == "refill_needed"
@@ -18,9 +18,9 @@ from custom_components.pill_assistant.const import (
     CONF_REFILL_REMINDER_DAYS,
     SERVICE_TAKE_MEDICATION,
     ATTR_MEDICATION_ID,
-    STORAGE_KEY,
     STORAGE_VERSION,
 )
+from custom_components.pill_assistant.store import medication_storage_key
 
 
 @pytest.mark.asyncio
@@ -56,13 +56,11 @@ async def test_state_persists_after_reload(hass: HomeAssistant):
     await hass.async_block_till_done()
 
     # Get the storage data
-    store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+    store = Store(hass, STORAGE_VERSION, medication_storage_key(entry.entry_id))
     storage_data = await store.async_load()
 
     # Verify state was saved
-    med_id = entry.entry_id
-    assert med_id in storage_data["medications"]
-    med_data = storage_data["medications"][med_id]
+    med_data = storage_data["medication"]
     assert med_data["last_taken"] is not None
     assert med_data["remaining_amount"] == 29  # Started with 30 doses, took 1 dose
 
@@ -80,7 +78,7 @@ async def test_state_persists_after_reload(hass: HomeAssistant):
 
     # Verify state persisted
     storage_data_after = await store.async_load()
-    med_data_after = storage_data_after["medications"][med_id]
+    med_data_after = storage_data_after["medication"]
     assert med_data_after["last_taken"] == last_taken_before
     assert med_data_after["remaining_amount"] == remaining_before
 
@@ -118,9 +116,9 @@ async def test_relative_medication_state_persists(hass: HomeAssistant):
     await hass.async_block_till_done()
 
     # Get storage and verify state
-    store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+    store = Store(hass, STORAGE_VERSION, medication_storage_key(entry1.entry_id))
     storage_data = await store.async_load()
-    last_taken_med1 = storage_data["medications"][entry1.entry_id]["last_taken"]
+    last_taken_med1 = storage_data["medication"]["last_taken"]
     assert last_taken_med1 is not None
 
     # Unload and reload
@@ -131,10 +129,7 @@ async def test_relative_medication_state_persists(hass: HomeAssistant):
 
     # Verify state persisted
     storage_data_after = await store.async_load()
-    assert (
-        storage_data_after["medications"][entry1.entry_id]["last_taken"]
-        == last_taken_med1
-    )
+    assert storage_data_after["medication"]["last_taken"] == last_taken_med1
 
 
 @pytest.mark.asyncio
@@ -172,11 +167,9 @@ async def test_snooze_state_persists(hass: HomeAssistant):
     await hass.async_block_till_done()
 
     # Get the storage data
-    store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+    store = Store(hass, STORAGE_VERSION, medication_storage_key(entry.entry_id))
     storage_data = await store.async_load()
-    snooze_until_before = storage_data["medications"][entry.entry_id].get(
-        "snooze_until"
-    )
+    snooze_until_before = storage_data["medication"].get("snooze_until")
     assert snooze_until_before is not None
 
     # Unload and reload
@@ -187,9 +180,7 @@ async def test_snooze_state_persists(hass: HomeAssistant):
 
     # Verify snooze state persisted
     storage_data_after = await store.async_load()
-    snooze_until_after = storage_data_after["medications"][entry.entry_id].get(
-        "snooze_until"
-    )
+    snooze_until_after = storage_data_after["medication"].get("snooze_until")
     assert snooze_until_after == snooze_until_before
 
 
@@ -226,13 +217,11 @@ async def test_missed_doses_persist(hass: HomeAssistant):
         await hass.async_block_till_done()
 
         # Get the storage data
-        store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        store = Store(hass, STORAGE_VERSION, medication_storage_key(entry.entry_id))
         storage_data = await store.async_load()
 
         # Store missed doses count
-        missed_doses_before = storage_data["medications"][entry.entry_id].get(
-            "missed_doses", []
-        )
+        missed_doses_before = storage_data["medication"].get("missed_doses", [])
 
         # Unload and reload
         await hass.config_entries.async_unload(entry.entry_id)
@@ -242,7 +231,5 @@ async def test_missed_doses_persist(hass: HomeAssistant):
 
         # Verify missed doses persisted
         storage_data_after = await store.async_load()
-        missed_doses_after = storage_data_after["medications"][entry.entry_id].get(
-            "missed_doses", []
-        )
+        missed_doses_after = storage_data_after["medication"].get("missed_doses", [])
         assert missed_doses_after == missed_doses_before
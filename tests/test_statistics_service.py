@@ -1,14 +1,19 @@
 """Test statistics service response format."""
 
+import csv
 from datetime import datetime, timedelta
+import os
 
 import pytest
 from homeassistant.core import HomeAssistant, ServiceResponse
 from homeassistant.util import dt as dt_util
 from pytest_homeassistant_custom_component.common import MockConfigEntry
 
+from custom_components.pill_assistant import log_utils
 from custom_components.pill_assistant.const import (
     ATTR_END_DATE,
+    ATTR_GRANULARITY,
+    ATTR_MAX_POINTS,
     ATTR_MEDICATION_ID,
     ATTR_START_DATE,
     CONF_DOSAGE,
@@ -258,3 +263,92 @@ async def test_statistics_daily_counts(hass: HomeAssistant):
             assert "taken" in med_day_data
             assert "skipped" in med_day_data
             assert "name" in med_day_data
+
+
+async def test_statistics_series_by_granularity(hass: HomeAssistant):
+    """Test statistics are returned as compact per-bucket series."""
+    config_entry = MockConfigEntry(
+        domain=DOMAIN,
+        entry_id="series_med",
+        data={
+            CONF_MEDICATION_NAME: "Series Med",
+            CONF_DOSAGE: "1",
+            CONF_DOSAGE_UNIT: "each",
+            CONF_SCHEDULE_TIMES: ["08:00"],
+            CONF_SCHEDULE_DAYS: ["mon", "tue", "wed", "thu", "fri", "sat", "sun"],
+            CONF_REFILL_AMOUNT: 60,
+            CONF_ON_TIME_WINDOW_MINUTES: 30,
+        },
+    )
+    config_entry.add_to_hass(hass)
+    await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    # Doses on 1, 2 and 10 January, and a snooze on 3 February
+    events = [
+        ("2025-01-01T08:05:00", "taken"),
+        ("2025-01-02T11:00:00", "taken"),
+        ("2025-01-02T20:00:00", "skipped"),
+        ("2025-01-10T08:00:00", "taken"),
+        ("2025-02-03T07:55:00", "snoozed"),
+    ]
+    path = log_utils.get_global_log_path(hass)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8") as handle:
+        writer = csv.DictWriter(handle, fieldnames=log_utils.GLOBAL_LOG_COLUMNS)
+        writer.writeheader()
+        for timestamp, action in events:
+            writer.writerow(
+                {
+                    "timestamp": timestamp,
+                    "action": action,
+                    "medication_id": "series_med",
+                    "medication_name": "Series Med",
+                }
+            )
+
+    async def get_statistics(**data) -> dict:
+        return await hass.services.async_call(
+            DOMAIN,
+            SERVICE_GET_STATISTICS,
+            {
+                ATTR_START_DATE: "2025-01-01T00:00:00",
+                ATTR_END_DATE: "2025-03-01T00:00:00",
+                **data,
+            },
+            blocking=True,
+            return_response=True,
+        )
+
+    response = await get_statistics(**{ATTR_GRANULARITY: "week"})
+    assert "daily_counts" not in response
+    assert "taken_times" not in response["medications"]["series_med"]
+    assert response["medications"]["series_med"]["taken_count"] == 3
+    series = response["series"]
+    assert series["granularity"] == "week"
+    assert series["bucket_size"] == 1
+    # Weeks start on Monday, and weeks without events are zeros
+    assert series["start"][0] == "2024-12-30T00:00:00"
+    assert series["start"][-1] == "2025-02-03T00:00:00"
+    med_series = series["medications"]["series_med"]
+    assert med_series["name"] == "Series Med"
+    assert med_series["taken"] == [2, 1, 0, 0, 0, 0]
+    assert med_series["taken_on_time"] == [1, 1, 0, 0, 0, 0]
+    assert med_series["skipped"] == [1, 0, 0, 0, 0, 0]
+    assert med_series["snoozed"] == [0, 0, 0, 0, 0, 1]
+
+    response = await get_statistics(**{ATTR_GRANULARITY: "month"})
+    assert response["series"]["start"] == ["2025-01-01T00:00:00", "2025-02-01T00:00:00"]
+    assert response["series"]["medications"]["series_med"]["taken"] == [3, 0]
+
+    # 34 days fit in 10 points of 4 days each; the counts are kept
+    response = await get_statistics(**{ATTR_GRANULARITY: "day", ATTR_MAX_POINTS: 10})
+    series = response["series"]
+    assert series["bucket_size"] == 4
+    assert len(series["start"]) == 9
+    assert series["start"][:3] == [
+        "2025-01-01T00:00:00",
+        "2025-01-05T00:00:00",
+        "2025-01-09T00:00:00",
+    ]
+    assert series["medications"]["series_med"]["taken"] == [2, 0, 1, 0, 0, 0, 0, 0, 0]
@@ -0,0 +1,224 @@
+"""Test lock striping, snapshots and coalesced writes in the store."""
+
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from custom_components.pill_assistant.const import STORAGE_KEY
+from custom_components.pill_assistant.store import (
+    PillAssistantStore,
+    history_storage_key,
+    medication_storage_key,
+)
+
+
+class BlockingSave:
+    """Stand-in for Store.async_save that blocks until released."""
+
+    def __init__(self) -> None:
+        """Initialize with the gate closed."""
+        self.release = asyncio.Event()
+        self.saved: list = []
+
+    async def __call__(self, store: Store, data) -> None:
+        """Record the storage key and written data once the gate opens."""
+        await self.release.wait()
+        self.saved.append((store.key, data))
+
+    def keys(self) -> list[str]:
+        """Return the keys of the written files, in order."""
+        return [key for key, _ in self.saved]
+
+    def last(self, key: str):
+        """Return the data last written to a file."""
+        return [data for saved_key, data in self.saved if saved_key == key][-1]
+
+
+def _patch_save(blocking: BlockingSave):
+    """Patch every Store to save through ``blocking``."""
+
+    async def async_save(store: Store, data) -> None:
+        await blocking(store, data)
+
+    return patch.object(Store, "async_save", async_save)
+
+
+async def _store_with_meds(hass: HomeAssistant) -> PillAssistantStore:
+    """Return a loaded store holding two medications."""
+    store = PillAssistantStore(hass)
+    data = await store.async_load()
+    data["medications"]["med_a"] = {"remaining_amount": 10}
+    data["medications"]["med_b"] = {"remaining_amount": 10}
+    await store.async_save(data)
+    return store
+
+
+def _decrement(med_id: str):
+    """Return an update function taking one dose of ``med_id``."""
+
+    def update(data: dict) -> None:
+        data["medications"][med_id]["remaining_amount"] -= 1
+
+    return update
+
+
+async def test_different_medications_do_not_block(hass: HomeAssistant):
+    """Test an update of one medication proceeds while another is saving."""
+    store = await _store_with_meds(hass)
+    blocking = BlockingSave()
+    with _patch_save(blocking):
+        task_a = hass.async_create_task(
+            store.async_update(_decrement("med_a"), med_id="med_a")
+        )
+        await asyncio.sleep(0)
+        task_b = hass.async_create_task(
+            store.async_update(_decrement("med_b"), med_id="med_b")
+        )
+        await asyncio.sleep(0)
+
+        # Both changes are applied and published while the first write is pending
+        snapshot = store.snapshot
+        assert snapshot["medications"]["med_a"]["remaining_amount"] == 9
+        assert snapshot["medications"]["med_b"]["remaining_amount"] == 9
+        assert not task_a.done()
+
+        blocking.release.set()
+        await asyncio.gather(task_a, task_b)
+
+    # Each change only rewrote the file of its own medication
+    assert blocking.keys() == [
+        medication_storage_key("med_a"),
+        medication_storage_key("med_b"),
+    ]
+    med_b = blocking.last(medication_storage_key("med_b"))
+    assert med_b["medication"]["remaining_amount"] == 9
+
+
+async def test_same_medication_updates_are_serialized(hass: HomeAssistant):
+    """Test a second update of a medication waits for the first to be saved."""
+    store = await _store_with_meds(hass)
+    blocking = BlockingSave()
+    with _patch_save(blocking):
+        task_first = hass.async_create_task(
+            store.async_update(_decrement("med_a"), med_id="med_a")
+        )
+        await asyncio.sleep(0)
+        task_second = hass.async_create_task(
+            store.async_update(_decrement("med_a"), med_id="med_a")
+        )
+        await asyncio.sleep(0)
+
+        assert store.snapshot["medications"]["med_a"]["remaining_amount"] == 9
+
+        blocking.release.set()
+        await asyncio.gather(task_first, task_second)
+    assert store.snapshot["medications"]["med_a"]["remaining_amount"] == 8
+
+
+async def test_global_update_excludes_medication_updates(hass: HomeAssistant):
+    """Test a global rewrite waits for a take, and holds off the next one."""
+    store = await _store_with_meds(hass)
+    applied = []
+
+    def refill_all(data: dict) -> None:
+        applied.append("refill_all")
+        for med in data["medications"].values():
+            med["remaining_amount"] = 30
+
+    blocking = BlockingSave()
+    with _patch_save(blocking):
+        task_take = hass.async_create_task(
+            store.async_update(_decrement("med_a"), med_id="med_a")
+        )
+        await asyncio.sleep(0)
+        task_refill = hass.async_create_task(
+            store.async_update(refill_all, rewrite_history=True)
+        )
+        await asyncio.sleep(0)
+        task_next = hass.async_create_task(
+            store.async_update(_decrement("med_b"), med_id="med_b")
+        )
+        for _ in range(3):
+            await asyncio.sleep(0)
+
+        # The take of med_a is saving; neither the rewrite nor med_b started
+        assert applied == []
+        medications = store.snapshot["medications"]
+        assert medications["med_a"]["remaining_amount"] == 9
+        assert medications["med_b"]["remaining_amount"] == 10
+
+        blocking.release.set()
+        await asyncio.gather(task_take, task_refill, task_next)
+
+    medications = store.snapshot["medications"]
+    assert medications["med_a"]["remaining_amount"] == 30
+    assert medications["med_b"]["remaining_amount"] == 29
+
+
+async def test_concurrent_writes_are_coalesced(hass: HomeAssistant):
+    """Test changes made during a pending write share the next write."""
+    store = await _store_with_meds(hass)
+    blocking = BlockingSave()
+    with _patch_save(blocking):
+        first = hass.async_create_task(
+            store.async_update(_decrement("med_a"), med_id="med_a")
+        )
+        await asyncio.sleep(0)
+        others = [
+            hass.async_create_task(
+                store.async_update(_decrement("med_b"), med_id="med_b")
+            ),
+            hass.async_create_task(
+                store.async_append_history(
+                    {
+                        "medication_id": "med_b",
+                        "action": "skipped",
+                        "timestamp": dt_util.now().isoformat(),
+                    }
+                )
+            ),
+        ]
+        await asyncio.sleep(0)
+
+        blocking.release.set()
+        await asyncio.gather(first, *others)
+
+    # The first write plus a single write covering both later changes, which
+    # also lists the new history file in the index
+    assert sorted(blocking.keys()) == sorted(
+        [
+            medication_storage_key("med_a"),
+            history_storage_key("med_b"),
+            medication_storage_key("med_b"),
+            STORAGE_KEY,
+        ]
+    )
+    med_b = blocking.last(medication_storage_key("med_b"))
+    assert med_b["medication"]["remaining_amount"] == 9
+    assert med_b["recent_history"][-1]["action"] == "skipped"
+    history = blocking.last(history_storage_key("med_b"))["history"]
+    assert history[-1]["action"] == "skipped"
+
+
+async def test_snapshot_is_immutable(hass: HomeAssistant):
+    """Test published snapshots are not affected by later changes."""
+    store = await _store_with_meds(hass)
+    before = store.snapshot
+
+    await store.async_update(_decrement("med_a"), med_id="med_a")
+    await store.async_append_history({"medication_id": "med_a", "action": "taken"})
+
+    assert before["medications"]["med_a"]["remaining_amount"] == 10
+    assert before["history"] == ()
+    after = store.snapshot
+    assert after["medications"]["med_a"]["remaining_amount"] == 9
+    assert len(after["history"]) == 1
+    # Unchanged records are shared between snapshots
+    assert after["medications"]["med_b"] is before["medications"]["med_b"]
+
+    with pytest.raises(TypeError):
+        after["history"] = []
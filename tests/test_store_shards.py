@@ -0,0 +1,136 @@
+"""Test the index and per-medication storage files."""
+
+from datetime import datetime, timedelta
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from custom_components.pill_assistant.const import (
+    HISTORY_STORAGE_KEY,
+    STORAGE_KEY,
+    STORAGE_VERSION,
+)
+from custom_components.pill_assistant.store import (
+    PillAssistantStore,
+    history_storage_key,
+    medication_storage_key,
+)
+
+
+def _now() -> datetime:
+    """Return a fixed local noon."""
+    return datetime(2025, 1, 6, 12, 0, tzinfo=dt_util.DEFAULT_TIME_ZONE)
+
+
+def _entry(med_id: str | None, days_ago: int) -> dict:
+    """Return a taken history entry."""
+    entry = {
+        "action": "taken",
+        "timestamp": (_now() - timedelta(days=days_ago)).isoformat(),
+    }
+    if med_id is not None:
+        entry["medication_id"] = med_id
+    return entry
+
+
+def _stored(key: str, data: dict) -> dict:
+    """Return a storage document as written by Store."""
+    return {"version": STORAGE_VERSION, "key": key, "data": data}
+
+
+async def test_single_file_layout_is_split(
+    hass: HomeAssistant, hass_storage: dict, freezer
+):
+    """Test the single medication file is split and loads back the same."""
+    freezer.move_to(_now())
+    medications = {"med_a": {"remaining_amount": 10}, "med_b": {"remaining_amount": 5}}
+    history = [_entry("med_a", 40), _entry("med_b", 3), _entry(None, 2)]
+    history.append(_entry("med_a", 1))
+    hass_storage[STORAGE_KEY] = _stored(
+        STORAGE_KEY,
+        {
+            "medications": medications,
+            "last_sensor_trigger": {"med_a": "sensor.door"},
+            "recent_history": history[1:],
+        },
+    )
+    hass_storage[HISTORY_STORAGE_KEY] = _stored(
+        HISTORY_STORAGE_KEY, {"history": history}
+    )
+
+    store = PillAssistantStore(hass)
+    await store.async_load()
+
+    index = hass_storage[STORAGE_KEY]["data"]
+    assert index["medication_ids"] == ["med_a", "med_b"]
+    assert index["history_ids"] == ["med_a", "med_b"]
+    assert index["last_sensor_trigger"] == {"med_a": "sensor.door"}
+    assert "medications" not in index
+    med_a = hass_storage[medication_storage_key("med_a")]["data"]
+    assert med_a["medication"] == {"remaining_amount": 10}
+    assert med_a["recent_history"] == [_entry("med_a", 1)]
+    assert hass_storage[history_storage_key("med_a")]["data"]["history"] == [
+        _entry("med_a", 40),
+        _entry("med_a", 1),
+    ]
+    assert hass_storage[history_storage_key("med_b")]["data"]["history"] == [
+        _entry("med_b", 3)
+    ]
+    # Entries without a medication stay in the shared history file
+    assert hass_storage[HISTORY_STORAGE_KEY]["data"]["history"] == [_entry(None, 2)]
+
+    PillAssistantStore.reset_instance()
+    reloaded = PillAssistantStore(hass)
+    data = await reloaded.async_load()
+    assert data["medications"] == medications
+    assert data["last_sensor_trigger"] == {"med_a": "sensor.door"}
+    assert len(reloaded.recent_history) == 3
+    assert await reloaded.async_load_history() == history
+
+
+async def test_changes_only_rewrite_their_medication_files(
+    hass: HomeAssistant, hass_storage: dict, freezer
+):
+    """Test updates write the files of the changed medication and nothing else."""
+    freezer.move_to(_now())
+    store = PillAssistantStore(hass)
+    data = await store.async_load()
+    data["medications"]["med_a"] = {"remaining_amount": 10}
+    data["medications"]["med_b"] = {"remaining_amount": 10}
+    await store.async_save(data)
+    await store.async_append_history(_entry("med_a", 1), _entry("med_b", 1))
+
+    def written() -> dict:
+        """Return the document currently stored under each key."""
+        return {key: stored for key, stored in hass_storage.items()}
+
+    def update_a(data: dict) -> None:
+        data["medications"]["med_a"]["remaining_amount"] -= 1
+
+    before = written()
+    await store.async_update(update_a, med_id="med_a")
+    after = written()
+    assert [key for key in after if after[key] is not before[key]] == [
+        medication_storage_key("med_a")
+    ]
+
+    def edit_b(data: dict) -> None:
+        data["history"][1] = {**data["history"][1], "action": "skipped"}
+
+    before = written()
+    await store.async_update(edit_b, rewrite_history=True)
+    after = written()
+    assert {key for key in after if after[key] is not before[key]} == {
+        medication_storage_key("med_b"),
+        history_storage_key("med_b"),
+    }
+
+    def delete_b(data: dict) -> None:
+        del data["medications"]["med_b"]
+
+    await store.async_update(delete_b)
+    assert medication_storage_key("med_b") not in hass_storage
+    assert hass_storage[STORAGE_KEY]["data"]["medication_ids"] == ["med_a"]
+    # The history of a removed medication is kept
+    history_b = hass_storage[history_storage_key("med_b")]["data"]["history"]
+    assert history_b[0]["action"] == "skipped"
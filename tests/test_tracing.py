@@ -0,0 +1,115 @@
+"""Test span tracing of actions and the JSON-lines exporter."""
+
+import json
+import os
+
+from homeassistant.core import HomeAssistant
+from homeassistant.setup import async_setup_component
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.pill_assistant.const import (
+    ATTR_MEDICATION_ID,
+    CONF_TRACING,
+    DOMAIN,
+    SERVICE_TAKE_MEDICATION,
+)
+from custom_components.pill_assistant.log_utils import get_logs_dir
+from custom_components.pill_assistant.tracing import (
+    TRACES_FILENAME,
+    JsonLinesExporter,
+)
+
+
+def _read_spans(hass: HomeAssistant) -> list[dict]:
+    """Return the exported spans."""
+    path = os.path.join(get_logs_dir(hass), TRACES_FILENAME)
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle]
+
+
+async def test_take_medication_is_traced(
+    hass: HomeAssistant, mock_config_entry: MockConfigEntry
+):
+    """Test a take is exported as one trace with nested stages."""
+    mock_config_entry.add_to_hass(hass)
+    await hass.config_entries.async_setup(mock_config_entry.entry_id)
+    await hass.async_block_till_done()
+    med_id = mock_config_entry.entry_id
+
+    await hass.services.async_call(
+        DOMAIN, SERVICE_TAKE_MEDICATION, {ATTR_MEDICATION_ID: med_id}, blocking=True
+    )
+    await hass.async_block_till_done()
+    # Sensor refreshes started by the take end after it, and are written
+    # with the next trace
+    hass.data[DOMAIN]["tracer"].async_flush()
+    await hass.async_block_till_done()
+
+    spans = _read_spans(hass)
+    roots = [span for span in spans if span["parent_id"] is None]
+    assert [root["name"] for root in roots] == ["service_take_medication"]
+    root = roots[0]
+    assert root["attributes"] == {"medication_id": med_id}
+    assert {span["trace_id"] for span in spans} == {root["trace_id"]}
+
+    by_name = {}
+    for span in spans:
+        by_name.setdefault(span["name"], []).append(span)
+    ids = {span["span_id"]: span for span in spans}
+
+    store_update = by_name["store_update"][0]
+    assert store_update["parent_id"] == root["span_id"]
+    for stage in ("store_lock_wait", "store_write", "store_write_history"):
+        assert by_name[stage][0]["parent_id"] == store_update["span_id"]
+
+    appends = by_name["csv_append"]
+    assert len(appends) == 2
+    assert all(append["attributes"]["bytes_written"] > 0 for append in appends)
+    assert ids[appends[0]["parent_id"]]["name"] == "log_event"
+
+    dispatch = by_name["dispatch"][0]
+    assert dispatch["parent_id"] == root["span_id"]
+    assert any(
+        span["parent_id"] == dispatch["span_id"] for span in by_name["sensor_update"]
+    )
+
+
+async def test_tracing_can_be_disabled(
+    hass: HomeAssistant, mock_config_entry: MockConfigEntry
+):
+    """Test no traces are written when tracing is turned off."""
+    assert await async_setup_component(hass, DOMAIN, {DOMAIN: {CONF_TRACING: False}})
+    mock_config_entry.add_to_hass(hass)
+    await hass.config_entries.async_setup(mock_config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    await hass.services.async_call(
+        DOMAIN,
+        SERVICE_TAKE_MEDICATION,
+        {ATTR_MEDICATION_ID: mock_config_entry.entry_id},
+        blocking=True,
+    )
+    await hass.async_block_till_done()
+
+    assert _read_spans(hass) == []
+
+
+def test_exporter_rotates_by_size(tmp_path):
+    """Test the exporter keeps a bounded number of rotated files."""
+    path = tmp_path / "traces.jsonl"
+    exporter = JsonLinesExporter(str(path), max_bytes=100, backup_count=2)
+
+    for index in range(5):
+        exporter.write([{"index": index, "padding": "x" * 40}])
+
+    assert sorted(os.listdir(tmp_path)) == [
+        "traces.jsonl",
+        "traces.jsonl.1",
+        "traces.jsonl.2",
+    ]
+    with open(path, encoding="utf-8") as handle:
+        assert json.loads(handle.readline())["index"] == 4
+    with open(f"{path}.2", encoding="utf-8") as handle:
+        assert json.loads(handle.readline())["index"] == 2
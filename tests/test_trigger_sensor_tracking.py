@@ -0,0 +1,123 @@
+"""Test shared state-change tracking of relative_sensor trigger sensors."""
+
+from datetime import timedelta
+from unittest.mock import patch
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.event import async_track_state_change_event
+from homeassistant.util import dt as dt_util
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.pill_assistant.const import (
+    ATTR_NEXT_DOSE_TIME,
+    CONF_DOSAGE,
+    CONF_DOSAGE_UNIT,
+    CONF_MEDICATION_NAME,
+    CONF_REFILL_AMOUNT,
+    CONF_REFILL_REMINDER_DAYS,
+    CONF_RELATIVE_OFFSET_HOURS,
+    CONF_RELATIVE_OFFSET_MINUTES,
+    CONF_RELATIVE_TO_SENSOR,
+    CONF_SCHEDULE_DAYS,
+    CONF_SCHEDULE_TYPE,
+    CONF_SENSOR_TRIGGER_VALUE,
+    DOMAIN,
+)
+from custom_components.pill_assistant.triggers import SensorTriggerTracker
+
+SENSOR_ID = "binary_sensor.kitchen_motion"
+
+
+def _sensor_entry(name: str) -> MockConfigEntry:
+    """Return a medication due one hour after the kitchen sensor turns on."""
+    return MockConfigEntry(
+        domain=DOMAIN,
+        data={
+            CONF_MEDICATION_NAME: name,
+            CONF_DOSAGE: "1",
+            CONF_DOSAGE_UNIT: "pill",
+            CONF_SCHEDULE_TYPE: "relative_sensor",
+            CONF_RELATIVE_TO_SENSOR: SENSOR_ID,
+            CONF_SENSOR_TRIGGER_VALUE: "on",
+            CONF_RELATIVE_OFFSET_HOURS: 1,
+            CONF_RELATIVE_OFFSET_MINUTES: 0,
+            CONF_SCHEDULE_DAYS: ["mon", "tue", "wed", "thu", "fri", "sat", "sun"],
+            CONF_REFILL_AMOUNT: 30,
+            CONF_REFILL_REMINDER_DAYS: 7,
+        },
+    )
+
+
+async def test_medications_share_one_sensor_subscription(hass: HomeAssistant):
+    """Test two medications on the same sensor create a single subscription."""
+    hass.states.async_set(SENSOR_ID, "off")
+
+    with patch(
+        "custom_components.pill_assistant.triggers.async_track_state_change_event",
+        wraps=async_track_state_change_event,
+    ) as mock_track:
+        first = _sensor_entry("Med One")
+        second = _sensor_entry("Med Two")
+        first.add_to_hass(hass)
+        second.add_to_hass(hass)
+        await hass.config_entries.async_setup(first.entry_id)
+        await hass.async_block_till_done()
+
+    tracker = hass.data[DOMAIN]["trigger_tracker"]
+    assert tracker.entity_ids == {SENSOR_ID}
+    # Subscribed once when the sensor was first used, not once per medication
+    assert mock_track.call_count == 1
+
+    await hass.config_entries.async_unload(first.entry_id)
+    await hass.async_block_till_done()
+    assert tracker.entity_ids == {SENSOR_ID}
+
+    await hass.config_entries.async_unload(second.entry_id)
+    await hass.async_block_till_done()
+    assert tracker.entity_ids == frozenset()
+
+
+async def test_sensor_change_updates_next_dose_immediately(hass: HomeAssistant):
+    """Test the next dose follows the sensor without waiting for a time tick."""
+    hass.states.async_set(SENSOR_ID, "off")
+    entry = _sensor_entry("Motion Med")
+    entry.add_to_hass(hass)
+    await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+
+    entity_id = "sensor.pa_motion_med"
+    assert ATTR_NEXT_DOSE_TIME not in hass.states.get(entity_id).attributes
+
+    hass.states.async_set(SENSOR_ID, "on")
+    await hass.async_block_till_done()
+
+    expected = hass.states.get(SENSOR_ID).last_changed + timedelta(hours=1)
+    next_dose = hass.states.get(entity_id).attributes[ATTR_NEXT_DOSE_TIME]
+    assert dt_util.parse_datetime(next_dose) == expected
+
+    # Non-matching values clear the trigger again
+    hass.states.async_set(SENSOR_ID, "off")
+    await hass.async_block_till_done()
+    assert ATTR_NEXT_DOSE_TIME not in hass.states.get(entity_id).attributes
+
+
+async def test_removing_a_listener_twice_keeps_later_listeners(hass: HomeAssistant):
+    """Test a stale remove callback leaves a newer listener of the sensor."""
+    hass.states.async_set(SENSOR_ID, "off")
+    tracker = SensorTriggerTracker(hass)
+    received = []
+
+    remove_first = tracker.async_add_listener(SENSOR_ID, received.append)
+    remove_first()
+    remove_second = tracker.async_add_listener(SENSOR_ID, received.append)
+    remove_first()
+    assert tracker.entity_ids == {SENSOR_ID}
+
+    hass.states.async_set(SENSOR_ID, "on")
+    await hass.async_block_till_done()
+    assert [state.state for state in received] == ["on"]
+
+    remove_second()
+    remove_second()
+    assert tracker.entity_ids == frozenset()
+    tracker.async_stop()